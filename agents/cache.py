@@ -5,6 +5,10 @@ Agent Result Caching System
 Decorators for caching expensive agent operations.
 Reduces API calls, improves response times, handles rate limits gracefully.
 
+Two tiers: a bounded in-process LRU in front of one SQLite table (WAL mode) shared by
+all agents. Expired rows are removed in batch sweeps, and the least recently used rows
+are evicted when the store grows past max_bytes / max_entries. Keys live in namespaces.
+
 Usage:
     from agents.cache import cache_result, invalidate_cache
 
@@ -21,27 +25,104 @@ Usage:
 
 import json
 import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
-from datetime import datetime, timedelta
 from functools import wraps
 from typing import Callable, Any, Optional
 
 
 class AgentCache:
-    """Simple file-based cache for agent results"""
-
-    def __init__(self, cache_dir: Optional[Path] = None):
+    """Two-tier cache for agent results: in-memory LRU over a shared SQLite table"""
+
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        namespace: str = "default",
+        memory_size: int = 256,
+        memory_ttl: float = 30.0,
+        max_entries: int = 10000,
+        max_bytes: int = 50 * 1024 * 1024,
+        sweep_interval: float = 300.0,
+    ):
+        """
+        Args:
+            cache_dir: Directory holding agent_cache.db (default: data/agent_cache)
+            namespace: Key namespace; clear() and stats() only see this namespace
+            memory_size: Entries kept in the in-process LRU
+            memory_ttl: Seconds a memory entry is trusted before re-checking SQLite,
+                        so deletes from other processes are picked up
+            max_entries / max_bytes: Store-wide limits enforced by sweeps (LRU eviction)
+            sweep_interval: Seconds between expiry/eviction sweeps (also run every 100 sets)
+        """
         if cache_dir is None:
             cache_dir = Path(__file__).parent.parent / "data" / "agent_cache"
 
         self.cache_dir = cache_dir
         self.cache_dir.mkdir(parents=True, exist_ok=True)
-
-    def _get_cache_file(self, key: str) -> Path:
-        """Get cache file path for key"""
-        # Hash key to avoid filesystem issues
-        key_hash = hashlib.sha256(key.encode()).hexdigest()
-        return self.cache_dir / f"{key_hash}.json"
+        self.db_path = self.cache_dir / "agent_cache.db"
+        self.namespace = namespace
+        self.memory_size = memory_size
+        self.memory_ttl = memory_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+
+        self._memory: OrderedDict = OrderedDict()  # key -> (value JSON, trusted until)
+        self._touched: dict = {}  # key -> last memory-tier hit, written to last_access by sweep()
+        self._lock = threading.RLock()
+        self._conn = None
+        self._conn_pid = None
+        self._last_sweep = time.time()
+        self._sets_since_sweep = 0
+        self.counters = {"hits": 0, "memory_hits": 0, "misses": 0, "sets": 0, "evictions": 0, "expired_removed": 0}
+        self._init_database()
+
+    def _db(self) -> sqlite3.Connection:
+        """Connection for this process (reopened after a fork)"""
+        if self._conn is None or self._conn_pid != os.getpid():
+            self._conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def _init_database(self):
+        """Initialize SQLite database schema"""
+        conn = self._db()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    cached_at REAL NOT NULL,
+                    expires_at REAL,
+                    last_access REAL NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_cache_expires
+                ON cache_entries(expires_at) WHERE expires_at IS NOT NULL
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_cache_last_access
+                ON cache_entries(last_access)
+            """)
+
+    def _remember(self, key: str, value_json: str, expires_at: Optional[float], now: float):
+        trusted_until = now + self.memory_ttl
+        if expires_at is not None:
+            trusted_until = min(trusted_until, expires_at)
+        self._memory[key] = (value_json, trusted_until)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
 
     def get(self, key: str) -> Optional[Any]:
         """
@@ -50,26 +131,41 @@ class AgentCache:
         Returns:
             Cached value or None if not found/expired
         """
-        cache_file = self._get_cache_file(key)
-
-        if not cache_file.exists():
-            return None
-
-        try:
-            with open(cache_file) as f:
-                data = json.load(f)
-
-            # Check expiration
-            if "expires_at" in data:
-                expires_at = datetime.fromisoformat(data["expires_at"])
-                if datetime.now() >= expires_at:
-                    cache_file.unlink()  # Remove expired
-                    return None
-
-            return data["value"]
-
-        except (json.JSONDecodeError, KeyError):
-            return None
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now < entry[1]:
+                    self._memory.move_to_end(key)
+                    self._touched[key] = now
+                    self.counters["hits"] += 1
+                    self.counters["memory_hits"] += 1
+                    return json.loads(entry[0])
+                del self._memory[key]
+
+            conn = self._db()
+            row = conn.execute(
+                "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+            value_json, expires_at = row
+            if expires_at is not None and now >= expires_at:
+                with conn:
+                    conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+                self.counters["misses"] += 1
+                self.counters["expired_removed"] += 1
+                return None
+            with conn:
+                conn.execute(
+                    "UPDATE cache_entries SET last_access = ? WHERE namespace = ? AND key = ?",
+                    (now, self.namespace, key),
+                )
+            self._remember(key, value_json, expires_at, now)
+            self.counters["hits"] += 1
+            return json.loads(value_json)
 
     def set(self, key: str, value: Any, ttl_seconds: Optional[int] = None):
         """
@@ -80,20 +176,26 @@ class AgentCache:
             value: Value to cache (must be JSON-serializable)
             ttl_seconds: Time-to-live in seconds (None = never expires)
         """
-        cache_file = self._get_cache_file(key)
-
-        data = {
-            "key": key,
-            "value": value,
-            "cached_at": datetime.now().isoformat()
-        }
-
-        if ttl_seconds is not None:
-            expires_at = datetime.now() + timedelta(seconds=ttl_seconds)
-            data["expires_at"] = expires_at.isoformat()
-
-        with open(cache_file, 'w') as f:
-            json.dump(data, f, indent=2)
+        value_json = json.dumps(value)
+        now = time.time()
+        expires_at = now + ttl_seconds if ttl_seconds is not None else None
+
+        with self._lock:
+            conn = self._db()
+            with conn:
+                conn.execute(
+                    """
+                    INSERT OR REPLACE INTO cache_entries
+                    (namespace, key, value, cached_at, expires_at, last_access, size_bytes)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (self.namespace, key, value_json, now, expires_at, now, len(value_json)),
+                )
+            self._remember(key, value_json, expires_at, now)
+            self.counters["sets"] += 1
+            self._sets_since_sweep += 1
+            if self._sets_since_sweep >= 100 or now - self._last_sweep >= self.sweep_interval:
+                self.sweep()
 
     def delete(self, key: str) -> bool:
         """
@@ -102,53 +204,99 @@ class AgentCache:
         Returns:
             True if key existed and was deleted
         """
-        cache_file = self._get_cache_file(key)
-
-        if cache_file.exists():
-            cache_file.unlink()
-            return True
-
-        return False
+        with self._lock:
+            self._memory.pop(key, None)
+            conn = self._db()
+            with conn:
+                cursor = conn.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key)
+                )
+            return cursor.rowcount > 0
 
     def clear(self):
-        """Clear all cached values"""
-        for cache_file in self.cache_dir.glob("*.json"):
-            cache_file.unlink()
+        """Clear all cached values in this namespace"""
+        with self._lock:
+            self._memory.clear()
+            conn = self._db()
+            with conn:
+                conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+
+    def sweep(self) -> dict:
+        """
+        Write this instance's pending memory-tier accesses to last_access, remove expired
+        entries (all namespaces) in one batch, then evict the least recently used entries
+        while the store exceeds max_entries or max_bytes.
+
+        Returns:
+            {"expired": n, "evicted": n}
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._db()
+            with conn:
+                # Memory-tier hits don't touch SQLite; record them now so eviction stays LRU
+                if self._touched:
+                    conn.executemany(
+                        "UPDATE cache_entries SET last_access = MAX(last_access, ?) WHERE namespace = ? AND key = ?",
+                        [(t, self.namespace, k) for k, t in self._touched.items()],
+                    )
+                    self._touched.clear()
+                expired = conn.execute(
+                    "DELETE FROM cache_entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+                ).rowcount
+
+                count, total_bytes = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM cache_entries"
+                ).fetchone()
+                evicted = 0
+                if count > self.max_entries or total_bytes > self.max_bytes:
+                    victims = []
+                    for rowid, size in conn.execute(
+                        "SELECT rowid, size_bytes FROM cache_entries ORDER BY last_access"
+                    ):
+                        if count <= self.max_entries and total_bytes <= self.max_bytes:
+                            break
+                        victims.append((rowid,))
+                        count -= 1
+                        total_bytes -= size
+                    conn.executemany("DELETE FROM cache_entries WHERE rowid = ?", victims)
+                    evicted = len(victims)
+
+            if evicted:
+                # Evicted keys may still sit in the memory tier; drop it rather than track them
+                self._memory.clear()
+            self.counters["expired_removed"] += expired
+            self.counters["evictions"] += evicted
+            self._last_sweep = now
+            self._sets_since_sweep = 0
+        return {"expired": expired, "evicted": evicted}
 
     def stats(self) -> dict:
         """Get cache statistics"""
-        total = 0
-        expired = 0
-        valid = 0
-        size_bytes = 0
-
-        for cache_file in self.cache_dir.glob("*.json"):
-            total += 1
-            size_bytes += cache_file.stat().st_size
-
-            try:
-                with open(cache_file) as f:
-                    data = json.load(f)
-
-                if "expires_at" in data:
-                    expires_at = datetime.fromisoformat(data["expires_at"])
-                    if datetime.now() >= expires_at:
-                        expired += 1
-                    else:
-                        valid += 1
-                else:
-                    valid += 1
-
-            except (json.JSONDecodeError, KeyError):
-                pass
-
-        return {
-            "total_entries": total,
-            "valid_entries": valid,
-            "expired_entries": expired,
-            "size_bytes": size_bytes,
-            "size_mb": round(size_bytes / 1024 / 1024, 2)
-        }
+        now = time.time()
+        with self._lock:
+            total, expired, size_bytes = self._db().execute(
+                """
+                SELECT COUNT(*),
+                       COALESCE(SUM(expires_at IS NOT NULL AND expires_at <= ?), 0),
+                       COALESCE(SUM(size_bytes), 0)
+                FROM cache_entries WHERE namespace = ?
+                """,
+                (now, self.namespace),
+            ).fetchone()
+            lookups = self.counters["hits"] + self.counters["misses"]
+
+            return {
+                "namespace": self.namespace,
+                "total_entries": total,
+                "valid_entries": total - expired,
+                "expired_entries": expired,
+                "memory_entries": len(self._memory),
+                "size_bytes": size_bytes,
+                "size_mb": round(size_bytes / 1024 / 1024, 2),
+                **self.counters,
+                "hit_rate": round(self.counters["hits"] / lookups, 3) if lookups else 0.0,
+            }
 
 
 # Global cache instance
@@ -256,12 +404,16 @@ if __name__ == "__main__":
     parser.add_argument("--clear", action="store_true", help="Clear all cached data")
     parser.add_argument("--get", metavar="KEY", help="Get cached value")
     parser.add_argument("--delete", metavar="KEY", help="Delete cached value")
+    parser.add_argument("--sweep", action="store_true", help="Remove expired entries and enforce size limits")
+    parser.add_argument("--namespace", default="default", help="Key namespace (default: default)")
 
     args = parser.parse_args()
+    if args.namespace != _cache.namespace:
+        _cache = AgentCache(namespace=args.namespace)
 
     if args.stats:
         stats = _cache.stats()
-        print("\nCache Statistics:")
+        print(f"\nCache Statistics ({stats['namespace']}):")
         print(f"  Total entries: {stats['total_entries']}")
         print(f"  Valid entries: {stats['valid_entries']}")
         print(f"  Expired entries: {stats['expired_entries']}")
@@ -270,7 +422,11 @@ if __name__ == "__main__":
 
     elif args.clear:
         _cache.clear()
-        print("✓ Cleared all cached data")
+        print(f"✓ Cleared all cached data in namespace '{_cache.namespace}'")
+
+    elif args.sweep:
+        result = _cache.sweep()
+        print(f"✓ Removed {result['expired']} expired, evicted {result['evicted']} entries")
 
     elif args.get:
         value = _cache.get(args.get)
@@ -15,6 +15,9 @@ Components:
     - embed_memory.py: Generate vector embeddings
     - semantic_search.py: Vector similarity search
     - hybrid_search.py: Combined BM25 + vector search
+    - ann_index.py: IVF approximate nearest-neighbour index over embeddings
+    - embedding_stub_server.py: Local stand-in embeddings endpoint for testing
+    - query_cache.py: Cached query embeddings (LRU + SQLite)
 """
 
 from .memory_db import (
@@ -0,0 +1,515 @@
+"""
+Tool: Approximate Nearest-Neighbour Index for Memory Embeddings
+Purpose: Keep semantic search sub-linear as memory_entries grows
+
+IVF-flat index implemented locally with numpy:
+- Spherical k-means splits the normalized embeddings into ~sqrt(N) clusters
+- Each entry ID is stored in the inverted list of its nearest centroid
+- A query scores the centroids, probes the best `nprobe` lists, and the
+  candidates are scored exactly against the resident EmbeddingMatrix
+  (which also applies the is_active / type filters and soft-deletes)
+
+The index is persisted as data/memory_ann.npz next to memory.db. It is built
+by embed_memory.reindex_all() and updated incrementally by embed_entry(), which
+rewrite the file. Searches catch their in-memory copy up on rows written since its
+updated_at watermark but never write the file. The index is reported
+as stale (so callers fall back to exact search) when it no longer covers the
+live embeddings or too many vectors were added since the centroids were trained.
+An index covers a single embedding model and is stale for queries from any other.
+
+Usage:
+    python memory/ann_index.py --build                  # (Re)train and save the index
+    python memory/ann_index.py --stats                  # Show index statistics
+    python memory/ann_index.py --benchmark              # Recall/latency vs exact search on memory.db
+    python memory/ann_index.py --benchmark --synthetic 50000 --dim 256
+
+Dependencies:
+    - numpy
+    - sqlite3 (stdlib)
+
+Output:
+    JSON result with success status and index info
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Set
+
+sys.path.insert(0, str(Path(__file__).parent))
+try:
+    from memory_db import get_connection, DB_PATH
+except ImportError:
+    print("Error: Could not import memory_db", file=sys.stderr)
+    sys.exit(1)
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+# Index file lives next to memory.db
+ANN_INDEX_PATH = DB_PATH.parent / "memory_ann.npz"
+
+# Below this many embeddings exact search is already fast; don't bother with an index
+MIN_ANN_ENTRIES = 2000
+
+# Treat the index as stale once this fraction of vectors was added after training
+STALE_DRIFT_RATIO = 0.5
+
+# k-means training parameters
+KMEANS_ITERATIONS = 12
+KMEANS_SAMPLE = 50000
+
+INDEX_VERSION = 2
+
+
+def default_nlist(count: int) -> int:
+    """Number of inverted lists for a collection of `count` vectors."""
+    return max(1, min(4096, int(count ** 0.5)))
+
+
+def default_nprobe(nlist: int) -> int:
+    """Number of lists probed per query (trades recall for latency).
+
+    nlist // 20 gave ~0.98 recall@10 at ~6x the speed of exact search on 100k
+    clustered 768-dim vectors (see --benchmark).
+    """
+    return max(8, nlist // 20)
+
+
+def _spherical_kmeans(vectors, nlist: int, iterations: int = KMEANS_ITERATIONS, seed: int = 0):
+    """Train nlist unit-norm centroids on (already normalized) vectors."""
+    rng = np.random.default_rng(seed)
+    if len(vectors) > KMEANS_SAMPLE:
+        vectors = vectors[rng.choice(len(vectors), KMEANS_SAMPLE, replace=False)]
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        counts = np.bincount(assign, minlength=nlist)
+        # Re-seed empty clusters from random points so every list stays useful
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            sums[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+    return centroids
+
+
+class AnnIndex:
+    """IVF-flat coarse quantizer: centroids plus entry-ID inverted lists."""
+
+    def __init__(self, centroids, entry_ids=None, lists=None, trained_count: int = 0,
+                 synced_at: Optional[str] = None, built_at: Optional[str] = None,
+                 model: Optional[str] = None):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.model = model
+        self.list_of: Dict[int, int] = {}
+        self.members: List[Set[int]] = [set() for _ in range(len(self.centroids))]
+        self.trained_count = trained_count
+        self.added_since_train = 0
+        self.synced_at = synced_at
+        self.built_at = built_at
+        self._arrays: Dict[int, Any] = {}   # list_id -> cached np.int64 array of members
+        self._lock = threading.Lock()
+        if entry_ids is not None:
+            for entry_id, list_id in zip(entry_ids.tolist(), lists.tolist()):
+                self.list_of[entry_id] = list_id
+                self.members[list_id].add(entry_id)
+
+    def __len__(self) -> int:
+        return len(self.list_of)
+
+    @property
+    def dim(self) -> int:
+        return self.centroids.shape[1]
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, entry_ids, vectors, nlist: Optional[int] = None, synced_at: Optional[str] = None,
+              model: Optional[str] = None) -> "AnnIndex":
+        """Train centroids on normalized vectors and assign every entry."""
+        nlist = min(nlist or default_nlist(len(vectors)), len(vectors))
+        centroids = _spherical_kmeans(vectors, nlist)
+        index = cls(centroids, trained_count=len(vectors), synced_at=synced_at,
+                    built_at=datetime.now().isoformat(timespec='seconds'), model=model)
+        for start in range(0, len(vectors), 8192):
+            chunk = vectors[start:start + 8192]
+            assign = np.argmax(chunk @ centroids.T, axis=1)
+            for entry_id, list_id in zip(entry_ids[start:start + 8192].tolist(), assign.tolist()):
+                index.list_of[entry_id] = list_id
+                index.members[list_id].add(entry_id)
+        return index
+
+    def add(self, entry_id: int, vector) -> bool:
+        """Assign (or re-assign) a normalized vector to its nearest list. Returns True if changed."""
+        list_id = int(np.argmax(self.centroids @ vector))
+        with self._lock:
+            old = self.list_of.get(entry_id)
+            if old == list_id:
+                return False
+            if old is not None:
+                self.members[old].discard(entry_id)
+                self._arrays.pop(old, None)
+            else:
+                self.added_since_train += 1
+            self.list_of[entry_id] = list_id
+            self.members[list_id].add(entry_id)
+            self._arrays.pop(list_id, None)
+            return True
+
+    def remove(self, entry_id: int) -> bool:
+        with self._lock:
+            old = self.list_of.pop(entry_id, None)
+            if old is not None:
+                self.members[old].discard(entry_id)
+                self._arrays.pop(old, None)
+            return old is not None
+
+    def candidates(self, query, nprobe: Optional[int] = None):
+        """Entry IDs (np.int64 array) in the nprobe lists closest to the query."""
+        query = np.asarray(query, dtype=np.float32)
+        nprobe = min(nprobe or default_nprobe(self.nlist), self.nlist)
+        scores = self.centroids @ query
+        probe = np.argpartition(-scores, nprobe - 1)[:nprobe] if nprobe < self.nlist else range(self.nlist)
+        with self._lock:
+            parts = []
+            for list_id in probe:
+                arr = self._arrays.get(list_id)
+                if arr is None:
+                    members = self.members[list_id]
+                    arr = np.fromiter(members, dtype=np.int64, count=len(members))
+                    self._arrays[list_id] = arr
+                parts.append(arr)
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    def is_stale(self, live_count: int, dim: Optional[int], model: Optional[str] = None) -> bool:
+        """True when exact search should be used instead of this index."""
+        if model is not None and model != self.model:
+            return True
+        if dim is not None and dim != self.dim:
+            return True
+        if self.trained_count and self.added_since_train > STALE_DRIFT_RATIO * self.trained_count:
+            return True
+        # Every live embedding must be assigned to a list (extra IDs are harmless)
+        return live_count > len(self.list_of)
+
+    def catch_up(self, conn=None) -> int:
+        """Apply rows written since synced_at (from any process). Returns the number of changes."""
+        own_conn = conn is None
+        if own_conn:
+            conn = get_connection()
+        try:
+            # >= rather than >: several writes can share one CURRENT_TIMESTAMP second
+            if self.synced_at is None:
+                rows = conn.execute('SELECT id, embedding, embedding_model, is_active, updated_at FROM memory_entries').fetchall()
+            else:
+                rows = conn.execute(
+                    'SELECT id, embedding, embedding_model, is_active, updated_at FROM memory_entries WHERE updated_at >= ?',
+                    (self.synced_at,)
+                ).fetchall()
+        finally:
+            if own_conn:
+                conn.close()
+
+        changed = 0
+        for row in rows:
+            blob = row['embedding']
+            if (not blob or not row['is_active'] or len(blob) != self.dim * 4
+                    or row['embedding_model'] != self.model):
+                changed += self.remove(row['id'])
+            else:
+                vector = np.frombuffer(blob, dtype=np.float32)
+                norm = np.linalg.norm(vector)
+                changed += self.add(row['id'], vector / norm if norm > 0 else vector)
+            if row['updated_at'] and (self.synced_at is None or row['updated_at'] > self.synced_at):
+                self.synced_at = row['updated_at']
+                changed += 1
+        return changed
+
+    def save(self, path: Path = None) -> None:
+        """Atomically write the index to disk."""
+        path = path or ANN_INDEX_PATH
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            entry_ids = np.fromiter(self.list_of.keys(), dtype=np.int64, count=len(self.list_of))
+            lists = np.fromiter(self.list_of.values(), dtype=np.int32, count=len(self.list_of))
+        meta = {
+            "version": INDEX_VERSION,
+            "trained_count": self.trained_count,
+            "added_since_train": self.added_since_train,
+            "synced_at": self.synced_at,
+            "built_at": self.built_at,
+            "model": self.model,
+        }
+        # Unique temp file per writer: the bot, CLI searches and embed_memory may save concurrently
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, centroids=self.centroids, entry_ids=entry_ids, lists=lists,
+                         meta=np.array(json.dumps(meta)))
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+    @classmethod
+    def load(cls, path: Path = None) -> Optional["AnnIndex"]:
+        path = path or ANN_INDEX_PATH
+        if not path.exists():
+            return None
+        try:
+            with np.load(path) as data:
+                meta = json.loads(str(data['meta']))
+                if meta.get("version") != INDEX_VERSION:
+                    return None
+                index = cls(data['centroids'], data['entry_ids'], data['lists'],
+                            trained_count=meta.get("trained_count", 0),
+                            synced_at=meta.get("synced_at"), built_at=meta.get("built_at"),
+                            model=meta.get("model"))
+                index.added_since_train = meta.get("added_since_train", 0)
+                return index
+        except Exception as e:  # torn or foreign file (BadZipFile, EOFError, ...): treat as no index
+            print(f"Warning: could not load ANN index {path}: {e}", file=sys.stderr)
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        sizes = [len(m) for m in self.members]
+        return {
+            "model": self.model,
+            "entries": len(self.list_of),
+            "nlist": self.nlist,
+            "dim": self.dim,
+            "default_nprobe": default_nprobe(self.nlist),
+            "largest_list": max(sizes) if sizes else 0,
+            "empty_lists": sum(1 for s in sizes if s == 0),
+            "trained_count": self.trained_count,
+            "added_since_train": self.added_since_train,
+            "synced_at": self.synced_at,
+            "built_at": self.built_at,
+        }
+
+
+_index: Optional[AnnIndex] = None
+_index_mtime: Optional[float] = None
+_index_lock = threading.Lock()
+
+
+def get_ann_index() -> Optional[AnnIndex]:
+    """
+    Return the on-disk index (reloaded if another process rewrote it), caught up with the DB.
+
+    The catch-up only changes the in-memory copy; update_ann_index() persists it.
+    """
+    global _index, _index_mtime
+    if not HAS_NUMPY:
+        return None
+    with _index_lock:
+        try:
+            mtime = ANN_INDEX_PATH.stat().st_mtime
+        except OSError:
+            _index, _index_mtime = None, None
+            return None
+        if _index is None or mtime != _index_mtime:
+            _index = AnnIndex.load()
+            _index_mtime = mtime
+        if _index is None:
+            return None
+        _index.catch_up()
+        return _index
+
+
+def update_ann_index() -> Dict[str, Any]:
+    """Bring an existing on-disk index up to date and save it (no-op if none has been built)."""
+    global _index_mtime
+    index = get_ann_index()
+    if index is None:
+        return {"success": True, "message": "No ANN index to update"}
+    index.save()
+    with _index_lock:
+        if _index is index:
+            _index_mtime = ANN_INDEX_PATH.stat().st_mtime
+    return {"success": True, "message": "ANN index updated", "entries": len(index)}
+
+
+def build_ann_index(nlist: Optional[int] = None, model: Optional[str] = None) -> Dict[str, Any]:
+    """Train a fresh index over every active embedding from `model` (default: the active one) and save it."""
+    global _index, _index_mtime
+    if not HAS_NUMPY:
+        return {"success": False, "error": "numpy not installed"}
+
+    from semantic_search import get_embedding_matrix
+    from embed_memory import get_active_model
+    model = model or get_active_model()
+    matrix = get_embedding_matrix(model)
+    entry_ids, vectors = matrix.snapshot()
+    if len(entry_ids) < MIN_ANN_ENTRIES:
+        ANN_INDEX_PATH.unlink(missing_ok=True)
+        with _index_lock:
+            _index, _index_mtime = None, None
+        return {
+            "success": True,
+            "message": f"Only {len(entry_ids)} embeddings (< {MIN_ANN_ENTRIES}); exact search is used, no index built",
+            "entries": len(entry_ids)
+        }
+
+    conn = get_connection()
+    synced_at = conn.execute('SELECT MAX(updated_at) FROM memory_entries').fetchone()[0]
+    conn.close()
+
+    started = time.perf_counter()
+    index = AnnIndex.build(entry_ids, vectors, nlist=nlist, synced_at=synced_at, model=model)
+    index.save()
+    with _index_lock:
+        _index, _index_mtime = index, ANN_INDEX_PATH.stat().st_mtime
+
+    return {
+        "success": True,
+        "message": f"ANN index built with {index.nlist} lists over {len(index)} entries",
+        "build_seconds": round(time.perf_counter() - started, 3),
+        "stats": index.stats()
+    }
+
+
+def get_index_stats() -> Dict[str, Any]:
+    index = get_ann_index()
+    if index is None:
+        return {"success": True, "message": "No ANN index built", "path": str(ANN_INDEX_PATH)}
+    return {"success": True, "path": str(ANN_INDEX_PATH), "stats": index.stats()}
+
+
+def _synthetic_vectors(count: int, dim: int, clusters: int = 200, seed: int = 42):
+    """Clustered unit vectors, roughly shaped like real embedding collections."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)] + 0.6 * rng.standard_normal((count, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def benchmark(synthetic: int = 0, dim: int = 256, queries: int = 200, k: int = 10,
+              nprobes: Optional[List[int]] = None) -> Dict[str, Any]:
+    """
+    Compare recall@k and per-query latency of the ANN path against exact search.
+
+    Uses the live embeddings from memory.db, or `synthetic` clustered vectors.
+    Queries are perturbed copies of stored vectors.
+    """
+    if not HAS_NUMPY:
+        return {"success": False, "error": "numpy not installed"}
+
+    if synthetic:
+        vectors = _synthetic_vectors(synthetic, dim)
+        entry_ids = np.arange(len(vectors), dtype=np.int64)
+        source = f"synthetic ({synthetic} x {dim})"
+    else:
+        from semantic_search import get_embedding_matrix
+        entry_ids, vectors = get_embedding_matrix().snapshot()
+        source = "memory.db"
+    if len(vectors) < 2:
+        return {"success": False, "error": "Not enough embeddings to benchmark"}
+
+    rng = np.random.default_rng(7)
+    picks = rng.choice(len(vectors), min(queries, len(vectors)), replace=False)
+    query_vecs = vectors[picks] + 0.3 * rng.standard_normal((len(picks), vectors.shape[1])).astype(np.float32)
+    query_vecs /= np.linalg.norm(query_vecs, axis=1, keepdims=True)
+    k = min(k, len(vectors))
+
+    row_lookup = np.full(int(entry_ids.max()) + 1, -1, dtype=np.int64)
+    row_lookup[entry_ids] = np.arange(len(entry_ids))
+
+    def exact_top(q):
+        scores = vectors @ q
+        top = np.argpartition(-scores, k - 1)[:k]
+        return set(entry_ids[top].tolist())
+
+    started = time.perf_counter()
+    truth = [exact_top(q) for q in query_vecs]
+    exact_ms = (time.perf_counter() - started) * 1000 / len(query_vecs)
+
+    started = time.perf_counter()
+    index = AnnIndex.build(entry_ids, vectors)
+    build_seconds = time.perf_counter() - started
+
+    nprobes = nprobes or sorted({1, 2, 4, 8, 16, default_nprobe(index.nlist), index.nlist // 4} - {0})
+    curve = []
+    for nprobe in nprobes:
+        hits = 0
+        scanned = 0
+        started = time.perf_counter()
+        for q, expected in zip(query_vecs, truth):
+            rows = row_lookup[index.candidates(q, nprobe)]
+            scanned += len(rows)
+            scores = vectors[rows] @ q
+            kk = min(k, len(rows))
+            top = rows[np.argpartition(-scores, kk - 1)[:kk]] if kk else rows
+            hits += len(expected & set(entry_ids[top].tolist()))
+        elapsed_ms = (time.perf_counter() - started) * 1000 / len(query_vecs)
+        curve.append({
+            "nprobe": nprobe,
+            "recall_at_k": round(hits / (k * len(query_vecs)), 4),
+            "ms_per_query": round(elapsed_ms, 3),
+            "avg_scanned": int(scanned / len(query_vecs)),
+            "speedup_vs_exact": round(exact_ms / elapsed_ms, 2) if elapsed_ms else None
+        })
+
+    return {
+        "success": True,
+        "message": f"Benchmarked {len(query_vecs)} queries against {len(vectors)} vectors",
+        "source": source,
+        "k": k,
+        "nlist": index.nlist,
+        "build_seconds": round(build_seconds, 3),
+        "exact_ms_per_query": round(exact_ms, 3),
+        "ann": curve
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ANN index for memory embeddings')
+    parser.add_argument('--build', action='store_true', help='Train and save the index')
+    parser.add_argument('--stats', action='store_true', help='Show index statistics')
+    parser.add_argument('--benchmark', action='store_true', help='Recall vs latency against exact search')
+    parser.add_argument('--nlist', type=int, help='Number of inverted lists (default sqrt(N))')
+    parser.add_argument('--synthetic', type=int, default=0, help='Benchmark on N synthetic vectors instead of memory.db')
+    parser.add_argument('--dim', type=int, default=256, help='Dimensions for --synthetic')
+    parser.add_argument('--queries', type=int, default=200, help='Benchmark query count')
+    parser.add_argument('--k', type=int, default=10, help='Benchmark recall@k')
+
+    args = parser.parse_args()
+
+    if args.build:
+        result = build_ann_index(nlist=args.nlist)
+    elif args.stats:
+        result = get_index_stats()
+    elif args.benchmark:
+        result = benchmark(synthetic=args.synthetic, dim=args.dim, queries=args.queries, k=args.k)
+    else:
+        parser.print_help()
+        sys.exit(0)
+
+    if result.get('success'):
+        print(f"OK {result.get('message', 'Success')}")
+    else:
+        print(f"ERROR {result.get('error', 'Unknown error')}")
+        sys.exit(1)
+
+    print(json.dumps(result, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,15 +2,28 @@
 Tool: Memory Embedding Generator
 Purpose: Generate vector embeddings for memory entries to enable semantic search
 
-Uses OpenAI's text-embedding-3-small model (1536 dimensions, ~$0.02/1M tokens)
+Embedding providers (EMBEDDING_PROVIDER env var):
+- local (default): offline hashed word + character n-gram projection (512 dims),
+  no API key or network; large batches are spread across all CPU cores
+- openai: text-embedding-3-small (1536 dimensions, ~$0.02/1M tokens)
+
 Stores embeddings as BLOBs in SQLite for use with sqlite-vec or manual cosine similarity.
+Each row records its embedding_model; vectors from different models are never compared,
+and --all re-embeds rows whose model differs from the active provider's.
 
 Usage:
     python tools/memory/embed_memory.py --all              # Embed all entries without embeddings
     python tools/memory/embed_memory.py --id 5             # Embed a specific entry
     python tools/memory/embed_memory.py --content "text"   # Get embedding for arbitrary text
     python tools/memory/embed_memory.py --stats            # Show embedding statistics
-    python tools/memory/embed_memory.py --reindex          # Re-embed all entries
+    python tools/memory/embed_memory.py --reindex          # Re-embed all entries (resumes if interrupted)
+    python tools/memory/embed_memory.py --reindex --restart                  # Ignore a saved checkpoint
+    python tools/memory/embed_memory.py --all --base-url http://127.0.0.1:8089/v1   # Local stand-in server
+    python tools/memory/embed_memory.py --all --provider openai                    # Override EMBEDDING_PROVIDER
+
+Entries are embedded in batches: many texts per embeddings request (bounded by
+--request-size and an estimated token budget), identical content (same content_hash)
+embedded once, and up to --concurrency requests in flight.
 
 Dependencies:
     - openai
@@ -18,20 +31,26 @@ Dependencies:
     - sqlite3 (stdlib)
 
 Env Vars:
-    - OPENAI_API_KEY (required)
+    - EMBEDDING_PROVIDER (optional, "local" or "openai"; default local)
+    - OPENAI_API_KEY (required for the openai provider unless EMBEDDING_BASE_URL is set)
     - HELICONE_API_KEY (optional, for observability)
+    - EMBEDDING_BASE_URL (optional, OpenAI-compatible server, e.g. embedding_stub_server.py)
 
 Output:
     JSON result with success status and embedding info
 """
 
 import os
+import re
 import sys
 import json
+import zlib
 import argparse
 import struct
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from dotenv import load_dotenv
 
 # Load environment
@@ -52,20 +71,49 @@ try:
         get_entries_without_embeddings,
         store_embedding,
         get_entry,
-        get_connection
+        get_connection,
+        notify_write,
+        store_embeddings,
+        compute_content_hash,
+        DB_PATH
     )
 except ImportError:
     print("Error: Could not import memory_db", file=sys.stderr)
     sys.exit(1)
 
+from ann_index import update_ann_index, build_ann_index
+
 # Constants
 EMBEDDING_MODEL = "text-embedding-3-small"
 EMBEDDING_DIMENSIONS = 1536
 
+# Active provider: "local" (offline, default) or "openai"
+EMBEDDING_PROVIDER = os.getenv('EMBEDDING_PROVIDER', 'local').lower()
+
+# Local hashed n-gram embeddings
+LOCAL_EMBEDDING_DIMENSIONS = 512
+LOCAL_NGRAM_RANGE = (3, 5)
+# Batches at least this large are spread across CPU cores
+LOCAL_PARALLEL_THRESHOLD = 256
+
+# Batching limits per embeddings request (the API allows 2048 inputs / 300k tokens)
+MAX_REQUEST_INPUTS = 128
+MAX_REQUEST_TOKENS = 60000
+DEFAULT_CONCURRENCY = 4
+
+# Reindex progress, so an interrupted run resumes where it stopped
+REINDEX_CHECKPOINT_PATH = DB_PATH.parent / "embed_reindex_checkpoint.json"
+
 
-def get_openai_client():
-    """Get OpenAI client with optional Helicone proxy."""
+def get_openai_client(base_url: Optional[str] = None):
+    """Get OpenAI client with optional Helicone proxy or local embedding server."""
     api_key = os.getenv('OPENAI_API_KEY')
+
+    # Local OpenAI-compatible server (e.g. embedding_stub_server.py) for testing
+    base_url = base_url or os.getenv('EMBEDDING_BASE_URL')
+    if base_url:
+        return OpenAI(api_key=api_key or "local", base_url=base_url)
+
     if not api_key:
         raise ValueError("OPENAI_API_KEY environment variable not set")
 
@@ -95,53 +143,349 @@ def bytes_to_embedding(data: bytes) -> List[float]:
     return list(struct.unpack(f'{count}f', data))
 
 
-def generate_embedding(text: str, client=None) -> Dict[str, Any]:
+class OpenAIEmbeddingProvider:
+    """Embeddings from the OpenAI API (or any OpenAI-compatible server)."""
+
+    name = "openai"
+    local = False
+
+    def __init__(self, client=None):
+        self._client = client
+        self.model = EMBEDDING_MODEL
+        self.dimensions = EMBEDDING_DIMENSIONS
+
+    def embed(self, texts: List[str]) -> Dict[str, Any]:
+        if not HAS_OPENAI:
+            return {"success": False, "error": "openai package not installed"}
+
+        try:
+            if self._client is None:
+                self._client = get_openai_client()
+
+            response = self._client.embeddings.create(
+                model=self.model,
+                input=texts,
+                encoding_format="float"
+            )
+
+            embeddings = [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+            if len(embeddings) != len(texts):
+                return {"success": False, "error": f"Expected {len(texts)} embeddings, got {len(embeddings)}"}
+
+            return {
+                "success": True,
+                "embeddings": embeddings,
+                "model": self.model,
+                "usage": {
+                    "prompt_tokens": response.usage.prompt_tokens,
+                    "total_tokens": response.usage.total_tokens
+                }
+            }
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+
+def _hash_features(text: str):
+    """Yield (feature, weight): words, word bigrams and character n-grams of each word."""
+    words = re.findall(r'\w+', text.lower())
+    for word in words:
+        yield 'w:' + word, 1.0
+        padded = f' {word} '
+        for n in range(LOCAL_NGRAM_RANGE[0], LOCAL_NGRAM_RANGE[1] + 1):
+            for i in range(len(padded) - n + 1):
+                yield 'c:' + padded[i:i + n], 0.5
+    for first, second in zip(words, words[1:]):
+        yield f'b:{first} {second}', 1.0
+
+
+def _hash_embed(text: str, dimensions: int) -> List[float]:
+    """Signed feature hashing of one text into a unit vector."""
+    vector = [0.0] * dimensions
+    for feature, weight in _hash_features(text):
+        h = zlib.crc32(feature.encode())
+        # Low bits pick the slot, the top bit picks the sign (keeps collisions unbiased)
+        vector[h % dimensions] += weight if h & 0x80000000 else -weight
+    norm = sum(v * v for v in vector) ** 0.5
+    return [v / norm for v in vector] if norm else vector
+
+
+def _hash_embed_chunk(args: Tuple[List[str], int]) -> List[List[float]]:
+    texts, dimensions = args
+    return [_hash_embed(text, dimensions) for text in texts]
+
+
+class LocalEmbeddingProvider:
+    """Offline embeddings: hashed word and character n-gram projection on the CPU."""
+
+    name = "local"
+    local = True
+
+    def __init__(self, dimensions: int = LOCAL_EMBEDDING_DIMENSIONS):
+        self.dimensions = dimensions
+        self.model = f"local-hash-ngram-{dimensions}"
+
+    def embed(self, texts: List[str]) -> Dict[str, Any]:
+        workers = os.cpu_count() or 1
+        try:
+            if len(texts) >= LOCAL_PARALLEL_THRESHOLD and workers > 1:
+                size = -(-len(texts) // workers)
+                chunks = [(texts[i:i + size], self.dimensions) for i in range(0, len(texts), size)]
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    embeddings = [v for chunk in pool.map(_hash_embed_chunk, chunks) for v in chunk]
+            else:
+                embeddings = _hash_embed_chunk((texts, self.dimensions))
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+        tokens = sum(estimate_tokens(t) for t in texts)
+        return {
+            "success": True,
+            "embeddings": embeddings,
+            "model": self.model,
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+        }
+
+
+PROVIDERS = {
+    "local": LocalEmbeddingProvider,
+    "openai": OpenAIEmbeddingProvider,
+}
+
+_providers: Dict[str, Any] = {}
+
+
+def get_embedding_provider(name: Optional[str] = None):
+    """Return the (cached) provider by name, defaulting to EMBEDDING_PROVIDER."""
+    name = (name or EMBEDDING_PROVIDER).lower()
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown embedding provider '{name}'. Must be one of: {list(PROVIDERS)}")
+    if name not in _providers:
+        _providers[name] = PROVIDERS[name]()
+    return _providers[name]
+
+
+def resolve_provider(client=None, provider=None):
+    """Provider for a call: an explicit provider, an OpenAI client, or the default."""
+    if provider is not None and not isinstance(provider, str):
+        return provider
+    if client is not None:
+        return OpenAIEmbeddingProvider(client)
+    return get_embedding_provider(provider)
+
+
+def get_active_model(client=None, provider=None) -> str:
+    """Model name new embeddings (and query embeddings) are generated with."""
+    return resolve_provider(client, provider).model
+
+
+def generate_embedding(text: str, client=None, provider=None) -> Dict[str, Any]:
     """
     Generate embedding for a text string.
 
     Args:
         text: Text to embed
-        client: Optional OpenAI client (creates one if not provided)
+        client: Optional OpenAI client (forces the openai provider)
+        provider: Optional provider instance or name (default EMBEDDING_PROVIDER)
 
     Returns:
         dict with embedding and metadata
     """
-    if not HAS_OPENAI:
-        return {"success": False, "error": "openai package not installed"}
+    result = generate_embeddings([text], client, provider)
+    if not result.get('success'):
+        return result
+
+    embedding = result['embeddings'][0]
+    return {
+        "success": True,
+        "embedding": embedding,
+        "model": result['model'],
+        "dimensions": len(embedding),
+        "usage": result['usage']
+    }
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) for packing requests."""
+    return len(text) // 4 + 1
+
+
+def generate_embeddings(texts: List[str], client=None, provider=None) -> Dict[str, Any]:
+    """
+    Generate embeddings for several texts in one request.
 
-    if client is None:
-        client = get_openai_client()
+    Args:
+        texts: Texts to embed
+        client: Optional OpenAI client (forces the openai provider)
+        provider: Optional provider instance or name (default EMBEDDING_PROVIDER)
 
+    Returns:
+        dict with embeddings (same order as texts), model and usage
+    """
     try:
-        response = client.embeddings.create(
-            model=EMBEDDING_MODEL,
-            input=text,
-            encoding_format="float"
-        )
+        provider = resolve_provider(client, provider)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+    return provider.embed(texts)
+
+
+def _pack_requests(
+    texts: List[str],
+    max_inputs: int = MAX_REQUEST_INPUTS,
+    max_tokens: int = MAX_REQUEST_TOKENS
+) -> List[List[int]]:
+    """Group text indexes into requests bounded by input count and estimated tokens."""
+    requests = []
+    current: List[int] = []
+    current_tokens = 0
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (len(current) >= max_inputs or current_tokens + tokens > max_tokens):
+            requests.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        requests.append(current)
+    return requests
+
+
+def _embed_request(texts: List[str], provider) -> Dict[str, Any]:
+    """Embed one packed request; if the batch is rejected, retry its texts one by one."""
+    result = generate_embeddings(texts, provider=provider)
+    result['requests'] = 1
+    if result.get('success') or len(texts) == 1:
+        if not result.get('success'):
+            result['errors'] = [result.get('error')]
+        return result
+
+    # One bad input (e.g. over the model's context) fails the whole batch; isolate it
+    embeddings: List[Optional[List[float]]] = []
+    errors: List[Optional[str]] = []
+    tokens = 0
+    for text in texts:
+        single = generate_embeddings([text], provider=provider)
+        if single.get('success'):
+            embeddings.append(single['embeddings'][0])
+            errors.append(None)
+            tokens += single['usage']['total_tokens']
+        else:
+            embeddings.append(None)
+            errors.append(single.get('error'))
+    return {
+        "success": True,
+        "embeddings": embeddings,
+        "errors": errors,
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        "requests": 1 + len(texts)
+    }
 
-        embedding = response.data[0].embedding
 
-        return {
-            "success": True,
-            "embedding": embedding,
-            "model": EMBEDDING_MODEL,
-            "dimensions": len(embedding),
-            "usage": {
-                "prompt_tokens": response.usage.prompt_tokens,
-                "total_tokens": response.usage.total_tokens
-            }
-        }
-    except Exception as e:
+def embed_entries_batched(
+    entries: List[Dict[str, Any]],
+    client=None,
+    request_size: int = MAX_REQUEST_INPUTS,
+    max_request_tokens: int = MAX_REQUEST_TOKENS,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    provider=None
+) -> Dict[str, Any]:
+    """
+    Embed and store a list of entries with as few API round trips as possible.
+
+    Entries sharing a content_hash are embedded once, texts are packed into
+    requests by count and estimated tokens, and up to `concurrency` requests run
+    at once. The local provider gets everything as one batch (it fans out over
+    CPU cores itself). Results are stored in one transaction per call.
+
+    Args:
+        entries: Dicts with id, content and (optionally) content_hash
+        client: Optional OpenAI client (forces the openai provider)
+        request_size: Max texts per embeddings request
+        max_request_tokens: Max estimated tokens per request
+        concurrency: Max requests in flight
+        provider: Optional provider instance or name
+
+    Returns:
+        dict with processed/failed counts, tokens, requests made and per-entry status
+    """
+    try:
+        provider = resolve_provider(client, provider)
+    except ValueError as e:
         return {"success": False, "error": str(e)}
 
+    # Dedupe by content hash: one text per distinct content
+    ids_by_hash: Dict[str, List[int]] = {}
+    texts: List[str] = []
+    hashes: List[str] = []
+    skipped = []
+    for entry in entries:
+        content = entry.get('content') or ''
+        if not content:
+            skipped.append({"id": entry['id'], "success": False, "error": f"Entry {entry['id']} has no content"})
+            continue
+        content_hash = entry.get('content_hash') or compute_content_hash(content)
+        if content_hash not in ids_by_hash:
+            ids_by_hash[content_hash] = []
+            texts.append(content)
+            hashes.append(content_hash)
+        ids_by_hash[content_hash].append(entry['id'])
+
+    if provider.local:
+        packed = [list(range(len(texts)))] if texts else []
+        concurrency = 1
+    else:
+        packed = _pack_requests(texts, max_inputs=request_size, max_tokens=max_request_tokens)
+
+    def run(indexes: List[int]) -> Tuple[List[int], Dict[str, Any]]:
+        return indexes, _embed_request([texts[i] for i in indexes], provider)
+
+    to_store: List[Tuple[int, bytes]] = []
+    statuses = list(skipped)
+    total_tokens = 0
+    requests_made = 0
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        for indexes, result in pool.map(run, packed):
+            requests_made += result.get('requests', 1)
+            if not result.get('success'):
+                for i in indexes:
+                    for entry_id in ids_by_hash[hashes[i]]:
+                        statuses.append({"id": entry_id, "success": False, "error": result.get('error')})
+                continue
+            total_tokens += result['usage']['total_tokens']
+            errors = result.get('errors') or [None] * len(indexes)
+            for i, embedding, error in zip(indexes, result['embeddings'], errors):
+                for entry_id in ids_by_hash[hashes[i]]:
+                    if embedding is None:
+                        statuses.append({"id": entry_id, "success": False, "error": error})
+                    else:
+                        to_store.append((entry_id, embedding_to_bytes(embedding)))
+                        statuses.append({"id": entry_id, "success": True, "error": None})
+
+    store_result = store_embeddings(to_store, provider.model)
+    if not store_result.get('success'):
+        return store_result
+
+    processed = len(to_store)
+    return {
+        "success": True,
+        "processed": processed,
+        "failed": len(statuses) - processed,
+        "unique_texts": len(texts),
+        "requests": requests_made,
+        "total_tokens": total_tokens,
+        "model": provider.model,
+        "entries": statuses
+    }
+
 
-def embed_entry(entry_id: int, client=None) -> Dict[str, Any]:
+def embed_entry(entry_id: int, client=None, update_index: bool = True, provider=None) -> Dict[str, Any]:
     """
     Generate and store embedding for a memory entry.
 
     Args:
         entry_id: Memory entry ID
-        client: Optional OpenAI client
+        client: Optional OpenAI client (forces the openai provider)
+        update_index: Also update the on-disk ANN index (callers embedding in bulk update it once)
+        provider: Optional provider instance or name
 
     Returns:
         dict with success status
@@ -158,13 +502,15 @@ def embed_entry(entry_id: int, client=None) -> Dict[str, Any]:
         return {"success": False, "error": f"Entry {entry_id} has no content"}
 
     # Generate embedding
-    embed_result = generate_embedding(content, client)
+    embed_result = generate_embedding(content, client, provider)
     if not embed_result.get('success'):
         return embed_result
 
     # Store embedding
     embedding_bytes = embedding_to_bytes(embed_result['embedding'])
-    store_result = store_embedding(entry_id, embedding_bytes, EMBEDDING_MODEL)
+    store_result = store_embedding(entry_id, embedding_bytes, embed_result['model'])
+    if update_index and store_result.get('success'):
+        update_ann_index()
 
     return {
         "success": store_result.get('success', False),
@@ -172,26 +518,37 @@ def embed_entry(entry_id: int, client=None) -> Dict[str, Any]:
         "content_preview": content[:100] + "..." if len(content) > 100 else content,
         "dimensions": embed_result['dimensions'],
         "tokens_used": embed_result['usage']['total_tokens'],
-        "model": EMBEDDING_MODEL
+        "model": embed_result['model']
     }
 
 
-def embed_all_pending(batch_size: int = 50, client=None) -> Dict[str, Any]:
+def embed_all_pending(
+    batch_size: int = 50,
+    client=None,
+    request_size: int = MAX_REQUEST_INPUTS,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    provider=None
+) -> Dict[str, Any]:
     """
-    Embed all entries that don't have embeddings yet.
+    Embed all entries that don't have embeddings yet (or have them from another model).
 
     Args:
         batch_size: Number of entries to process
-        client: Optional OpenAI client
+        client: Optional OpenAI client (forces the openai provider)
+        request_size: Max texts per embeddings request
+        concurrency: Max requests in flight
+        provider: Optional provider instance or name
 
     Returns:
         dict with batch results
     """
-    if client is None:
-        client = get_openai_client()
+    try:
+        provider = resolve_provider(client, provider)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
 
-    # Get entries without embeddings
-    pending = get_entries_without_embeddings(limit=batch_size)
+    # Get entries without embeddings from the active model
+    pending = get_entries_without_embeddings(limit=batch_size, model=provider.model)
     if not pending.get('success'):
         return pending
 
@@ -199,60 +556,134 @@ def embed_all_pending(batch_size: int = 50, client=None) -> Dict[str, Any]:
     if not entries:
         return {"success": True, "message": "No entries need embedding", "processed": 0}
 
-    results = {
-        "success": True,
-        "processed": 0,
-        "failed": 0,
-        "total_tokens": 0,
-        "entries": []
-    }
+    results = embed_entries_batched(entries, request_size=request_size, concurrency=concurrency, provider=provider)
+    if not results.get('success'):
+        return results
 
-    for entry in entries:
-        entry_id = entry['id']
-        result = embed_entry(entry_id, client)
+    # Calculate cost (~$0.02 per 1M tokens; local embeddings are free)
+    cost = 0 if provider.local else results['total_tokens'] * 0.00002
+    results['estimated_cost'] = f"${cost:.6f}"
 
-        if result.get('success'):
-            results['processed'] += 1
-            results['total_tokens'] += result.get('tokens_used', 0)
-        else:
-            results['failed'] += 1
-
-        results['entries'].append({
-            "id": entry_id,
-            "success": result.get('success', False),
-            "error": result.get('error')
-        })
-
-    # Calculate cost (~$0.02 per 1M tokens)
-    results['estimated_cost'] = f"${results['total_tokens'] * 0.00002:.6f}"
+    if results['processed']:
+        update_ann_index()
 
     return results
 
 
-def reindex_all(batch_size: int = 100, client=None) -> Dict[str, Any]:
+def _load_checkpoint() -> Optional[Dict[str, Any]]:
+    try:
+        with open(REINDEX_CHECKPOINT_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_checkpoint(checkpoint: Dict[str, Any]) -> None:
+    tmp_path = REINDEX_CHECKPOINT_PATH.with_name(REINDEX_CHECKPOINT_PATH.name + ".tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, REINDEX_CHECKPOINT_PATH)
+
+
+def reindex_all(
+    batch_size: int = 500,
+    client=None,
+    request_size: int = MAX_REQUEST_INPUTS,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    restart: bool = False,
+    provider=None
+) -> Dict[str, Any]:
     """
     Re-embed all entries (regenerate all embeddings).
 
+    Entries are re-embedded in ID order, batch_size at a time, overwriting their
+    old embeddings in place so search keeps working during the run. Progress is
+    checkpointed after every batch; a later call resumes from the checkpoint
+    unless restart is set.
+
     Args:
-        batch_size: Number of entries to process per batch
+        batch_size: Number of entries per checkpointed batch
         client: Optional OpenAI client
+        request_size: Max texts per embeddings request
+        concurrency: Max requests in flight
+        restart: Ignore any saved checkpoint and start over
+        provider: Optional provider instance or name
 
     Returns:
         dict with reindex results
     """
-    if client is None:
-        client = get_openai_client()
+    try:
+        provider = resolve_provider(client, provider)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
 
-    conn = get_connection()
-    cursor = conn.cursor()
+    checkpoint = None if restart else _load_checkpoint()
+    if checkpoint and checkpoint.get('model') != provider.model:
+        checkpoint = None
+    resumed_from = checkpoint['last_id'] if checkpoint else None
+    if checkpoint is None:
+        checkpoint = {
+            "model": provider.model,
+            "last_id": 0,
+            "processed": 0,
+            "failed": 0,
+            "total_tokens": 0,
+            "requests": 0,
+            "started_at": time.strftime('%Y-%m-%d %H:%M:%S')
+        }
 
-    # Clear existing embeddings
-    cursor.execute('UPDATE memory_entries SET embedding = NULL, embedding_model = NULL')
+    failures = []
+    while True:
+        conn = get_connection()
+        rows = conn.execute('''
+            SELECT id, content, content_hash FROM memory_entries
+            WHERE is_active = 1 AND id > ?
+            ORDER BY id
+            LIMIT ?
+        ''', (checkpoint['last_id'], batch_size)).fetchall()
+        conn.close()
+        if not rows:
+            break
+
+        batch = embed_entries_batched([dict(row) for row in rows], request_size=request_size,
+                                      concurrency=concurrency, provider=provider)
+        if not batch.get('success'):
+            return {**batch, "checkpoint": checkpoint}
+
+        checkpoint['last_id'] = rows[-1]['id']
+        for key in ('processed', 'failed', 'total_tokens', 'requests'):
+            checkpoint[key] += batch[key]
+        failures.extend(e for e in batch['entries'] if not e['success'])
+        _save_checkpoint(checkpoint)
+
+    # Inactive entries keep no embeddings (matches the old clear-then-embed behaviour)
+    conn = get_connection()
+    conn.execute('UPDATE memory_entries SET embedding = NULL, embedding_model = NULL WHERE is_active = 0 AND embedding IS NOT NULL')
     conn.commit()
     conn.close()
+    notify_write(None)
+
+    try:
+        REINDEX_CHECKPOINT_PATH.unlink()
+    except FileNotFoundError:
+        pass
 
-    # Now embed all
-    return embed_all_pending(batch_size=batch_size, client=client)
+    results = {
+        "success": True,
+        "message": f"Re-embedded {checkpoint['processed']} entries in {checkpoint['requests']} requests",
+        "processed": checkpoint['processed'],
+        "failed": checkpoint['failed'],
+        "requests": checkpoint['requests'],
+        "total_tokens": checkpoint['total_tokens'],
+        "model": provider.model,
+        "estimated_cost": f"${0 if provider.local else checkpoint['total_tokens'] * 0.00002:.6f}",
+        "resumed_from_id": resumed_from,
+        "failures": failures
+    }
+
+    # Retrain the ANN index on the fresh vectors
+    results['ann_index'] = build_ann_index(model=provider.model)
+    return results
 
 
 def get_embedding_stats() -> Dict[str, Any]:
@@ -291,6 +722,9 @@ def get_embedding_stats() -> Dict[str, Any]:
 
     conn.close()
 
+    active_model = get_active_model()
+    current = by_model.get(active_model, 0)
+
     return {
         "success": True,
         "stats": {
@@ -299,6 +733,8 @@ def get_embedding_stats() -> Dict[str, Any]:
             "without_embeddings": without_embeddings,
             "coverage_percent": round(with_embeddings / total * 100, 1) if total > 0 else 0,
             "by_model": by_model,
+            "active_model": active_model,
+            "searchable_percent": round(current / total * 100, 1) if total > 0 else 0,
             "avg_content_length": round(avg_length, 0)
         }
     }
@@ -311,35 +747,47 @@ def main():
     parser.add_argument('--content', help='Get embedding for arbitrary text (returns JSON)')
     parser.add_argument('--reindex', action='store_true', help='Re-embed all entries')
     parser.add_argument('--stats', action='store_true', help='Show embedding statistics')
-    parser.add_argument('--batch-size', type=int, default=50, help='Batch size for --all')
+    parser.add_argument('--batch-size', type=int, default=None,
+                        help='Entries to embed for --all (default 50) / per checkpoint for --reindex (default 500)')
+    parser.add_argument('--request-size', type=int, default=MAX_REQUEST_INPUTS, help='Max texts per embeddings request')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help='Max embeddings requests in flight')
+    parser.add_argument('--restart', action='store_true', help='With --reindex, ignore a saved checkpoint')
+    parser.add_argument('--base-url', help='OpenAI-compatible embeddings endpoint (e.g. a local stand-in server)')
+    parser.add_argument('--provider', choices=list(PROVIDERS), help='Embedding provider (default EMBEDDING_PROVIDER)')
 
     args = parser.parse_args()
 
     result = None
+    client = None
+    if args.base_url:
+        if not HAS_OPENAI:
+            print("Error: openai package not installed")
+            sys.exit(1)
+        client = get_openai_client(base_url=args.base_url)
 
     if args.stats:
         result = get_embedding_stats()
 
     elif args.content:
         # Just get embedding for text
-        if not HAS_OPENAI:
-            print("Error: openai package not installed")
-            sys.exit(1)
-        result = generate_embedding(args.content)
+        result = generate_embedding(args.content, client, provider=args.provider)
         # Don't print full embedding, just metadata
         if result.get('success'):
             result['embedding_preview'] = result['embedding'][:5] + ['...']
             del result['embedding']
 
     elif args.id:
-        result = embed_entry(args.id)
+        result = embed_entry(args.id, client, provider=args.provider)
 
     elif args.reindex:
-        print("Re-indexing all entries (this will clear existing embeddings)...")
-        result = reindex_all(batch_size=args.batch_size)
+        print("Re-indexing all entries...")
+        result = reindex_all(batch_size=args.batch_size or 500, client=client, request_size=args.request_size,
+                             concurrency=args.concurrency, restart=args.restart, provider=args.provider)
 
     elif args.all:
-        result = embed_all_pending(batch_size=args.batch_size)
+        result = embed_all_pending(batch_size=args.batch_size or 50, client=client,
+                                   request_size=args.request_size, concurrency=args.concurrency,
+                                   provider=args.provider)
 
     else:
         parser.print_help()
@@ -0,0 +1,141 @@
+"""
+Tool: Embedding Stub Server
+Purpose: Local stand-in for the OpenAI embeddings endpoint, for testing the embedding pipeline
+
+Serves POST /v1/embeddings with deterministic pseudo-random unit vectors (seeded
+from the text), so embed_memory.py can be exercised end to end without an API key
+or network access. GET /stats reports how many requests and inputs were served.
+
+Usage:
+    python tools/memory/embedding_stub_server.py                        # Listen on 127.0.0.1:8089
+    python tools/memory/embedding_stub_server.py --port 9000 --dim 256
+    python tools/memory/embedding_stub_server.py --latency-ms 150       # Simulate API round trips
+    python tools/memory/embedding_stub_server.py --max-input-chars 2000 # Reject requests with an over-long input
+
+    # Then point the pipeline at it:
+    python tools/memory/embed_memory.py --all --base-url http://127.0.0.1:8089/v1
+
+Dependencies:
+    - stdlib only
+
+Output:
+    OpenAI-compatible JSON responses
+"""
+
+import sys
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import List
+
+
+def stub_embedding(text: str, dim: int) -> List[float]:
+    """Deterministic unit vector for a text."""
+    seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], 'big')
+    rng = random.Random(seed)
+    vector = [rng.gauss(0, 1) for _ in range(dim)]
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    dim = 1536
+    latency = 0.0
+    max_chars = 0
+    stats = {"requests": 0, "inputs": 0}
+    stats_lock = threading.Lock()
+
+    def _send(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/stats':
+            with self.stats_lock:
+                self._send(200, dict(self.stats))
+        else:
+            self._send(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/embeddings'):
+            self._send(404, {"error": {"message": "Not found"}})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._send(400, {"error": {"message": "Invalid JSON"}})
+            return
+
+        texts = request.get('input')
+        if isinstance(texts, str):
+            texts = [texts]
+        if not texts or not all(isinstance(t, str) for t in texts):
+            self._send(400, {"error": {"message": "input must be a string or list of strings"}})
+            return
+
+        if self.latency:
+            time.sleep(self.latency)
+        # Like the real API: one input over the context length fails the whole request
+        rejected = self.max_chars and any(len(t) > self.max_chars for t in texts)
+        with self.stats_lock:
+            self.stats["requests"] += 1
+            if rejected:
+                self.stats["rejected"] = self.stats.get("rejected", 0) + 1
+            else:
+                self.stats["inputs"] += len(texts)
+        if rejected:
+            self._send(400, {"error": {"message": f"Input longer than {self.max_chars} characters"}})
+            return
+
+        tokens = sum(len(t) // 4 + 1 for t in texts)
+        self._send(200, {
+            "object": "list",
+            "model": request.get('model', 'stub'),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": stub_embedding(t, self.dim)}
+                for i, t in enumerate(texts)
+            ],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+        })
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in embeddings server')
+    parser.add_argument('--host', default='127.0.0.1', help='Bind address')
+    parser.add_argument('--port', type=int, default=8089, help='Port')
+    parser.add_argument('--dim', type=int, default=1536, help='Embedding dimensions')
+    parser.add_argument('--latency-ms', type=float, default=0, help='Artificial delay per request')
+    parser.add_argument('--max-input-chars', type=int, default=0, help='Reject requests with a longer input (0 = no limit)')
+
+    args = parser.parse_args()
+
+    StubHandler.dim = args.dim
+    StubHandler.latency = args.latency_ms / 1000
+    StubHandler.max_chars = args.max_input_chars
+
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    print(f"OK Embedding stub listening on http://{args.host}:{args.port}/v1 (dim={args.dim})")
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,20 +7,27 @@ This implements Moltbot's hybrid search approach:
 - Vector search for semantic similarity (good for meaning)
 - Combined scoring: 0.7 * bm25 + 0.3 * cosine (configurable)
 
+Keyword search is served by the FTS5 inverted index in memory.db (memory_fts),
+which memory_db keeps in sync on every write. The in-memory BM25 scan is only
+used for caller-supplied entry lists or SQLite builds without FTS5.
+
 Usage:
     python tools/memory/hybrid_search.py --query "GPT image generation"
     python tools/memory/hybrid_search.py --query "what tools" --limit 10
     python tools/memory/hybrid_search.py --query "meeting" --bm25-weight 0.5
     python tools/memory/hybrid_search.py --query "learned" --semantic-only
     python tools/memory/hybrid_search.py --query "API key" --keyword-only
+    python tools/memory/hybrid_search.py --query "deploy" --min-importance 7 --max-age-days 30
+    python tools/memory/hybrid_search.py --query "printer" --fusion rrf
 
 Dependencies:
-    - openai (for embeddings)
+    - openai (only with EMBEDDING_PROVIDER=openai; the default local embeddings are offline)
     - rank_bm25 (optional, falls back to simple TF-IDF)
     - sqlite3 (stdlib)
 
 Env Vars:
-    - OPENAI_API_KEY (required for semantic search)
+    - EMBEDDING_PROVIDER (optional, "local" or "openai"; see embed_memory.py)
+    - OPENAI_API_KEY (required for the openai embedding provider)
 
 Output:
     JSON with ranked results combining both search methods
@@ -32,8 +39,9 @@ import json
 import argparse
 import re
 import math
+import time
 from pathlib import Path
-from typing import Optional, List, Dict, Any, Set
+from typing import Optional, List, Dict, Any, Tuple
 from collections import Counter
 from dotenv import load_dotenv
 
@@ -43,9 +51,11 @@ load_dotenv()
 # Import from sibling modules
 sys.path.insert(0, str(Path(__file__).parent))
 try:
-    from semantic_search import semantic_search, cosine_similarity
-    from embed_memory import generate_embedding, bytes_to_embedding
-    from memory_db import get_connection, search_entries
+    from semantic_search import cosine_similarity, get_embedding_matrix
+    from ann_index import get_ann_index
+    from embed_memory import bytes_to_embedding
+    from memory_db import get_connection, fts_search, log_search_access
+    from query_cache import get_query_embedding
 except ImportError as e:
     print(f"Error importing modules: {e}", file=sys.stderr)
     sys.exit(1)
@@ -57,6 +67,15 @@ try:
 except ImportError:
     HAS_BM25 = False
 
+FUSION_METHODS = ('weighted', 'rrf')
+
+# Reciprocal rank fusion damping constant (Cormack et al.)
+RRF_K = 60
+
+# Similarities below these count as no semantic match
+SEMANTIC_THRESHOLD = 0.2
+SEMANTIC_ONLY_THRESHOLD = 0.3
+
 
 def tokenize(text: str) -> List[str]:
     """Simple tokenizer for BM25."""
@@ -115,24 +134,70 @@ def get_all_entries_for_bm25() -> List[Dict[str, Any]]:
     return entries
 
 
+def indexed_bm25_search(
+    query: str,
+    entry_type: Optional[str] = None,
+    limit: int = 20
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    BM25 keyword search against the persistent FTS5 index.
+
+    Returns:
+        List of entries with BM25 scores, or None if the index is unavailable
+    """
+    query_tokens = tokenize(query)
+    if not query_tokens:
+        return []
+
+    result = fts_search(query_tokens, entry_type=entry_type, limit=limit)
+    if not result.get("success"):
+        return None
+
+    entries = result["entries"]
+    if not entries:
+        return []
+
+    max_score = entries[0]["bm25"] if entries[0]["bm25"] > 0 else 1
+    scored_entries = []
+    for entry in entries:
+        score = entry.pop("bm25")
+        if score > 0:
+            scored_entries.append({
+                **entry,
+                "bm25_score": round(score / max_score, 4),
+                "bm25_raw": round(score, 4)
+            })
+    return scored_entries
+
+
 def bm25_search(
     query: str,
     entries: Optional[List[Dict]] = None,
-    limit: int = 20
+    limit: int = 20,
+    entry_type: Optional[str] = None
 ) -> List[Dict[str, Any]]:
     """
     Perform BM25 keyword search.
 
+    Uses the FTS5 index unless a pre-loaded entry list is given (or FTS5 is
+    missing), in which case the entries are tokenized and scored in memory.
+
     Args:
         query: Search query
         entries: Optional pre-loaded entries
         limit: Maximum results
+        entry_type: Optional type filter (index path only)
 
     Returns:
         List of entries with BM25 scores
     """
     if entries is None:
+        indexed = indexed_bm25_search(query, entry_type=entry_type, limit=limit)
+        if indexed is not None:
+            return indexed
         entries = get_all_entries_for_bm25()
+        if entry_type:
+            entries = [e for e in entries if e.get('type') == entry_type]
 
     if not entries:
         return []
@@ -192,6 +257,155 @@ def bm25_search(
     return scored_entries[:limit]
 
 
+def _filter_conditions(
+    entry_type: Optional[str] = None,
+    min_importance: Optional[int] = None,
+    max_age_days: Optional[float] = None
+) -> Tuple[List[str], List[Any]]:
+    """SQL WHERE conditions (and params) for the hybrid search pre-filters."""
+    conditions = ['is_active = 1']
+    params: List[Any] = []
+    if entry_type:
+        conditions.append('type = ?')
+        params.append(entry_type)
+    if min_importance is not None:
+        conditions.append('importance >= ?')
+        params.append(min_importance)
+    if max_age_days is not None:
+        conditions.append("created_at >= datetime('now', ?)")
+        params.append(f'-{max_age_days} days')
+    return conditions, params
+
+
+def _filtered_ids(conditions: List[str], params: List[Any]) -> List[int]:
+    """IDs of entries passing the pre-filters (no row data is decoded)."""
+    conn = get_connection()
+    rows = conn.execute(
+        f"SELECT id FROM memory_entries WHERE {' AND '.join(conditions)}", params
+    ).fetchall()
+    conn.close()
+    return [row['id'] for row in rows]
+
+
+def _keyword_stage(
+    query: str,
+    candidate_limit: int,
+    conditions: List[str],
+    params: List[Any],
+    entry_type: Optional[str],
+    min_importance: Optional[int],
+    max_age_days: Optional[float]
+) -> Tuple[Dict[int, float], Dict[int, Dict[str, Any]], Optional[Dict[int, float]]]:
+    """
+    Top BM25 candidates under the pre-filters.
+
+    Returns:
+        (raw scores by id, entry rows by id, scan_scores) where scan_scores holds raw
+        scores for every entry when the in-memory fallback was used (None otherwise).
+    """
+    terms = tokenize(query)
+    if not terms:
+        return {}, {}, None
+
+    result = fts_search(terms, entry_type=entry_type, limit=candidate_limit,
+                        min_importance=min_importance, max_age_days=max_age_days)
+    if result.get("success"):
+        rows = {e["id"]: e for e in result["entries"] if e["bm25"] > 0}
+        return {i: e.pop("bm25") for i, e in rows.items()}, rows, None
+
+    # No FTS5: load the filtered entries once and score them in memory
+    conn = get_connection()
+    entries = [dict(row) for row in conn.execute(f'''
+        SELECT id, type, content, source, importance, tags, created_at
+        FROM memory_entries
+        WHERE {' AND '.join(conditions)}
+    ''', params).fetchall()]
+    conn.close()
+    scored = bm25_search(query, entries, limit=len(entries))
+    scan_scores = {e["id"]: e["bm25_raw"] for e in scored}
+    top = scored[:candidate_limit]
+    return ({e["id"]: e["bm25_raw"] for e in top},
+            {e["id"]: e for e in top},
+            scan_scores)
+
+
+def _vector_stage(
+    query_embedding: List[float],
+    model: str,
+    candidate_limit: int,
+    threshold: float,
+    conditions: List[str],
+    params: List[Any],
+    entry_type: Optional[str],
+    prefiltered: bool,
+    extra_ids: List[int]
+) -> Tuple[Dict[int, float], Dict[int, Dict[str, Any]], int, str]:
+    """
+    Top vector candidates under the pre-filters, plus similarities for extra_ids
+    (keyword candidates) so both scores cover the same candidate set. Only entries
+    embedded with the query's model are compared.
+
+    Returns:
+        (similarity by id, entry rows by id, total_searched, search_mode)
+    """
+    matrix = get_embedding_matrix(model)
+    if matrix is not None:
+        allowed = None
+        search_mode = "exact"
+        if prefiltered:
+            allowed = _filtered_ids(conditions, params)
+        else:
+            index = get_ann_index()
+            if index is not None and not index.is_stale(len(matrix), matrix.dim, model):
+                allowed = index.candidates(query_embedding)
+                search_mode = "ann"
+        hits, searched, _ = matrix.search(query_embedding, limit=candidate_limit, threshold=threshold,
+                                          entry_type=entry_type, entry_ids=allowed)
+        if search_mode == "ann" and len(hits) < candidate_limit and searched < len(allowed):
+            # Filtered probe came up short (see semantic_search); rescore every row
+            hits, searched, _ = matrix.search(query_embedding, limit=candidate_limit, threshold=threshold,
+                                              entry_type=entry_type)
+            search_mode = "exact_fallback"
+        scores = {meta['id']: sim for meta, sim in hits}
+        rows = {meta['id']: meta for meta, _ in hits}
+        missing = [i for i in extra_ids if i not in scores]
+        if missing:
+            extra, _, _ = matrix.search(query_embedding, limit=len(missing), threshold=threshold, entry_ids=missing)
+            scores.update((meta['id'], sim) for meta, sim in extra)
+        return scores, rows, searched, search_mode
+
+    # Pure-Python fallback: decode the filtered embeddings once
+    conn = get_connection()
+    entries = conn.execute(f'''
+        SELECT id, type, content, source, importance, tags, created_at, embedding
+        FROM memory_entries
+        WHERE embedding IS NOT NULL AND embedding_model = ? AND {' AND '.join(conditions)}
+    ''', [model] + params).fetchall()
+    conn.close()
+
+    query_mag = math.sqrt(sum(a * a for a in query_embedding))
+    all_scores = {}
+    rows = {}
+    for row in entries:
+        vector = bytes_to_embedding(row['embedding'])
+        if len(vector) != len(query_embedding):
+            continue
+        similarity = cosine_similarity(query_embedding, vector, mag1=query_mag)
+        if similarity >= threshold:
+            all_scores[row['id']] = similarity
+            rows[row['id']] = {k: row[k] for k in row.keys() if k != 'embedding'}
+
+    top = sorted(all_scores, key=all_scores.get, reverse=True)[:candidate_limit]
+    scores = {i: all_scores[i] for i in top}
+    scores.update((i, all_scores[i]) for i in extra_ids if i in all_scores)
+    return scores, {i: rows[i] for i in scores}, len(entries), "python"
+
+
+def _ranks(scores: Dict[int, float]) -> Dict[int, int]:
+    """1-based rank of each id by descending score."""
+    return {entry_id: rank for rank, entry_id in enumerate(sorted(scores, key=scores.get, reverse=True), start=1)}
+
+
 def hybrid_search(
     query: str,
     entry_type: Optional[str] = None,
@@ -200,11 +414,19 @@ def hybrid_search(
     semantic_weight: float = 0.3,
     min_score: float = 0.1,
     semantic_only: bool = False,
-    keyword_only: bool = False
+    keyword_only: bool = False,
+    min_importance: Optional[int] = None,
+    max_age_days: Optional[float] = None,
+    fusion: str = "weighted",
+    client=None
 ) -> Dict[str, Any]:
     """
     Perform hybrid BM25 + semantic search.
 
+    Both stages draw from one candidate set: the top keyword hits and the top
+    vector hits are each scored by the other method too, and every row is read
+    at most once. Pre-filters are pushed into the SQL of both stages.
+
     Args:
         query: Search query
         entry_type: Optional type filter
@@ -214,100 +436,142 @@ def hybrid_search(
         min_score: Minimum combined score
         semantic_only: Only use semantic search
         keyword_only: Only use keyword search
+        min_importance: Only search entries at or above this importance
+        max_age_days: Only search entries created in the last N days
+        fusion: "weighted" (score blend) or "rrf" (reciprocal rank fusion)
+        client: Optional OpenAI client
 
     Returns:
-        dict with combined results
+        dict with combined results and per-stage timings in milliseconds
     """
+    if fusion not in FUSION_METHODS:
+        return {"success": False, "error": f"Invalid fusion. Must be one of: {FUSION_METHODS}"}
+
+    started = time.perf_counter()
+    timings: Dict[str, float] = {}
+
+    def lap(stage: str, since: float) -> float:
+        now = time.perf_counter()
+        timings[stage] = round((now - since) * 1000, 2)
+        return now
+
+    method = "keyword_only" if keyword_only else "semantic_only" if semantic_only else "hybrid"
     results = {
         "success": True,
         "query": query,
-        "method": "hybrid",
+        "method": method,
         "weights": {"bm25": bm25_weight, "semantic": semantic_weight},
+        "fusion": fusion,
+        "filters": {"type": entry_type, "min_importance": min_importance, "max_age_days": max_age_days},
         "results": []
     }
-
-    # Get entries for BM25
-    all_entries = get_all_entries_for_bm25()
-
-    # Filter by type if specified
-    if entry_type:
-        all_entries = [e for e in all_entries if e.get('type') == entry_type]
-
-    if not all_entries:
-        results["message"] = "No entries found"
-        return results
-
-    # Keyword-only search
     if keyword_only:
-        results["method"] = "keyword_only"
-        bm25_results = bm25_search(query, all_entries, limit=limit)
-        results["results"] = [{
-            "id": r["id"],
-            "type": r["type"],
-            "content": r["content"],
-            "score": r["bm25_score"],
-            "bm25_score": r["bm25_score"],
-            "semantic_score": None
-        } for r in bm25_results]
-        return results
-
-    # Semantic-only search
-    if semantic_only:
-        results["method"] = "semantic_only"
-        sem_results = semantic_search(query, entry_type=entry_type, limit=limit, threshold=0.3)
-        if sem_results.get("success"):
-            results["results"] = [{
-                "id": r["id"],
-                "type": r["type"],
-                "content": r["content"],
-                "score": r["similarity"],
-                "bm25_score": None,
-                "semantic_score": r["similarity"]
-            } for r in sem_results.get("results", [])]
-        return results
-
-    # Full hybrid search
-    # Step 1: BM25 search (get more candidates than needed)
-    bm25_results = bm25_search(query, all_entries, limit=limit * 3)
-    bm25_scores = {r["id"]: r["bm25_score"] for r in bm25_results}
-
-    # Step 2: Semantic search on candidates
-    sem_results = semantic_search(query, entry_type=entry_type, limit=limit * 3, threshold=0.2)
-    semantic_scores = {}
-    if sem_results.get("success"):
-        semantic_scores = {r["id"]: r["similarity"] for r in sem_results.get("results", [])}
-
-    # Step 3: Combine scores
-    all_ids = set(bm25_scores.keys()) | set(semantic_scores.keys())
-    combined = []
+        bm25_weight, semantic_weight = 1.0, 0.0
+    elif semantic_only:
+        bm25_weight, semantic_weight = 0.0, 1.0
+
+    candidate_limit = limit * 3 if method == "hybrid" else limit
+    conditions, params = _filter_conditions(entry_type, min_importance, max_age_days)
+    prefiltered = min_importance is not None or max_age_days is not None
+    rows: Dict[int, Dict[str, Any]] = {}
+
+    # Stage 1: keyword candidates from the inverted index
+    bm25_raw: Dict[int, float] = {}
+    scan_scores = None
+    t = time.perf_counter()
+    if not semantic_only:
+        bm25_raw, keyword_rows, scan_scores = _keyword_stage(
+            query, candidate_limit, conditions, params, entry_type, min_importance, max_age_days
+        )
+        rows.update(keyword_rows)
+        t = lap("keyword", t)
+
+    # Stage 2: query embedding + vector candidates (also scoring the keyword hits)
+    semantic_scores: Dict[int, float] = {}
+    if not keyword_only:
+        embed_result = get_query_embedding(query, client)
+        t = lap("embed", t)
+        if embed_result.get('success'):
+            semantic_scores, vector_rows, searched, search_mode = _vector_stage(
+                embed_result['embedding'], embed_result['model'], candidate_limit,
+                SEMANTIC_ONLY_THRESHOLD if semantic_only else SEMANTIC_THRESHOLD,
+                conditions, params, entry_type, prefiltered, list(bm25_raw)
+            )
+            for entry_id, row in vector_rows.items():
+                rows.setdefault(entry_id, row)
+            results["total_searched"] = searched
+            results["search_mode"] = search_mode
+            results["model"] = embed_result['model']
+            results["tokens_used"] = embed_result['usage']['total_tokens']
+            results["query_cache"] = embed_result.get('cache')
+        else:
+            results["semantic_error"] = embed_result.get('error')
+        t = lap("vector", t)
+
+    # Stage 3: keyword scores for vector-only candidates
+    if method == "hybrid":
+        missing = [i for i in semantic_scores if i not in bm25_raw]
+        if missing:
+            if scan_scores is not None:
+                bm25_raw.update((i, scan_scores[i]) for i in missing if i in scan_scores)
+            else:
+                extra = fts_search(tokenize(query), limit=len(missing), entry_ids=missing)
+                bm25_raw.update((e["id"], e["bm25"]) for e in extra.get("entries", []) if e["bm25"] > 0)
+        t = lap("keyword_rescore", t)
+
+    # Stage 4: merge over the shared candidate set (dict lookups only)
+    max_raw = max(bm25_raw.values(), default=0) or 1
+    bm25_scores = {i: raw / max_raw for i, raw in bm25_raw.items()}
+    all_ids = set(bm25_scores) | set(semantic_scores)
+
+    if fusion == "rrf":
+        bm25_ranks = _ranks(bm25_scores)
+        semantic_ranks = _ranks(semantic_scores)
+        best = (bm25_weight + semantic_weight) / (RRF_K + 1) or 1
+        fused = {}
+        for entry_id in all_ids:
+            score = 0.0
+            if entry_id in bm25_ranks:
+                score += bm25_weight / (RRF_K + bm25_ranks[entry_id])
+            if entry_id in semantic_ranks:
+                score += semantic_weight / (RRF_K + semantic_ranks[entry_id])
+            fused[entry_id] = score / best
+    else:
+        fused = {
+            entry_id: bm25_weight * bm25_scores.get(entry_id, 0) + semantic_weight * semantic_scores.get(entry_id, 0)
+            for entry_id in all_ids
+        }
 
-    for entry_id in all_ids:
+    combined = []
+    for entry_id, combined_score in fused.items():
+        if combined_score < min_score or combined_score <= 0:
+            continue
+        entry_data = rows.get(entry_id)
+        if entry_data is None:
+            continue
         bm25 = bm25_scores.get(entry_id, 0)
         semantic = semantic_scores.get(entry_id, 0)
+        combined.append({
+            "id": entry_id,
+            "type": entry_data["type"],
+            "content": entry_data["content"],
+            "score": round(combined_score, 4),
+            "bm25_score": round(bm25, 4) if bm25 > 0 else None,
+            "semantic_score": round(semantic, 4) if semantic > 0 else None,
+            "importance": entry_data.get("importance")
+        })
 
-        # Combined score
-        combined_score = (bm25_weight * bm25) + (semantic_weight * semantic)
-
-        if combined_score >= min_score:
-            # Find the entry data
-            entry_data = next((e for e in all_entries if e["id"] == entry_id), None)
-            if entry_data:
-                combined.append({
-                    "id": entry_id,
-                    "type": entry_data["type"],
-                    "content": entry_data["content"],
-                    "score": round(combined_score, 4),
-                    "bm25_score": round(bm25, 4) if bm25 > 0 else None,
-                    "semantic_score": round(semantic, 4) if semantic > 0 else None,
-                    "importance": entry_data.get("importance")
-                })
-
-    # Sort by combined score
     combined.sort(key=lambda x: x["score"], reverse=True)
+    lap("merge", t)
+    timings["total"] = round((time.perf_counter() - started) * 1000, 2)
 
     results["results"] = combined[:limit]
+    log_search_access([r["id"] for r in results["results"]], query)
     results["total_candidates"] = len(all_ids)
     results["above_threshold"] = len(combined)
+    results["timings_ms"] = timings
+    if not all_ids:
+        results["message"] = "No entries found"
 
     return results
 
@@ -327,6 +591,12 @@ def main():
                        help='Only use semantic/vector search')
     parser.add_argument('--keyword-only', action='store_true',
                        help='Only use keyword/BM25 search')
+    parser.add_argument('--min-importance', type=int,
+                       help='Only search entries at or above this importance')
+    parser.add_argument('--max-age-days', type=float,
+                       help='Only search entries created in the last N days')
+    parser.add_argument('--fusion', choices=FUSION_METHODS, default='weighted',
+                       help='Score merge: weighted blend or reciprocal rank fusion')
 
     args = parser.parse_args()
 
@@ -343,7 +613,10 @@ def main():
         semantic_weight=sem_w,
         min_score=args.min_score,
         semantic_only=args.semantic_only,
-        keyword_only=args.keyword_only
+        keyword_only=args.keyword_only,
+        min_importance=args.min_importance,
+        max_age_days=args.max_age_days,
+        fusion=args.fusion
     )
 
     if result.get('success'):
@@ -16,6 +16,20 @@ Usage:
     python tools/memory/memory_db.py --action delete --id 5
     python tools/memory/memory_db.py --action stats
     python tools/memory/memory_db.py --action recent --hours 24
+    python tools/memory/memory_db.py --action rebuild-search-index
+    python tools/memory/memory_db.py --action benchmark --iterations 2000
+    python tools/memory/memory_db.py --action compact-access-log --days 30
+    python tools/memory/memory_db.py --action import --file entries.jsonl [--upsert]
+
+Connections are pooled per thread (get_connection() hands back the same WAL-mode
+connection each time; close() only ends any open transaction), and the schema is
+created/migrated once per process, tracked with PRAGMA user_version.
+
+Access tracking (reads, search hits, updates) is buffered in memory and written in
+one transaction every ACCESS_FLUSH_SIZE events or ACCESS_FLUSH_SECONDS, and at
+exit, so reads never wait on a commit; events for entries hard-deleted before the
+flush are dropped. compact-access-log rolls raw access rows older than N days into
+per-entry daily counts in memory_access_daily.
 
 Dependencies:
     - sqlite3 (stdlib)
@@ -30,11 +44,14 @@ import os
 import sys
 import json
 import sqlite3
+import atexit
 import argparse
 import hashlib
-from datetime import datetime, timedelta
+import threading
+import time
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable, Tuple, Set
 
 # Database path
 DB_PATH = Path(__file__).parent.parent / "data" / "memory.db"
@@ -45,14 +62,123 @@ VALID_TYPES = ['fact', 'preference', 'event', 'insight', 'task', 'relationship']
 # Valid sources
 VALID_SOURCES = ['user', 'inferred', 'session', 'external', 'system']
 
+# Set to False when the SQLite build lacks FTS5; keyword search then scans entries
+HAS_FTS5 = True
 
-def get_connection():
-    """Get database connection, creating tables if needed."""
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(str(DB_PATH))
+# In-process caches (e.g. the semantic search embedding matrix) that want to hear
+# about writes. Callbacks receive the entry ID, or None when every row changed.
+_write_listeners: List[Callable[[Optional[int]], None]] = []
+
+# Bump whenever _create_schema() changes so existing databases get migrated
+SCHEMA_VERSION = 2
+
+# Buffered access events are flushed once this many are queued or the oldest is this old
+ACCESS_FLUSH_SIZE = 100
+ACCESS_FLUSH_SECONDS = 5.0
+
+# Rows per transaction for --action import
+IMPORT_BATCH_SIZE = 1000
+
+# Max IDs or hashes per "IN (...)" query (SQLite variable limit is 999 on older builds)
+_ID_CHUNK = 500
+
+# Raw memory_access_log rows older than this are rolled into memory_access_daily
+ACCESS_LOG_RETENTION_DAYS = 30
+
+# Applied to every new connection (journal_mode=WAL also persists in the file)
+_PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',      # Safe with WAL; fsync only at checkpoints
+    'PRAGMA cache_size = -16000',       # 16 MB page cache
+    'PRAGMA mmap_size = 268435456',     # 256 MB memory-mapped reads
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA busy_timeout = 5000',
+)
+
+
+class PooledConnection(sqlite3.Connection):
+    """Connection owned by the per-thread pool: close() ends the transaction but keeps it open."""
+
+    def close(self) -> None:
+        # Same visible effect as closing: uncommitted work is discarded
+        if self.in_transaction:
+            self.rollback()
+
+    def dispose(self) -> None:
+        super().close()
+
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+_schema_ready: Set[str] = set()
+
+# Pending (memory_id, access_type, query, accessed_at) events, see record_access()
+_access_lock = threading.Lock()
+_access_buffer: List[Tuple[int, str, Optional[str], str]] = []
+_access_pid = os.getpid()
+_access_timer: Optional[threading.Timer] = None
+
+
+def _open_connection(path: str) -> PooledConnection:
+    conn = sqlite3.connect(path, factory=PooledConnection)
     conn.row_factory = sqlite3.Row
+    for pragma in _PRAGMAS:
+        conn.execute(pragma)
+    return conn
 
-    cursor = conn.cursor()
+
+def get_connection():
+    """
+    Get this thread's pooled database connection.
+
+    Each thread (including asyncio.to_thread workers) gets its own connection,
+    opened once and reused; callers still call close() when done. The schema is
+    created or migrated the first time a process touches a database file.
+    """
+    path = str(DB_PATH)
+    pool = getattr(_local, 'connections', None)
+    if pool is None or _local.pid != os.getpid():
+        # New thread, or a forked child that must not reuse the parent's handles
+        pool = _local.connections = {}
+        _local.pid = os.getpid()
+
+    conn = pool.get(path)
+    if conn is None:
+        DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+        conn = pool[path] = _open_connection(path)
+
+    if path not in _schema_ready:
+        with _schema_lock:
+            if path not in _schema_ready:
+                _migrate(conn)
+                _schema_ready.add(path)
+    return conn
+
+
+def close_connections() -> None:
+    """Close this thread's pooled connections (e.g. before a worker thread exits)."""
+    pool = getattr(_local, 'connections', None) or {}
+    for conn in pool.values():
+        conn.dispose()
+    pool.clear()
+
+
+def _migrate(conn) -> None:
+    """Create or upgrade the schema once per database file (tracked in user_version)."""
+    global HAS_FTS5
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        HAS_FTS5 = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'memory_fts'"
+        ).fetchone() is not None
+        return
+    _create_schema(conn.cursor())
+    conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+    conn.commit()
+
+
+def _create_schema(cursor) -> None:
+    """Create every table, index and trigger (all statements are idempotent)."""
 
     # Main memory entries table
     cursor.execute('''
@@ -104,16 +230,114 @@ def get_connection():
         )
     ''')
 
+    # Per-entry daily access counts compacted from memory_access_log
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS memory_access_daily (
+            memory_id INTEGER NOT NULL,
+            date DATE NOT NULL,
+            access_type TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (memory_id, date, access_type)
+        )
+    ''')
+
+    # Cached query embeddings (see query_cache.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS query_embeddings (
+            query_key TEXT NOT NULL,
+            model TEXT NOT NULL,
+            embedding BLOB NOT NULL,
+            created_at REAL NOT NULL,
+            last_used REAL NOT NULL,
+            hits INTEGER DEFAULT 0,
+            PRIMARY KEY (query_key, model)
+        )
+    ''')
+
     # Indexes for performance
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_memory_type ON memory_entries(type)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_memory_source ON memory_entries(source)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_memory_created ON memory_entries(created_at)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_memory_active ON memory_entries(is_active)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_memory_importance ON memory_entries(importance)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_memory_updated ON memory_entries(updated_at)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_daily_logs_date ON daily_logs(date)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_query_embeddings_used ON query_embeddings(last_used)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_access_log_accessed ON memory_access_log(accessed_at)')
 
-    conn.commit()
-    return conn
+    _ensure_search_index(cursor)
+
+
+def _ensure_search_index(cursor) -> None:
+    """
+    Create the FTS5 inverted index used for BM25 keyword search.
+
+    memory_fts is an external-content FTS5 table over memory_entries.content holding
+    only active entries. Triggers keep it in sync inside the same transaction as
+    every INSERT/UPDATE/DELETE, so add_entry(), update_entry() and delete_entry()
+    (and any other writer) never leave it stale.
+    """
+    global HAS_FTS5
+    if not HAS_FTS5:
+        return
+
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'memory_fts'")
+    exists = cursor.fetchone() is not None
+    try:
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS memory_fts USING fts5(
+                content,
+                content='memory_entries',
+                content_rowid='id',
+                tokenize='unicode61'
+            )
+        ''')
+    except sqlite3.OperationalError:
+        HAS_FTS5 = False
+        return
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS memory_fts_insert AFTER INSERT ON memory_entries
+        WHEN new.is_active = 1
+        BEGIN
+            INSERT INTO memory_fts(rowid, content) VALUES (new.id, new.content);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS memory_fts_delete AFTER DELETE ON memory_entries
+        WHEN old.is_active = 1
+        BEGIN
+            INSERT INTO memory_fts(memory_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS memory_fts_update AFTER UPDATE OF content, is_active ON memory_entries
+        BEGIN
+            INSERT INTO memory_fts(memory_fts, rowid, content)
+                SELECT 'delete', old.id, old.content WHERE old.is_active = 1;
+            INSERT INTO memory_fts(rowid, content)
+                SELECT new.id, new.content WHERE new.is_active = 1;
+        END
+    ''')
+
+    if not exists:
+        # First run against an existing database: index what is already there
+        cursor.execute('INSERT INTO memory_fts(rowid, content) SELECT id, content FROM memory_entries WHERE is_active = 1')
+
+
+def register_write_listener(callback: Callable[[Optional[int]], None]) -> None:
+    """Register a callback to be notified when an entry's content or embedding changes."""
+    if callback not in _write_listeners:
+        _write_listeners.append(callback)
+
+
+def notify_write(entry_id: Optional[int] = None) -> None:
+    """Notify write listeners. entry_id=None means all entries may have changed."""
+    for callback in list(_write_listeners):
+        try:
+            callback(entry_id)
+        except Exception as e:
+            print(f"Warning: memory write listener failed: {e}", file=sys.stderr)
 
 
 def row_to_dict(row) -> Optional[Dict]:
@@ -202,6 +426,218 @@ def add_entry(
     return {"success": True, "entry": entry, "message": f"Memory entry created with ID {entry_id}"}
 
 
+def _prepare_bulk_row(item: Dict[str, Any], defaults: Dict[str, Any]) -> Tuple[Optional[tuple], Optional[str]]:
+    """Validate one bulk row; returns (insert params, None) or (None, error)."""
+    if not isinstance(item, dict):
+        return None, "Row must be a JSON object"
+    content = item.get('content')
+    if not isinstance(content, str) or not content.strip():
+        return None, "content is required"
+
+    entry_type = item.get('type', item.get('entry_type', defaults.get('entry_type', 'fact')))
+    if entry_type not in VALID_TYPES:
+        return None, f"Invalid type. Must be one of: {VALID_TYPES}"
+    source = item.get('source', defaults.get('source', 'session'))
+    if source not in VALID_SOURCES:
+        return None, f"Invalid source. Must be one of: {VALID_SOURCES}"
+    try:
+        confidence = float(item.get('confidence', 1.0))
+        importance = int(item.get('importance', defaults.get('importance', 5)))
+    except (TypeError, ValueError):
+        return None, "confidence and importance must be numbers"
+    if not 1 <= importance <= 10:
+        return None, "importance must be between 1 and 10"
+
+    tags = item.get('tags')
+    if isinstance(tags, str):
+        tags = [t.strip() for t in tags.split(',') if t.strip()]
+    tags_json = json.dumps(tags) if tags else None
+
+    return (entry_type, content, compute_content_hash(content), source, confidence, importance,
+            tags_json, item.get('context'), item.get('expires_at')), None
+
+
+def add_entries_bulk(
+    entries: List[Dict[str, Any]],
+    upsert: bool = False,
+    defaults: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Add many memory entries in one transaction.
+
+    Each item takes the add_entry() fields as keys (content, type, source,
+    confidence, importance, tags, context, expires_at). Rows are validated and
+    hashed up front, then written with a single executemany; duplicates are
+    resolved by ON CONFLICT(content_hash) instead of a SELECT per row.
+
+    Args:
+        entries: Rows to insert
+        upsert: If True, an existing entry with the same content hash is
+                overwritten (and reactivated); otherwise it is left alone
+        defaults: Fallback type/source/importance for rows that omit them
+
+    Returns:
+        dict with counts and per-row "results" in input order, each with
+        index, status (created, updated, duplicate or invalid) and id or error
+    """
+    defaults = defaults or {}
+    results: List[Dict[str, Any]] = []
+    rows: List[tuple] = []
+    row_indexes: List[int] = []
+
+    for index, item in enumerate(entries):
+        params, error = _prepare_bulk_row(item, defaults)
+        if error:
+            results.append({"index": index, "status": "invalid", "error": error})
+        else:
+            results.append({"index": index})
+            rows.append(params)
+            row_indexes.append(index)
+
+    if rows:
+        hashes = list(dict.fromkeys(row[2] for row in rows))
+        conn = get_connection()
+        try:
+            existing = _ids_by_hash(conn, hashes)
+            if upsert:
+                conflict = '''DO UPDATE SET
+                    type = excluded.type,
+                    content = excluded.content,
+                    source = excluded.source,
+                    confidence = excluded.confidence,
+                    importance = excluded.importance,
+                    tags = excluded.tags,
+                    context = excluded.context,
+                    expires_at = excluded.expires_at,
+                    is_active = 1,
+                    updated_at = CURRENT_TIMESTAMP'''
+            else:
+                conflict = 'DO NOTHING'
+            conn.executemany(f'''
+                INSERT INTO memory_entries
+                (type, content, content_hash, source, confidence, importance, tags, context, expires_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(content_hash) {conflict}
+            ''', rows)
+            ids = _ids_by_hash(conn, hashes)
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            conn.close()
+            return {"success": False, "error": f"Bulk insert failed: {e}"}
+        conn.close()
+
+        # A hash seen earlier in this batch counts as existing for later rows
+        seen: Set[str] = set()
+        for row, index in zip(rows, row_indexes):
+            content_hash = row[2]
+            if content_hash in existing or content_hash in seen:
+                status = "updated" if upsert else "duplicate"
+            else:
+                status = "created"
+            seen.add(content_hash)
+            results[index].update(status=status, id=ids.get(content_hash))
+
+        if upsert:
+            for entry_id in sorted({r['id'] for r in results if r.get('status') == 'updated'}):
+                notify_write(entry_id)
+
+    counts = {status: 0 for status in ('created', 'updated', 'duplicate', 'invalid')}
+    for result in results:
+        counts[result['status']] += 1
+
+    return {
+        "success": True,
+        "message": ", ".join(f"{n} {status}" for status, n in counts.items() if n) or "No entries",
+        "counts": counts,
+        "results": results
+    }
+
+
+def upsert_entries(entries: List[Dict[str, Any]], defaults: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Insert entries, overwriting any existing entry with the same content hash."""
+    return add_entries_bulk(entries, upsert=True, defaults=defaults)
+
+
+def _ids_by_hash(conn, hashes: List[str]) -> Dict[str, int]:
+    """Map content hashes to entry IDs (chunked to stay under SQLite's variable limit)."""
+    ids: Dict[str, int] = {}
+    for start in range(0, len(hashes), _ID_CHUNK):
+        chunk = hashes[start:start + _ID_CHUNK]
+        rows = conn.execute(
+            f"SELECT id, content_hash FROM memory_entries WHERE content_hash IN ({','.join('?' * len(chunk))})",
+            chunk
+        ).fetchall()
+        ids.update((row['content_hash'], row['id']) for row in rows)
+    return ids
+
+
+def import_entries(
+    path: str,
+    upsert: bool = False,
+    batch_size: int = IMPORT_BATCH_SIZE,
+    defaults: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Stream a JSONL file ('-' for stdin) into memory_entries, one transaction per batch.
+
+    Only counts and the failing rows (with 1-based line numbers) are returned, so
+    imports of any size stay small in memory and output.
+    """
+    try:
+        handle = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    except OSError as e:
+        return {"success": False, "error": f"Cannot open {path}: {e}"}
+
+    counts = {status: 0 for status in ('created', 'updated', 'duplicate', 'invalid')}
+    errors: List[Dict[str, Any]] = []
+    batch: List[Any] = []
+    lines: List[int] = []
+
+    def flush() -> Optional[str]:
+        result = add_entries_bulk(batch, upsert=upsert, defaults=defaults)
+        if not result.get('success'):
+            return result.get('error')
+        for status, n in result['counts'].items():
+            counts[status] += n
+        for row in result['results']:
+            if row['status'] == 'invalid':
+                errors.append({"line": lines[row['index']], "error": row['error']})
+        batch.clear()
+        lines.clear()
+        return None
+
+    try:
+        for line_no, line in enumerate(handle, 1):
+            if not line.strip():
+                continue
+            try:
+                batch.append(json.loads(line))
+            except ValueError as e:
+                counts['invalid'] += 1
+                errors.append({"line": line_no, "error": f"Invalid JSON: {e}"})
+                continue
+            lines.append(line_no)
+            if len(batch) >= batch_size:
+                error = flush()
+                if error:
+                    return {"success": False, "error": f"{error} (batch ending at line {line_no})", "counts": counts}
+        if batch:
+            error = flush()
+            if error:
+                return {"success": False, "error": error, "counts": counts}
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+    return {
+        "success": True,
+        "message": ", ".join(f"{n} {status}" for status, n in counts.items() if n) or "No entries",
+        "counts": counts,
+        "errors": errors
+    }
+
+
 def get_entry(entry_id: int) -> Dict[str, Any]:
     """Get a single memory entry by ID and record access."""
     conn = get_connection()
@@ -210,25 +646,12 @@ def get_entry(entry_id: int) -> Dict[str, Any]:
     cursor.execute('SELECT * FROM memory_entries WHERE id = ?', (entry_id,))
     entry = row_to_dict(cursor.fetchone())
 
+    conn.close()
+
     if not entry:
-        conn.close()
         return {"success": False, "error": f"Memory entry {entry_id} not found"}
 
-    # Update access tracking
-    cursor.execute('''
-        UPDATE memory_entries
-        SET last_accessed = CURRENT_TIMESTAMP, access_count = access_count + 1
-        WHERE id = ?
-    ''', (entry_id,))
-
-    # Log access
-    cursor.execute(
-        'INSERT INTO memory_access_log (memory_id, access_type) VALUES (?, ?)',
-        (entry_id, 'read')
-    )
-
-    conn.commit()
-    conn.close()
+    record_access(entry_id, 'read')
 
     return {"success": True, "entry": entry}
 
@@ -345,17 +768,139 @@ def search_entries(
 
     entries = [row_to_dict(row) for row in cursor.fetchall()]
 
-    # Log search
-    for entry in entries:
-        cursor.execute(
-            'INSERT INTO memory_access_log (memory_id, access_type, query) VALUES (?, ?, ?)',
-            (entry['id'], 'search', query)
-        )
+    conn.close()
+    log_search_access([entry['id'] for entry in entries], query)
+
+    return {"success": True, "entries": entries, "query": query, "count": len(entries)}
+
+
+def log_search_access(entry_ids: List[int], query: str) -> None:
+    """Record that a search for `query` returned these entries (feeds query cache warm-up)."""
+    for entry_id in entry_ids:
+        record_access(entry_id, 'search', query)
+
+
+def record_access(entry_id: int, access_type: str, query: Optional[str] = None) -> None:
+    """
+    Queue an access event for memory_access_log.
+
+    'read' events also bump the entry's access_count/last_accessed when flushed.
+    The buffer is flushed in one transaction once ACCESS_FLUSH_SIZE events are
+    queued, ACCESS_FLUSH_SECONDS after the first queued event, and at exit.
+    """
+    global _access_pid, _access_timer
+    now = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    with _access_lock:
+        if _access_pid != os.getpid():
+            # Forked child: the parent still owns (and will flush) what it queued
+            _access_buffer.clear()
+            _access_timer = None
+            _access_pid = os.getpid()
+        _access_buffer.append((entry_id, access_type, query, now))
+        flush_now = len(_access_buffer) >= ACCESS_FLUSH_SIZE
+        if not flush_now and _access_timer is None:
+            _access_timer = threading.Timer(ACCESS_FLUSH_SECONDS, _flush_on_timer)
+            _access_timer.daemon = True
+            _access_timer.start()
+    if flush_now:
+        flush_access_log()
+
+
+def _drop_pending_access(entry_id: int) -> None:
+    """Discard queued events for an entry that is being hard-deleted."""
+    with _access_lock:
+        _access_buffer[:] = [event for event in _access_buffer if event[0] != entry_id]
+
+
+def _flush_on_timer() -> None:
+    flush_access_log()
+    close_connections()
+
+
+def flush_access_log() -> int:
+    """Write buffered access events in one transaction. Returns the number written."""
+    global _access_timer
+    with _access_lock:
+        if _access_timer is not None:
+            _access_timer.cancel()
+            _access_timer = None
+        if _access_pid != os.getpid():
+            _access_buffer.clear()
+        events = list(_access_buffer)
+        _access_buffer.clear()
+    if not events:
+        return 0
+
+    # Collapse reads per entry: one UPDATE each, with the count and latest time
+    reads: Dict[int, List[Any]] = {}
+    for entry_id, access_type, _, accessed_at in events:
+        if access_type == 'read':
+            total = reads.setdefault(entry_id, [0, accessed_at])
+            total[0] += 1
+            total[1] = max(total[1], accessed_at)
+
+    conn = get_connection()
+    try:
+        # Skip events for entries hard-deleted since they were queued (possibly by another process)
+        written = conn.executemany('''
+            INSERT INTO memory_access_log (memory_id, access_type, query, accessed_at)
+            SELECT ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM memory_entries WHERE id = ?)
+        ''', [(*event, event[0]) for event in events]).rowcount
+        conn.executemany('''
+            UPDATE memory_entries
+            SET access_count = access_count + ?, last_accessed = MAX(COALESCE(last_accessed, ''), ?)
+            WHERE id = ?
+        ''', [(count, last, entry_id) for entry_id, (count, last) in reads.items()])
+        conn.commit()
+    except sqlite3.Error as e:
+        # Access tracking is analytics only; never fail the caller over it
+        conn.rollback()
+        print(f"Warning: dropped {len(events)} access log events: {e}", file=sys.stderr)
+        return 0
+    finally:
+        conn.close()
+    return written
+
+
+def compact_access_log(older_than_days: int = ACCESS_LOG_RETENTION_DAYS) -> Dict[str, Any]:
+    """
+    Roll raw memory_access_log rows older than N days into memory_access_daily.
 
+    Counts are added to any existing (memory_id, date, access_type) row, so the
+    job can be re-run safely; the rolled-up raw rows are deleted in the same
+    transaction.
+    """
+    if older_than_days < 0:
+        return {"success": False, "error": "--days must be zero or more"}
+    flush_access_log()
+
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=older_than_days)).strftime('%Y-%m-%d %H:%M:%S')
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO memory_access_daily (memory_id, date, access_type, count)
+        SELECT memory_id, date(accessed_at), access_type, COUNT(*)
+        FROM memory_access_log
+        WHERE accessed_at < ? AND memory_id IS NOT NULL AND access_type IS NOT NULL
+        GROUP BY memory_id, date(accessed_at), access_type
+        ON CONFLICT(memory_id, date, access_type) DO UPDATE SET count = count + excluded.count
+    ''', (cutoff,))
+    aggregated = cursor.rowcount
+    cursor.execute('DELETE FROM memory_access_log WHERE accessed_at < ?', (cutoff,))
+    removed = cursor.rowcount
     conn.commit()
     conn.close()
 
-    return {"success": True, "entries": entries, "query": query, "count": len(entries)}
+    return {
+        "success": True,
+        "message": f"Compacted {removed} access log rows into {aggregated} daily aggregates",
+        "removed": removed,
+        "aggregated": aggregated,
+        "cutoff": cutoff
+    }
+
+
+atexit.register(flush_access_log)
 
 
 def update_entry(entry_id: int, **kwargs) -> Dict[str, Any]:
@@ -408,19 +953,14 @@ def update_entry(entry_id: int, **kwargs) -> Dict[str, Any]:
 
     cursor.execute(f'UPDATE memory_entries SET {", ".join(updates)} WHERE id = ?', values)
     conn.commit()
-
-    # Log update
-    cursor.execute(
-        'INSERT INTO memory_access_log (memory_id, access_type) VALUES (?, ?)',
-        (entry_id, 'update')
-    )
-    conn.commit()
+    record_access(entry_id, 'update')
 
     # Fetch updated entry
     cursor.execute('SELECT * FROM memory_entries WHERE id = ?', (entry_id,))
     entry = row_to_dict(cursor.fetchone())
 
     conn.close()
+    notify_write(entry_id)
 
     return {"success": True, "entry": entry, "message": f"Memory entry {entry_id} updated"}
 
@@ -449,11 +989,14 @@ def delete_entry(entry_id: int, soft_delete: bool = True) -> Dict[str, Any]:
         message = f"Memory entry {entry_id} marked as inactive"
     else:
         cursor.execute('DELETE FROM memory_access_log WHERE memory_id = ?', (entry_id,))
+        cursor.execute('DELETE FROM memory_access_daily WHERE memory_id = ?', (entry_id,))
         cursor.execute('DELETE FROM memory_entries WHERE id = ?', (entry_id,))
+        _drop_pending_access(entry_id)
         message = f"Memory entry {entry_id} permanently deleted"
 
     conn.commit()
     conn.close()
+    notify_write(entry_id)
 
     return {"success": True, "message": message}
 
@@ -487,6 +1030,7 @@ def get_recent(hours: int = 24, entry_type: Optional[str] = None) -> Dict[str, A
 
 def get_stats() -> Dict[str, Any]:
     """Get memory statistics."""
+    flush_access_log()
     conn = get_connection()
     cursor = conn.cursor()
 
@@ -533,6 +1077,12 @@ def get_stats() -> Dict[str, Any]:
     cursor.execute('SELECT COUNT(*) as count FROM daily_logs')
     daily_log_count = cursor.fetchone()['count']
 
+    # Access log size (raw rows vs compacted daily aggregates)
+    cursor.execute('SELECT COUNT(*) as count FROM memory_access_log')
+    access_log_rows = cursor.fetchone()['count']
+    cursor.execute('SELECT COUNT(*) as count FROM memory_access_daily')
+    access_daily_rows = cursor.fetchone()['count']
+
     conn.close()
 
     return {
@@ -544,7 +1094,8 @@ def get_stats() -> Dict[str, Any]:
             "by_source": by_source,
             "with_embeddings": with_embeddings,
             "daily_logs": daily_log_count,
-            "most_accessed": most_accessed
+            "most_accessed": most_accessed,
+            "access_log": {"raw_rows": access_log_rows, "daily_rows": access_daily_rows}
         }
     }
 
@@ -624,6 +1175,152 @@ def get_daily_logs(dates: List[str]) -> Dict[str, Any]:
     return {"success": True, "logs": logs}
 
 
+def fts_search(
+    terms: List[str],
+    entry_type: Optional[str] = None,
+    limit: int = 20,
+    min_importance: Optional[int] = None,
+    max_age_days: Optional[float] = None,
+    entry_ids: Optional[List[int]] = None
+) -> Dict[str, Any]:
+    """
+    BM25-ranked keyword search over the FTS5 inverted index.
+
+    Args:
+        terms: Already-tokenized query terms (any term may match)
+        entry_type: Optional type filter
+        limit: Max results
+        min_importance: Optional minimum importance
+        max_age_days: Optional recency filter on created_at
+        entry_ids: Optional candidate IDs; only these entries are scored
+
+    Returns:
+        dict with entries (best first), each carrying a positive bm25 score
+    """
+    if not HAS_FTS5:
+        return {"success": False, "error": "FTS5 not available in this SQLite build"}
+    if not terms:
+        return {"success": True, "entries": [], "count": 0}
+
+    # Quote every term so FTS5 query syntax (AND, NEAR, *, -) is taken literally
+    match = ' OR '.join('"' + t.replace('"', '""') + '"' for t in terms)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    conditions = ['memory_fts MATCH ?', 'm.is_active = 1']
+    params: List[Any] = [match]
+    if entry_type:
+        conditions.append('m.type = ?')
+        params.append(entry_type)
+    if min_importance is not None:
+        conditions.append('m.importance >= ?')
+        params.append(min_importance)
+    if max_age_days is not None:
+        conditions.append("m.created_at >= datetime('now', ?)")
+        params.append(f'-{max_age_days} days')
+    if entry_ids is not None and not entry_ids:
+        conn.close()
+        return {"success": True, "entries": [], "count": 0}
+
+    # Candidate IDs are bound in chunks; bm25() uses index-wide statistics, so
+    # scores from different chunks are comparable and can be merged directly
+    if entry_ids is None:
+        chunks: List[Optional[List[int]]] = [None]
+    else:
+        ids = list(entry_ids)
+        chunks = [ids[i:i + _ID_CHUNK] for i in range(0, len(ids), _ID_CHUNK)]
+
+    entries = []
+    try:
+        for chunk in chunks:
+            chunk_conditions, chunk_params = list(conditions), list(params)
+            if chunk is not None:
+                chunk_conditions.append(f"m.id IN ({','.join('?' * len(chunk))})")
+                chunk_params.extend(chunk)
+            cursor.execute(f'''
+                SELECT m.id, m.type, m.content, m.source, m.importance, m.tags, m.created_at,
+                       -bm25(memory_fts) AS bm25
+                FROM memory_fts
+                JOIN memory_entries m ON m.id = memory_fts.rowid
+                WHERE {' AND '.join(chunk_conditions)}
+                ORDER BY bm25(memory_fts)
+                LIMIT ?
+            ''', chunk_params + [limit])
+            entries.extend(dict(row) for row in cursor.fetchall())
+    except sqlite3.OperationalError as e:
+        conn.close()
+        return {"success": False, "error": f"Keyword search failed: {e}"}
+
+    conn.close()
+    if len(chunks) > 1:
+        entries.sort(key=lambda e: e['bm25'], reverse=True)
+        entries = entries[:limit]
+
+    return {"success": True, "entries": entries, "count": len(entries)}
+
+
+def benchmark_connections(iterations: int = 1000) -> Dict[str, Any]:
+    """
+    Per-call overhead of a primary-key lookup: fresh connection + schema setup
+    (the old get_connection behaviour) versus the pooled connection.
+    """
+    conn = get_connection()
+    row = conn.execute('SELECT MAX(id) FROM memory_entries').fetchone()
+    conn.close()
+    entry_id = row[0] or 0
+    path = str(DB_PATH)
+
+    def lookup(c) -> None:
+        c.execute('SELECT * FROM memory_entries WHERE id = ?', (entry_id,)).fetchone()
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        c = sqlite3.connect(path)
+        c.row_factory = sqlite3.Row
+        _create_schema(c.cursor())
+        c.commit()
+        lookup(c)
+        c.close()
+    fresh = (time.perf_counter() - started) / iterations
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        c = get_connection()
+        lookup(c)
+        c.close()
+    pooled = (time.perf_counter() - started) / iterations
+
+    return {
+        "success": True,
+        "message": f"Pooled connections are {fresh / pooled:.1f}x faster per call",
+        "iterations": iterations,
+        "per_call_us": {
+            "fresh_connection_with_schema": round(fresh * 1e6, 1),
+            "pooled_connection": round(pooled * 1e6, 1)
+        },
+        "journal_mode": get_connection().execute('PRAGMA journal_mode').fetchone()[0]
+    }
+
+
+def rebuild_search_index() -> Dict[str, Any]:
+    """Drop and repopulate the FTS5 keyword index from active entries."""
+    conn = get_connection()
+    if not HAS_FTS5:
+        conn.close()
+        return {"success": False, "error": "FTS5 not available in this SQLite build"}
+
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO memory_fts(memory_fts) VALUES ('delete-all')")
+    cursor.execute('INSERT INTO memory_fts(rowid, content) SELECT id, content FROM memory_entries WHERE is_active = 1')
+    indexed = cursor.rowcount
+    cursor.execute("INSERT INTO memory_fts(memory_fts) VALUES ('optimize')")
+    conn.commit()
+    conn.close()
+
+    return {"success": True, "message": f"Search index rebuilt with {indexed} entries", "indexed": indexed}
+
+
 def store_embedding(entry_id: int, embedding: bytes, model: str = 'text-embedding-3-small') -> Dict[str, Any]:
     """
     Store an embedding for a memory entry.
@@ -648,22 +1345,60 @@ def store_embedding(entry_id: int, embedding: bytes, model: str = 'text-embeddin
 
     conn.commit()
     conn.close()
+    notify_write(entry_id)
 
     return {"success": True, "message": f"Embedding stored for entry {entry_id}"}
 
 
-def get_entries_without_embeddings(limit: int = 50) -> Dict[str, Any]:
-    """Get entries that don't have embeddings yet."""
+def store_embeddings(items: List[Tuple[int, bytes]], model: str = 'text-embedding-3-small') -> Dict[str, Any]:
+    """
+    Store many embeddings in one transaction.
+
+    Args:
+        items: (entry_id, embedding_bytes) pairs
+        model: Model used to generate the embeddings
+
+    Returns:
+        dict with success status and count stored
+    """
+    if not items:
+        return {"success": True, "stored": 0}
+
+    conn = get_connection()
+    conn.executemany('''
+        UPDATE memory_entries
+        SET embedding = ?, embedding_model = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    ''', [(embedding, model, entry_id) for entry_id, embedding in items])
+    conn.commit()
+    conn.close()
+    for entry_id, _ in items:
+        notify_write(entry_id)
+
+    return {"success": True, "stored": len(items)}
+
+
+def get_entries_without_embeddings(limit: int = 50, model: Optional[str] = None) -> Dict[str, Any]:
+    """Get entries that don't have embeddings yet (or, given a model, whose embedding is from another model)."""
     conn = get_connection()
     cursor = conn.cursor()
 
-    cursor.execute('''
-        SELECT id, content, type
-        FROM memory_entries
-        WHERE embedding IS NULL AND is_active = 1
-        ORDER BY importance DESC, created_at DESC
-        LIMIT ?
-    ''', (limit,))
+    if model:
+        cursor.execute('''
+            SELECT id, content, type, content_hash
+            FROM memory_entries
+            WHERE (embedding IS NULL OR embedding_model IS NOT ?) AND is_active = 1
+            ORDER BY importance DESC, created_at DESC
+            LIMIT ?
+        ''', (model, limit))
+    else:
+        cursor.execute('''
+            SELECT id, content, type, content_hash
+            FROM memory_entries
+            WHERE embedding IS NULL AND is_active = 1
+            ORDER BY importance DESC, created_at DESC
+            LIMIT ?
+        ''', (limit,))
 
     entries = [row_to_dict(row) for row in cursor.fetchall()]
 
@@ -676,7 +1411,8 @@ def main():
     parser = argparse.ArgumentParser(description='Memory Database Manager')
     parser.add_argument('--action', required=True,
                        choices=['add', 'get', 'list', 'search', 'update', 'delete',
-                               'recent', 'stats', 'add-log', 'get-log', 'needs-embedding'],
+                               'recent', 'stats', 'add-log', 'get-log', 'needs-embedding',
+                               'rebuild-search-index', 'benchmark', 'compact-access-log', 'import'],
                        help='Action to perform')
     parser.add_argument('--id', type=int, help='Entry ID')
     parser.add_argument('--content', help='Memory content')
@@ -694,6 +1430,11 @@ def main():
     parser.add_argument('--limit', type=int, default=100, help='Limit for list')
     parser.add_argument('--offset', type=int, default=0, help='Offset for list')
     parser.add_argument('--hard-delete', action='store_true', help='Permanently delete instead of soft delete')
+    parser.add_argument('--iterations', type=int, default=1000, help='Iterations for benchmark')
+    parser.add_argument('--file', help="JSONL file for import ('-' for stdin)")
+    parser.add_argument('--upsert', action='store_true', help='Import overwrites entries with the same content')
+    parser.add_argument('--days', type=int, default=ACCESS_LOG_RETENTION_DAYS,
+                       help='Compact access log rows older than this many days')
 
     args = parser.parse_args()
 
@@ -784,6 +1525,24 @@ def main():
     elif args.action == 'needs-embedding':
         result = get_entries_without_embeddings(limit=args.limit)
 
+    elif args.action == 'rebuild-search-index':
+        result = rebuild_search_index()
+
+    elif args.action == 'benchmark':
+        result = benchmark_connections(iterations=args.iterations)
+
+    elif args.action == 'compact-access-log':
+        result = compact_access_log(older_than_days=args.days)
+
+    elif args.action == 'import':
+        if not args.file:
+            print("Error: --file required for import action")
+            sys.exit(1)
+        defaults = {'source': args.source}
+        if args.type:
+            defaults['entry_type'] = args.type
+        result = import_entries(args.file, upsert=args.upsert, defaults=defaults)
+
     if result:
         if result.get('success'):
             print(f"OK {result.get('message', 'Success')}")
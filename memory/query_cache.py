@@ -0,0 +1,328 @@
+"""
+Tool: Query Embedding Cache
+Purpose: Avoid re-embedding repeated search queries through the embeddings API
+
+Query embeddings are keyed by normalized query text + model. A bounded in-process
+LRU sits in front of the query_embeddings table in data/memory.db, which persists
+across processes (the Telegram bot runs each search as a subprocess). Rows expire
+after QUERY_CACHE_TTL_DAYS and the table is trimmed to QUERY_CACHE_MAX_ROWS by
+least-recent use. The local embedding provider is cheaper to run than a cache
+lookup, so its queries bypass the cache.
+
+Usage:
+    python tools/memory/query_cache.py --stats
+    python tools/memory/query_cache.py --warm-up --limit 50    # Pre-embed frequent queries from memory_access_log
+    python tools/memory/query_cache.py --clear
+
+Dependencies:
+    - openai (for embeddings on a miss)
+    - sqlite3 (stdlib)
+
+Output:
+    JSON with cache statistics or warm-up results
+"""
+
+import re
+import sys
+import json
+import time
+import argparse
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent))
+from memory_db import get_connection, flush_access_log
+from embed_memory import (
+    generate_embedding,
+    generate_embeddings,
+    embedding_to_bytes,
+    bytes_to_embedding,
+    resolve_provider
+)
+
+# In-process LRU size
+QUERY_CACHE_MEMORY_SIZE = 256
+
+# On-disk expiry and size bound
+QUERY_CACHE_TTL_DAYS = 30
+QUERY_CACHE_MAX_ROWS = 5000
+
+# Trim the table every this many inserts rather than on each one
+_EVICT_EVERY = 50
+
+_memory: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+_lock = threading.Lock()
+_counters = {"hits": 0, "misses": 0, "memory_hits": 0, "disk_hits": 0}
+_inserts = 0
+
+
+def normalize_query(query: str) -> str:
+    """Cache key text: lowercase, collapsed whitespace, no surrounding punctuation."""
+    text = re.sub(r'\s+', ' ', query.lower()).strip()
+    return text.strip('?!.,;: ')
+
+
+def _remember(key: Tuple[str, str], embedding: List[float]) -> None:
+    with _lock:
+        _memory[key] = embedding
+        _memory.move_to_end(key)
+        while len(_memory) > QUERY_CACHE_MEMORY_SIZE:
+            _memory.popitem(last=False)
+
+
+def _lookup_disk(key: Tuple[str, str]) -> Optional[List[float]]:
+    now = time.time()
+    conn = get_connection()
+    row = conn.execute(
+        'SELECT embedding, created_at FROM query_embeddings WHERE query_key = ? AND model = ?', key
+    ).fetchone()
+    if row is None:
+        conn.close()
+        return None
+    if now - row['created_at'] > QUERY_CACHE_TTL_DAYS * 86400:
+        conn.execute('DELETE FROM query_embeddings WHERE query_key = ? AND model = ?', key)
+        conn.commit()
+        conn.close()
+        return None
+    conn.execute(
+        'UPDATE query_embeddings SET last_used = ?, hits = hits + 1 WHERE query_key = ? AND model = ?',
+        (now, *key)
+    )
+    conn.commit()
+    conn.close()
+    return bytes_to_embedding(row['embedding'])
+
+
+def _store_disk(items: List[Tuple[Tuple[str, str], List[float]]]) -> None:
+    global _inserts
+    now = time.time()
+    conn = get_connection()
+    conn.executemany('''
+        INSERT OR REPLACE INTO query_embeddings (query_key, model, embedding, created_at, last_used, hits)
+        VALUES (?, ?, ?, ?, ?, 0)
+    ''', [(key[0], key[1], embedding_to_bytes(embedding), now, now) for key, embedding in items])
+    conn.commit()
+
+    with _lock:
+        _inserts += len(items)
+        evict = _inserts >= _EVICT_EVERY
+        if evict:
+            _inserts = 0
+    if evict:
+        _evict(conn)
+    conn.close()
+
+
+def _evict(conn) -> int:
+    """Drop expired rows and trim to QUERY_CACHE_MAX_ROWS by least-recent use."""
+    cursor = conn.execute('DELETE FROM query_embeddings WHERE created_at < ?',
+                          (time.time() - QUERY_CACHE_TTL_DAYS * 86400,))
+    removed = cursor.rowcount
+    cursor = conn.execute('''
+        DELETE FROM query_embeddings WHERE rowid IN (
+            SELECT rowid FROM query_embeddings ORDER BY last_used DESC LIMIT -1 OFFSET ?
+        )
+    ''', (QUERY_CACHE_MAX_ROWS,))
+    removed += cursor.rowcount
+    conn.commit()
+    return removed
+
+
+def cache_stats() -> Dict[str, int]:
+    """Hit/miss counters for this process."""
+    with _lock:
+        return dict(_counters, memory_entries=len(_memory))
+
+
+def get_query_embedding(query: str, client=None, provider=None) -> Dict[str, Any]:
+    """
+    Embed a search query, serving repeats from the cache.
+
+    Returns the generate_embedding() result shape plus a "cache" dict with
+    "hit" (bool), "source" (memory/disk/api/local) and this process's counters.
+    """
+    try:
+        provider = resolve_provider(client, provider)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+
+    if provider.local:
+        result = generate_embedding(query, provider=provider)
+        result["cache"] = {"hit": False, "source": "local", **cache_stats()}
+        return result
+
+    model = provider.model
+    key = (normalize_query(query), model)
+
+    with _lock:
+        embedding = _memory.get(key)
+        if embedding is not None:
+            _memory.move_to_end(key)
+            _counters["hits"] += 1
+            _counters["memory_hits"] += 1
+    source = "memory"
+
+    if embedding is None:
+        embedding = _lookup_disk(key)
+        source = "disk"
+        if embedding is not None:
+            _remember(key, embedding)
+            with _lock:
+                _counters["hits"] += 1
+                _counters["disk_hits"] += 1
+
+    if embedding is not None:
+        return {
+            "success": True,
+            "embedding": embedding,
+            "model": model,
+            "dimensions": len(embedding),
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+            "cache": {"hit": True, "source": source, **cache_stats()}
+        }
+
+    result = generate_embedding(query, provider=provider)
+    with _lock:
+        _counters["misses"] += 1
+    if result.get('success'):
+        _remember(key, result['embedding'])
+        _store_disk([(key, result['embedding'])])
+    result["cache"] = {"hit": False, "source": "api", **cache_stats()}
+    return result
+
+
+def warm_up(limit: int = 50, client=None, provider=None) -> Dict[str, Any]:
+    """
+    Pre-embed the most frequent search queries from memory_access_log.
+
+    Queries already cached are skipped; the rest are embedded in one batched request.
+    """
+    try:
+        provider = resolve_provider(client, provider)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+    if provider.local:
+        return {"success": True, "message": f"{provider.model} embeddings are not cached", "embedded": 0}
+    model = provider.model
+
+    flush_access_log()
+    conn = get_connection()
+    rows = conn.execute('''
+        SELECT query, COUNT(*) AS uses FROM memory_access_log
+        WHERE query IS NOT NULL AND query != ''
+        GROUP BY LOWER(TRIM(query))
+        ORDER BY uses DESC
+        LIMIT ?
+    ''', (limit,)).fetchall()
+
+    seen = set()
+    queries = []
+    for row in rows:
+        key = normalize_query(row['query'])
+        if key and key not in seen:
+            seen.add(key)
+            queries.append(key)
+
+    cutoff = time.time() - QUERY_CACHE_TTL_DAYS * 86400
+    cached = set()
+    for key in queries:
+        row = conn.execute(
+            'SELECT 1 FROM query_embeddings WHERE query_key = ? AND model = ? AND created_at >= ?',
+            (key, model, cutoff)
+        ).fetchone()
+        if row:
+            cached.add(key)
+    conn.close()
+
+    missing = [q for q in queries if q not in cached]
+    if not missing:
+        return {"success": True, "message": "Query cache already warm", "candidates": len(queries), "embedded": 0}
+
+    result = generate_embeddings(missing, provider=provider)
+    if not result.get('success'):
+        return result
+
+    items = [((q, model), embedding) for q, embedding in zip(missing, result['embeddings'])]
+    _store_disk(items)
+    for key, embedding in items:
+        _remember(key, embedding)
+
+    return {
+        "success": True,
+        "message": f"Pre-embedded {len(missing)} frequent queries",
+        "candidates": len(queries),
+        "already_cached": len(cached),
+        "embedded": len(missing),
+        "tokens_used": result['usage']['total_tokens']
+    }
+
+
+def get_cache_info() -> Dict[str, Any]:
+    """Statistics for the on-disk cache."""
+    conn = get_connection()
+    row = conn.execute('''
+        SELECT COUNT(*) AS entries, COALESCE(SUM(hits), 0) AS hits,
+               MIN(created_at) AS oldest, MAX(last_used) AS last_used
+        FROM query_embeddings
+    ''').fetchone()
+    by_model = {r['model']: r['count'] for r in conn.execute(
+        'SELECT model, COUNT(*) AS count FROM query_embeddings GROUP BY model'
+    ).fetchall()}
+    conn.close()
+    return {
+        "success": True,
+        "stats": {
+            "entries": row['entries'],
+            "total_hits": row['hits'],
+            "by_model": by_model,
+            "oldest": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(row['oldest'])) if row['oldest'] else None,
+            "last_used": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(row['last_used'])) if row['last_used'] else None,
+            "ttl_days": QUERY_CACHE_TTL_DAYS,
+            "max_rows": QUERY_CACHE_MAX_ROWS
+        }
+    }
+
+
+def clear_cache() -> Dict[str, Any]:
+    """Drop every cached query embedding."""
+    conn = get_connection()
+    removed = conn.execute('DELETE FROM query_embeddings').rowcount
+    conn.commit()
+    conn.close()
+    with _lock:
+        _memory.clear()
+    return {"success": True, "message": f"Removed {removed} cached query embeddings", "removed": removed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query embedding cache')
+    parser.add_argument('--stats', action='store_true', help='Show cache statistics')
+    parser.add_argument('--warm-up', action='store_true', help='Pre-embed frequent queries from the access log')
+    parser.add_argument('--clear', action='store_true', help='Empty the cache')
+    parser.add_argument('--limit', type=int, default=50, help='Queries to consider for --warm-up')
+
+    args = parser.parse_args()
+
+    if args.stats:
+        result = get_cache_info()
+    elif args.warm_up:
+        result = warm_up(limit=args.limit)
+    elif args.clear:
+        result = clear_cache()
+    else:
+        parser.print_help()
+        sys.exit(0)
+
+    if result.get('success'):
+        print(f"OK {result.get('message', 'Success')}")
+    else:
+        print(f"ERROR {result.get('error', 'Unknown error')}")
+        sys.exit(1)
+
+    print(json.dumps(result, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -12,14 +12,19 @@ Usage:
     python tools/memory/semantic_search.py --query "what tools do I use" --limit 10
     python tools/memory/semantic_search.py --query "meeting notes" --type event
     python tools/memory/semantic_search.py --query "learned behavior" --threshold 0.7
+    python tools/memory/semantic_search.py --query "meeting notes" --exact   # Skip the ANN index
+
+With an ANN index, a filtered query whose probed lists yield fewer than --limit
+matches is re-run as an exact search (search_mode "exact_fallback").
 
 Dependencies:
-    - openai (for query embedding)
-    - numpy (for cosine similarity)
+    - openai (only with EMBEDDING_PROVIDER=openai; the default local embeddings are offline)
+    - numpy (optional, for the resident embedding matrix; falls back to pure Python)
     - sqlite3 (stdlib)
 
 Env Vars:
-    - OPENAI_API_KEY (required)
+    - EMBEDDING_PROVIDER (optional, "local" or "openai"; see embed_memory.py)
+    - OPENAI_API_KEY (required for the openai embedding provider)
 
 Output:
     JSON with ranked results and similarity scores
@@ -29,10 +34,12 @@ import os
 import sys
 import json
 import argparse
-import struct
 import math
+import threading
+import time
+from collections import Counter
 from pathlib import Path
-from typing import Optional, List, Dict, Any, Tuple
+from typing import Optional, List, Dict, Any, Tuple, Set
 from dotenv import load_dotenv
 
 # Load environment
@@ -41,12 +48,30 @@ load_dotenv()
 # Import from sibling modules
 sys.path.insert(0, str(Path(__file__).parent))
 try:
-    from embed_memory import generate_embedding, bytes_to_embedding, get_openai_client
-    from memory_db import get_connection
+    from embed_memory import bytes_to_embedding, get_active_model
+    from memory_db import get_connection, register_write_listener, log_search_access, VALID_TYPES
+    from ann_index import get_ann_index
+    from query_cache import get_query_embedding
 except ImportError as e:
     print(f"Error importing modules: {e}", file=sys.stderr)
     sys.exit(1)
 
+# numpy is optional; without it we fall back to pure-Python cosine similarity
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+# Columns loaded for each matrix row (everything a search result needs)
+_MATRIX_COLUMNS = 'id, type, content, source, importance, created_at, tags, is_active, embedding, embedding_model, updated_at'
+
+# Hard deletes from other processes don't show up in updated_at; reload fully this often
+FULL_RELOAD_SECONDS = 300
+
+# Max IDs per "WHERE id IN (...)" query (SQLite variable limit is 999 on older builds)
+_ID_CHUNK = 500
+
 
 def cosine_similarity(vec1: List[float], vec2: List[float], mag1: Optional[float] = None, mag2: Optional[float] = None) -> float:
     """
@@ -77,9 +102,304 @@ def cosine_similarity(vec1: List[float], vec2: List[float], mag1: Optional[float
     return dot_product / (mag1 * mag2)
 
 
+class EmbeddingMatrix:
+    """
+    Resident, pre-normalized float32 matrix of active memory embeddings from one model.
+
+    Rows are decoded straight from the BLOBs with np.frombuffer and L2-normalized once,
+    so scoring a query is a single matrix-vector product plus an argpartition top-k.
+    In-process writes (store_embedding, update_entry, delete_entry) arrive through the
+    memory_db write listener; writes from other processes are picked up on the next
+    refresh() via the updated_at watermark. Rows embedded with another model are
+    never loaded, so vectors from different embedding spaces are never compared.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self._lock = threading.Lock()
+        self._matrix = None          # (capacity, dim) float32; rows [0, _size) are allocated
+        self._alive = None           # bool mask over rows; False = removed
+        self._types = None           # int8 index into VALID_TYPES per row (-1 = unknown)
+        self._size = 0
+        self._dim: Optional[int] = None
+        self.row_of: Dict[int, int] = {}
+        self._row_by_id = None       # dense np.int64 lookup: entry id -> row (-1 = absent)
+        self.meta: List[Optional[Dict[str, Any]]] = []
+        self._dirty: Set[int] = set()
+        self._needs_full_reload = True
+        self._watermark: Optional[str] = None
+        self._loaded_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self.row_of)
+
+    @property
+    def dim(self) -> Optional[int]:
+        return self._dim
+
+    def mark_dirty(self, entry_id: Optional[int]) -> None:
+        """Write listener: remember which rows to re-read on the next refresh()."""
+        with self._lock:
+            if entry_id is None:
+                self._needs_full_reload = True
+            else:
+                self._dirty.add(entry_id)
+
+    def refresh(self) -> None:
+        """Bring the matrix up to date with the database."""
+        with self._lock:
+            if self._needs_full_reload or time.monotonic() - self._loaded_at > FULL_RELOAD_SECONDS:
+                self._full_reload()
+                return
+
+            conn = get_connection()
+            try:
+                rows = []
+                if self._watermark is not None:
+                    rows = conn.execute(
+                        f'SELECT {_MATRIX_COLUMNS} FROM memory_entries WHERE updated_at >= ?',
+                        (self._watermark,)
+                    ).fetchall()
+                else:
+                    rows = conn.execute(f'SELECT {_MATRIX_COLUMNS} FROM memory_entries').fetchall()
+
+                dirty = self._dirty - {row['id'] for row in rows}
+                self._dirty = set()
+                if dirty:
+                    found = set()
+                    ids = list(dirty)
+                    for i in range(0, len(ids), _ID_CHUNK):
+                        chunk = ids[i:i + _ID_CHUNK]
+                        placeholders = ','.join('?' * len(chunk))
+                        chunk_rows = conn.execute(
+                            f'SELECT {_MATRIX_COLUMNS} FROM memory_entries WHERE id IN ({placeholders})',
+                            chunk
+                        ).fetchall()
+                        found.update(row['id'] for row in chunk_rows)
+                        rows.extend(chunk_rows)
+                    # Dirty IDs that no longer exist were hard-deleted
+                    for entry_id in dirty - found:
+                        self._remove(entry_id)
+            finally:
+                conn.close()
+
+            for row in rows:
+                self._apply(row)
+
+    def _full_reload(self) -> None:
+        """Rebuild the whole matrix in one pass (caller holds the lock)."""
+        conn = get_connection()
+        try:
+            rows = conn.execute(f'''
+                SELECT {_MATRIX_COLUMNS} FROM memory_entries
+                WHERE embedding IS NOT NULL AND is_active = 1 AND embedding_model = ?
+                ORDER BY importance DESC
+            ''', (self.model,)).fetchall()
+            watermark = conn.execute('SELECT MAX(updated_at) FROM memory_entries').fetchone()[0]
+        finally:
+            conn.close()
+
+        # All rows must share one dimension; keep the most common and skip strays
+        sizes = Counter(len(row['embedding']) for row in rows)
+        blob_size = sizes.most_common(1)[0][0] if sizes else 0
+        rows = [row for row in rows if len(row['embedding']) == blob_size and blob_size > 0]
+        skipped = sum(sizes.values()) - len(rows)
+        if skipped:
+            print(f"Warning: skipped {skipped} embeddings with mismatched dimensions", file=sys.stderr)
+
+        self._dim = blob_size // 4 if rows else None
+        self.row_of = {}
+        self.meta = []
+        self._dirty = set()
+        if rows:
+            matrix = np.frombuffer(b''.join(row['embedding'] for row in rows), dtype=np.float32)
+            matrix = matrix.reshape(len(rows), self._dim).copy()
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            matrix /= norms
+            self._matrix = matrix
+        else:
+            self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._size = len(rows)
+        self._alive = np.ones(len(rows), dtype=bool)
+        self._types = np.array([self._type_code(row['type']) for row in rows], dtype=np.int8)
+        self._row_by_id = np.full(max((row['id'] for row in rows), default=0) + 1, -1, dtype=np.int64)
+        for i, row in enumerate(rows):
+            self.row_of[row['id']] = i
+            self._row_by_id[row['id']] = i
+            self.meta.append(self._row_meta(row))
+
+        self._watermark = watermark
+        self._needs_full_reload = False
+        self._loaded_at = time.monotonic()
+
+    @staticmethod
+    def _type_code(entry_type: str) -> int:
+        return VALID_TYPES.index(entry_type) if entry_type in VALID_TYPES else -1
+
+    @staticmethod
+    def _row_meta(row) -> Dict[str, Any]:
+        return {
+            "id": row['id'],
+            "type": row['type'],
+            "content": row['content'],
+            "source": row['source'],
+            "importance": row['importance'],
+            "created_at": row['created_at'],
+            "tags": row['tags'],
+        }
+
+    def _remove(self, entry_id: int) -> None:
+        row = self.row_of.pop(entry_id, None)
+        if row is not None:
+            self._alive[row] = False
+            self._row_by_id[entry_id] = -1
+            self.meta[row] = None
+
+    def _apply(self, row) -> None:
+        """Insert, overwrite or remove a single row (caller holds the lock)."""
+        if row['updated_at'] and (self._watermark is None or row['updated_at'] > self._watermark):
+            self._watermark = row['updated_at']
+
+        blob = row['embedding']
+        if not blob or not row['is_active'] or row['embedding_model'] != self.model:
+            self._remove(row['id'])
+            return
+
+        vec = np.frombuffer(blob, dtype=np.float32)
+        if self._dim is None:
+            self._dim = len(vec)
+            self._matrix = np.zeros((0, self._dim), dtype=np.float32)
+        if len(vec) != self._dim:
+            self._remove(row['id'])
+            return
+        norm = np.linalg.norm(vec)
+        vec = vec / norm if norm > 0 else vec
+
+        idx = self.row_of.get(row['id'])
+        if idx is None:
+            idx = self._size
+            if idx >= self._matrix.shape[0]:
+                self._grow(max(16, idx * 2))
+            self._size += 1
+            self.row_of[row['id']] = idx
+            if row['id'] >= len(self._row_by_id):
+                grown = np.full(max(row['id'] + 1, len(self._row_by_id) * 2), -1, dtype=np.int64)
+                grown[:len(self._row_by_id)] = self._row_by_id
+                self._row_by_id = grown
+            self._row_by_id[row['id']] = idx
+            self.meta.append(None)
+        self._matrix[idx] = vec
+        self._alive[idx] = True
+        self._types[idx] = self._type_code(row['type'])
+        self.meta[idx] = self._row_meta(row)
+
+    def _grow(self, capacity: int) -> None:
+        matrix = np.zeros((capacity, self._dim), dtype=np.float32)
+        alive = np.zeros(capacity, dtype=bool)
+        types = np.full(capacity, -1, dtype=np.int8)
+        matrix[:self._size] = self._matrix[:self._size]
+        alive[:self._size] = self._alive[:self._size]
+        types[:self._size] = self._types[:self._size]
+        self._matrix, self._alive, self._types = matrix, alive, types
+
+    def search(
+        self,
+        query_embedding: List[float],
+        limit: int = 10,
+        threshold: float = 0.5,
+        entry_type: Optional[str] = None,
+        exclude_id: Optional[int] = None,
+        entry_ids=None
+    ) -> Tuple[List[Tuple[Dict[str, Any], float]], int, int]:
+        """
+        Score rows against a query vector.
+
+        Args:
+            entry_ids: Optional candidate entry IDs (e.g. from the ANN index); only
+                these entries are scored. None scores every row.
+
+        Returns:
+            (hits, total_searched, above_threshold) where hits is a list of
+            (entry_meta, similarity) sorted by similarity descending.
+        """
+        query = np.asarray(query_embedding, dtype=np.float32)
+        with self._lock:
+            n = self._size
+            if n == 0 or self._dim is None or len(query) != self._dim:
+                return [], 0, 0
+            query_norm = np.linalg.norm(query)
+            if query_norm == 0:
+                return [], 0, 0
+
+            if entry_ids is None:
+                rows = np.arange(n)
+                vectors = self._matrix[:n]
+            else:
+                ids = np.asarray(list(entry_ids) if isinstance(entry_ids, (set, frozenset)) else entry_ids, dtype=np.int64)
+                ids = ids[(ids >= 0) & (ids < len(self._row_by_id))]
+                rows = self._row_by_id[ids]
+                rows = rows[rows >= 0]
+                vectors = self._matrix[rows]
+
+            mask = self._alive[rows]
+            if entry_type:
+                mask &= self._types[rows] == self._type_code(entry_type)
+            if exclude_id is not None and exclude_id in self.row_of:
+                mask &= rows != self.row_of[exclude_id]
+            searched = int(mask.sum())
+
+            scores = vectors @ (query / query_norm)
+            candidates = np.flatnonzero(mask & (scores >= threshold))
+            above = len(candidates)
+            if limit <= 0:
+                top = candidates[:0]
+            elif above > limit:
+                top = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+            else:
+                top = candidates
+            top = top[np.argsort(-scores[top], kind='stable')]
+            hits = [(self.meta[rows[i]], float(scores[i])) for i in top]
+        return hits, searched, above
+
+    def snapshot(self):
+        """Return (entry_ids, vectors) copies of all live rows, e.g. for building an index."""
+        with self._lock:
+            if not self.row_of:
+                return np.zeros(0, dtype=np.int64), np.zeros((0, self._dim or 0), dtype=np.float32)
+            ids = np.fromiter(self.row_of.keys(), dtype=np.int64, count=len(self.row_of))
+            rows = np.fromiter(self.row_of.values(), dtype=np.int64, count=len(self.row_of))
+            return ids, self._matrix[rows].copy()
+
+    def vector(self, entry_id: int):
+        """Return the normalized vector for an entry, or None if it isn't resident."""
+        with self._lock:
+            row = self.row_of.get(entry_id)
+            return None if row is None else self._matrix[row].copy()
+
+
+_matrices: Dict[str, EmbeddingMatrix] = {}
+_matrix_lock = threading.Lock()
+
+
+def get_embedding_matrix(model: Optional[str] = None) -> Optional[EmbeddingMatrix]:
+    """Return the process-wide embedding matrix for a model (default: the active one), or None without numpy."""
+    if not HAS_NUMPY:
+        return None
+    model = model or get_active_model()
+    with _matrix_lock:
+        matrix = _matrices.get(model)
+        if matrix is None:
+            matrix = _matrices[model] = EmbeddingMatrix(model)
+            register_write_listener(matrix.mark_dirty)
+    matrix.refresh()
+    return matrix
+
+
 def get_all_embeddings(
     entry_type: Optional[str] = None,
-    active_only: bool = True
+    active_only: bool = True,
+    model: Optional[str] = None
 ) -> List[Dict[str, Any]]:
     """
     Get all memory entries with embeddings.
@@ -87,6 +407,7 @@ def get_all_embeddings(
     Args:
         entry_type: Optional type filter
         active_only: Only get active entries
+        model: Only entries embedded with this model
 
     Returns:
         List of entries with their embeddings
@@ -97,6 +418,10 @@ def get_all_embeddings(
     conditions = ['embedding IS NOT NULL']
     params = []
 
+    if model:
+        conditions.append('embedding_model = ?')
+        params.append(model)
+
     if active_only:
         conditions.append('is_active = 1')
 
@@ -130,7 +455,8 @@ def semantic_search(
     entry_type: Optional[str] = None,
     limit: int = 10,
     threshold: float = 0.5,
-    client=None
+    client=None,
+    use_ann: bool = True
 ) -> Dict[str, Any]:
     """
     Search memories by semantic similarity.
@@ -140,27 +466,87 @@ def semantic_search(
         entry_type: Optional type filter
         limit: Maximum results to return
         threshold: Minimum similarity threshold (0-1)
-        client: Optional OpenAI client
+        client: Optional OpenAI client (forces the openai embedding provider)
+        use_ann: Use the ANN index when one is built and fresh (exact search otherwise)
+
+    Only entries embedded with the same model as the query are compared.
 
     Returns:
         dict with ranked results
     """
-    # Generate query embedding
-    embed_result = generate_embedding(query, client)
+    # Generate query embedding (repeat queries come from the cache)
+    embed_result = get_query_embedding(query, client)
     if not embed_result.get('success'):
         return embed_result
 
     query_embedding = embed_result['embedding']
+    model = embed_result['model']
+
+    # Fast path: score against the resident matrix in one matrix-vector product
+    matrix = get_embedding_matrix(model)
+    if matrix is not None:
+        candidates = None
+        search_mode = "exact"
+        if use_ann:
+            index = get_ann_index()
+            if index is not None and not index.is_stale(len(matrix), matrix.dim, model):
+                candidates = index.candidates(query_embedding)
+                search_mode = "ann"
+        hits, searched, above = matrix.search(
+            query_embedding, limit=limit, threshold=threshold, entry_type=entry_type, entry_ids=candidates
+        )
+        if candidates is not None and len(hits) < limit and searched < len(candidates):
+            # The type filter (or rows gone since indexing) thinned the probed lists,
+            # so matches may sit in unprobed ones; rescore every row instead
+            hits, searched, above = matrix.search(
+                query_embedding, limit=limit, threshold=threshold, entry_type=entry_type
+            )
+            search_mode = "exact_fallback"
+        if not searched:
+            return {
+                "success": True,
+                "query": query,
+                "results": [],
+                "message": f"No entries with {model} embeddings found (run embed_memory.py --all)",
+                "model": model,
+                "query_cache": embed_result.get('cache')
+            }
+        results = [{
+            "id": meta['id'],
+            "type": meta['type'],
+            "content": meta['content'],
+            "source": meta['source'],
+            "importance": meta['importance'],
+            "similarity": round(similarity, 4),
+            "created_at": meta['created_at'],
+            "tags": json.loads(meta['tags']) if meta['tags'] else None
+        } for meta, similarity in hits]
+        log_search_access([r['id'] for r in results], query)
+        return {
+            "success": True,
+            "query": query,
+            "results": results,
+            "total_searched": searched,
+            "above_threshold": above,
+            "returned": len(results),
+            "threshold": threshold,
+            "search_mode": search_mode,
+            "model": model,
+            "tokens_used": embed_result['usage']['total_tokens'],
+            "query_cache": embed_result.get('cache')
+        }
 
     # Get all entries with embeddings
-    entries = get_all_embeddings(entry_type=entry_type)
+    entries = get_all_embeddings(entry_type=entry_type, model=model)
 
     if not entries:
         return {
             "success": True,
             "query": query,
             "results": [],
-            "message": "No entries with embeddings found"
+            "message": f"No entries with {model} embeddings found (run embed_memory.py --all)",
+            "model": model,
+            "query_cache": embed_result.get('cache')
         }
 
     # Calculate similarities
@@ -189,6 +575,7 @@ def semantic_search(
 
     # Limit results
     results = scored_entries[:limit]
+    log_search_access([r['id'] for r in results], query)
 
     return {
         "success": True,
@@ -198,7 +585,9 @@ def semantic_search(
         "above_threshold": len(scored_entries),
         "returned": len(results),
         "threshold": threshold,
-        "tokens_used": embed_result['usage']['total_tokens']
+        "model": model,
+        "tokens_used": embed_result['usage']['total_tokens'],
+        "query_cache": embed_result.get('cache')
     }
 
 
@@ -222,7 +611,7 @@ def find_similar(
     cursor = conn.cursor()
 
     # Get source entry embedding
-    cursor.execute('SELECT content, embedding FROM memory_entries WHERE id = ?', (entry_id,))
+    cursor.execute('SELECT content, embedding, embedding_model FROM memory_entries WHERE id = ?', (entry_id,))
     row = cursor.fetchone()
 
     if not row:
@@ -233,12 +622,32 @@ def find_similar(
         conn.close()
         return {"success": False, "error": f"Entry {entry_id} has no embedding"}
 
-    source_embedding = bytes_to_embedding(row['embedding'])
     source_content = row['content']
+    model = row['embedding_model']
     conn.close()
 
-    # Get all other entries
-    entries = get_all_embeddings()
+    # Only compare against entries embedded with the same model
+    matrix = get_embedding_matrix(model) if model else None
+    if matrix is not None:
+        source_vector = np.frombuffer(row['embedding'], dtype=np.float32)
+        hits, searched, _ = matrix.search(source_vector, limit=limit, threshold=threshold, exclude_id=entry_id)
+        return {
+            "success": True,
+            "source_id": entry_id,
+            "source_content": source_content,
+            "similar_entries": [{
+                "id": meta['id'],
+                "type": meta['type'],
+                "content": meta['content'],
+                "similarity": round(similarity, 4)
+            } for meta, similarity in hits],
+            "total_compared": searched
+        }
+
+    source_embedding = bytes_to_embedding(row['embedding'])
+
+    # Get all other entries from the same model
+    entries = get_all_embeddings(model=model)
 
     # Calculate similarities (excluding source)
     scored = []
@@ -247,7 +656,7 @@ def find_similar(
     source_mag = math.sqrt(sum(a * a for a in source_embedding))
 
     for entry in entries:
-        if entry['id'] != entry_id and entry.get('embedding'):
+        if entry['id'] != entry_id and entry.get('embedding') and len(entry['embedding']) == len(source_embedding):
             similarity = cosine_similarity(source_embedding, entry['embedding'], mag1=source_mag)
             if similarity >= threshold:
                 scored.append({
@@ -276,6 +685,7 @@ def main():
     parser.add_argument('--threshold', type=float, default=0.5,
                        help='Minimum similarity threshold (0-1)')
     parser.add_argument('--similar-to', type=int, help='Find entries similar to this ID')
+    parser.add_argument('--exact', action='store_true', help='Exact search even if an ANN index exists')
 
     args = parser.parse_args()
 
@@ -293,7 +703,8 @@ def main():
             query=args.query,
             entry_type=args.type,
             limit=args.limit,
-            threshold=args.threshold
+            threshold=args.threshold,
+            use_ann=not args.exact
         )
 
     else:
@@ -0,0 +1,60 @@
+"""
+Shared fixtures for the test suite.
+
+memory_store points the memory modules (memory/) at an empty database under the
+test's tmp_path and resets their in-process caches; everything is restored when
+the test ends, so no test touches data/ or sees another test's state.
+"""
+
+import sys
+from collections import OrderedDict
+from pathlib import Path
+
+import pytest
+
+# The memory modules import each other by bare name
+MEMORY_DIR = Path(__file__).parent.parent / "memory"
+if str(MEMORY_DIR) not in sys.path:
+    sys.path.insert(0, str(MEMORY_DIR))
+
+
+@pytest.fixture
+def memory_store(tmp_path, monkeypatch):
+    """Fresh memory.db, ANN index path, embedding matrices and query cache in tmp_path; yields tmp_path."""
+    import memory_db
+
+    monkeypatch.setattr(memory_db, "DB_PATH", tmp_path / "memory.db")
+    monkeypatch.setattr(memory_db, "_write_listeners", [])
+    monkeypatch.setattr(memory_db, "_access_buffer", [])
+    monkeypatch.setattr(memory_db, "_access_timer", None)
+
+    # Modules that need optional packages (dotenv, openai) are only reset when importable
+    try:
+        import ann_index
+        monkeypatch.setattr(ann_index, "ANN_INDEX_PATH", tmp_path / "memory_ann.npz")
+        monkeypatch.setattr(ann_index, "_index", None)
+        monkeypatch.setattr(ann_index, "_index_mtime", None)
+    except ImportError:
+        pass
+    try:
+        import embed_memory
+        monkeypatch.setattr(embed_memory, "REINDEX_CHECKPOINT_PATH", tmp_path / "embed_reindex_checkpoint.json")
+    except ImportError:
+        pass
+    try:
+        import semantic_search
+        monkeypatch.setattr(semantic_search, "_matrices", {})
+    except ImportError:
+        pass
+    try:
+        import query_cache
+        monkeypatch.setattr(query_cache, "_memory", OrderedDict())
+        monkeypatch.setattr(query_cache, "_inserts", 0)
+    except ImportError:
+        pass
+
+    yield tmp_path
+
+    # Write (and stop the timer for) events queued during the test while DB_PATH still points here
+    memory_db.flush_access_log()
+    memory_db.close_connections()
@@ -219,6 +219,75 @@ def test_caching():
     print("  ✅ Caching tests passed\n")
 
 
+def test_cache_tiers():
+    """Test SQLite store, memory LRU, expiry sweeps, eviction and namespaces"""
+    print("Testing Cache Tiers...")
+
+    import tempfile
+    import time
+
+    cache_dir = Path(tempfile.mkdtemp())
+    cache = AgentCache(cache_dir, memory_size=2, max_entries=3)
+
+    # Test 1: Values survive in SQLite beyond the memory tier and across instances
+    for i in range(3):
+        cache.set(f"tier_{i}", {"n": i})
+    assert len(cache._memory) == 2, "Memory tier not bounded"
+    assert cache.get("tier_0") == {"n": 0}, "Value evicted from memory should come from SQLite"
+    assert AgentCache(cache_dir).get("tier_1") == {"n": 1}, "Second instance should share the store"
+    print("  ✓ Memory LRU over shared SQLite works")
+
+    # Test 2: Returned values are copies
+    cache.get("tier_2")["n"] = 99
+    assert cache.get("tier_2") == {"n": 2}, "Mutating a result changed the cache"
+    print("  ✓ Cached values are isolated from callers")
+
+    # Test 3: Expired entries are misses and are removed by a sweep
+    cache.set("short", "x", ttl_seconds=0)
+    time.sleep(0.01)
+    assert cache.get("short") is None, "Expired entry returned"
+    cache.set("short_2", "y", ttl_seconds=0)
+    time.sleep(0.01)
+    assert cache.sweep()["expired"] == 1, "Sweep should remove the expired entry"
+    print("  ✓ Expiry and batch sweep work")
+
+    # Test 4: Size-based eviction drops the least recently used
+    cache.set("tier_3", {"n": 3})
+    result = cache.sweep()
+    assert result["evicted"] == 1, "One entry over max_entries should be evicted"
+    assert cache.stats()["total_entries"] == 3, "Store not trimmed to max_entries"
+    print("  ✓ LRU eviction works")
+
+    # Test 4b: Keys served from the memory tier count as recently used
+    lru = AgentCache(Path(tempfile.mkdtemp()), max_entries=2)
+    lru.set("hot", 1)
+    time.sleep(0.01)
+    lru.set("cold", 2)
+    time.sleep(0.01)
+    assert lru.get("hot") == 1 and lru.counters["memory_hits"] == 1, "Expected a memory-tier hit"
+    time.sleep(0.01)
+    lru.set("new", 3)
+    assert lru.sweep()["evicted"] == 1, "One entry over max_entries should be evicted"
+    assert AgentCache(lru.cache_dir).get("hot") == 1, "Hot key evicted before the cold one"
+    assert AgentCache(lru.cache_dir).get("cold") is None, "Cold key should be evicted"
+    print("  ✓ Memory-tier hits keep keys from eviction")
+
+    # Test 5: Namespaces are separate
+    other = AgentCache(cache_dir, namespace="other")
+    other.set("tier_3", "other value")
+    assert cache.get("tier_3") == {"n": 3}, "Namespaces leaked"
+    other.clear()
+    assert cache.get("tier_3") == {"n": 3}, "clear() should only touch its namespace"
+    print("  ✓ Namespaces work")
+
+    # Test 6: Counters
+    stats = cache.stats()
+    assert stats["hits"] > 0 and stats["misses"] > 0 and stats["evictions"] == 1, "Counters wrong"
+    print(f"  ✓ Counters work (hit rate {stats['hit_rate']})")
+
+    print("  ✅ Cache tier tests passed\n")
+
+
 def test_router_integration():
     """Test router integration (dry-run only)"""
     print("Testing Router Integration...")
@@ -264,6 +333,7 @@ def main():
         test_shared_memory()
         test_workflows()
         test_caching()
+        test_cache_tiers()
         test_router_integration()
 
         print("=" * 70)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Tests for the IVF-flat ANN index (memory/ann_index.py)
+Tests: recall against exact search, staleness, catch-up from the DB, save/load round trip,
+exact fallback for filtered searches
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# The memory modules import each other by bare name
+sys.path.insert(0, str(Path(__file__).parent.parent / "memory"))
+
+pytest.importorskip("dotenv")
+
+import ann_index
+import memory_db
+from ann_index import AnnIndex, HAS_NUMPY
+
+pytestmark = pytest.mark.skipif(not HAS_NUMPY, reason="numpy not installed")
+
+MODEL = "test-model"
+DIM = 16
+
+
+def _add_embedded(vectors) -> list:
+    result = memory_db.add_entries_bulk([{"content": f"entry {i}"} for i in range(len(vectors))])
+    ids = [row["id"] for row in result["results"]]
+    memory_db.store_embeddings([(i, v.astype("float32").tobytes()) for i, v in zip(ids, vectors)], MODEL)
+    return ids
+
+
+def _build_from_db() -> AnnIndex:
+    import numpy as np
+    conn = memory_db.get_connection()
+    rows = conn.execute("SELECT id, embedding FROM memory_entries WHERE embedding IS NOT NULL ORDER BY id").fetchall()
+    synced_at = conn.execute("SELECT MAX(updated_at) FROM memory_entries").fetchone()[0]
+    conn.close()
+    ids = np.array([r["id"] for r in rows], dtype=np.int64)
+    vectors = np.stack([np.frombuffer(r["embedding"], dtype=np.float32) for r in rows])
+    return AnnIndex.build(ids, vectors, nlist=4, synced_at=synced_at, model=MODEL)
+
+
+def test_candidates_recall_against_exact():
+    """Scoring only the probed lists finds nearly all of the exact top-k"""
+    print("Testing ANN recall against exact search...")
+
+    import numpy as np
+    vectors = ann_index._synthetic_vectors(3000, DIM, clusters=50)
+    entry_ids = np.arange(100, 100 + len(vectors), dtype=np.int64)
+    index = AnnIndex.build(entry_ids, vectors, model=MODEL)
+    assert len(index) == len(vectors) and index.nlist == ann_index.default_nlist(len(vectors))
+
+    rng = np.random.default_rng(1)
+    hits = total = 0
+    for row in rng.choice(len(vectors), 50, replace=False):
+        query = vectors[row] + 0.2 * rng.standard_normal(DIM).astype(np.float32)
+        query /= np.linalg.norm(query)
+        exact = set(entry_ids[np.argsort(-(vectors @ query))[:10]].tolist())
+        candidates = index.candidates(query)
+        assert len(candidates) < len(vectors), "Probing should not scan every list"
+        rows = candidates - 100
+        top = candidates[np.argsort(-(vectors[rows] @ query))[:10]]
+        hits += len(exact & set(top.tolist()))
+        total += len(exact)
+    assert hits / total >= 0.9, f"recall@10 too low: {hits / total:.2f}"
+
+    everything = index.candidates(vectors[0], nprobe=index.nlist)
+    assert sorted(everything.tolist()) == entry_ids.tolist(), "Probing every list should return every entry"
+    print(f"  ✓ recall@10 = {hits / total:.2f}")
+
+
+def test_is_stale():
+    """Model or dimension mismatch, drift and uncovered entries all mark the index stale"""
+    print("Testing staleness checks...")
+
+    import numpy as np
+    vectors = ann_index._synthetic_vectors(100, DIM, clusters=5)
+    index = AnnIndex.build(np.arange(100, dtype=np.int64), vectors, nlist=5, model=MODEL)
+
+    assert not index.is_stale(100, DIM, MODEL)
+    assert index.is_stale(100, DIM, "other-model"), "Other model should be stale"
+    assert index.is_stale(100, DIM * 2, MODEL), "Other dimension should be stale"
+    assert index.is_stale(101, DIM, MODEL), "Live entries missing from the index should be stale"
+    assert not index.is_stale(90, DIM, MODEL), "Extra IDs in the index are harmless"
+
+    for entry_id in range(100, 151):
+        index.add(entry_id, vectors[entry_id % 100])
+    assert index.is_stale(151, DIM, MODEL), "More than STALE_DRIFT_RATIO added since training should be stale"
+    print("  ✓ Stale on model, dimension, coverage and drift")
+
+
+def test_catch_up_after_writes(memory_store):
+    """catch_up() applies store_embedding and delete_entry made through memory_db"""
+    print("Testing catch-up from the database...")
+
+    import numpy as np
+    vectors = ann_index._synthetic_vectors(40, DIM, clusters=4)
+    ids = _add_embedded(vectors[:30])
+    index = _build_from_db()
+    assert len(index) == 30
+
+    new_id = memory_db.add_entry("added after build")["entry"]["id"]
+    memory_db.store_embedding(new_id, vectors[30].tobytes(), MODEL)
+    other_id = memory_db.add_entry("embedded with another model")["entry"]["id"]
+    memory_db.store_embedding(other_id, vectors[31].tobytes(), "other-model")
+    memory_db.delete_entry(ids[0])
+
+    assert index.catch_up() > 0
+    assert new_id in index.list_of, "Newly embedded entry not picked up"
+    assert other_id not in index.list_of, "Embedding from another model should not be indexed"
+    assert ids[0] not in index.list_of, "Deleted entry still indexed"
+    assert index.added_since_train == 1
+
+    memory_db.store_embedding(ids[1], (-vectors[1]).astype(np.float32).tobytes(), MODEL)
+    index.catch_up()
+    expected = int(np.argmax(index.centroids @ -vectors[1]))
+    assert index.list_of[ids[1]] == expected, "Re-embedded entry not moved to its nearest list"
+    assert index.added_since_train == 1, "A re-assignment is not an addition"
+    print("  ✓ Catch-up applies adds, re-embeds and deletes")
+
+
+def test_save_load_round_trip(memory_store):
+    """save() replaces the file atomically and load() restores the same index"""
+    print("Testing save/load round trip...")
+
+    import numpy as np
+    tmp = memory_store
+    vectors = ann_index._synthetic_vectors(200, DIM, clusters=8)
+    index = AnnIndex.build(np.arange(200, dtype=np.int64), vectors, nlist=8, synced_at="2026-01-01 00:00:00",
+                           model=MODEL)
+    index.add(500, vectors[0])
+
+    index.save()
+    index.save()  # Overwrites the existing file in place
+    assert [p.name for p in tmp.iterdir() if p.name.startswith("memory_ann")] == ["memory_ann.npz"], \
+        "Temp files left behind"
+
+    loaded = AnnIndex.load()
+    assert loaded.list_of == index.list_of
+    assert np.array_equal(loaded.centroids, index.centroids)
+    assert (loaded.model, loaded.synced_at, loaded.trained_count, loaded.added_since_train) == \
+        (MODEL, "2026-01-01 00:00:00", 200, 1)
+    assert sorted(loaded.candidates(vectors[0], nprobe=8).tolist()) == sorted(index.list_of)
+
+    # A writer that fails mid-save leaves the previous file and no temp file
+    def broken_savez(f, **arrays):
+        f.write(b"partial")
+        raise OSError("disk full")
+    original = ann_index.np.savez
+    ann_index.np.savez = broken_savez
+    try:
+        with pytest.raises(OSError):
+            AnnIndex(index.centroids, model="replacement").save()
+    finally:
+        ann_index.np.savez = original
+    assert [p.name for p in tmp.iterdir() if p.name.startswith("memory_ann")] == ["memory_ann.npz"]
+    assert AnnIndex.load().model == MODEL, "Failed save clobbered the previous index"
+
+    ann_index.ANN_INDEX_PATH.write_bytes(b"not an index")
+    assert AnnIndex.load() is None, "A foreign file should load as no index"
+    print("  ✓ Round trip preserves the index")
+
+
+def test_filtered_search_falls_back_to_exact(memory_store):
+    """A type-filtered ANN search that comes up short is re-run exactly"""
+    print("Testing exact fallback for filtered searches...")
+
+    import embed_memory
+    import semantic_search
+    facts = [f"printer filament note {i} about spool {i % 7} and nozzle {i % 5}" for i in range(56)]
+    events = ["dentist appointment thursday", "flight to lisbon booked",
+              "birthday dinner with family", "car service at the garage"]
+    rows = [{"content": c} for c in facts] + [{"content": c, "type": "event"} for c in events]
+    ids = [r["id"] for r in memory_db.add_entries_bulk(rows)["results"]]
+    provider = embed_memory.get_embedding_provider("local")
+    embed_memory.embed_entries_batched([{"id": i, "content": r["content"]} for i, r in zip(ids, rows)],
+                                       provider=provider)
+
+    matrix = semantic_search.get_embedding_matrix(provider.model)
+    entry_ids, vectors = matrix.snapshot()
+    index = AnnIndex.build(entry_ids, vectors, nlist=30, model=provider.model)
+    index.synced_at = "9999-12-31 00:00:00"
+    index.save()
+
+    query = "printer filament spool"
+    q = embed_memory.generate_embedding(query, provider=provider)["embedding"]
+    probed_events = set(index.candidates(q).tolist()) & set(ids[56:])
+    assert len(probed_events) < 4, "Probed lists should miss some events for this test to mean anything"
+
+    plain = semantic_search.semantic_search(query, limit=3, threshold=-1)
+    assert plain["search_mode"] == "ann" and plain["returned"] == 3
+
+    filtered = semantic_search.semantic_search(query, entry_type="event", limit=4, threshold=-1)
+    assert filtered["search_mode"] == "exact_fallback", filtered
+    assert sorted(r["id"] for r in filtered["results"]) == ids[56:], "Every matching event should be returned"
+    print("  ✓ Short filtered ANN result falls back to exact search")
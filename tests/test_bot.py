@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Tests for the Telegram bot's turn handling (tools/telegram/bot.py)
+Tests: busy marker across concurrent turns, streaming reply edit throttle and RetryAfter
+backoff, Markdown fallback of the final edit, stream_message event sequence end to end
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from telegram.error import BadRequest, RetryAfter
+
+# The bot's modules import each other by bare name
+sys.path.insert(0, str(Path(__file__).parent.parent / "tools" / "telegram"))
+
+pytest.importorskip("dotenv")
+pytest.importorskip("openai")
+pytest.importorskip("telegram")
+
+import bot
+import conversation
+import tool_runner
+from turn_queue import QueuedMessage
+
+USER_ID = 42
+
+
+class _FakeSent:
+    """A message the bot sent; records every edit. errors: exceptions the next edits raise, in order."""
+
+    def __init__(self, text: str):
+        self.texts = [text]
+        self.edits = []
+        self.errors = []
+
+    async def edit_text(self, text: str, parse_mode=None):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.edits.append((text, parse_mode))
+        self.texts.append(text)
+
+
+class _FakeChat:
+    async def send_action(self, action):
+        pass
+
+    async def send_message(self, text):
+        pass
+
+
+class _FakeMessage:
+    def __init__(self, text: str):
+        self.text = text
+        self.chat = _FakeChat()
+        self.replies = []
+
+    async def reply_text(self, text: str, parse_mode=None):
+        sent = _FakeSent(text)
+        self.replies.append((sent, parse_mode))
+        return sent
+
+
+def _batch(user_id: int, text: str) -> list:
+    update = SimpleNamespace(message=_FakeMessage(text), effective_user=SimpleNamespace(id=user_id))
+    return [QueuedMessage(chat_id=user_id, text=text, payload=(update, None, False, None))]
+
+
+def test_busy_marker_spans_concurrent_turns(tmp_path, monkeypatch):
+    """The busy file stays until the last of several concurrent turns has finished"""
+    print("Testing the busy marker across concurrent turns...")
+
+    busy = tmp_path / "bot_busy_since"
+    monkeypatch.setattr(bot, "BOT_BUSY_FILE", busy)
+    monkeypatch.setattr(bot, "_active_turns", 0)
+    monkeypatch.setattr(bot, "DELAYED_STATUS_SEC", 60)
+    release = dict.fromkeys((1, 2))
+
+    async def fake_stream(text, user_id):
+        await release[user_id].wait()
+        yield {"type": "reply", "text": f"done {user_id}"}
+
+    monkeypatch.setattr(bot, "stream_message", fake_stream)
+
+    async def scenario():
+        for user_id in release:
+            release[user_id] = asyncio.Event()
+        turns = {user_id: asyncio.create_task(bot._run_turn(_batch(user_id, "hello"))) for user_id in release}
+        await asyncio.sleep(0.05)
+        assert busy.exists() and bot._active_turns == 2
+
+        release[1].set()
+        await turns[1]
+        assert busy.exists(), "First finished turn must not clear the marker while another runs"
+
+        release[2].set()
+        await turns[2]
+        assert not busy.exists() and bot._active_turns == 0
+
+    asyncio.run(scenario())
+    print("  ✓ Cleared only after the last turn")
+
+
+def _clock(monkeypatch) -> list:
+    """Replace bot.time with a clock the test sets by hand; returns [now]."""
+    now = [100.0]
+    monkeypatch.setattr(bot, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_streaming_edits_are_throttled(monkeypatch):
+    """The first update sends the message; later ones edit it at most once per interval"""
+    print("Testing the streaming edit throttle...")
+
+    now = _clock(monkeypatch)
+    source = _FakeMessage("hi")
+    reply = bot._StreamingReply(source, interval=1.5)
+
+    async def scenario():
+        await reply.update("Hel")
+        now[0] += 0.5
+        await reply.update("Hello")
+        now[0] += 1.0
+        await reply.update("Hello wor")
+        await reply.update("Hello world")
+        now[0] += 1.5
+        await reply.update("Hello world")
+        now[0] += 1.5
+        await reply.update("Hello world ")
+        await reply.update("  ")
+
+    asyncio.run(scenario())
+    sent, parse_mode = source.replies[0]
+    assert len(source.replies) == 1 and sent.texts[0] == "Hel" and parse_mode is None
+    assert sent.edits == [("Hello wor", None), ("Hello world", None)], \
+        "Edits within the interval, repeating the shown text or blank are skipped"
+    print("  ✓ One edit per interval")
+
+
+def test_retry_after_backs_off(monkeypatch):
+    """A RetryAfter on an interim edit holds further edits until the requested delay has passed"""
+    print("Testing the RetryAfter backoff...")
+
+    now = _clock(monkeypatch)
+    source = _FakeMessage("hi")
+    reply = bot._StreamingReply(source, interval=1.0)
+
+    async def scenario():
+        await reply.update("one")
+        sent = source.replies[0][0]
+        sent.errors.append(RetryAfter(5))
+        now[0] += 1.0
+        await reply.update("one two")
+        assert not sent.edits and not sent.errors, "The edit was attempted and refused"
+        now[0] += 2.0
+        await reply.update("one two three")
+        assert not sent.edits, "Still inside the RetryAfter window"
+        now[0] += 3.5
+        await reply.update("one two three four")
+        return sent
+
+    sent = asyncio.run(scenario())
+    assert sent.edits == [("one two three four", None)]
+    print("  ✓ Edits resume after retry_after")
+
+
+def test_finish_falls_back_to_plain_text(monkeypatch):
+    """The final Markdown edit falls back to plain text, also when it is retried after a RetryAfter"""
+    print("Testing the final edit fallback...")
+
+    slept = []
+
+    async def fake_sleep(delay):
+        slept.append(delay)
+
+    monkeypatch.setattr(bot.asyncio, "sleep", fake_sleep)
+    text = "Done: *half [bold"
+
+    async def finish(*errors):
+        source = _FakeMessage("hi")
+        reply = bot._StreamingReply(source, interval=1.0)
+        await reply.update("Done")
+        sent = source.replies[0][0]
+        sent.errors.extend(errors)
+        await reply.finish(text)
+        return sent
+
+    sent = asyncio.run(finish(BadRequest("Can't parse entities")))
+    assert sent.edits == [(text, None)]
+
+    sent = asyncio.run(finish(RetryAfter(3), BadRequest("Can't parse entities")))
+    assert slept == [3.0] and sent.edits == [(text, None)], "Retried edit must fall back too"
+
+    sent = asyncio.run(finish(RetryAfter(1)))
+    assert sent.edits == [(bot._escape_markdown(text), "Markdown")]
+
+    sent = asyncio.run(finish(BadRequest("Message is not modified")))
+    assert sent.edits == []
+    print("  ✓ Plain text when Markdown is refused")
+
+    source = _FakeMessage("hi")
+    asyncio.run(bot._StreamingReply(source, interval=1.0).finish(text))
+    assert [(s.texts, p) for s, p in source.replies] == [([bot._escape_markdown(text)], "Markdown")]
+    print("  ✓ Sent directly when nothing was streamed")
+
+
+def test_stream_events_reach_the_chat(tmp_path, monkeypatch):
+    """stream_message yields partial, status, then reply; _run_turn edits them into one message"""
+    print("Testing the stream_message event sequence...")
+
+    def chunk(content=None, tool_call=None, finish_reason=None):
+        delta = SimpleNamespace(content=content, tool_calls=[tool_call] if tool_call else None)
+        return SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=finish_reason)])
+
+    rounds = [
+        [chunk("Let me "), chunk("check."), chunk(tool_call=SimpleNamespace(
+            index=0, id="call_1", function=SimpleNamespace(name="test_stream_tool", arguments="{}"))),
+         chunk(finish_reason="tool_calls")],
+        [chunk("All "), chunk("done."), chunk(finish_reason="stop")],
+    ]
+
+    class StreamingClient:
+        async def stream(self, **kwargs):
+            for c in rounds.pop(0):
+                yield c
+
+    session = {"messages": [], "model_id": "primary", "summary": "",
+               "system_prompt": "You are a helpful assistant.", "memory_loaded": True}
+    monkeypatch.setattr(conversation, "_sessions", {USER_ID: session})
+    monkeypatch.setattr(conversation, "_save_session", lambda user_id: None)
+    monkeypatch.setattr(conversation, "_get_client_and_model", lambda uid: (StreamingClient(), "model", "ollama"))
+    tool_runner.register("test_stream_tool", lambda inp: '{"success": true}')
+    try:
+        async def collect():
+            return [(e["type"], e["text"]) async for e in conversation.stream_message("check it", USER_ID)]
+
+        events = asyncio.run(collect())
+    finally:
+        tool_runner.TOOL_REGISTRY.pop("test_stream_tool", None)
+        tool_runner._latency.pop("test_stream_tool", None)
+    assert events == [
+        ("partial", "Let me"), ("partial", "Let me check."), ("status", "Using test_stream_tool…"),
+        ("partial", "All"), ("partial", "All done."), ("reply", "All done."),
+    ]
+    print("  ✓ partial → status → partial → reply")
+
+    # The bot shows them in one message: interim edits as plain text, the reply as Markdown
+    monkeypatch.setattr(bot, "BOT_BUSY_FILE", tmp_path / "bot_busy_since")
+    monkeypatch.setattr(bot, "DELAYED_STATUS_SEC", 60)
+    monkeypatch.setattr(bot, "STREAM_EDIT_INTERVAL_SEC", 0)
+    monkeypatch.setattr(bot, "load_config", lambda: {"bot": {"stream_edit_interval": 0}})
+
+    async def replay(text, user_id):
+        for kind, event_text in events:
+            yield {"type": kind, "text": event_text}
+
+    monkeypatch.setattr(bot, "stream_message", replay)
+    batch = _batch(USER_ID, "check it")
+    asyncio.run(bot._run_turn(batch))
+    replies = batch[0].payload[0].message.replies
+    assert len(replies) == 1, "Every event after the first edits the same message"
+    sent, _ = replies[0]
+    assert sent.texts[0] == "Let me" and sent.edits == [
+        ("Let me check.", None), ("Let me check.\n\nUsing test_stream_tool…", None),
+        ("All", None), ("All done.", None), (bot._escape_markdown("All done."), "Markdown"),
+    ]
+    print("  ✓ One message, edited in place")
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Tests for the token-budgeted context window (tools/telegram/context_window.py)
+Tests: budget precedence, history trimming to budget, splitting turns for the rolling summary
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# The bot's modules import each other by bare name
+sys.path.insert(0, str(Path(__file__).parent.parent / "tools" / "telegram"))
+
+import context_window
+from context_window import fit_history, messages_tokens, split_for_summary
+
+
+def _turn(i: int, result_chars: int = 2000) -> list:
+    """One turn: question, a tool call with two results, fetched context, and the answer."""
+    calls = [{"id": f"call_{i}_{n}", "type": "function",
+              "function": {"name": "memory_search", "arguments": f'{{"query": "q{i}"}}'}} for n in range(2)]
+    return [
+        {"role": "user", "content": f"question {i}"},
+        {"role": "assistant", "content": "", "tool_calls": calls},
+        {"role": "tool", "tool_call_id": calls[0]["id"], "content": "r" * result_chars},
+        {"role": "tool", "tool_call_id": calls[1]["id"], "content": "s" * result_chars},
+        {"role": "user", "content": "[Context already fetched for this message]\n" + "c" * 400},
+        {"role": "assistant", "content": f"answer {i}"},
+    ]
+
+
+def _history(turns: int, **kwargs) -> list:
+    return [m for i in range(turns) for m in _turn(i, **kwargs)]
+
+
+def _assert_tool_results_paired(messages: list) -> None:
+    """Every tool result follows the assistant message that issued its call, with nothing but results between."""
+    pending = set()
+    for m in messages:
+        if m["role"] == "tool":
+            assert m["tool_call_id"] in pending, f"Tool result {m['tool_call_id']} separated from its tool_calls"
+            pending.discard(m["tool_call_id"])
+            continue
+        assert not pending, f"Tool calls without results: {pending}"
+        pending = {tc["id"] for tc in m.get("tool_calls") or []}
+    assert not pending, f"Tool calls without results: {pending}"
+
+
+def test_budget_precedence():
+    """context.budgets wins, then context.default_budget, then the built-in per-provider table"""
+    print("Testing budget precedence...")
+
+    config = {"context": {"budgets": {"ollama": 8000}, "default_budget": 16000}}
+    assert context_window.budget_for("ollama", config) == 8000
+    for provider in ("minimax", "openrouter", "other"):
+        assert context_window.budget_for(provider, config) == 16000, f"default_budget ignored for {provider}"
+
+    assert context_window.budget_for("minimax", {"context": {"budgets": {"ollama": 8000}}}) == 32000
+    assert context_window.budget_for("ollama", {}) == context_window.DEFAULT_BUDGETS["ollama"]
+    assert context_window.budget_for("other", {"context": None}) == context_window.DEFAULT_BUDGET
+    assert context_window.budget_for("ollama", {"context": {"default_budget": "9000"}}) == 9000
+    print("  ✓ Configured values come before built-ins")
+
+
+def test_fit_history_shrinks_stale_context_first():
+    """Older tool results and fetched context are truncated before any turn is dropped"""
+    print("Testing stale-result shrinking...")
+
+    messages = _history(3)
+    original = [dict(m) for m in messages]
+    budget = messages_tokens(messages) - 1000
+    out, stats = fit_history(messages, budget)
+
+    assert messages == original, "Input list must not be modified"
+    assert stats["dropped_messages"] == 0 and stats["truncated"] > 0
+    assert stats["tokens_after"] <= budget and stats["tokens_after"] == messages_tokens(out)
+    assert out[-6:] == messages[-6:], "Newest turn's tool results must stay whole"
+    shrunk = [m for m in out if (m.get("content") or "").endswith(context_window.TRUNCATION_MARK)]
+    assert shrunk and all(context_window.is_stale_context(m) for m in shrunk)
+    _assert_tool_results_paired(out)
+    print("  ✓ Shrinks stale results oldest first")
+
+
+@pytest.mark.parametrize("keep_turns", [0, 1, 2])
+def test_fit_history_drops_whole_turns(keep_turns):
+    """Oldest turns go whole; the newest turn is kept even when it alone is over budget"""
+    print(f"Testing turn dropping (budget for {keep_turns} turns)...")
+
+    messages = _history(5, result_chars=200)
+    if keep_turns:
+        budget = messages_tokens(messages[-6 * keep_turns:])
+    else:
+        budget = 10  # Smaller than the newest turn
+    out, stats = fit_history(messages, budget, stale_chars=10**6)
+
+    expected = max(keep_turns, 1)
+    assert out == messages[-6 * expected:], f"Expected the newest {expected} turn(s) intact"
+    assert stats["dropped_messages"] == len(messages) - len(out) and stats["truncated"] == 0
+    assert out[0] == {"role": "user", "content": f"question {5 - expected}"}
+    _assert_tool_results_paired(out)
+
+    # Orphaned results left at the head by an earlier trim go with the first turn
+    orphaned = messages[3:]
+    out, _ = fit_history(orphaned, messages_tokens(messages[-6:]), stale_chars=10**6)
+    assert out == messages[-6:]
+    _assert_tool_results_paired(out)
+    print("  ✓ Whole turns dropped, newest kept")
+
+
+def test_split_for_summary():
+    """The fold/keep split is at a turn start, keeps at least the newest turn and never splits a tool call"""
+    print("Testing split for the rolling summary...")
+
+    messages = _history(4, result_chars=200)
+    turn_tokens = messages_tokens(messages[-6:])
+
+    for keep_tokens, kept_turns in ((0, 1), (turn_tokens, 1), (2 * turn_tokens, 2), (10**6, 3)):
+        folded, kept = split_for_summary(messages, keep_tokens)
+        assert folded + kept == messages
+        assert len(kept) == 6 * kept_turns, f"keep_tokens={keep_tokens}: kept {len(kept)} messages"
+        assert kept[0]["role"] == "user" and not context_window.is_stale_context(kept[0])
+        assert folded, "The oldest turn is always folded when there is more than one turn"
+        _assert_tool_results_paired(folded)
+        _assert_tool_results_paired(kept)
+
+    single = _turn(0)
+    assert split_for_summary(single, 0) == ([], single), "A single turn has nothing to fold"
+    assert split_for_summary([], 0) == ([], [])
+    print("  ✓ Split at turn boundaries")
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Tests for the batched embedding pipeline (memory/embed_memory.py)
+Tests: content-hash dedupe, one-by-one retry after a rejected batch, reindex
+checkpoint resume; driven against embedding_stub_server.py
+"""
+
+import sys
+import threading
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+# The memory modules import each other by bare name
+sys.path.insert(0, str(Path(__file__).parent.parent / "memory"))
+
+pytest.importorskip("dotenv")
+pytest.importorskip("openai")
+
+import embed_memory
+import memory_db
+from embedding_stub_server import StubHandler, stub_embedding
+
+DIM = 32
+
+
+@contextmanager
+def _stub_server(max_chars: int = 0):
+    """Run embedding_stub_server in a thread; yields (provider, stats)."""
+    handler = type("Handler", (StubHandler,), {"dim": DIM, "max_chars": max_chars,
+                                               "stats": {"requests": 0, "inputs": 0}})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        client = embed_memory.get_openai_client(base_url=f"http://127.0.0.1:{server.server_port}/v1")
+        client = client.with_options(max_retries=0)
+        yield embed_memory.OpenAIEmbeddingProvider(client), handler.stats
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _add(contents: list) -> list:
+    return [r["id"] for r in memory_db.add_entries_bulk([{"content": c} for c in contents])["results"]]
+
+
+def _stored(entry_id: int):
+    conn = memory_db.get_connection()
+    row = conn.execute("SELECT embedding, embedding_model FROM memory_entries WHERE id = ?", (entry_id,)).fetchone()
+    conn.close()
+    return row["embedding"], row["embedding_model"]
+
+
+def test_dedupe_by_content_hash(memory_store):
+    """Entries with the same content hash are embedded once and all stored"""
+    print("Testing content-hash dedupe...")
+
+    ids = _add(["Coffee beans order", "Dentist on Thursday", "Garage code changed"])
+    entries = [
+        {"id": ids[0], "content": "Coffee beans order"},
+        {"id": ids[1], "content": "Dentist on Thursday"},
+        # Same normalized text as the first entry (what content_hash dedupes)
+        {"id": ids[2], "content": "  coffee BEANS order"},
+        {"id": ids[0], "content": "Coffee beans order"},
+    ]
+    with _stub_server() as (provider, stats):
+        result = embed_memory.embed_entries_batched(entries, provider=provider, request_size=2)
+
+    assert result["success"] and result["unique_texts"] == 2, result
+    assert stats["inputs"] == 2 and stats["requests"] == 1, f"Duplicates were sent to the API: {stats}"
+    assert result["processed"] == 4 and result["failed"] == 0
+    assert _stored(ids[0]) == _stored(ids[2]), "Deduped entries should share one embedding"
+    blob, model = _stored(ids[1])
+    assert model == provider.model and embed_memory.bytes_to_embedding(blob) == pytest.approx(
+        stub_embedding("Dentist on Thursday", DIM), abs=1e-6)
+    print("  ✓ One embedding per distinct content")
+
+
+def test_rejected_batch_retried_one_by_one(memory_store):
+    """A batch rejected for one bad input is retried per text; only that entry fails"""
+    print("Testing retry after a rejected batch...")
+
+    too_long = "overflow " * 40
+    ids = _add(["short one", too_long, "short two", "short three"])
+    entries = [{"id": i, "content": c} for i, c in zip(ids, ["short one", too_long, "short two", "short three"])]
+    with _stub_server(max_chars=100) as (provider, stats):
+        result = embed_memory.embed_entries_batched(entries, provider=provider, request_size=2, concurrency=1)
+
+    assert result["success"], result
+    assert result["processed"] == 3 and result["failed"] == 1, result
+    failed = [e for e in result["entries"] if not e["success"]]
+    assert [e["id"] for e in failed] == [ids[1]] and "longer than" in failed[0]["error"]
+    # Batch [0, 1] rejected then retried as two singles; batch [2, 3] succeeds first time
+    assert result["requests"] == 4 and stats["rejected"] == 2, (result["requests"], stats)
+    assert _stored(ids[1]) == (None, None), "Rejected entry should stay unembedded"
+    assert all(_stored(i)[0] for i in (ids[0], ids[2], ids[3]))
+    print("  ✓ Only the bad input fails")
+
+
+class _Interrupted(Exception):
+    pass
+
+
+class _FailAfter:
+    """Provider wrapper that dies after a number of successful embed calls."""
+
+    local = False
+
+    def __init__(self, provider, calls: int):
+        self._provider = provider
+        self.model = provider.model
+        self.calls = calls
+
+    def embed(self, texts):
+        if self.calls == 0:
+            raise _Interrupted()
+        self.calls -= 1
+        return self._provider.embed(texts)
+
+
+def test_reindex_resumes_from_checkpoint(memory_store):
+    """An interrupted reindex resumes after the last checkpointed batch"""
+    print("Testing reindex checkpoint resume...")
+
+    ids = _add([f"memory note {i}" for i in range(7)])
+    memory_db.delete_entry(ids[6])
+    with _stub_server() as (provider, stats):
+        with pytest.raises(_Interrupted):
+            embed_memory.reindex_all(batch_size=2, provider=_FailAfter(provider, 2))
+        checkpoint = embed_memory._load_checkpoint()
+        assert checkpoint["last_id"] == ids[3] and checkpoint["processed"] == 4, checkpoint
+        assert stats["inputs"] == 4
+
+        result = embed_memory.reindex_all(batch_size=2, provider=provider)
+
+    assert result["success"] and result["resumed_from_id"] == ids[3], result
+    assert stats["inputs"] == 6, f"Checkpointed entries were re-embedded: {stats}"
+    assert result["processed"] == 6 and result["model"] == provider.model
+    assert not embed_memory.REINDEX_CHECKPOINT_PATH.exists(), "Checkpoint should be removed when done"
+    assert all(_stored(i)[1] == provider.model for i in ids[:6])
+    assert _stored(ids[6]) == (None, None), "Inactive entries keep no embedding"
+
+    # A checkpoint from another model is ignored
+    embed_memory._save_checkpoint({**checkpoint, "model": "other-model"})
+    with _stub_server() as (provider, stats):
+        result = embed_memory.reindex_all(batch_size=2, provider=provider)
+    assert result["resumed_from_id"] is None and stats["inputs"] == 6
+    print("  ✓ Resume skips finished batches")
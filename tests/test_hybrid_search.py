@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Tests for hybrid keyword + semantic search (memory/hybrid_search.py)
+Tests: weighted and RRF fusion over the shared candidate set, pre-filters in both stages
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# The memory modules import each other by bare name
+sys.path.insert(0, str(Path(__file__).parent.parent / "memory"))
+
+pytest.importorskip("dotenv")
+
+import embed_memory
+import hybrid_search
+import memory_db
+import semantic_search
+
+ENTRIES = [
+    # (content, type, importance, age_days)
+    ("Printer filament: PETG for outdoor parts, PLA for prototypes", "fact", 8, 1),
+    ("Filament dryer runs at 65C for four hours before printing", "fact", 7, 2),
+    ("Bought filament spools in black and white", "event", 8, 3),
+    ("The 3D printer nozzle was swapped for a hardened steel one", "fact", 9, 4),
+    ("Old filament brand preference from last year", "preference", 9, 200),
+    ("Printer filament tangles when the spool is wound loosely", "fact", 3, 5),
+    ("Weekly grocery list: eggs, spinach, coffee", "fact", 5, 1),
+    ("Dentist appointment moved to Thursday morning", "event", 6, 1),
+    ("Filament printer filament storage: sealed boxes with desiccant", "fact", 8, 60),
+    ("Bed adhesion improved with a textured PEI sheet on the printer", "insight", 7, 6),
+]
+
+
+@pytest.fixture
+def entries(memory_store) -> dict:
+    """ENTRIES added, aged and embedded with the local provider; {entry_id: entry}."""
+    rows = [{"content": c, "type": t, "importance": i} for c, t, i, _ in ENTRIES]
+    ids = [r["id"] for r in memory_db.add_entries_bulk(rows)["results"]]
+    conn = memory_db.get_connection()
+    conn.executemany("UPDATE memory_entries SET created_at = datetime('now', ?) WHERE id = ?",
+                     [(f"-{age} days", entry_id) for (_, _, _, age), entry_id in zip(ENTRIES, ids)])
+    conn.commit()
+    conn.close()
+
+    result = embed_memory.embed_entries_batched([{"id": i, "content": e[0]} for i, e in zip(ids, ENTRIES)],
+                                                provider="local")
+    assert result["processed"] == len(ENTRIES)
+    return {entry_id: entry for entry_id, entry in zip(ids, ENTRIES)}
+
+
+def _cosine(query: str, content: str) -> float:
+    provider = embed_memory.get_embedding_provider("local")
+    q = embed_memory.generate_embedding(query, provider=provider)["embedding"]
+    d = embed_memory.generate_embedding(content, provider=provider)["embedding"]
+    return semantic_search.cosine_similarity(q, d)
+
+
+def _has_term(content: str, query: str) -> bool:
+    return bool(set(hybrid_search.tokenize(query)) & set(hybrid_search.tokenize(content)))
+
+
+def test_weighted_fusion_scores_shared_candidates(entries):
+    """Every candidate carries both its keyword and semantic score, blended by weight"""
+    print("Testing weighted fusion over the shared candidate set...")
+
+    query = "printer filament"
+    result = hybrid_search.hybrid_search(query, limit=3, min_score=0)
+    assert result["success"] and result["results"], result
+
+    for r in result["results"]:
+        content = entries[r["id"]][0]
+        # Keyword hits get a semantic score and vector hits a keyword score, whichever stage found them
+        assert (r["bm25_score"] is not None) == _has_term(content, query), r
+        expected = _cosine(query, content)
+        if expected >= hybrid_search.SEMANTIC_THRESHOLD:
+            assert r["semantic_score"] == pytest.approx(expected, abs=1e-3), r
+        assert r["score"] == pytest.approx(0.7 * (r["bm25_score"] or 0) + 0.3 * (r["semantic_score"] or 0),
+                                           abs=2e-4), r
+    scores = [r["score"] for r in result["results"]]
+    assert scores == sorted(scores, reverse=True)
+    print("  ✓ Weighted blend uses both scores for every candidate")
+
+
+def test_rrf_fusion_ranks_shared_candidates(entries):
+    """RRF combines each candidate's rank in both stages"""
+    print("Testing RRF fusion over the shared candidate set...")
+
+    weighted = hybrid_search.hybrid_search("printer filament", limit=10, min_score=0)
+    rrf = hybrid_search.hybrid_search("printer filament", limit=10, min_score=0, fusion="rrf")
+    assert rrf["fusion"] == "rrf" and rrf["total_candidates"] == weighted["total_candidates"]
+    assert {r["id"] for r in rrf["results"]} == {r["id"] for r in weighted["results"]}, \
+        "Both fusions should rank the same candidates"
+
+    by_bm25 = sorted((r for r in rrf["results"] if r["bm25_score"]), key=lambda r: -r["bm25_score"])
+    by_sem = sorted((r for r in rrf["results"] if r["semantic_score"]), key=lambda r: -r["semantic_score"])
+    bm25_rank = {r["id"]: i for i, r in enumerate(by_bm25, 1)}
+    sem_rank = {r["id"]: i for i, r in enumerate(by_sem, 1)}
+    best = 1.0 / (hybrid_search.RRF_K + 1)
+    for r in rrf["results"]:
+        expected = 0.0
+        if r["id"] in bm25_rank:
+            expected += 0.7 / (hybrid_search.RRF_K + bm25_rank[r["id"]])
+        if r["id"] in sem_rank:
+            expected += 0.3 / (hybrid_search.RRF_K + sem_rank[r["id"]])
+        assert r["score"] == pytest.approx(expected / best, abs=2e-4), r
+    assert hybrid_search.hybrid_search("x", fusion="bogus")["success"] is False
+    print("  ✓ RRF scores follow ranks in both stages")
+
+
+@pytest.mark.parametrize("mode", ["hybrid", "keyword_only", "semantic_only"])
+@pytest.mark.parametrize("fusion", ["weighted", "rrf"])
+def test_filters_apply_to_both_stages(entries, mode, fusion):
+    """Type, importance and age filters exclude entries from keyword and vector candidates"""
+    print(f"Testing pre-filters ({mode}, {fusion})...")
+
+    result = hybrid_search.hybrid_search(
+        "printer filament", entry_type="fact", min_importance=7, max_age_days=30, limit=10, min_score=0,
+        keyword_only=mode == "keyword_only", semantic_only=mode == "semantic_only", fusion=fusion
+    )
+    assert result["success"] and result["results"], result
+    allowed = {i for i, (_, t, imp, age) in entries.items() if t == "fact" and imp >= 7 and age <= 30}
+    returned = {r["id"] for r in result["results"]}
+    assert returned <= allowed, f"Filtered-out entries returned: {returned - allowed}"
+    if mode != "semantic_only":
+        assert returned == {i for i in allowed if _has_term(entries[i][0], "printer filament")}
+
+    # Type filter alone (no importance/age) takes the unfiltered vector path
+    typed = hybrid_search.hybrid_search("printer filament", entry_type="event", limit=10, min_score=0,
+                                        keyword_only=mode == "keyword_only",
+                                        semantic_only=mode == "semantic_only", fusion=fusion)
+    assert {entries[r["id"]][1] for r in typed["results"]} <= {"event"}, typed["results"]
+    print("  ✓ Filters hold in both stages")
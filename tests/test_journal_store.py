@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Tests for the date-indexed journal store (tools/briefings/journal_store.py)
+Tests: incremental appends at record boundaries, full re-ingest
+"""
+
+import csv
+import sys
+import tempfile
+from pathlib import Path
+
+# Add parent to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tools.briefings import journal_store
+
+HEADER = "Date,Time,Entry Text,Mood Rating\n"
+
+
+def _store_matches_csv(csv_path: Path, db_path: Path) -> bool:
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        expected = list(csv.DictReader(f))
+    return journal_store.read_all(csv_path, db_path=db_path) == expected
+
+
+def _append(path: Path, text: str):
+    with open(path, "a", encoding="utf-8", newline="") as f:
+        f.write(text)
+
+
+def test_append_after_unterminated_row():
+    """A last row without a trailing newline is re-parsed when the file grows"""
+    print("Testing append after a row without trailing newline...")
+
+    tmp = Path(tempfile.mkdtemp())
+    csv_path, db_path = tmp / "journal.csv", tmp / "journal.db"
+    csv_path.write_text(HEADER + "2026-02-01,08:00:00,first,4\n2026-02-01,09:00:00,a", encoding="utf-8")
+
+    assert journal_store.sync(csv_path, db_path)["mode"] == "full"
+    assert _store_matches_csv(csv_path, db_path), "Initial ingest differs from csv.DictReader"
+
+    _append(csv_path, "bc,5\n2026-02-02,08:00:00,second,3\n")
+    result = journal_store.sync(csv_path, db_path)
+    assert result["mode"] == "appended", "Growth with unchanged prefix should be incremental"
+    assert result["rows"] == 3, "Truncated row should be replaced, not kept alongside a garbage row"
+    assert _store_matches_csv(csv_path, db_path), "Store differs from csv.DictReader after append"
+    rows = journal_store.read_range(csv_path, "2026-02-01", "2026-02-01", db_path=db_path)
+    assert [r["Entry Text"] for r in rows] == ["first", "abc"], "Completed row not re-parsed whole"
+    print("  ✓ Unterminated last row is re-parsed on append")
+
+
+def test_append_during_multiline_entry():
+    """A sync that lands mid-write of a quoted multi-line entry doesn't leave a broken row"""
+    print("Testing sync mid-write of a quoted multi-line entry...")
+
+    tmp = Path(tempfile.mkdtemp())
+    csv_path, db_path = tmp / "journal.csv", tmp / "journal.db"
+    csv_path.write_text(HEADER + '2026-02-01,08:00:00,first,4\n2026-02-02,08:00:00,"line one\n', encoding="utf-8")
+    journal_store.sync(csv_path, db_path)
+
+    _append(csv_path, 'line two, with comma\nline three",5\n2026-02-03,08:00:00,third,2\n')
+    result = journal_store.sync(csv_path, db_path)
+    assert result["mode"] == "appended", "Growth with unchanged prefix should be incremental"
+    assert _store_matches_csv(csv_path, db_path), "Store differs from csv.DictReader after append"
+    rows = journal_store.read_range(csv_path, "2026-02-02", "2026-02-03", db_path=db_path)
+    assert rows[0]["Entry Text"] == "line one\nline two, with comma\nline three", "Multi-line entry broken"
+    assert rows[0]["Mood Rating"] == "5" and rows[1]["Entry Text"] == "third", "Rows after the entry wrong"
+    print("  ✓ Partially written multi-line entry is re-parsed whole")
+
+
+def test_rewrite_reingests():
+    """A rewritten file (changed prefix) is re-ingested in full"""
+    print("Testing full re-ingest after a rewrite...")
+
+    tmp = Path(tempfile.mkdtemp())
+    csv_path, db_path = tmp / "journal.csv", tmp / "journal.db"
+    csv_path.write_text(HEADER + "2026-02-01,08:00:00,first,4\n", encoding="utf-8")
+    journal_store.sync(csv_path, db_path)
+
+    csv_path.write_text(HEADER + "2026-02-01,08:00:00,edited,4\n2026-02-02,08:00:00,second,3\n", encoding="utf-8")
+    assert journal_store.sync(csv_path, db_path)["mode"] == "full", "Changed prefix should trigger a full ingest"
+    assert _store_matches_csv(csv_path, db_path), "Store differs from csv.DictReader after rewrite"
+    assert journal_store.sync(csv_path, db_path)["mode"] == "unchanged", "Unchanged file should not be re-read"
+    print("  ✓ Rewrite triggers full re-ingest")
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Tests for the async LLM provider layer (tools/telegram/llm.py)
+Tests: per-provider concurrency limit and in-flight count, request timeout, timeout
+while waiting for a slot, stalled stream, slots released after every outcome
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# The bot's modules import each other by bare name
+sys.path.insert(0, str(Path(__file__).parent.parent / "tools" / "telegram"))
+
+pytest.importorskip("openai")
+
+import llm
+
+
+class _FakeCompletions:
+    """chat.completions stand-in: create() waits for `release`, or for `delay` seconds when set."""
+
+    def __init__(self, delay: float | None = None, chunk_gaps=()):
+        self.delay = delay
+        self.chunk_gaps = list(chunk_gaps)
+        self.release = asyncio.Event()
+        self.started = 0
+
+    async def create(self, **kwargs):
+        self.started += 1
+        if self.delay is not None:
+            await asyncio.sleep(self.delay)
+        else:
+            await self.release.wait()
+        if kwargs.get("stream"):
+            return _FakeStream(self.chunk_gaps)
+        return SimpleNamespace(model=kwargs["model"])
+
+
+class _FakeStream:
+    """Streaming response: yields one chunk after each gap (seconds)."""
+
+    def __init__(self, gaps):
+        self.gaps = list(gaps)
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.gaps:
+            raise StopAsyncIteration
+        await asyncio.sleep(self.gaps.pop(0))
+        return SimpleNamespace(choices=[])
+
+    async def close(self):
+        self.closed = True
+
+
+def _provider(completions: _FakeCompletions, concurrency: int = 2, timeout: float = 5.0) -> llm.Provider:
+    return llm.Provider(
+        name="test", model="test-model", client=SimpleNamespace(chat=SimpleNamespace(completions=completions)),
+        timeout=timeout, concurrency=concurrency, semaphore=asyncio.Semaphore(concurrency),
+    )
+
+
+def test_concurrency_limit_and_in_flight():
+    """No more than `concurrency` requests run at once; in_flight() counts those holding a slot"""
+    print("Testing the concurrency limit...")
+
+    async def scenario():
+        completions = _FakeCompletions()
+        provider = _provider(completions, concurrency=2)
+        tasks = [asyncio.create_task(provider.complete(messages=[])) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        assert completions.started == 2 and provider.in_flight() == 2, "Third request should wait for a slot"
+
+        completions.release.set()
+        results = await asyncio.gather(*tasks)
+        assert completions.started == 3 and provider.in_flight() == 0
+        assert all(r.model == "test-model" for r in results), "Provider model is the default"
+
+        # A stream holds its slot until the last chunk has been read
+        completions.chunk_gaps = [0, 0]
+        seen = []
+        async for _ in provider.stream(messages=[]):
+            seen.append(provider.in_flight())
+        assert seen == [1, 1] and provider.in_flight() == 0
+
+    asyncio.run(scenario())
+    print("  ✓ Limit enforced, in-flight count back to zero")
+
+
+def test_request_timeout():
+    """A slow completion raises ProviderTimeout and frees its slot"""
+    print("Testing the request timeout...")
+
+    async def scenario():
+        provider = _provider(_FakeCompletions(delay=1.0), concurrency=1, timeout=0.05)
+        with pytest.raises(llm.ProviderTimeout, match="did not respond"):
+            await provider.complete(messages=[])
+        assert provider.in_flight() == 0 and not provider.semaphore.locked()
+
+    asyncio.run(scenario())
+    print("  ✓ Timed out and released")
+
+
+def test_timeout_covers_waiting_for_a_slot():
+    """With every slot busy, complete() and stream() time out instead of queueing forever"""
+    print("Testing the timeout while waiting for a slot...")
+
+    async def scenario():
+        completions = _FakeCompletions()
+        provider = _provider(completions, concurrency=1)
+        holder = asyncio.create_task(provider.complete(messages=[]))
+        await asyncio.sleep(0.01)
+        provider.timeout = 0.05  # For the requests that follow; the holder keeps its 5s
+
+        with pytest.raises(llm.ProviderTimeout, match="did not respond"):
+            await provider.complete(messages=[])
+        with pytest.raises(llm.ProviderTimeout, match="no free slot"):
+            async for _ in provider.stream(messages=[]):
+                pass
+        assert completions.started == 1 and provider.in_flight() == 1
+
+        completions.release.set()
+        await holder
+        assert provider.in_flight() == 0
+
+    asyncio.run(scenario())
+    print("  ✓ Slot waits are bounded")
+
+
+def test_stalled_stream_times_out():
+    """The stream timeout applies to each gap between chunks, not the whole reply"""
+    print("Testing the stalled stream timeout...")
+
+    async def scenario():
+        # Four chunks 0.03s apart: longer than the timeout in total, but never stalled
+        provider = _provider(_FakeCompletions(delay=0, chunk_gaps=[0.03] * 4), timeout=0.1)
+        assert len([c async for c in provider.stream(messages=[])]) == 4
+
+        provider = _provider(_FakeCompletions(delay=0, chunk_gaps=[0, 1.0]), concurrency=1, timeout=0.1)
+        received = []
+        with pytest.raises(llm.ProviderTimeout, match="stalled"):
+            async for chunk in provider.stream(messages=[]):
+                received.append(chunk)
+        assert len(received) == 1 and provider.in_flight() == 0 and not provider.semaphore.locked()
+
+    asyncio.run(scenario())
+    print("  ✓ Stall detected, slot released")
@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+Tests for the memory database (memory/memory_db.py)
+Tests: FTS5 index kept in sync by triggers, backfill of an existing database,
+chunked candidate lists, user_version migrations, pooled connections,
+access log flushing and compaction, bulk add/upsert and JSONL import
+"""
+
+import io
+import json
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# The memory modules import each other by bare name
+sys.path.insert(0, str(Path(__file__).parent.parent / "memory"))
+
+import memory_db
+
+# memory_entries as created before the schema was versioned (user_version 0)
+LEGACY_SCHEMA = """
+CREATE TABLE memory_entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL CHECK(type IN ('fact', 'preference', 'event', 'insight', 'task', 'relationship')),
+    content TEXT NOT NULL,
+    content_hash TEXT UNIQUE,
+    source TEXT DEFAULT 'session' CHECK(source IN ('user', 'inferred', 'session', 'external', 'system')),
+    confidence REAL DEFAULT 1.0,
+    importance INTEGER DEFAULT 5 CHECK(importance BETWEEN 1 AND 10),
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    last_accessed DATETIME,
+    access_count INTEGER DEFAULT 0,
+    embedding BLOB,
+    embedding_model TEXT,
+    tags TEXT,
+    context TEXT,
+    expires_at DATETIME,
+    is_active INTEGER DEFAULT 1
+);
+CREATE TABLE memory_access_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    memory_id INTEGER,
+    access_type TEXT CHECK(access_type IN ('read', 'search', 'update', 'reference')),
+    query TEXT,
+    accessed_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    session_id TEXT,
+    FOREIGN KEY (memory_id) REFERENCES memory_entries(id)
+);
+"""
+
+
+def _legacy_db(contents: list, user_version: int = 0) -> Path:
+    """A database written by an older version: no FTS index, access tables or user_version."""
+    path = memory_db.DB_PATH
+    with sqlite3.connect(path) as conn:
+        conn.executescript(LEGACY_SCHEMA)
+        conn.executemany(
+            "INSERT INTO memory_entries (type, content, content_hash, is_active) VALUES ('fact', ?, ?, ?)",
+            [(content, memory_db.compute_content_hash(content), active) for content, active in contents]
+        )
+        conn.execute(f"PRAGMA user_version = {user_version}")
+    return path
+
+
+def _fts_ids(*terms: str) -> list:
+    result = memory_db.fts_search(list(terms))
+    assert result["success"], result
+    return sorted(e["id"] for e in result["entries"])
+
+
+def _indexed_rowids(term: str) -> list:
+    """Rowids in the FTS index itself (fts_search also filters on is_active)."""
+    conn = memory_db.get_connection()
+    rows = conn.execute("SELECT rowid FROM memory_fts WHERE memory_fts MATCH ? ORDER BY rowid", (term,)).fetchall()
+    conn.close()
+    return [r[0] for r in rows]
+
+
+def test_fts_tracks_writes(memory_store):
+    """add, update, soft delete, reactivate and hard delete keep memory_fts in sync"""
+    print("Testing FTS index sync on writes...")
+
+    memory_db.get_connection()
+    if not memory_db.HAS_FTS5:
+        pytest.skip("SQLite built without FTS5")
+
+    first = memory_db.add_entry("The printer uses PETG filament")["entry"]["id"]
+    second = memory_db.add_entry("Dentist appointment on Tuesday")["entry"]["id"]
+    bulk = memory_db.add_entries_bulk([{"content": "Spare filament is in the garage"}])["results"][0]["id"]
+    assert _fts_ids("filament") == [first, bulk], "Inserted entries not indexed"
+
+    memory_db.update_entry(first, content="The printer uses PLA plastic")
+    assert _fts_ids("filament") == [bulk], "Old content still indexed after update"
+    assert _fts_ids("plastic") == [first], "New content not indexed after update"
+
+    memory_db.delete_entry(second)
+    assert _indexed_rowids("dentist") == [], "Soft-deleted entry still in the index"
+    memory_db.update_entry(second, is_active=1)
+    assert _fts_ids("dentist") == [second], "Reactivated entry not re-indexed"
+
+    memory_db.update_entry(second, importance=9)
+    assert _indexed_rowids("dentist") == [second], "Non-content update should leave one index row"
+
+    memory_db.delete_entry(bulk, soft_delete=False)
+    assert _indexed_rowids("filament") == [], "Hard-deleted entry still in the index"
+
+    conn = memory_db.get_connection()
+    conn.execute("INSERT INTO memory_fts(memory_fts) VALUES ('integrity-check')")
+    conn.close()
+    print("  ✓ Triggers keep the index in sync")
+
+
+def test_fts_backfills_existing_db(memory_store):
+    """Creating memory_fts on an existing database indexes the active rows already there"""
+    print("Testing FTS backfill of an existing database...")
+
+    _legacy_db([("Garage door code changed", 1), ("Old garage remote", 0), ("Coffee beans order", 1)])
+    memory_db.get_connection()
+    if not memory_db.HAS_FTS5:
+        pytest.skip("SQLite built without FTS5")
+
+    assert _indexed_rowids("garage") == [1], "Active rows not backfilled (or inactive rows indexed)"
+    assert _fts_ids("coffee") == [3]
+    memory_db.update_entry(1, content="Garage door code changed again")
+    assert _fts_ids("garage") == [1], "Backfilled row not kept in sync"
+    print("  ✓ Existing rows backfilled once")
+
+
+def test_fts_search_chunks_candidate_ids(memory_store):
+    """A candidate list longer than SQLite's variable limit is searched in chunks"""
+    print("Testing chunked candidate IDs...")
+
+    rows = [{"content": f"note {i} " + "filament " * (1 + i % 7)} for i in range(2500)]
+    ids = [r["id"] for r in memory_db.add_entries_bulk(rows)["results"]]
+    if not memory_db.HAS_FTS5:
+        pytest.skip("SQLite built without FTS5")
+
+    expected = memory_db.fts_search(["filament"], limit=20)
+    chunked = memory_db.fts_search(["filament"], limit=20, entry_ids=list(reversed(ids)))
+    assert chunked["success"], chunked.get("error")
+    assert [e["bm25"] for e in chunked["entries"]] == [e["bm25"] for e in expected["entries"]], \
+        "Merged chunks should rank like an unrestricted search"
+
+    subset = ids[::3]
+    restricted = memory_db.fts_search(["filament"], limit=len(subset), entry_ids=subset)
+    assert sorted(e["id"] for e in restricted["entries"]) == sorted(subset)
+    assert memory_db.fts_search(["filament"], entry_ids=[])["entries"] == []
+    print("  ✓ Chunked search returns the global top results")
+
+
+def _tables() -> set:
+    conn = memory_db.get_connection()
+    rows = conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')").fetchall()
+    conn.close()
+    return {r[0] for r in rows}
+
+
+@pytest.mark.parametrize("user_version", [0, 1])
+def test_migrate_old_database(memory_store, monkeypatch, user_version):
+    """A v0/v1 database is upgraded once, keeping its rows"""
+    print(f"Testing migration from user_version {user_version}...")
+
+    path = _legacy_db([("Kept across the upgrade", 1)], user_version=user_version)
+    conn = memory_db.get_connection()
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == memory_db.SCHEMA_VERSION
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    conn.close()
+    assert {"memory_access_daily", "query_embeddings", "daily_logs"} <= _tables(), "Missing tables after migration"
+    assert memory_db.get_entry(1)["entry"]["content"] == "Kept across the upgrade"
+
+    # Later processes see the current user_version and skip _create_schema entirely
+    memory_db.close_connections()
+    memory_db._schema_ready.discard(str(path))
+    monkeypatch.setattr(memory_db, "_create_schema",
+                        lambda cursor: (_ for _ in ()).throw(AssertionError("schema re-created")))
+    memory_db.get_connection()
+    assert memory_db.get_entry(1)["success"]
+    print("  ✓ Migrated once, then skipped")
+
+
+def test_pooled_close_rolls_back(memory_store):
+    """close() discards uncommitted work but keeps the thread's connection open"""
+    print("Testing pooled connection close()...")
+
+    conn = memory_db.get_connection()
+    conn.execute("INSERT INTO memory_entries (type, content, content_hash) VALUES ('fact', 'uncommitted', 'h1')")
+    assert conn.in_transaction
+    conn.close()
+    assert not conn.in_transaction, "close() should end the transaction"
+
+    again = memory_db.get_connection()
+    assert again is conn, "The same thread should get its pooled connection back"
+    assert again.execute("SELECT COUNT(*) FROM memory_entries").fetchone()[0] == 0, "close() committed"
+    assert memory_db.add_entry("committed")["success"]
+    again.close()
+    again.close()  # Closing twice (as existing callers may) is harmless
+    assert memory_db.list_entries()["total"] == 1
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(memory_db.get_connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn, "Each thread gets its own connection"
+
+    memory_db.close_connections()
+    fresh = memory_db.get_connection()
+    assert fresh is not conn and fresh.execute("SELECT COUNT(*) FROM memory_entries").fetchone()[0] == 1
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+    print("  ✓ close() rolls back; dispose() really closes")
+
+
+def _access_rows() -> list:
+    conn = memory_db.get_connection()
+    rows = conn.execute("SELECT memory_id, access_type FROM memory_access_log ORDER BY id").fetchall()
+    conn.close()
+    return [tuple(r) for r in rows]
+
+
+@pytest.fixture
+def access_ids(memory_store) -> list:
+    """IDs of three entries in a fresh database with nothing in the access log."""
+    return [memory_db.add_entry(f"access log entry {i}")["entry"]["id"] for i in range(3)]
+
+
+def test_access_log_flush_triggers(access_ids, monkeypatch):
+    """Buffered events are written at ACCESS_FLUSH_SIZE, after ACCESS_FLUSH_SECONDS, and at exit"""
+    print("Testing access log flush triggers...")
+
+    ids = access_ids
+    monkeypatch.setattr(memory_db, "ACCESS_FLUSH_SIZE", 3)
+    monkeypatch.setattr(memory_db, "ACCESS_FLUSH_SECONDS", 60)
+    memory_db.record_access(ids[0], "read")
+    memory_db.record_access(ids[0], "read")
+    assert _access_rows() == [], "Events below the size threshold should stay buffered"
+    memory_db.record_access(ids[1], "search", "query")
+    assert _access_rows() == [(ids[0], "read"), (ids[0], "read"), (ids[1], "search")]
+    assert memory_db._access_timer is None, "A size flush should cancel the pending timer"
+
+    monkeypatch.setattr(memory_db, "ACCESS_FLUSH_SECONDS", 0.05)
+    memory_db.record_access(ids[2], "update")
+    deadline = time.monotonic() + 5
+    while len(_access_rows()) < 4 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert _access_rows()[-1] == (ids[2], "update"), "Timer should flush a lone event"
+    assert memory_db._access_buffer == []
+
+    conn = memory_db.get_connection()
+    entry = conn.execute("SELECT access_count, last_accessed FROM memory_entries WHERE id = ?", (ids[0],)).fetchone()
+    conn.close()
+    assert entry["access_count"] == 2 and entry["last_accessed"], "Reads should bump access_count once flushed"
+
+    # A process that exits with events still buffered writes them from the atexit hook
+    script = (
+        "import sys; from pathlib import Path; sys.path.insert(0, sys.argv[1]); import memory_db; "
+        "memory_db.DB_PATH = Path(sys.argv[2]); memory_db.ACCESS_FLUSH_SECONDS = 60; "
+        "memory_db.record_access(int(sys.argv[3]), 'reference')"
+    )
+    memory_dir = str(Path(__file__).parent.parent / "memory")
+    subprocess.run([sys.executable, "-c", script, memory_dir, str(memory_db.DB_PATH), str(ids[1])], check=True)
+    assert _access_rows()[-1] == (ids[1], "reference"), "atexit should flush the buffer"
+    print("  ✓ Size, timer and exit flushes")
+
+
+def test_access_log_skips_deleted_entries(access_ids):
+    """Events still buffered for a hard-deleted entry never reach the log tables"""
+    print("Testing access events for deleted entries...")
+
+    ids = access_ids
+    for entry_id in ids:
+        memory_db.record_access(entry_id, "read")
+        memory_db.record_access(entry_id, "search", "query")
+    assert memory_db.delete_entry(ids[0], soft_delete=False)["success"]
+    assert [e[0] for e in memory_db._access_buffer] == [ids[1], ids[1], ids[2], ids[2]], \
+        "Deleted entry's events should leave the buffer"
+
+    # Deleted behind this process's back: the flush itself skips the missing entry
+    with sqlite3.connect(memory_db.DB_PATH) as other:
+        other.execute("DELETE FROM memory_entries WHERE id = ?", (ids[1],))
+    assert memory_db.flush_access_log() == 2, "Only the surviving entry's events should be written"
+    assert _access_rows() == [(ids[2], "read"), (ids[2], "search")]
+
+    # Soft deletes keep their history
+    memory_db.record_access(ids[2], "read")
+    memory_db.delete_entry(ids[2])
+    assert memory_db.flush_access_log() == 1
+    conn = memory_db.get_connection()
+    orphans = conn.execute(
+        "SELECT COUNT(*) FROM memory_access_log WHERE memory_id NOT IN (SELECT id FROM memory_entries)"
+    ).fetchone()[0]
+    conn.close()
+    assert orphans == 0
+    print("  ✓ No orphan access rows")
+
+
+def test_compact_access_log(access_ids):
+    """Raw rows older than the cutoff become per-day counts; re-running adds to them"""
+    print("Testing access log compaction...")
+
+    ids = access_ids
+    conn = memory_db.get_connection()
+
+    def log(entry_id, access_type, when):
+        conn.execute("INSERT INTO memory_access_log (memory_id, access_type, accessed_at) "
+                     "VALUES (?, ?, datetime('now', ?))", (entry_id, access_type, when))
+        conn.commit()
+
+    for when in ("-40 days", "-40 days", "-35 days"):
+        log(ids[0], "read", when)
+    log(ids[0], "search", "-40 days")
+    log(ids[1], "read", "-1 days")
+    memory_db.record_access(ids[1], "read")  # Buffered; compaction flushes it first
+
+    result = memory_db.compact_access_log(30)
+    assert result["success"] and result["removed"] == 4 and result["aggregated"] == 3, result
+
+    def daily():
+        rows = conn.execute("SELECT memory_id, access_type, count FROM memory_access_daily "
+                            "ORDER BY memory_id, date, access_type").fetchall()
+        return [tuple(r) for r in rows]
+
+    assert daily() == [(ids[0], "read", 2), (ids[0], "search", 1), (ids[0], "read", 1)]
+    assert _access_rows() == [(ids[1], "read"), (ids[1], "read")], "Recent rows should stay raw"
+
+    log(ids[0], "read", "-40 days")
+    assert memory_db.compact_access_log(30)["removed"] == 1
+    assert daily()[0] == (ids[0], "read", 3), "Re-running should add to the existing day"
+    assert memory_db.compact_access_log(-1)["success"] is False
+    conn.close()
+    print("  ✓ Rolled into daily counts")
+
+
+def test_bulk_outcomes(memory_store):
+    """add_entries_bulk reports created, duplicate and invalid rows in input order"""
+    print("Testing bulk add outcomes...")
+
+    existing = memory_db.add_entry("Already stored", importance=3)["entry"]["id"]
+    result = memory_db.add_entries_bulk([
+        {"content": "First new fact", "tags": "a, b"},
+        {"content": "already STORED "},
+        {"content": ""},
+        {"content": "Bad type", "type": "rumour"},
+        {"content": "Bad importance", "importance": 11},
+        "not an object",
+        {"content": "First new fact"},
+        {"content": "An event", "type": "event", "importance": "8"},
+    ], defaults={"source": "external"})
+
+    assert result["success"]
+    assert [r["status"] for r in result["results"]] == [
+        "created", "duplicate", "invalid", "invalid", "invalid", "invalid", "duplicate", "created"]
+    assert [r["index"] for r in result["results"]] == list(range(8))
+    assert result["counts"] == {"created": 2, "updated": 0, "duplicate": 2, "invalid": 4}
+    assert result["results"][1]["id"] == existing
+    assert result["results"][6]["id"] == result["results"][0]["id"], "In-batch duplicate should share the new ID"
+    assert "content is required" in result["results"][2]["error"]
+
+    created = memory_db.get_entry(result["results"][0]["id"])["entry"]
+    assert (created["source"], json.loads(created["tags"])) == ("external", ["a", "b"])
+    assert memory_db.get_entry(existing)["entry"]["importance"] == 3, "Duplicate without upsert must not overwrite"
+    assert memory_db.get_entry(result["results"][7]["id"])["entry"]["importance"] == 8
+    print("  ✓ Created, duplicate and invalid reported per row")
+
+
+def test_upsert_overwrites_and_reactivates(memory_store):
+    """upsert_entries overwrites same-hash entries (including inactive ones) in place"""
+    print("Testing upsert...")
+
+    kept = memory_db.add_entry("Trip to Lisbon in May", importance=4)["entry"]["id"]
+    memory_db.delete_entry(kept)
+
+    result = memory_db.upsert_entries([
+        {"content": "Trip to Lisbon in May", "importance": 9, "type": "event", "tags": ["travel"]},
+        {"content": "Brand new entry"},
+    ])
+    assert [r["status"] for r in result["results"]] == ["updated", "created"]
+    assert result["results"][0]["id"] == kept, "Upsert should keep the existing ID"
+    entry = memory_db.get_entry(kept)["entry"]
+    assert (entry["importance"], entry["type"], entry["is_active"]) == (9, "event", 1)
+    assert memory_db.list_entries()["total"] == 2
+    print("  ✓ Upsert updates in place")
+
+
+def test_import_reports_bad_lines(memory_store):
+    """JSONL import counts every outcome and reports failing rows by line number"""
+    print("Testing JSONL import...")
+
+    lines = [
+        json.dumps({"content": "Line one"}),
+        "",
+        "{not json",
+        json.dumps({"content": "Line four", "type": "nonsense"}),
+        json.dumps({"content": "line ONE"}),
+        json.dumps({"content": "Line six", "importance": 7}),
+        json.dumps({"importance": 2}),
+    ]
+    path = memory_store / "entries.jsonl"
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    result = memory_db.import_entries(str(path), batch_size=2)
+    assert result["success"], result
+    assert result["counts"] == {"created": 2, "updated": 0, "duplicate": 1, "invalid": 3}
+    assert [e["line"] for e in result["errors"]] == [3, 4, 7], result["errors"]
+    assert result["errors"][0]["error"].startswith("Invalid JSON")
+
+    again = memory_db.import_entries(str(path), upsert=True)
+    assert again["counts"] == {"created": 0, "updated": 3, "duplicate": 0, "invalid": 3}
+    assert memory_db.import_entries(str(path.with_name("missing.jsonl")))["success"] is False
+    print("  ✓ Bad lines reported with their line numbers")
+
+
+def test_import_cli_from_stdin(memory_store, capsys):
+    """--action import --file - --upsert (as vault_onboard uses it) reads JSONL from stdin"""
+    print("Testing import CLI from stdin...")
+
+    memory_db.add_entry("Works at the county office", importance=3)
+    rows = [{"content": "Works at the county office", "type": "fact", "importance": 8,
+             "source": "external", "tags": ["work"]},
+            {"content": "Prefers window seats", "type": "preference", "importance": 6,
+             "source": "external", "tags": ["travel"]}]
+
+    capsys.readouterr()
+    argv, stdin = sys.argv, sys.stdin
+    sys.argv = ["memory_db.py", "--action", "import", "--file", "-", "--upsert"]
+    sys.stdin = io.StringIO("\n".join(json.dumps(r) for r in rows) + "\n")
+    try:
+        memory_db.main()
+    finally:
+        sys.argv, sys.stdin = argv, stdin
+
+    out = capsys.readouterr().out
+    assert out.splitlines()[0] == "OK 1 created, 1 updated"
+    assert json.loads(out.split("\n", 1)[1])["counts"]["updated"] == 1
+    entries = {e["content"]: e for e in memory_db.list_entries()["entries"]}
+    assert entries["Works at the county office"]["importance"] == 8
+    assert entries["Prefers window seats"]["source"] == "external"
+    print("  ✓ CLI import upserts from stdin")
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Tests for the query embedding cache (memory/query_cache.py)
+Tests: memory, disk and API sources, TTL expiry, eviction down to QUERY_CACHE_MAX_ROWS
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# The memory modules import each other by bare name
+sys.path.insert(0, str(Path(__file__).parent.parent / "memory"))
+
+pytest.importorskip("dotenv")
+
+import memory_db
+import query_cache
+from embedding_stub_server import stub_embedding
+
+DIM = 16
+
+
+class _CountingProvider:
+    """Non-local provider that records every text it is asked to embed."""
+
+    local = False
+
+    def __init__(self, model: str = "stub-model"):
+        self.model = model
+        self.texts = []
+
+    def embed(self, texts):
+        self.texts.extend(texts)
+        return {
+            "success": True,
+            "embeddings": [stub_embedding(t, DIM) for t in texts],
+            "model": self.model,
+            "usage": {"prompt_tokens": len(texts), "total_tokens": len(texts)}
+        }
+
+
+def _disk_rows() -> dict:
+    conn = memory_db.get_connection()
+    rows = conn.execute("SELECT query_key, model, hits FROM query_embeddings").fetchall()
+    conn.close()
+    return {(r["query_key"], r["model"]): r["hits"] for r in rows}
+
+
+def test_memory_disk_and_api_sources(memory_store):
+    """A miss goes to the API; repeats come from memory, then from disk in a fresh process"""
+    print("Testing cache sources...")
+
+    provider = _CountingProvider()
+    before = query_cache.cache_stats()
+
+    first = query_cache.get_query_embedding("What's for dinner?", provider=provider)
+    assert first["success"] and first["cache"]["source"] == "api" and not first["cache"]["hit"]
+    assert provider.texts == ["What's for dinner?"], "The API sees the original query text"
+    assert _disk_rows() == {("what's for dinner", "stub-model"): 0}
+
+    again = query_cache.get_query_embedding("  what's for   DINNER ", provider=provider)
+    assert again["cache"]["source"] == "memory" and again["cache"]["hit"]
+    assert again["embedding"] == first["embedding"] and again["usage"]["total_tokens"] == 0
+
+    query_cache._memory.clear()  # As in a new process: only the table survives
+    from_disk = query_cache.get_query_embedding("what's for dinner", provider=provider)
+    assert from_disk["cache"]["source"] == "disk" and from_disk["dimensions"] == DIM
+    assert from_disk["embedding"] == pytest.approx(first["embedding"], abs=1e-6)
+    assert _disk_rows()[("what's for dinner", "stub-model")] == 1, "Disk hits should be counted"
+    assert query_cache.get_query_embedding("what's for dinner", provider=provider)["cache"]["source"] == "memory"
+    assert len(provider.texts) == 1
+
+    other_model = _CountingProvider("other-model")
+    assert query_cache.get_query_embedding("what's for dinner", provider=other_model)["cache"]["source"] == "api"
+
+    stats = query_cache.cache_stats()
+    assert stats["misses"] - before["misses"] == 2 and stats["hits"] - before["hits"] == 3
+    assert stats["memory_hits"] - before["memory_hits"] == 2 and stats["disk_hits"] - before["disk_hits"] == 1
+
+    local = query_cache.get_query_embedding("what's for dinner", provider="local")
+    assert local["cache"]["source"] == "local" and len(_disk_rows()) == 2, "Local queries bypass the cache"
+    print("  ✓ api → memory → disk")
+
+
+def test_expired_row_is_re_embedded(memory_store):
+    """A disk row older than QUERY_CACHE_TTL_DAYS is deleted and the query embedded again"""
+    print("Testing TTL expiry...")
+
+    provider = _CountingProvider()
+    query_cache.get_query_embedding("garage door code", provider=provider)
+
+    conn = memory_db.get_connection()
+    conn.execute("UPDATE query_embeddings SET created_at = ?",
+                 (time.time() - query_cache.QUERY_CACHE_TTL_DAYS * 86400 - 60,))
+    conn.commit()
+    conn.close()
+    query_cache._memory.clear()
+
+    result = query_cache.get_query_embedding("garage door code", provider=provider)
+    assert result["cache"]["source"] == "api" and len(provider.texts) == 2
+    conn = memory_db.get_connection()
+    created_at = conn.execute("SELECT created_at FROM query_embeddings").fetchone()[0]
+    conn.close()
+    assert time.time() - created_at < 60, "Expired row should be replaced by a fresh one"
+    print("  ✓ Expired rows are re-embedded")
+
+
+def test_evict_trims_to_max_rows(memory_store, monkeypatch):
+    """_evict drops expired rows, then the least recently used beyond QUERY_CACHE_MAX_ROWS"""
+    print("Testing eviction...")
+
+    monkeypatch.setattr(query_cache, "QUERY_CACHE_MAX_ROWS", 4)
+    monkeypatch.setattr(query_cache, "_EVICT_EVERY", 100)
+    query_cache._store_disk([((f"query {i}", "stub-model"), stub_embedding(f"query {i}", DIM)) for i in range(7)])
+
+    now = time.time()
+    conn = memory_db.get_connection()
+    # query 0 is expired; otherwise last use runs from query 6 (oldest) to query 1 (newest)
+    conn.execute("UPDATE query_embeddings SET created_at = ? WHERE query_key = 'query 0'",
+                 (now - query_cache.QUERY_CACHE_TTL_DAYS * 86400 - 60,))
+    conn.executemany("UPDATE query_embeddings SET last_used = ? WHERE query_key = ?",
+                     [(now - i, f"query {i}") for i in range(7)])
+    conn.commit()
+
+    assert query_cache._evict(conn) == 3
+    conn.close()
+    assert sorted(k for k, _ in _disk_rows()) == ["query 1", "query 2", "query 3", "query 4"]
+
+    # _store_disk runs the trim itself every _EVICT_EVERY inserts
+    monkeypatch.setattr(query_cache, "_EVICT_EVERY", 3)
+    monkeypatch.setattr(query_cache, "_inserts", 0)
+    query_cache._store_disk([(("query 7", "stub-model"), stub_embedding("query 7", DIM))])
+    assert len(_disk_rows()) == 5, "No trim before _EVICT_EVERY inserts"
+    query_cache._store_disk([((f"query {i}", "stub-model"), stub_embedding(f"query {i}", DIM)) for i in (8, 9)])
+    rows = _disk_rows()
+    assert len(rows) == 4 and {"query 7", "query 8", "query 9"} <= {k for k, _ in rows}
+    print("  ✓ Trimmed by expiry, then least-recent use")
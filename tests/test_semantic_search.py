@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Tests for the resident embedding matrix (memory/semantic_search.py)
+Tests: writes from another thread's connection arrive through the write listener,
+writes from another process through the updated_at watermark
+"""
+
+import json
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# The memory modules import each other by bare name
+MEMORY_DIR = Path(__file__).parent.parent / "memory"
+sys.path.insert(0, str(MEMORY_DIR))
+
+pytest.importorskip("dotenv")
+
+import memory_db
+import semantic_search
+
+pytestmark = pytest.mark.skipif(not semantic_search.HAS_NUMPY, reason="numpy not installed")
+
+MODEL = "test-model"
+DIM = 8
+
+# Runs memory_db calls in a separate process, where this process's write listeners can't hear them
+_OTHER_PROCESS = """
+import json, sys
+from pathlib import Path
+sys.path.insert(0, sys.argv[1])
+import memory_db
+memory_db.DB_PATH = Path(sys.argv[2])
+for name, args in json.loads(sys.argv[3]):
+    if name == "store_embedding":
+        args[1] = bytes.fromhex(args[1])
+    assert getattr(memory_db, name)(*args)["success"]
+"""
+
+
+def _vector(seed: int) -> bytes:
+    import numpy as np
+    return np.random.default_rng(seed).standard_normal(DIM).astype(np.float32).tobytes()
+
+
+@pytest.fixture
+def seeded(memory_store) -> tuple:
+    """(matrix, ids): five entries, the first four embedded and loaded into the matrix."""
+    ids = [r["id"] for r in memory_db.add_entries_bulk([{"content": f"entry {i}"} for i in range(5)])["results"]]
+    memory_db.store_embeddings([(i, _vector(i)) for i in ids[:4]], MODEL)
+    matrix = semantic_search.get_embedding_matrix(MODEL)
+    assert sorted(matrix.row_of) == ids[:4]
+    return matrix, ids
+
+
+def _resident(matrix, entry_id: int, blob: bytes) -> bool:
+    import numpy as np
+    vec = matrix.vector(entry_id)
+    expected = np.frombuffer(blob, dtype=np.float32)
+    return vec is not None and np.allclose(vec, expected / np.linalg.norm(expected), atol=1e-6)
+
+
+def test_listener_picks_up_writes_from_another_thread(seeded):
+    """store_embedding/delete_entry on another thread's pooled connection mark rows dirty"""
+    print("Testing write listener across threads...")
+
+    import numpy as np
+    matrix, ids = seeded
+
+    def writes():
+        memory_db.store_embedding(ids[4], _vector(40), MODEL)
+        memory_db.store_embedding(ids[0], _vector(50), MODEL)
+        memory_db.delete_entry(ids[1])
+        memory_db.delete_entry(ids[2], soft_delete=False)
+        memory_db.close_connections()
+
+    thread = threading.Thread(target=writes)
+    thread.start()
+    thread.join()
+    assert matrix._dirty == {ids[4], ids[0], ids[1], ids[2]}, "Listener should mark every written entry"
+
+    matrix.refresh()
+    assert sorted(matrix.row_of) == [ids[0], ids[3], ids[4]]
+    assert _resident(matrix, ids[4], _vector(40)), "New embedding not loaded"
+    assert _resident(matrix, ids[0], _vector(50)), "Re-embedded entry kept its old vector"
+    hits, searched, _ = matrix.search(np.frombuffer(_vector(50), dtype=np.float32).tolist(), limit=1, threshold=-1)
+    assert searched == 3 and hits[0][0]["id"] == ids[0]
+    print("  ✓ Thread writes applied on refresh")
+
+
+def test_watermark_picks_up_writes_from_another_process(seeded, monkeypatch):
+    """Writes the listener never hears about are found through the updated_at watermark"""
+    print("Testing updated_at watermark across processes...")
+
+    matrix, ids = seeded
+    calls = [
+        ("store_embedding", [ids[4], _vector(40).hex(), MODEL]),
+        ("store_embedding", [ids[0], _vector(50).hex(), MODEL]),
+        ("store_embedding", [ids[1], _vector(60).hex(), "other-model"]),
+        ("delete_entry", [ids[2]]),
+    ]
+    subprocess.run([sys.executable, "-c", _OTHER_PROCESS, str(MEMORY_DIR), str(memory_db.DB_PATH),
+                    json.dumps(calls)], check=True)
+    assert not matrix._dirty, "Another process's writes can't reach this process's listeners"
+
+    matrix.refresh()
+    assert sorted(matrix.row_of) == [ids[0], ids[3], ids[4]], "Soft delete and model change should drop rows"
+    assert _resident(matrix, ids[4], _vector(40)) and _resident(matrix, ids[0], _vector(50))
+    assert matrix._watermark is not None
+
+    # Hard deletes leave no updated_at behind; the periodic full reload removes them
+    subprocess.run([sys.executable, "-c", _OTHER_PROCESS, str(MEMORY_DIR), str(memory_db.DB_PATH),
+                    json.dumps([("delete_entry", [ids[3], False])])], check=True)
+    matrix.refresh()
+    assert ids[3] in matrix.row_of
+    monkeypatch.setattr(semantic_search, "FULL_RELOAD_SECONDS", 0)
+    matrix.refresh()
+    assert sorted(matrix.row_of) == [ids[0], ids[4]]
+    print("  ✓ Other-process writes applied on refresh")
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Tests for the Telegram bot's incremental session log (tools/telegram/conversation.py)
+Tests: context trim before the first save, summarization during an in-flight turn,
+reload after both, prefetch context within the token budget, lazy DB setup and
+sessions.json migration, system prompt cache
+"""
+
+import asyncio
+import json
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# The bot's modules import each other by bare name
+sys.path.insert(0, str(Path(__file__).parent.parent / "tools" / "telegram"))
+
+pytest.importorskip("dotenv")
+pytest.importorskip("openai")
+
+import context_window
+import conversation
+import tool_runner
+
+USER_ID = 42
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch) -> Path:
+    """Point the session store (and the legacy sessions.json) at tmp_path; no DB is opened yet."""
+    path = tmp_path / "sessions.db"
+    monkeypatch.setattr(conversation, "_SESSIONS_DB_PATH", path)
+    monkeypatch.setattr(conversation, "_SESSIONS_PATH", tmp_path / "sessions.json")
+    monkeypatch.setattr(conversation, "_sessions", {})
+    monkeypatch.setattr(conversation, "_db_conn", None)
+    monkeypatch.setattr(conversation, "_db_conn_path", None)
+    yield path
+    if conversation._db_conn is not None:
+        conversation._db_conn.close()
+
+
+def _turns(n: int, start: int = 0) -> list:
+    messages = []
+    for i in range(start, start + n):
+        messages.append({"role": "user", "content": f"question {i} " + "x" * 200})
+        messages.append({"role": "assistant", "content": f"answer {i} " + "y" * 200})
+    return messages
+
+
+def _stored_seqs(db_path: Path) -> list:
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute("SELECT seq FROM session_messages WHERE user_id = ? ORDER BY seq", (USER_ID,))
+        return [r[0] for r in rows]
+
+
+def _reload() -> dict:
+    conversation._sessions.clear()
+    return conversation._get_session(USER_ID)
+
+
+def test_trim_before_first_save(db_path):
+    """Turns dropped by the context budget before anything was written never reach the log"""
+    print("Testing context trim before the first save...")
+
+    session = {"messages": _turns(4), "model_id": "primary", "summary": ""}
+    conversation._sessions[USER_ID] = session
+
+    # Same steps as _run_turn: fit the history to the budget, then record the dropped head
+    budget = context_window.messages_tokens(session["messages"][-4:]) + 1
+    session["messages"], stats = context_window.fit_history(session["messages"], budget)
+    assert stats["dropped_messages"] == 4, "Budget should drop the two oldest turns"
+    conversation._drop_oldest(session, stats["dropped_messages"])
+    conversation._save_session(USER_ID)
+
+    assert _stored_seqs(db_path) == [4, 5, 6, 7], "Log should hold only the kept messages, at their seqs"
+    assert session["next_seq"] == 8 and session["pruned_seq"] == 4
+    print("  ✓ Trimmed head is not written")
+
+    session["messages"].extend(_turns(1, start=4))
+    conversation._save_session(USER_ID)
+    assert _stored_seqs(db_path) == [4, 5, 6, 7, 8, 9], "Later saves should append after the kept messages"
+
+    reloaded = _reload()
+    assert reloaded["messages"] == session["messages"], "Reloaded history differs"
+    assert reloaded["base_seq"] == 4 and reloaded["next_seq"] == 10
+    print("  ✓ Reload returns the trimmed history")
+
+
+def test_summary_during_in_flight_turn(db_path, monkeypatch):
+    """A summary that lands while a turn is adding messages keeps the turn's unsaved messages"""
+    print("Testing summarization during an in-flight turn...")
+
+    session = {"messages": _turns(3), "model_id": "primary", "summary": ""}
+    conversation._sessions[USER_ID] = session
+    conversation._save_session(USER_ID)
+
+    async def scenario():
+        release = asyncio.Event()
+
+        class SlowClient:
+            async def complete(self, **kwargs):
+                await release.wait()
+                return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="summary one"))])
+
+        monkeypatch.setattr(conversation, "_get_client_and_model", lambda uid: (SlowClient(), "model", "primary"))
+        task = asyncio.create_task(conversation._summarize_session(USER_ID, session, {"summary_keep_tokens": 1}))
+        await asyncio.sleep(0)
+
+        # The turn appends its messages while the summary request is outstanding
+        session["messages"].extend(_turns(1, start=3))
+        release.set()
+        await task
+
+    asyncio.run(scenario())
+    assert session["summary"] == "summary one", "Summary should apply: the folded turns are still the head"
+    assert session["base_seq"] == 4, "The two oldest turns should be folded"
+    assert [m["content"][:10] for m in session["messages"]] == [
+        "question 2", "answer 2 y", "question 3", "answer 3 y"
+    ], "Kept turn and the in-flight turn's messages should remain"
+    assert _stored_seqs(db_path) == [4, 5, 6, 7], "Summary save should prune the folded rows and write the turn's"
+    print("  ✓ Summary keeps the in-flight turn's messages")
+
+    # The turn finishes and saves: nothing is written twice or lost
+    session["messages"].append({"role": "user", "content": "question 4"})
+    conversation._save_session(USER_ID)
+    assert _stored_seqs(db_path) == [4, 5, 6, 7, 8]
+
+    reloaded = _reload()
+    assert reloaded["messages"] == session["messages"], "Reloaded history differs"
+    assert reloaded["summary"] == "summary one" and reloaded["base_seq"] == 4
+    print("  ✓ Reload returns the summary and the remaining history")
+
+
+def test_stale_summary_discarded_after_trim(db_path, monkeypatch):
+    """A summary of turns that a trim dropped in the meantime is discarded; the trim is kept"""
+    print("Testing a summary made stale by a trim...")
+
+    session = {"messages": _turns(3), "model_id": "primary", "summary": "earlier"}
+    conversation._sessions[USER_ID] = session
+    conversation._save_session(USER_ID)
+
+    async def scenario():
+        release = asyncio.Event()
+
+        class SlowClient:
+            async def complete(self, **kwargs):
+                await release.wait()
+                return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="stale"))])
+
+        monkeypatch.setattr(conversation, "_get_client_and_model", lambda uid: (SlowClient(), "model", "primary"))
+        task = asyncio.create_task(conversation._summarize_session(USER_ID, session, {"summary_keep_tokens": 1}))
+        await asyncio.sleep(0)
+
+        # A turn trims the oldest turn and saves before the summary comes back
+        session["messages"] = session["messages"][2:]
+        conversation._drop_oldest(session, 2)
+        conversation._save_session(USER_ID)
+        release.set()
+        await task
+
+    asyncio.run(scenario())
+    assert session["summary"] == "earlier", "Stale summary should be discarded"
+    assert session["base_seq"] == 2 and _stored_seqs(db_path) == [2, 3, 4, 5]
+
+    reloaded = _reload()
+    assert reloaded["messages"] == session["messages"], "Reloaded history differs"
+    assert reloaded["summary"] == "earlier" and reloaded["base_seq"] == 2
+    print("  ✓ Stale summary is discarded and the trim persists")
+
+
+def test_prefetch_context_counts_against_budget(db_path, monkeypatch):
+    """Prefetched context is appended before the history is fitted, so the request stays in budget"""
+    print("Testing prefetch context against the token budget...")
+
+    budget = 3000
+    session = {"messages": _turns(20), "model_id": "primary", "summary": "",
+               "system_prompt": "You are a helpful assistant.", "memory_loaded": True}
+    conversation._sessions[USER_ID] = session
+    sent = []
+
+    class CapturingClient:
+        async def complete(self, **kwargs):
+            sent.append(kwargs["messages"])
+            return SimpleNamespace(choices=[])
+
+    async def fake_prefetch(group, extra=None):
+        return {"kanban": "k" * 4000, "journal": "j" * 4000, "reminders": "r" * 2000}
+
+    config = {"context": {"budgets": {"ollama": budget}}, "tools": {}}
+    monkeypatch.setattr(conversation, "load_config", lambda: config)
+    monkeypatch.setattr(conversation, "_get_client_and_model", lambda uid: (CapturingClient(), "model", "ollama"))
+    monkeypatch.setattr(conversation, "_prefetch", fake_prefetch)
+
+    async def scenario():
+        return [event async for event in conversation._run_turn("what are my priorities", USER_ID, stream=False)]
+
+    asyncio.run(scenario())
+    request = sent[0]
+    assert request[-1]["content"].startswith("[Context already fetched"), "Prefetch context should be sent"
+    assert request[-2]["content"] == "what are my priorities"
+    assert sum(context_window.message_tokens(m) for m in request) <= budget, "Request exceeds the budget"
+    assert session["base_seq"] > 0, "Older turns should be dropped to make room for the context"
+    print("  ✓ Older turns make room for the prefetched context")
+
+
+def test_import_opens_no_db():
+    """Importing conversation creates no tables and migrates nothing until a session is used"""
+    print("Testing import without DB side effects...")
+
+    telegram_dir = str(Path(__file__).parent.parent / "tools" / "telegram")
+    script = f"import sys; sys.path.insert(0, {telegram_dir!r}); import conversation; print(conversation._db_conn)"
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+    assert result.stdout.strip().splitlines()[-1] == "None"
+    print("  ✓ No connection at import")
+
+
+def test_first_use_creates_tables_and_migrates_json(db_path):
+    """The first DB access creates the tables and moves a legacy sessions.json into the log"""
+    print("Testing lazy setup and sessions.json migration...")
+
+    legacy = {str(USER_ID): {"messages": _turns(1), "model_id": "primary"}}
+    conversation._SESSIONS_PATH.write_text(json.dumps(legacy), encoding="utf-8")
+    assert not db_path.exists()
+
+    session = conversation._get_session(USER_ID)
+    assert session["messages"] == _turns(1) and session["model_id"] == "primary"
+    assert not conversation._SESSIONS_PATH.exists(), "Legacy file should be renamed after migrating"
+    assert conversation._SESSIONS_PATH.with_suffix(".json.migrated").exists()
+    assert _stored_seqs(db_path) == [0, 1], "Loaded blob should move into the message log"
+    assert conversation._get_session(USER_ID + 1) is None
+    print("  ✓ Tables created and JSON migrated on first use")
+
+
+@pytest.fixture
+def prompt_builds(tmp_path, monkeypatch) -> list:
+    """Empty prompt cache, memory.db and MEMORY.md in tmp_path; returns the list of memory loads."""
+    loads = []
+
+    async def fake_load_memory():
+        loads.append(1)
+        return f"memory load {len(loads)}"
+
+    memory_db = tmp_path / "memory.db"
+    with sqlite3.connect(memory_db) as conn:
+        conn.execute("CREATE TABLE memory_entries (id INTEGER PRIMARY KEY, content TEXT, "
+                     "updated_at DATETIME DEFAULT CURRENT_TIMESTAMP)")
+        conn.execute("INSERT INTO memory_entries (content) VALUES ('first')")
+    memory_file = tmp_path / "MEMORY.md"
+    memory_file.write_text("# Memory\n", encoding="utf-8")
+
+    monkeypatch.setattr(conversation, "_prompt_cache", {"key": None, "prompt": None})
+    monkeypatch.setattr(conversation, "_load_memory", fake_load_memory)
+    monkeypatch.setattr(conversation, "_MEMORY_DB_PATH", memory_db)
+    monkeypatch.setattr(conversation, "_MEMORY_FILE_PATH", memory_file)
+    return loads
+
+
+def test_system_prompt_cache(prompt_builds):
+    """The prompt is reused until a prompt file, this process's memory writes or memory.db changes"""
+    print("Testing the system prompt cache...")
+
+    loads = prompt_builds
+
+    def prompt() -> str:
+        return asyncio.run(conversation._get_system_prompt())
+
+    first = prompt()
+    assert "memory load 1" in first
+    assert prompt() == first and len(loads) == 1, "Unchanged inputs should hit the cache"
+
+    tool_runner._bump_memory_version()
+    assert "memory load 2" in prompt(), "The bot's own memory write should rebuild"
+
+    conversation._MEMORY_FILE_PATH.write_text("# Memory\n- new fact\n", encoding="utf-8")
+    assert "memory load 3" in prompt(), "A MEMORY.md change should rebuild"
+    assert len(loads) == 3 and prompt() and len(loads) == 3
+
+    # Writes from other processes (cron jobs, memory_db.py --action import) only show in the DB
+    db = conversation._MEMORY_DB_PATH
+    with sqlite3.connect(db) as conn:
+        conn.execute("INSERT INTO memory_entries (content, updated_at) VALUES ('second', CURRENT_TIMESTAMP)")
+    assert "memory load 4" in prompt(), "An entry added by another process should rebuild"
+    with sqlite3.connect(db) as conn:
+        conn.execute("UPDATE memory_entries SET updated_at = '2999-01-01 00:00:00' WHERE content = 'first'")
+    assert "memory load 5" in prompt(), "An entry updated by another process should rebuild"
+    with sqlite3.connect(db) as conn:
+        conn.execute("DELETE FROM memory_entries WHERE content = 'second'")
+    assert "memory load 6" in prompt(), "An entry deleted by another process should rebuild"
+    assert prompt() and len(loads) == 6
+
+    db.unlink()
+    assert conversation._memory_db_watermark() is None and not db.exists(), "A missing DB is not created"
+    print("  ✓ Hits until an input changes")
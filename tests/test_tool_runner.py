@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Tests for the Telegram bot's tool runner (tools/telegram/tool_runner.py)
+Tests: registry dispatch, per-tool timeouts, latency stats, read-only result cache,
+parallel execute_calls ordering
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# The bot's modules import each other by bare name
+sys.path.insert(0, str(Path(__file__).parent.parent / "tools" / "telegram"))
+
+pytest.importorskip("dotenv")
+pytest.importorskip("yaml")
+
+import tool_runner
+from tool_runner import TOOL_REGISTRY, register
+
+
+def _register(name: str, handler, **meta) -> str:
+    register(name, handler, **meta)
+    tool_runner._latency.pop(name, None)
+    return name
+
+
+def _cleanup(*names: str) -> None:
+    for name in names:
+        TOOL_REGISTRY.pop(name, None)
+        tool_runner._latency.pop(name, None)
+
+
+def test_registry_dispatch():
+    """execute() calls the registered handler; unknown tools and handler errors give the generic error"""
+    print("Testing registry dispatch...")
+
+    seen = []
+
+    def echo(inp):
+        seen.append(inp)
+        return json.dumps({"success": True, "echo": inp["text"]})
+
+    def broken(inp):
+        raise RuntimeError("boom")
+
+    names = (_register("test_echo", echo), _register("test_broken", broken))
+    try:
+        result = asyncio.run(tool_runner.execute("test_echo", {"text": "hi"}))
+        assert json.loads(result) == {"success": True, "echo": "hi"} and seen == [{"text": "hi"}]
+        assert asyncio.run(tool_runner.execute("test_broken", {})) == tool_runner._ERROR_RESULT
+        assert asyncio.run(tool_runner.execute("test_no_such_tool", {})) == tool_runner._ERROR_RESULT
+    finally:
+        _cleanup(*names, "test_no_such_tool")
+
+    # Every registered handler is callable and read-only tools are flagged as such
+    assert all(callable(spec.handler) for spec in TOOL_REGISTRY.values())
+    assert tool_runner.is_read_only("memory_read") and not tool_runner.is_read_only("memory_write")
+    assert tool_runner.READ_ONLY_TOOLS == {n for n, s in TOOL_REGISTRY.items() if s.read_only}
+    # Mutating tools are never cut off, so a timeout on one would be dead configuration
+    assert all(spec.read_only or spec.timeout == tool_runner.DEFAULT_TOOL_TIMEOUT
+               for spec in TOOL_REGISTRY.values())
+    print("  ✓ Dispatch goes through TOOL_REGISTRY")
+
+
+def test_read_only_timeout():
+    """A read-only tool past its timeout returns an error; a mutating tool is left to finish"""
+    print("Testing per-tool timeouts...")
+
+    def slow(inp):
+        time.sleep(inp["seconds"])
+        return json.dumps({"success": True})
+
+    names = (_register("test_slow_read", slow, read_only=True, timeout=0.1),
+             _register("test_slow_write", slow, timeout=0.1))
+    try:
+        result = json.loads(asyncio.run(tool_runner.execute("test_slow_read", {"seconds": 0.5})))
+        assert result == {"success": False, "error": "test_slow_read timed out after 0.1s."}
+        result = json.loads(asyncio.run(tool_runner.execute("test_slow_write", {"seconds": 0.3})))
+        assert result == {"success": True}, "Mutating tools must not be reported as timed out"
+
+        stats = tool_runner.tool_stats()
+        assert stats["test_slow_read"]["timeouts"] == 1
+        assert stats["test_slow_write"]["timeouts"] == 0 and stats["test_slow_write"]["max_ms"] >= 300
+    finally:
+        _cleanup(*names)
+    print("  ✓ Only read-only tools time out")
+
+
+def test_tool_stats_histogram():
+    """tool_stats() reports counts, errors, buckets and bucket percentiles per tool"""
+    print("Testing latency stats...")
+
+    name = "test_stats"
+    tool_runner._latency.pop(name, None)
+    try:
+        for ms in [5] * 8 + [40, 70000]:
+            tool_runner._record_latency(name, ms, "ok")
+        tool_runner._record_latency(name, 200, "error")
+        tool_runner._record_latency(name, 200, "timeout")
+
+        stats = tool_runner.tool_stats()[name]
+        assert stats["count"] == 12 and stats["errors"] == 1 and stats["timeouts"] == 1
+        assert stats["histogram"] == {"<=10ms": 8, "<=50ms": 1, "<=250ms": 2, ">60000ms": 1}
+        assert stats["p50_ms"] == 10 and stats["p95_ms"] is None, "p95 falls in the open-ended bucket"
+        assert stats["max_ms"] == 70000 and stats["mean_ms"] == round((40 + 8 * 5 + 70000 + 400) / 12, 1)
+        assert stats["in_process"] is None, "Unregistered tool has no spec"
+    finally:
+        tool_runner._latency.pop(name, None)
+    print("  ✓ Histogram and percentiles")
+
+
+def _counting_reader(path: Path, calls: list, gate: threading.Event = None):
+    def read(inp):
+        calls.append(inp)
+        if gate is not None:
+            gate.wait(5)
+        return json.dumps({"success": True, "text": path.read_text() if path.exists() else None,
+                           "call": len(calls)})
+    return read
+
+
+def test_result_cache_hits_and_source_changes():
+    """Repeat calls hit the cache until a source file's mtime or size changes"""
+    print("Testing result cache hits and source-file stamps...")
+
+    path = Path(tempfile.mkdtemp()) / "notes.md"
+    path.write_text("one")
+    calls = []
+    name = _register("test_cached", _counting_reader(path, calls), read_only=True, cacheable=True,
+                     cache_ttl=60, sources=lambda inp: [path])
+    tool_runner._result_cache.clear()
+    try:
+        before = tool_runner.cache_stats()
+        first = tool_runner._execute_sync(name, {"q": 1, "unused": None})
+        assert tool_runner._execute_sync(name, {"q": 1}) == first, "None-valued keys should not change the key"
+        assert len(calls) == 1, "Second call should be served from the cache"
+        tool_runner._execute_sync(name, {"q": 2})
+        assert len(calls) == 2, "Different input is a different entry"
+        stats = tool_runner.cache_stats()
+        assert (stats["hits"] - before["hits"], stats["misses"] - before["misses"]) == (1, 2)
+
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert json.loads(tool_runner._execute_sync(name, {"q": 1}))["call"] == 3, "mtime change should miss"
+
+        stat = path.stat()
+        path.write_text("one!")
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        result = json.loads(tool_runner._execute_sync(name, {"q": 1}))
+        assert (result["call"], result["text"]) == (4, "one!"), "Size change with the same mtime should miss"
+
+        path.unlink()
+        calls_before = len(calls)
+        tool_runner._execute_sync(name, {"q": 3})
+        tool_runner._execute_sync(name, {"q": 3})
+        assert len(calls) == calls_before + 1, "A missing source stamps consistently and still caches"
+    finally:
+        _cleanup(name)
+        tool_runner._result_cache.clear()
+    print("  ✓ Hits until a source file changes")
+
+
+def test_result_cache_ttl_and_invalidation():
+    """Entries expire after their TTL and are dropped by the writing tools that name them"""
+    print("Testing result cache TTL and invalidation...")
+
+    path = Path(tempfile.mkdtemp()) / "list.md"
+    path.write_text("- item")
+    calls, other_calls = [], []
+    names = (
+        _register("test_cached", _counting_reader(path, calls), read_only=True, cacheable=True, cache_ttl=0.2,
+                  sources=lambda inp: [path]),
+        _register("test_other", _counting_reader(path, other_calls), read_only=True, cacheable=True,
+                  cache_ttl=60),
+        _register("test_writer", lambda inp: json.dumps({"success": True}), invalidates=("test_cached",)),
+        _register("test_write_all", lambda inp: json.dumps({"success": True}), invalidates=("*",)),
+    )
+    tool_runner._result_cache.clear()
+    try:
+        tool_runner._execute_sync("test_cached", {})
+        tool_runner._execute_sync("test_cached", {})
+        assert len(calls) == 1
+        time.sleep(0.25)
+        tool_runner._execute_sync("test_cached", {})
+        assert len(calls) == 2, "Expired entry should be recomputed"
+
+        tool_runner._execute_sync("test_other", {})
+        asyncio.run(tool_runner.execute("test_writer", {}))
+        tool_runner._execute_sync("test_cached", {})
+        tool_runner._execute_sync("test_other", {})
+        assert (len(calls), len(other_calls)) == (3, 1), "Writer should only drop the tools it names"
+
+        asyncio.run(tool_runner.execute("test_write_all", {}))
+        tool_runner._execute_sync("test_cached", {})
+        tool_runner._execute_sync("test_other", {})
+        assert (len(calls), len(other_calls)) == (4, 2), "'*' should drop every cached result"
+    finally:
+        _cleanup(*names)
+        tool_runner._result_cache.clear()
+    print("  ✓ TTL expiry and write invalidation")
+
+
+def test_result_cache_skips_store_after_concurrent_invalidation():
+    """A result computed while a write invalidated the cache is returned but not stored"""
+    print("Testing the cache generation check...")
+
+    path = Path(tempfile.mkdtemp()) / "log.md"
+    path.write_text("before")
+    calls = []
+    gate = threading.Event()
+    names = (
+        _register("test_cached", _counting_reader(path, calls, gate), read_only=True, cacheable=True,
+                  cache_ttl=60),
+        _register("test_writer", lambda inp: path.write_text("after") and json.dumps({"success": True}),
+                  invalidates=("test_cached",)),
+    )
+    tool_runner._result_cache.clear()
+    try:
+        results = []
+        reader = threading.Thread(target=lambda: results.append(tool_runner._execute_sync("test_cached", {})))
+        reader.start()
+        while not calls:
+            time.sleep(0.01)
+        tool_runner._execute_sync("test_writer", {})
+        gate.set()
+        reader.join(5)
+
+        assert json.loads(results[0])["call"] == 1
+        assert tool_runner.cache_stats()["entries"] == 0, "Result read during a write must not be cached"
+        assert json.loads(tool_runner._execute_sync("test_cached", {}))["text"] == "after"
+        assert len(calls) == 2
+        tool_runner._execute_sync("test_cached", {})
+        assert len(calls) == 2, "Results after the write are cached again"
+    finally:
+        gate.set()
+        _cleanup(*names)
+        tool_runner._result_cache.clear()
+    print("  ✓ Store skipped when the generation moved on")
+
+
+def test_execute_calls_order_overlap_and_barrier():
+    """Results come back in call order; read-only runs overlap and a mutating call waits for them"""
+    print("Testing execute_calls ordering...")
+
+    spans = {}
+
+    def timed(inp):
+        start = time.monotonic()
+        time.sleep(inp["seconds"])
+        spans[inp["id"]] = (start, time.monotonic())
+        return json.dumps({"success": True, "id": inp["id"]})
+
+    names = (_register("test_par_read", timed, read_only=True),
+             _register("test_par_write", timed))
+    calls = [
+        ("test_par_read", {"id": "r1", "seconds": 0.3}),
+        ("test_par_read", {"id": "r2", "seconds": 0.1}),
+        ("test_par_write", {"id": "w", "seconds": 0.1}),
+        ("test_par_read", {"id": "r3", "seconds": 0.2}),
+        ("test_par_read", {"id": "r4", "seconds": 0.05}),
+    ]
+    try:
+        results = asyncio.run(tool_runner.execute_calls(calls))
+    finally:
+        _cleanup(*names)
+
+    assert [json.loads(r)["id"] for r in results] == ["r1", "r2", "w", "r3", "r4"], "Results out of call order"
+    assert spans["r2"][0] < spans["r1"][1] and spans["r4"][0] < spans["r3"][1], "Read-only runs should overlap"
+    assert spans["w"][0] >= max(spans["r1"][1], spans["r2"][1]), "Write started before earlier reads finished"
+    assert min(spans["r3"][0], spans["r4"][0]) >= spans["w"][1], "Reads after a write started before it finished"
+    assert asyncio.run(tool_runner.execute_calls([])) == []
+    print("  ✓ Ordered results, overlapping reads, writes as barriers")
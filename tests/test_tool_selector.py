@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Tests for per-message tool selection (tools/telegram/tool_selector.py)
+Tests: every configured tool name exists, domain matching, recent tool names,
+select_tools subsets, compact_reference, request_all_tools expansion in a turn
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# The bot's modules import each other by bare name
+sys.path.insert(0, str(Path(__file__).parent.parent / "tools" / "telegram"))
+
+pytest.importorskip("dotenv")
+pytest.importorskip("openai")
+pytest.importorskip("yaml")
+
+from openai.types.chat import ChatCompletionMessage, ChatCompletionMessageToolCall
+from openai.types.chat.chat_completion_message_tool_call import Function
+
+import conversation
+import tool_selector
+from tool_definitions import TOOL_DEFINITIONS
+
+USER_ID = 42
+
+_REFERENCE = """# Tools
+
+Intro line.
+
+---
+
+## Memory
+
+### memory_write
+Saves to memory.
+
+- **CLI:** `python3 memory/memory_write.py`
+- **Confirm:** ask before overwriting MEMORY.md
+
+### memory_db
+Direct CRUD.
+More detail.
+
+- **Output:** JSON
+
+## Parsing
+
+| Tool | Output |
+|------|--------|
+| a | b |
+"""
+
+
+def _names(tools: list) -> list:
+    return [t["function"]["name"] for t in tools]
+
+
+def test_configured_names_exist():
+    """Every tool in CORE_TOOLS/DOMAIN_TOOLS is defined, and every domain a rule points at has tools"""
+    print("Testing configured tool and domain names...")
+
+    defined = set(_names(TOOL_DEFINITIONS))
+    assert not set(tool_selector.CORE_TOOLS) - defined, "Unknown tool in CORE_TOOLS"
+    for domain, names in tool_selector.DOMAIN_TOOLS.items():
+        assert not set(names) - defined, f"Unknown tool in DOMAIN_TOOLS[{domain!r}]"
+    print("  ✓ Tool names match TOOL_DEFINITIONS")
+
+    referenced = set(tool_selector.KEYWORD_DOMAINS)
+    referenced.update(d for domains in tool_selector.INTENT_DOMAINS.values() for d in domains)
+    referenced.update(d for agent in tool_selector.AGENTS.values() for d in agent.get("tools", []))
+    assert not referenced - set(tool_selector.DOMAIN_TOOLS), "Domain without DOMAIN_TOOLS entry"
+    print("  ✓ Keyword, intent and router domains have tools")
+
+
+def test_match_domains():
+    """Intents and keyword rules select domains; keywords match at word starts only"""
+    print("Testing domain matching...")
+
+    assert tool_selector.match_domains("What should I focus on?") == ["tasks"]
+    assert tool_selector.match_domains("hello", intents=("priorities",)) == ["tasks", "briefings"]
+    assert "reminders" in tool_selector.match_domains("Remind me to call the plumber")
+    assert set(tool_selector.match_domains("Any meetings on my calendar?")) == {"zapier"}
+    assert tool_selector.match_domains("An unfocused showcase") == [], "Keywords must start a word"
+    assert tool_selector.match_domains("") == []
+    print("  ✓ Intents and keywords")
+
+    if tool_selector.AGENTS:
+        assert "bambu" in tool_selector.match_domains("How much filament is left?")
+        assert tool_selector.match_domains("send a chat message") == [], "telegram agent keywords are skipped"
+        print("  ✓ router.AGENTS keywords")
+
+
+def test_recent_tool_names():
+    """Tools called in the turns before the new message; injected prefetch context doesn't start a turn"""
+    print("Testing recent tool names...")
+
+    def called(*names):
+        return {"role": "assistant", "content": "", "tool_calls": [{"function": {"name": n}} for n in names]}
+
+    # As in _run_turn: the new user message has already been appended
+    messages = [
+        {"role": "user", "content": "first"}, called("bambu"),
+        {"role": "user", "content": "second"}, called("kanban_read", "reminders_read"),
+        {"role": "user", "content": "third"},
+        {"role": "user", "content": "[Context already fetched — use this]\n\n..."}, called("memory_search"),
+        {"role": "user", "content": "new message"},
+    ]
+    assert tool_selector.recent_tool_names(messages) == {"kanban_read", "reminders_read", "memory_search"}
+    assert tool_selector.recent_tool_names(messages, turns=1) == {"memory_search"}
+    assert tool_selector.recent_tool_names(messages, turns=3) == {"bambu", "kanban_read", "reminders_read", "memory_search"}
+    assert tool_selector.recent_tool_names([{"role": "user", "content": "hi"}]) == set()
+    print("  ✓ Counted by user turns")
+
+
+def test_select_tools():
+    """Core + matched domains + recent tools, in TOOL_DEFINITIONS order, ending with request_all_tools"""
+    print("Testing select_tools...")
+
+    tools, info = tool_selector.select_tools("Remind me to water the plants", recent={"bambu", "no_such_tool"})
+    names = _names(tools)
+    assert names[-1] == tool_selector.EXPAND_TOOL
+    order = _names(TOOL_DEFINITIONS)
+    assert names[:-1] == sorted(names[:-1], key=order.index), "Subset should keep TOOL_DEFINITIONS order"
+    expected = set(tool_selector.CORE_TOOLS) | set(tool_selector.DOMAIN_TOOLS["reminders"]) | {"bambu"}
+    assert set(names[:-1]) == expected
+    assert info["selected"] == len(expected) and not info["expanded"]
+    assert info["schema_tokens"] < info["full_schema_tokens"]
+    print("  ✓ Subset with the escape hatch")
+
+    tools, info = tool_selector.select_tools("hi", config={"tools": {"selection": {"core": ["memory_read"]}}})
+    assert _names(tools) == ["memory_read", tool_selector.EXPAND_TOOL]
+
+    tools, info = tool_selector.select_tools("hi", config={"tools": {"selection": {"enabled": False}}})
+    assert tools is TOOL_DEFINITIONS and info["expanded"]
+    print("  ✓ Configured core set and disabled selection")
+
+
+def test_compact_reference():
+    """Headings, opening descriptions and caveats stay; flags, outputs and the parsing table go"""
+    print("Testing compact_reference...")
+
+    assert tool_selector.compact_reference(_REFERENCE) == (
+        "# Tools\n\nIntro line.\n\n## Memory\n\n"
+        "### memory_write\nSaves to memory.\n\n- **Confirm:** ask before overwriting MEMORY.md\n\n"
+        "### memory_db\nDirect CRUD.\nMore detail.\n"
+    )
+
+    path = Path(__file__).parent.parent / "context" / "gotcha_tools_reference.md"
+    if path.exists():
+        full = path.read_text(encoding="utf-8")
+        compact = tool_selector.compact_reference(full)
+        assert len(compact) < len(full) and compact == tool_selector.compact_reference(full)
+        assert all(f"### {name}" in compact for name in ("memory_read", "memory_write"))
+    print("  ✓ Reference compacted")
+
+
+def test_request_all_tools_expands_turn(monkeypatch):
+    """A request_all_tools call gets the canned result and the next request carries every tool"""
+    print("Testing request_all_tools expansion...")
+
+    session = {"messages": [], "model_id": "primary", "summary": "",
+               "system_prompt": "You are a helpful assistant.", "memory_loaded": True}
+    monkeypatch.setattr(conversation, "_sessions", {USER_ID: session})
+    monkeypatch.setattr(conversation, "_save_session", lambda user_id: None)
+    monkeypatch.setattr(conversation, "load_config", lambda: {"tools": {}})
+    requests = []
+
+    class ScriptedClient:
+        async def complete(self, **kwargs):
+            requests.append(kwargs)
+            if len(requests) == 1:
+                message = ChatCompletionMessage(role="assistant", content="", tool_calls=[
+                    ChatCompletionMessageToolCall(id="call_1", type="function", function=Function(
+                        name=tool_selector.EXPAND_TOOL, arguments='{"reason": "need the printer"}')),
+                ])
+            else:
+                message = ChatCompletionMessage(role="assistant", content="All set.")
+            return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")])
+
+    monkeypatch.setattr(conversation, "_get_client_and_model", lambda uid: (ScriptedClient(), "model", "ollama"))
+    expanded_before = tool_selector.selection_stats()["expanded"]
+
+    async def scenario():
+        return [event async for event in conversation._run_turn("hello there", USER_ID, stream=False)]
+
+    events = asyncio.run(scenario())
+    assert events == [{"type": "reply", "text": "All set."}], "No status event for the expansion alone"
+    assert _names(requests[0]["tools"])[-1] == tool_selector.EXPAND_TOOL
+    assert len(requests[0]["tools"]) < len(TOOL_DEFINITIONS)
+    assert requests[1]["tools"] is TOOL_DEFINITIONS, "Rest of the turn should send every tool"
+    tool_results = [m for m in session["messages"] if m["role"] == "tool"]
+    assert tool_results == [{"role": "tool", "tool_call_id": "call_1", "content": tool_selector.EXPANDED_RESULT}]
+    assert tool_selector.selection_stats()["expanded"] == expanded_before + 1
+    print("  ✓ Expanded to every tool for the rest of the turn")
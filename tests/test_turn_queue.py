@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Tests for the Telegram bot's per-user turn queue (tools/telegram/turn_queue.py)
+Tests: coalescing, messages that arrive mid-turn, pending cap, global turn cap
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# The bot's modules import each other by bare name
+sys.path.insert(0, str(Path(__file__).parent.parent / "tools" / "telegram"))
+
+from turn_queue import QueuedMessage, TurnQueue, merge_texts
+
+
+def test_coalescing():
+    """A burst in one chat becomes one turn; commands and other chats run alone"""
+    print("Testing coalescing...")
+
+    async def scenario():
+        queue = TurnQueue(coalesce_ms=50, max_pending_per_user=10)
+        batches = []
+
+        async def run(batch):
+            batches.append([m.text for m in batch])
+
+        await asyncio.gather(*(queue.submit(1, QueuedMessage(1, t), run) for t in ("a", "b", "c")))
+        assert batches == [["a", "b", "c"]], f"Burst should merge into one turn, got {batches}"
+        assert queue.stats["turns"] == 1 and queue.stats["coalesced"] == 2
+        print("  ✓ Burst merges into one turn")
+
+        batches.clear()
+        await asyncio.gather(
+            queue.submit(1, QueuedMessage(1, "a"), run),
+            queue.submit(1, QueuedMessage(1, "/cmd", coalesce=False), run),
+            queue.submit(1, QueuedMessage(1, "b"), run),
+            queue.submit(1, QueuedMessage(2, "other chat"), run),
+        )
+        assert batches == [["a"], ["/cmd"], ["b"], ["other chat"]], f"Unexpected batches {batches}"
+        assert queue.pending(1) == 0
+        print("  ✓ Commands and other chats are not merged, order is kept")
+
+    asyncio.run(scenario())
+    assert merge_texts([QueuedMessage(1, "a"), QueuedMessage(1, "b")]) == "a\n\nb"
+
+
+def test_messages_during_turn_form_next_turn():
+    """Messages sent while a turn runs wait for it and are merged into the next turn"""
+    print("Testing messages that arrive during a turn...")
+
+    async def scenario():
+        queue = TurnQueue(coalesce_ms=0)
+        started, release = asyncio.Event(), asyncio.Event()
+        batches = []
+
+        async def run(batch):
+            batches.append([m.text for m in batch])
+            if len(batches) == 1:
+                started.set()
+                await release.wait()
+
+        worker = asyncio.create_task(queue.submit(1, QueuedMessage(1, "first"), run))
+        await started.wait()
+        # Later handlers only enqueue and return
+        assert await queue.submit(1, QueuedMessage(1, "second"), run)
+        assert await queue.submit(1, QueuedMessage(1, "third"), run)
+        assert batches == [["first"]], "Turns for one user must not overlap"
+        release.set()
+        await worker
+        assert batches == [["first"], ["second", "third"]], f"Unexpected batches {batches}"
+
+    asyncio.run(scenario())
+    print("  ✓ Waiting messages run together after the current turn")
+
+
+def test_pending_cap():
+    """A user with max_pending_per_user messages waiting has further messages rejected"""
+    print("Testing the per-user pending cap...")
+
+    async def scenario():
+        queue = TurnQueue(coalesce_ms=0, max_pending_per_user=2)
+        started, release = asyncio.Event(), asyncio.Event()
+        batches = []
+
+        async def run(batch):
+            batches.append([m.text for m in batch])
+            started.set()
+            await release.wait()
+
+        worker = asyncio.create_task(queue.submit(1, QueuedMessage(1, "running"), run))
+        await started.wait()
+        accepted = [await queue.submit(1, QueuedMessage(1, t), run) for t in ("w1", "w2", "w3")]
+        assert accepted == [True, True, False], f"Third waiting message should be rejected, got {accepted}"
+        assert queue.pending(1) == 2 and queue.stats["rejected"] == 1
+        other = asyncio.create_task(queue.submit(2, QueuedMessage(2, "other user"), run))
+        await asyncio.sleep(0)
+        assert queue.stats["rejected"] == 1, "Cap is per user"
+        release.set()
+        assert await worker and await other
+        assert ["w1", "w2"] in batches and ["w3"] not in batches
+
+    asyncio.run(scenario())
+    print("  ✓ Messages over the cap are rejected")
+
+
+def test_global_turn_cap():
+    """No more than max_concurrent_turns turns run at once across users"""
+    print("Testing the global concurrent-turn cap...")
+
+    async def scenario():
+        queue = TurnQueue(coalesce_ms=0, max_concurrent_turns=2)
+        running, peak = [0], [0]
+
+        async def run(batch):
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+            await asyncio.sleep(0.02)
+            running[0] -= 1
+
+        await asyncio.gather(*(queue.submit(uid, QueuedMessage(uid, "hi"), run) for uid in range(5)))
+        assert peak[0] == 2, f"Expected at most 2 concurrent turns, saw {peak[0]}"
+        assert queue.stats["turns"] == 5 and queue.stats["waited_for_slot"] == 3
+
+    asyncio.run(scenario())
+    print("  ✓ Turns beyond the cap wait for a slot")
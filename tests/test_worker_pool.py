@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Tests for the warm worker pool (tools/telegram/worker_pool.py)
+Tests: captured output and exit codes, timeout kill, recycle after max_requests, crashes
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+# The bot's modules import each other by bare name
+sys.path.insert(0, str(Path(__file__).parent.parent / "tools" / "telegram"))
+
+from worker_pool import WorkerPool
+
+SCRIPT = """\
+import os, sys, time
+if sys.argv[1] == "sleep":
+    time.sleep(30)
+if sys.argv[1] == "crash":
+    os._exit(3)
+print(os.getpid())
+print("to stderr", file=sys.stderr)
+sys.exit(int(sys.argv[2]) if len(sys.argv) > 2 else 0)
+"""
+
+
+def _script() -> str:
+    path = Path(tempfile.mkdtemp()) / "pooled.py"
+    path.write_text(SCRIPT)
+    return str(path)
+
+
+def _pid(result: subprocess.CompletedProcess) -> int:
+    return int(result.stdout.split()[0])
+
+
+def test_run_like_subprocess():
+    """Output and exit code come back as a CompletedProcess; a worker serves several runs"""
+    print("Testing runs on a warm worker...")
+
+    script = _script()
+    pool = WorkerPool(size=1, max_requests=10)
+    try:
+        first = pool.run([sys.executable, script, "a", "4"])
+        assert first.returncode == 4, "Exit code not passed through"
+        assert first.stderr.strip() == "to stderr", "stderr not captured"
+        second = pool.run([sys.executable, script, "b"])
+        assert second.returncode == 0 and _pid(second) == _pid(first), "Worker should be reused"
+        assert _pid(first) != os.getpid(), "Script should run outside the calling process"
+        assert pool.stats["spawned"] == 1 and pool.stats["runs"] == 2
+    finally:
+        pool.close()
+    print("  ✓ Runs return CompletedProcess on a reused worker")
+
+
+def test_timeout_kills_worker():
+    """A run past its timeout raises TimeoutExpired, and its worker is killed and replaced"""
+    print("Testing timeout kill...")
+
+    script = _script()
+    pool = WorkerPool(size=1, max_requests=10)
+    try:
+        before = _pid(pool.run([sys.executable, script, "a"]))
+        try:
+            pool.run([sys.executable, script, "sleep"], timeout=0.5)
+            raise AssertionError("Expected subprocess.TimeoutExpired")
+        except subprocess.TimeoutExpired:
+            pass
+        assert pool.stats["timeouts"] == 1
+        try:
+            os.kill(before, 0)
+            raise AssertionError("Timed-out worker is still running")
+        except ProcessLookupError:
+            pass
+        after = pool.run([sys.executable, script, "b"])
+        assert after.returncode == 0 and _pid(after) != before, "Next run should get a fresh worker"
+        assert pool.stats["spawned"] == 2
+    finally:
+        pool.close()
+    print("  ✓ Timed-out worker is killed and replaced")
+
+
+def test_recycle_after_max_requests():
+    """A worker is replaced after max_requests runs"""
+    print("Testing recycling...")
+
+    script = _script()
+    pool = WorkerPool(size=1, max_requests=2)
+    try:
+        pids = [_pid(pool.run([sys.executable, script, str(i)])) for i in range(5)]
+        assert pids[0] == pids[1] and pids[2] == pids[3] and pids[4] not in pids[:4], f"Unexpected workers {pids}"
+        assert pids[1] != pids[2], "Worker should be replaced after 2 runs"
+        assert pool.stats["recycled"] == 2 and pool.stats["spawned"] == 3
+    finally:
+        pool.close()
+    print("  ✓ Workers recycle after max_requests")
+
+
+def test_crash_reported_not_retried():
+    """A worker that dies mid-run gives a failed result once, and the pool recovers"""
+    print("Testing crash handling...")
+
+    script = _script()
+    pool = WorkerPool(size=1, max_requests=10)
+    try:
+        crashed = pool.run([sys.executable, script, "crash"])
+        assert crashed.returncode == -1 and "worker process died" in crashed.stderr
+        assert pool.stats["crashed"] == 1 and pool.stats["runs"] == 1, "Crashed run should not be retried"
+        assert pool.run([sys.executable, script, "a"]).returncode == 0, "Pool should start a new worker"
+    finally:
+        pool.close()
+    print("  ✓ Crash is reported once and the pool recovers")
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Journal Store
+
+Date-indexed SQLite copy of the journal CSV export (data/journal.db), so readers
+query a date range instead of parsing and sorting the whole export every time.
+Used by the Telegram bot's journal_read_recent tool, weekly_review and vault_onboard.
+
+Each read first syncs the store with the CSV (keyed by its resolved path):
+  - unchanged size/mtime: nothing to do
+  - file grew and the bytes before the old end are unchanged (new entries appended):
+    parsing resumes at the end of the last complete record (a newline outside quotes),
+    so a row that was cut short, or a quoted multi-line entry caught mid-write,
+    is dropped and parsed again whole
+  - anything else (MindsetLog sync rewrote the file, export replaced): re-ingest it
+Rows keep every CSV column as in csv.DictReader, so callers use the same keys
+("Date", "Time", "Entry Text", "Mood Rating", ...).
+
+Usage:
+    python3 tools/briefings/journal_store.py <csv> [--from YYYY-MM-DD] [--to YYYY-MM-DD]
+"""
+
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import sys
+from datetime import date
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+DEFAULT_DB_PATH = REPO_ROOT / "data" / "journal.db"
+
+# Bytes before the previous end of file compared to detect an append-only change
+FINGERPRINT_BYTES = 4096
+
+
+def _connect(db_path: Path) -> sqlite3.Connection:
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    columns = {r[1] for r in conn.execute("PRAGMA table_info(journal_files)")}
+    if columns and "record_end" not in columns:
+        # Store from before record boundaries were tracked: rebuild it from the CSVs
+        with conn:
+            conn.execute("DROP TABLE journal_files")
+            conn.execute("DROP TABLE IF EXISTS journal_entries")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS journal_files (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            header TEXT NOT NULL,
+            fingerprint TEXT NOT NULL,
+            record_end INTEGER NOT NULL,
+            complete_rows INTEGER NOT NULL,
+            rows INTEGER NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS journal_entries (
+            path TEXT NOT NULL,
+            row_num INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            time TEXT NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (path, row_num)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_journal_date ON journal_entries(path, date, time)")
+    return conn
+
+
+def _fingerprint(f, end: int) -> str:
+    """Hash of the FINGERPRINT_BYTES of f just before offset end."""
+    start = max(0, end - FINGERPRINT_BYTES)
+    f.seek(start)
+    return hashlib.sha1(f.read(end - start)).hexdigest()
+
+
+def _last_record_end(data: bytes) -> int:
+    """Offset just past the last newline outside a quoted field (0 if none): where the next record starts."""
+    end = 0
+    pos = 0
+    # Splitting on quotes alternates outside/inside fields; an escaped "" toggles twice
+    for i, part in enumerate(data.split(b'"')):
+        if i % 2 == 0:
+            newline = part.rfind(b"\n")
+            if newline >= 0:
+                end = pos + newline + 1
+        pos += len(part) + 1
+    return end
+
+
+def _insert_rows(conn: sqlite3.Connection, path: str, header: list, data: bytes, first_row: int) -> int:
+    reader = csv.DictReader(io.StringIO(data.decode("utf-8", errors="replace")), fieldnames=header)
+    count = 0
+    for count, row in enumerate(reader, start=1):
+        conn.execute(
+            "INSERT OR REPLACE INTO journal_entries (path, row_num, date, time, data) VALUES (?, ?, ?, ?, ?)",
+            (path, first_row + count - 1, (row.get("Date") or "").strip(), (row.get("Time") or "").strip(),
+             json.dumps(row)),
+        )
+    return count
+
+
+def _ingest_from(conn, path: str, header: list, data: bytes, start: int, first_row: int) -> tuple:
+    """
+    Insert the records in data (which begins at file offset start, on a record boundary).
+
+    Returns (record_end, complete_rows, rows): rows before the last record boundary are
+    final; anything after it (no trailing newline yet, or a quoted field still being
+    written) is stored too, but is replaced on the next append.
+    """
+    boundary = _last_record_end(data)
+    complete = first_row + _insert_rows(conn, path, header, data[:boundary], first_row)
+    rows = complete + _insert_rows(conn, path, header, data[boundary:], complete)
+    return start + boundary, complete, rows
+
+
+def sync(csv_path: Path, db_path: Path = DEFAULT_DB_PATH, conn: sqlite3.Connection | None = None) -> dict:
+    """
+    Bring the store up to date with csv_path.
+
+    Returns {"mode": "unchanged" | "appended" | "full", "rows_added": n, "rows": total}.
+    Raises OSError if the CSV can't be read.
+    """
+    own = conn is None
+    conn = conn or _connect(db_path)
+    try:
+        path = str(Path(csv_path).resolve())
+        st = os.stat(path)
+        known = conn.execute(
+            "SELECT size, mtime_ns, header, fingerprint, record_end, complete_rows, rows "
+            "FROM journal_files WHERE path = ?", (path,)
+        ).fetchone()
+        if known and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+            return {"mode": "unchanged", "rows_added": 0, "rows": known[6]}
+
+        with open(path, "rb") as f:
+            size, _, header, fingerprint, record_end, complete_rows, old_rows = known or (0,) * 7
+            # Appended? The bytes before the old end must be unchanged, and the header complete
+            if known and st.st_size > size and record_end > 0 and _fingerprint(f, size) == fingerprint:
+                f.seek(record_end)
+                data = f.read()
+                with conn:
+                    conn.execute(
+                        "DELETE FROM journal_entries WHERE path = ? AND row_num >= ?", (path, complete_rows)
+                    )
+                    new_end, complete, rows = _ingest_from(
+                        conn, path, json.loads(header), data, record_end, complete_rows
+                    )
+                    new_size = record_end + len(data)
+                    conn.execute(
+                        "UPDATE journal_files SET size = ?, mtime_ns = ?, fingerprint = ?, record_end = ?, "
+                        "complete_rows = ?, rows = ? WHERE path = ?",
+                        (new_size, st.st_mtime_ns, _fingerprint(f, new_size), new_end, complete, rows, path),
+                    )
+                return {"mode": "appended", "rows_added": rows - old_rows, "rows": rows}
+
+            f.seek(0)
+            raw = f.read()
+            header_end = raw.find(b"\n") + 1
+            header = next(csv.reader(io.StringIO(raw[:header_end or len(raw)].decode("utf-8-sig", errors="replace"))), [])
+            with conn:
+                conn.execute("DELETE FROM journal_entries WHERE path = ?", (path,))
+                if header_end:
+                    record_end, complete, rows = _ingest_from(conn, path, header, raw[header_end:], header_end, 0)
+                else:
+                    record_end, complete, rows = 0, 0, 0  # header not even complete: re-ingest next time
+                conn.execute(
+                    "INSERT OR REPLACE INTO journal_files "
+                    "(path, size, mtime_ns, header, fingerprint, record_end, complete_rows, rows) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (path, len(raw), st.st_mtime_ns, json.dumps(header), _fingerprint(f, len(raw)),
+                     record_end, complete, rows),
+                )
+        return {"mode": "full", "rows_added": rows, "rows": rows}
+    finally:
+        if own:
+            conn.close()
+
+
+def _as_iso(d) -> str:
+    return d.isoformat() if isinstance(d, date) else str(d)
+
+
+def read_range(csv_path: Path, start, end, newest_first: bool = False, db_path: Path = DEFAULT_DB_PATH) -> list[dict]:
+    """Rows with Date in [start, end] inclusive (dates or YYYY-MM-DD strings), by date and time."""
+    order = "DESC" if newest_first else "ASC"
+    conn = _connect(db_path)
+    try:
+        sync(csv_path, conn=conn)
+        cur = conn.execute(
+            f"SELECT data FROM journal_entries WHERE path = ? AND date >= ? AND date <= ? "
+            f"ORDER BY date {order}, time {order}, row_num {order}",
+            (str(Path(csv_path).resolve()), _as_iso(start), _as_iso(end)),
+        )
+        return [json.loads(r[0]) for r in cur]
+    finally:
+        conn.close()
+
+
+def read_all(csv_path: Path, db_path: Path = DEFAULT_DB_PATH) -> list[dict]:
+    """Every row, in CSV order."""
+    conn = _connect(db_path)
+    try:
+        sync(csv_path, conn=conn)
+        cur = conn.execute(
+            "SELECT data FROM journal_entries WHERE path = ? ORDER BY row_num", (str(Path(csv_path).resolve()),)
+        )
+        return [json.loads(r[0]) for r in cur]
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync and query the date-indexed journal store")
+    parser.add_argument("csv", help="Journal CSV export")
+    parser.add_argument("--from", dest="start", default="0000-00-00", help="First date (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end", default="9999-99-99", help="Last date (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    try:
+        stats = sync(Path(args.csv))
+        rows = read_range(Path(args.csv), args.start, args.end)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Journal store error: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps({"sync": stats, "entries": rows}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,6 @@ Surfaces nudges only when something's actually worth flagging.
 Sends to Telegram at 5pm Friday (cron). Also runnable via /run weekly_review.
 """
 
-import csv
 import json
 import os
 import sys
@@ -21,12 +20,14 @@ try:
     from tools.briefings.journal_backup import backup_week
     from tools.briefings.journal_recap import generate_recap
     from tools.briefings.health_stats import get_week_health_stats, format_health_summary
+    from tools.briefings import journal_store
 except ImportError:
     # Fallback for direct execution
     sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
     from tools.briefings.journal_backup import backup_week
     from tools.briefings.journal_recap import generate_recap
     from tools.briefings.health_stats import get_week_health_stats, format_health_summary
+    from tools.briefings import journal_store
 
 # Load .env when run by cron
 try:
@@ -65,20 +66,12 @@ def _find_journal_csv() -> Path | None:
 
 
 def _parse_journal_range(csv_path: Path, start: datetime, end: datetime) -> list[dict]:
-    """Return rows with Date in [start.date(), end.date()] inclusive."""
-    rows = []
+    """Return rows with Date in [start.date(), end.date()] inclusive (from the date-indexed journal store)."""
     try:
-        with open(csv_path, newline="", encoding="utf-8") as f:
-            for row in csv.DictReader(f):
-                try:
-                    d = datetime.strptime(row["Date"].strip(), "%Y-%m-%d").date()
-                    if start.date() <= d <= end.date():
-                        rows.append(row)
-                except (KeyError, ValueError):
-                    continue
+        return journal_store.read_range(csv_path, start.date(), end.date())
     except Exception as e:
         print(f"Journal parse error: {e}", file=sys.stderr)
-    return rows
+        return []
 
 
 def _week_stats(rows: list[dict]) -> dict:
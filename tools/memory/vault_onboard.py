@@ -13,7 +13,6 @@ memory_db entries tagged source=vault_onboard.
 
 from __future__ import annotations
 
-import csv
 import json
 import subprocess
 import sys
@@ -34,13 +33,16 @@ REPO_ROOT = Path(__file__).resolve().parent.parent.parent  # atlas/
 USER_MD = REPO_ROOT / "context" / "USER.md"
 MEMORY_DB_SCRIPT = REPO_ROOT / "memory" / "memory_db.py"
 
+sys.path.insert(0, str(REPO_ROOT))
+from tools.briefings import journal_store  # noqa: E402
+
 
 # ---------------------------------------------------------------------------
 # Journal analysis (pure Python — no LLM needed for stats)
 # ---------------------------------------------------------------------------
 def analyse_journals() -> dict:
     """Parse journal CSV and compute stats + sample entries for summarisation."""
-    rows = list(csv.DictReader(JOURNAL_CSV.open(newline="", encoding="utf-8")))
+    rows = journal_store.read_all(JOURNAL_CSV)
 
     # Monthly buckets
     months: dict[str, list] = defaultdict(list)
@@ -248,7 +250,7 @@ The more you know, the better you can help. But remember — you're learning abo
 
 
 def write_memory_db(travel: dict, work: dict, journal_summary: str):
-    """Add searchable entries to memory_db via the CLI script."""
+    """Upsert searchable entries into memory_db via the CLI script's bulk import."""
     entries = [
         ("Travel profile: ~40 countries, top memories Kenya/Antarctica/Japan/NZ/Cuba. "
          "Style: experience-led, food-curious, depth over accumulation. "
@@ -276,19 +278,25 @@ def write_memory_db(travel: dict, work: dict, journal_summary: str):
          "insight", 7, "journals"),
     ]
 
-    for content, entry_type, importance, tag in entries:
-        result = subprocess.run(
-            [sys.executable, str(MEMORY_DB_SCRIPT),
-             "--action", "add",
-             "--content", content,
-             "--type", entry_type,
-             "--importance", str(importance),
-             "--source", "external",
-             "--tags", tag],
-            capture_output=True, text=True, cwd=str(REPO_ROOT)
-        )
-        status = "OK" if result.returncode == 0 else f"FAIL: {result.stderr.strip()}"
-        print(f"  memory_db [{tag}]: {status}")
+    # One import call: every entry is written in a single transaction, and
+    # re-runs overwrite the earlier rows instead of failing as duplicates
+    rows = [
+        {"content": content, "type": entry_type, "importance": importance,
+         "source": "external", "tags": [tag]}
+        for content, entry_type, importance, tag in entries
+    ]
+    result = subprocess.run(
+        [sys.executable, str(MEMORY_DB_SCRIPT),
+         "--action", "import",
+         "--file", "-",
+         "--upsert"],
+        input="\n".join(json.dumps(row) for row in rows) + "\n",
+        capture_output=True, text=True, cwd=str(REPO_ROOT)
+    )
+    if result.returncode != 0:
+        print(f"  memory_db: FAIL: {(result.stderr or result.stdout).strip()}")
+        return
+    print(f"  memory_db: {result.stdout.splitlines()[0]}")
 
 
 # ---------------------------------------------------------------------------
@@ -3,6 +3,8 @@ Telegram bot entry point.
 
 Starts a polling loop, routes incoming messages to the conversation handler,
 and sends replies back. Enforces user allowlist and typing indicators from config.
+Replies stream in: a message is sent as soon as the model starts answering and
+edited (throttled) as it grows, with short status lines during tool rounds.
 
 Run:
     python3 tools/telegram/bot.py
@@ -14,6 +16,7 @@ import asyncio
 import logging
 import re
 import subprocess
+import time
 from pathlib import Path
 from contextlib import asynccontextmanager
 
@@ -23,11 +26,13 @@ sys.path.insert(0, str(Path(__file__).parent))
 from telegram import Update
 from telegram.ext import Application, MessageHandler, filters
 from telegram.constants import ChatAction
+from telegram.error import BadRequest, RetryAfter
 
 from config import load_config, get_repo_root
-from conversation import handle_message, reset_session, handle_models_command
+from conversation import handle_message, stream_message, reset_session, handle_models_command
 from commands import route as route_command, get_trial_prep_message, get_code_directive, get_rotary_directive, get_schedule_directive, get_episode_directive, get_episode_directive_for_episode_id, get_build_directive, trigger_restart, can_restart
 from group_manager import register_chat
+from turn_queue import TurnQueue, QueuedMessage, merge_texts, DEFAULT_COALESCE_MS, DEFAULT_MAX_PENDING_PER_USER, DEFAULT_MAX_CONCURRENT_TURNS
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 # Short-term error log: always write to file so failures are visible even if stderr isn't captured
@@ -42,6 +47,32 @@ logger = logging.getLogger(__name__)
 # Used by git_sync_and_restart to avoid restarting while the bot is handling a message
 BOT_BUSY_FILE = get_repo_root() / "data" / "bot_busy_since"
 
+# Turns in progress across all chats; the busy file is removed only when the last one ends
+_active_turns = 0
+
+
+def _turn_started() -> None:
+    """Count a turn and (re)touch the busy file so its mtime tracks the latest activity."""
+    global _active_turns
+    _active_turns += 1
+    try:
+        BOT_BUSY_FILE.parent.mkdir(parents=True, exist_ok=True)
+        BOT_BUSY_FILE.touch()
+    except OSError:
+        pass
+
+
+def _turn_finished() -> None:
+    """Uncount a turn; clear the busy file once no turn is running so git_sync can restart."""
+    global _active_turns
+    _active_turns = max(0, _active_turns - 1)
+    if _active_turns:
+        return
+    try:
+        BOT_BUSY_FILE.unlink(missing_ok=True)
+    except OSError:
+        pass
+
 
 @asynccontextmanager
 async def show_typing(chat, interval: int = 4):
@@ -468,6 +499,77 @@ def _escape_markdown(text: str) -> str:
     return "".join(parts)
 
 
+# Streaming replies: minimum seconds between edits of the placeholder message
+# (Telegram throttles edits; bot.stream_edit_interval in telegram.yaml)
+STREAM_EDIT_INTERVAL_SEC = 1.5
+TELEGRAM_MAX_MESSAGE = 4096
+
+
+def _retry_after_seconds(error: RetryAfter) -> float:
+    """RetryAfter.retry_after is a timedelta in newer python-telegram-bot releases, seconds before."""
+    delay = error.retry_after
+    return delay.total_seconds() if hasattr(delay, "total_seconds") else float(delay)
+
+
+class _StreamingReply:
+    """Reply message that is sent on the first event and then edited in place as the reply grows."""
+
+    def __init__(self, source_message, interval: float):
+        self._source = source_message
+        self._interval = interval
+        self._sent = None
+        self._shown = ""
+        self._next_edit = 0.0
+
+    @property
+    def started(self) -> bool:
+        return self._sent is not None
+
+    async def update(self, text: str) -> None:
+        """Show interim text, throttled. Sent as plain text: half-written Markdown may not parse."""
+        text = text.strip()
+        if len(text) > TELEGRAM_MAX_MESSAGE:
+            text = text[:TELEGRAM_MAX_MESSAGE - 1] + "…"
+        if not text or text == self._shown:
+            return
+        now = time.monotonic()
+        if self._sent is None:
+            self._sent = await self._source.reply_text(text)
+        elif now < self._next_edit:
+            return
+        else:
+            try:
+                await self._sent.edit_text(text)
+            except RetryAfter as e:
+                self._next_edit = now + _retry_after_seconds(e)
+                return
+            except BadRequest as e:
+                logger.debug("Streaming edit skipped: %s", e)
+        self._shown = text
+        self._next_edit = now + self._interval
+
+    async def finish(self, text: str) -> None:
+        """Replace the interim text with the final reply (Markdown), or send it if nothing was shown yet."""
+        if self._sent is None:
+            await self._source.reply_text(_escape_markdown(text), parse_mode="Markdown")
+            return
+        try:
+            await self._edit_final(text)
+        except RetryAfter as e:
+            await asyncio.sleep(_retry_after_seconds(e))
+            await self._edit_final(text)
+
+    async def _edit_final(self, text: str) -> None:
+        """Edit in the final reply as Markdown; plain text if Telegram can't parse it."""
+        try:
+            await self._sent.edit_text(_escape_markdown(text), parse_mode="Markdown")
+        except BadRequest as e:
+            if "not modified" in str(e).lower():
+                return
+            logger.warning("Final Markdown edit failed (%s) — sending plain text", e)
+            await self._sent.edit_text(text)
+
+
 async def _post_init(application) -> None:
     """Send a short 'Connected' message so /restart has visible confirmation."""
     config = load_config()
@@ -484,6 +586,22 @@ async def _post_init(application) -> None:
             logger.warning("Could not send startup notification: %s", e)
 
 
+_turn_queue = None
+
+
+def _get_turn_queue() -> TurnQueue:
+    """The bot's per-user turn queue, configured from the bot section of telegram.yaml."""
+    global _turn_queue
+    if _turn_queue is None:
+        bot_cfg = load_config().get("bot", {})
+        _turn_queue = TurnQueue(
+            coalesce_ms=int(bot_cfg.get("coalesce_ms", DEFAULT_COALESCE_MS)),
+            max_pending_per_user=int(bot_cfg.get("max_pending_per_user", DEFAULT_MAX_PENDING_PER_USER)),
+            max_concurrent_turns=int(bot_cfg.get("max_concurrent_turns", DEFAULT_MAX_CONCURRENT_TURNS)),
+        )
+    return _turn_queue
+
+
 async def on_message(update: Update, context) -> None:
     """Handle an incoming text message."""
     config = load_config()
@@ -624,6 +742,25 @@ async def on_message(update: Update, context) -> None:
                             except (FileNotFoundError, json.JSONDecodeError):
                                 pass
 
+    # --- Queue the turn: one at a time per user, rapid-fire messages merged (turn_queue.py) ---
+    # Commands, directives and replies to earlier messages always run as their own turn
+    coalesce = text == update.message.text and not update.message.reply_to_message and not msg_stripped.startswith("/")
+    queued = await _get_turn_queue().submit(
+        user_id,
+        QueuedMessage(chat.id, text, (update, context, redirect_build_to_coding, coding_group_id), coalesce),
+        _run_turn,
+    )
+    if not queued:
+        await update.message.reply_text("I'm still working through your earlier messages — send this again in a moment.")
+
+
+async def _run_turn(batch: list) -> None:
+    """Handle one turn: a single message, or several rapid-fire messages merged into one."""
+    update, context, redirect_build_to_coding, coding_group_id = batch[-1].payload
+    text = merge_texts(batch)
+    config = load_config()
+    user_id = update.effective_user.id
+
     # --- Start continuous typing indicator ---
     typing_enabled = config.get("bot", {}).get("typing_indicator", True)
     stop_typing = asyncio.Event()
@@ -633,14 +770,9 @@ async def on_message(update: Update, context) -> None:
     if typing_enabled:
         typing_task = asyncio.create_task(_keep_typing(update.message.chat, stop_typing))
 
+    # Signal that we're handling a message (for git_sync_and_restart: don't restart mid-turn)
+    _turn_started()
     try:
-        # Signal that we're handling a message (for git_sync_and_restart: don't restart mid-turn)
-        try:
-            BOT_BUSY_FILE.parent.mkdir(parents=True, exist_ok=True)
-            BOT_BUSY_FILE.touch()
-        except OSError:
-            pass
-
         # --- Handle /reset and /new (clear session, fresh context on next message) ---
         if update.message.text.strip().lower() in ("/reset", "/clear", "/new"):
             reset_session(user_id)
@@ -682,6 +814,27 @@ async def on_message(update: Update, context) -> None:
         )
 
         # --- Process message via LLM ---
+        bot_cfg = config.get("bot", {})
+        if bot_cfg.get("streaming", True) and not redirect_build_to_coding:
+            # Stream: first event sends a message, later ones edit it; the final reply replaces it
+            streaming_reply = _StreamingReply(
+                update.message, float(bot_cfg.get("stream_edit_interval", STREAM_EDIT_INTERVAL_SEC))
+            )
+            partial = ""
+            reply = ""
+            async for event in stream_message(text, user_id):
+                if event["type"] == "reply":
+                    reply = event["text"]
+                elif event["type"] == "partial":
+                    partial = event["text"]
+                    await streaming_reply.update(partial)
+                elif event["type"] == "status":
+                    await streaming_reply.update((partial + "\n\n" if partial else "") + event["text"])
+                if streaming_reply.started and delayed_status_task and not delayed_status_task.done():
+                    delayed_status_task.cancel()
+            await streaming_reply.finish(reply or "(no response)")
+            return
+
         reply = await handle_message(text, user_id)
         if redirect_build_to_coding:
             await context.bot.send_message(
@@ -699,12 +852,7 @@ async def on_message(update: Update, context) -> None:
         logger.exception("Error handling message")
         await update.message.reply_text(_escape_markdown(f"Couldn't do that: {e}"), parse_mode="Markdown")
     finally:
-        # Clear busy indicator so git_sync can restart when idle
-        try:
-            if BOT_BUSY_FILE.exists():
-                BOT_BUSY_FILE.unlink()
-        except OSError:
-            pass
+        _turn_finished()
         # Cancel delayed "taking longer" message if we already replied
         if delayed_status_task and not delayed_status_task.done():
             delayed_status_task.cancel()
@@ -739,7 +887,16 @@ def main():
     from telegram.request import HTTPXRequest
     # Increase timeouts: connect=30s, read=30s, write=30s, pool=30s
     request = HTTPXRequest(connection_pool_size=8, connect_timeout=30.0, read_timeout=30.0, write_timeout=30.0, pool_timeout=30.0)
-    app = Application.builder().token(token).request(request).post_init(_post_init).build()
+    # Handle chats concurrently; model calls are non-blocking and limited per provider (llm.py)
+    concurrent = load_config().get("bot", {}).get("concurrent_updates", 8)
+    app = (
+        Application.builder()
+        .token(token)
+        .request(request)
+        .post_init(_post_init)
+        .concurrent_updates(concurrent)
+        .build()
+    )
 
     # Handle all text messages (including /reset, /clear)
     app.add_handler(MessageHandler(filters.TEXT, on_message))
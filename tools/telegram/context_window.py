@@ -0,0 +1,186 @@
+"""
+Token-budgeted context window.
+
+Fits a session's history into a per-provider token budget (context.budgets in
+args/telegram.yaml) before each turn. Cheapest cuts first:
+  1. shrink stale tool results and injected prefetch context, oldest first
+  2. drop whole turns (user message + its assistant/tool replies), oldest first
+The newest turn is never dropped, and turns are removed whole so no assistant
+tool_calls message loses its tool results. split_for_summary() picks the oldest
+turns to fold into a session's rolling summary (see conversation.py).
+
+Token counts use tiktoken when installed, otherwise ~4 characters per token.
+"""
+
+import json
+import logging
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+    HAS_TIKTOKEN = True
+except Exception:  # ImportError, or the encoding can't be downloaded offline
+    _ENCODING = None
+    HAS_TIKTOKEN = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUDGETS = {"minimax": 32000, "openrouter": 24000, "ollama": 12000}
+DEFAULT_BUDGET = 24000
+DEFAULT_STALE_TOOL_RESULT_CHARS = 600
+
+# Per-message framing overhead (role, separators) in chat formats
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# User-role messages injected by the intent prefetch (conversation.py); stale like tool results
+INJECTED_CONTEXT_PREFIXES = (
+    "[Context already fetched",
+    "[Reminders already fetched",
+    "[Current reminders",
+)
+
+TRUNCATION_MARK = "\n…[truncated older result]"
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of a string."""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def message_tokens(message: dict) -> int:
+    """Approximate tokens for one chat message, including tool call arguments."""
+    tokens = MESSAGE_OVERHEAD_TOKENS + estimate_tokens(message.get("content") or "")
+    for tc in message.get("tool_calls") or []:
+        fn = tc.get("function") or {}
+        tokens += estimate_tokens(fn.get("name") or "") + estimate_tokens(fn.get("arguments") or "")
+    return tokens
+
+
+def messages_tokens(messages: list) -> int:
+    return sum(message_tokens(m) for m in messages)
+
+
+def tools_tokens(tools: list) -> int:
+    """Approximate tokens the tool schemas add to a request."""
+    return estimate_tokens(json.dumps(tools, separators=(",", ":"))) if tools else 0
+
+
+def is_stale_context(message: dict) -> bool:
+    """Tool results and injected prefetch context: bulky, and only needed for the turn they were fetched in."""
+    if message.get("role") == "tool":
+        return True
+    content = message.get("content") or ""
+    return message.get("role") == "user" and content.startswith(INJECTED_CONTEXT_PREFIXES)
+
+
+def budget_for(provider: str, config: dict) -> int:
+    """Token budget for a provider: context.budgets, then context.default_budget, then the built-in table."""
+    ctx_cfg = config.get("context") or {}
+    budgets = ctx_cfg.get("budgets") or {}
+    if provider in budgets:
+        return int(budgets[provider])
+    if ctx_cfg.get("default_budget") is not None:
+        return int(ctx_cfg["default_budget"])
+    return int(DEFAULT_BUDGETS.get(provider, DEFAULT_BUDGET))
+
+
+def _turn_starts(messages: list) -> list[int]:
+    """Indexes where a turn begins: user messages typed by the user (not injected context)."""
+    return [i for i, m in enumerate(messages) if m.get("role") == "user" and not is_stale_context(m)]
+
+
+def fit_history(messages: list, budget: int, reserved: int = 0, stale_chars: int = DEFAULT_STALE_TOOL_RESULT_CHARS):
+    """
+    Return (messages, stats) with history trimmed to fit budget - reserved tokens.
+
+    reserved: tokens already committed elsewhere in the request (system prompt).
+    The input list is not modified; shrunk messages are copies.
+    """
+    limit = max(0, budget - reserved)
+    out = list(messages)
+    before = messages_tokens(out)
+    total = before
+    truncated = 0
+    dropped = 0
+
+    # 1. Shrink stale tool results / injected context outside the newest turn, oldest first
+    starts = _turn_starts(out)
+    newest = starts[-1] if starts else len(out)
+    for i in range(newest):
+        if total <= limit:
+            break
+        m = out[i]
+        content = m.get("content") or ""
+        if is_stale_context(m) and len(content) > stale_chars + len(TRUNCATION_MARK):
+            shrunk = dict(m, content=content[:stale_chars] + TRUNCATION_MARK)
+            total += message_tokens(shrunk) - message_tokens(m)
+            out[i] = shrunk
+            truncated += 1
+
+    # 2. Drop whole turns, oldest first, keeping the newest
+    while total > limit:
+        starts = _turn_starts(out)
+        if len(starts) < 2:
+            break
+        # Anything before the first turn start (orphans from older trimming) goes with it
+        cut = starts[1]
+        total -= messages_tokens(out[:cut])
+        dropped += cut
+        out = out[cut:]
+
+    stats = {
+        "budget": budget,
+        "reserved": reserved,
+        "tokens_before": before,
+        "tokens_after": total,
+        "truncated": truncated,
+        "dropped_messages": dropped,
+    }
+    if truncated or dropped:
+        logger.info(
+            "Context trimmed to budget %d: history %d → %d tokens (%d results shrunk, %d messages dropped)",
+            budget, before, total, truncated, dropped,
+        )
+    if total > limit:
+        logger.warning("Newest turn alone (%d tokens) exceeds the context budget (%d)", total, limit)
+    return out, stats
+
+
+def split_for_summary(messages: list, keep_tokens: int) -> tuple[list, list]:
+    """
+    Split history at a turn boundary into (oldest turns to fold into a summary, recent turns to keep).
+
+    Keeps as many of the newest turns as fit in keep_tokens (always at least the newest
+    turn); returns ([], messages) when there is nothing older to fold.
+    """
+    starts = _turn_starts(messages)
+    if len(starts) < 2:
+        return [], messages
+    cut = starts[-1]
+    tail = messages_tokens(messages[cut:])
+    for i in range(len(starts) - 2, 0, -1):
+        tail += messages_tokens(messages[starts[i]:starts[i + 1]])
+        if tail > keep_tokens:
+            break
+        cut = starts[i]
+    return messages[:cut], messages[cut:]
+
+
+def format_transcript(messages: list, tool_chars: int = 300) -> str:
+    """Plain-text transcript for summarization; tool results and fetched context are clipped."""
+    lines = []
+    for m in messages:
+        role = m.get("role", "?")
+        content = (m.get("content") or "").strip()
+        if is_stale_context(m) and len(content) > tool_chars:
+            content = content[:tool_chars] + "…"
+        calls = [(tc.get("function") or {}).get("name", "?") for tc in m.get("tool_calls") or []]
+        if calls:
+            content = (content + "\n" if content else "") + f"(called tools: {', '.join(calls)})"
+        if content:
+            lines.append(f"{role.upper()}: {content}")
+    return "\n\n".join(lines)
@@ -2,20 +2,28 @@
 Conversation handler.
 
 Manages per-user state and runs the Claude tool_use loop.
-On first message from a user, loads memory and builds the system prompt.
+On first message from a user, attaches the system prompt (built from memory and
+the context files, cached until one of them changes).
 Each subsequent message appends to the existing conversation history.
+Model calls go through llm.py (async clients, per-provider concurrency limits
+and timeouts), so one user's completion never blocks the event loop.
+stream_message() yields the reply progressively for bot.py to edit into place.
 """
 
 import os
 import json
+import asyncio
 import sqlite3
 import logging
-import openai
+from datetime import datetime, timedelta
 from pathlib import Path
+from types import SimpleNamespace
 
 from config import load_config, get_repo_root
-from tool_definitions import TOOL_DEFINITIONS
+import context_window
+import llm
 import tool_runner
+import tool_selector
 
 REPO_ROOT = get_repo_root()
 logger = logging.getLogger(__name__)
@@ -24,26 +32,64 @@ _SESSIONS_PATH = REPO_ROOT / "data" / "sessions.json"
 _SESSIONS_DB_PATH = REPO_ROOT / "data" / "sessions.db"
 
 
-def _init_db() -> None:
-    """Initialize the sessions database table."""
-    try:
+# Sessions persist incrementally: `sessions` holds one small metadata row per user
+# (model_id, summary, base_seq) and `session_messages` is an append-only log with one
+# row per message. In memory, session["messages"][i] is log row base_seq + i, and rows
+# below next_seq are already written, so each save inserts only the new messages.
+# Turns dropped by the context budget or folded into the summary advance base_seq and
+# their rows are pruned in the same transaction.
+_db_conn = None
+_db_conn_path = None
+
+
+def _db() -> sqlite3.Connection:
+    """
+    Shared connection to the sessions DB, opened on first use (reopened if the path
+    changes, e.g. in tests). Opening it creates the tables and migrates sessions.json,
+    so importing this module touches no files.
+    """
+    global _db_conn, _db_conn_path
+    if _db_conn is None or _db_conn_path != _SESSIONS_DB_PATH:
         _SESSIONS_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-        with sqlite3.connect(_SESSIONS_DB_PATH) as conn:
+        _db_conn = sqlite3.connect(_SESSIONS_DB_PATH, check_same_thread=False)
+        _db_conn.execute("PRAGMA journal_mode=WAL")
+        _db_conn.execute("PRAGMA synchronous=NORMAL")
+        _db_conn_path = _SESSIONS_DB_PATH
+        _init_db(_db_conn)
+        _migrate_json_to_db(_db_conn)
+    return _db_conn
+
+
+def _init_db(conn: sqlite3.Connection) -> None:
+    """Initialize the sessions database tables."""
+    try:
+        with conn:
             conn.execute(
                 "CREATE TABLE IF NOT EXISTS sessions (user_id INTEGER PRIMARY KEY, data TEXT)"
             )
-            conn.commit()
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS session_messages (
+                    user_id INTEGER NOT NULL,
+                    seq INTEGER NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT,
+                    tool_calls TEXT,
+                    tool_call_id TEXT,
+                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (user_id, seq)
+                )
+            """)
     except sqlite3.Error as e:
         logger.error("Failed to initialize sessions DB: %s", e)
 
 
-def _migrate_json_to_db() -> None:
+def _migrate_json_to_db(conn: sqlite3.Connection) -> None:
     """Migrate legacy sessions.json to SQLite if needed."""
     if not _SESSIONS_PATH.exists():
         return
 
     try:
-        with sqlite3.connect(_SESSIONS_DB_PATH) as conn:
+        with conn:
             # Check if DB is already populated to avoid overwriting with stale JSON
             cursor = conn.execute("SELECT count(*) FROM sessions")
             if cursor.fetchone()[0] > 0:
@@ -55,6 +101,7 @@ def _migrate_json_to_db() -> None:
             for k, v in raw.items():
                 try:
                     uid = int(k)
+                    # Stored in the old blob format; _load_session() moves the messages into the log
                     data = json.dumps({
                         "messages": v.get("messages", []),
                         "model_id": v.get("model_id", "ollama"),
@@ -65,7 +112,6 @@ def _migrate_json_to_db() -> None:
                     )
                 except ValueError:
                     logger.warning("Skipping invalid user ID during migration: %s", k)
-            conn.commit()
 
         # Rename legacy file
         backup = _SESSIONS_PATH.with_suffix(".json.migrated")
@@ -76,43 +122,95 @@ def _migrate_json_to_db() -> None:
         logger.error("Migration failed: %s", e)
 
 
+def _message_row(user_id: int, seq: int, m: dict) -> tuple:
+    tool_calls = m.get("tool_calls")
+    return (
+        user_id, seq, m.get("role", "user"), m.get("content"),
+        json.dumps(tool_calls) if tool_calls else None, m.get("tool_call_id"),
+    )
+
+
+def _row_message(role: str, content, tool_calls, tool_call_id) -> dict:
+    m = {"role": role, "content": content if content is not None else ""}
+    if tool_calls:
+        m["tool_calls"] = json.loads(tool_calls)
+    if tool_call_id is not None:
+        m["tool_call_id"] = tool_call_id
+    return m
+
+
+def _write_session(conn: sqlite3.Connection, user_id: int, sess: dict) -> None:
+    """Append the session's unsaved messages and update its metadata row (caller commits)."""
+    messages = sess.get("messages", [])
+    base_seq = sess.get("base_seq", 0)
+    next_seq = sess.get("next_seq", 0)
+    start = max(next_seq, base_seq)
+    new = messages[start - base_seq:]
+    if new:
+        conn.executemany(
+            "INSERT OR REPLACE INTO session_messages (user_id, seq, role, content, tool_calls, tool_call_id) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [_message_row(user_id, start + i, m) for i, m in enumerate(new)],
+        )
+    if base_seq > sess.get("pruned_seq", 0):
+        conn.execute("DELETE FROM session_messages WHERE user_id = ? AND seq < ?", (user_id, base_seq))
+    conn.execute(
+        "INSERT OR REPLACE INTO sessions (user_id, data) VALUES (?, ?)",
+        (user_id, json.dumps({
+            "model_id": sess.get("model_id", "ollama"),
+            "summary": sess.get("summary", ""),
+            "base_seq": base_seq,
+        })),
+    )
+
+
+def _mark_written(sess: dict) -> None:
+    sess["next_seq"] = sess.get("base_seq", 0) + len(sess.get("messages", []))
+    sess["pruned_seq"] = sess.get("base_seq", 0)
+
+
 def _save_session(user_id: int) -> None:
-    """Persist a single user's session to DB."""
+    """Persist a user's new messages and session metadata in one transaction."""
     sess = _sessions.get(user_id)
     if not sess:
         return
 
     try:
-        data = json.dumps({
-            "messages": sess.get("messages", []),
-            "model_id": sess.get("model_id", "ollama"),
-        })
-        with sqlite3.connect(_SESSIONS_DB_PATH) as conn:
-            conn.execute(
-                "INSERT OR REPLACE INTO sessions (user_id, data) VALUES (?, ?)",
-                (user_id, data)
-            )
-            conn.commit()
+        with _db() as conn:
+            _write_session(conn, user_id, sess)
+        _mark_written(sess)
     except (sqlite3.Error, OSError) as e:
         logger.warning("Failed to save session for user %d: %s", user_id, e)
 
 
 def _save_sessions() -> None:
-    """Persist all in-memory sessions to DB (e.g. before returning a loop-detection message)."""
-    for uid in _sessions:
-        _save_session(uid)
+    """Persist all in-memory sessions in one transaction (e.g. before returning a loop-detection message)."""
+    try:
+        with _db() as conn:
+            for uid, sess in _sessions.items():
+                _write_session(conn, uid, sess)
+        for sess in _sessions.values():
+            _mark_written(sess)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning("Failed to save sessions: %s", e)
 
 
 def _delete_session(user_id: int) -> None:
     """Remove a user's session from DB."""
     try:
-        with sqlite3.connect(_SESSIONS_DB_PATH) as conn:
+        with _db() as conn:
             conn.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
-            conn.commit()
+            conn.execute("DELETE FROM session_messages WHERE user_id = ?", (user_id,))
     except sqlite3.Error as e:
         logger.warning("Failed to delete session for user %d: %s", user_id, e)
 
 
+def _drop_oldest(session: dict, count: int) -> None:
+    """Record that the first `count` messages left the in-memory history (trimmed or summarized)."""
+    if count:
+        session["base_seq"] = session.get("base_seq", 0) + count
+
+
 def _sanitize_loaded_messages(messages: list) -> list:
     """Strip assistant tool_calls and tool messages from persisted history so we never send
     stale tool_call ids to the API (OpenRouter/MiniMax reject 'tool id not found' when
@@ -134,49 +232,84 @@ def _sanitize_loaded_messages(messages: list) -> list:
     return out
 
 
-def _load_sessions() -> dict:
-    """Load persisted session messages from disk. system_prompt regenerates fresh on next use."""
-    _init_db()
-    _migrate_json_to_db()
-
+def _load_session(user_id: int) -> dict | None:
+    """Load one user's persisted session. system_prompt regenerates fresh on next use."""
     try:
-        with sqlite3.connect(_SESSIONS_DB_PATH) as conn:
-            cursor = conn.execute("SELECT user_id, data FROM sessions")
-            raw_sessions = {}
-            for row in cursor:
-                uid, data_str = row
-                try:
-                    data = json.loads(data_str)
-                    raw_sessions[uid] = {
-                        "messages": data.get("messages", []),
-                        "system_prompt": "",
-                        "memory_loaded": False,
-                        "model_id": data.get("model_id", "ollama"),
-                    }
-                except json.JSONDecodeError:
-                    logger.warning("Skipping corrupt session data for user %d", uid)
-            return raw_sessions
-    except sqlite3.Error as e:
-        logger.error("Failed to load sessions from DB: %s", e)
-        return {}
+        conn = _db()
+        row = conn.execute("SELECT data FROM sessions WHERE user_id = ?", (user_id,)).fetchone()
+        if row is None:
+            return None
+        try:
+            data = json.loads(row[0])
+        except json.JSONDecodeError:
+            logger.warning("Skipping corrupt session data for user %d", user_id)
+            return None
 
+        session = {
+            "messages": [],
+            "system_prompt": "",
+            "memory_loaded": False,
+            "model_id": data.get("model_id", "ollama"),
+            "summary": data.get("summary", ""),
+            "base_seq": data.get("base_seq", 0),
+        }
+        if "messages" in data:
+            # Old single-blob format: move the history into the message log once
+            session["messages"] = data["messages"]
+            with conn:
+                _write_session(conn, user_id, session)
+            logger.info("Migrated session for user %d to the message log (%d messages)", user_id, len(data["messages"]))
+        else:
+            rows = conn.execute(
+                "SELECT role, content, tool_calls, tool_call_id FROM session_messages "
+                "WHERE user_id = ? AND seq >= ? ORDER BY seq",
+                (user_id, session["base_seq"]),
+            ).fetchall()
+            session["messages"] = [_row_message(*r) for r in rows]
+        _mark_written(session)
+        return session
+    except (sqlite3.Error, json.JSONDecodeError) as e:
+        logger.error("Failed to load session for user %d: %s", user_id, e)
+        return None
 
-# Per-user conversation state: { user_id: { messages, system_prompt, memory_loaded, model_id } }
-_sessions: dict = _load_sessions()
 
-# Max messages to keep in history (oldest dropped first, system prompt is separate)
-MAX_HISTORY = 30
+def _get_session(user_id: int) -> dict | None:
+    """The user's session: in memory, else loaded from the DB on first use, else None."""
+    session = _sessions.get(user_id)
+    if session is None:
+        session = _load_session(user_id)
+        if session is not None:
+            _sessions[user_id] = session
+    return session
+
+
+# Per-user conversation state, loaded lazily by _get_session():
+# { user_id: { messages, system_prompt, memory_loaded, model_id, summary, base_seq, next_seq, pruned_seq } }
+_sessions: dict = {}
+
+
+
+_PROMPT_TEMPLATE_PATH = REPO_ROOT / "hardprompts" / "telegram_system_prompt.md"
+_TOOL_REF_PATH = REPO_ROOT / "context" / "gotcha_tools_reference.md"
+_SOUL_PATH = REPO_ROOT / "context" / "SOUL.md"
+_USER_PATH = REPO_ROOT / "context" / "USER.md"
+_MEMORY_FILE_PATH = REPO_ROOT / "memory" / "MEMORY.md"
+_MEMORY_LOGS_DIR = REPO_ROOT / "memory" / "logs"
+_MEMORY_DB_PATH = REPO_ROOT / "data" / "memory.db"
 
 
 def _load_system_prompt(memory_context: str) -> str:
     """Read the system prompt template and inject persona, memory + tool reference."""
-    template_path = REPO_ROOT / "hardprompts" / "telegram_system_prompt.md"
-    tool_ref_path = REPO_ROOT / "context" / "gotcha_tools_reference.md"
-    soul_path = REPO_ROOT / "context" / "SOUL.md"
-    user_path = REPO_ROOT / "context" / "USER.md"
+    template_path = _PROMPT_TEMPLATE_PATH
+    tool_ref_path = _TOOL_REF_PATH
+    soul_path = _SOUL_PATH
+    user_path = _USER_PATH
 
     template = template_path.read_text(encoding="utf-8")
     tool_ref = tool_ref_path.read_text(encoding="utf-8")
+    # Tool schemas already carry parameters; by default keep only the reference's descriptions and caveats
+    if (load_config().get("tools") or {}).get("reference", "compact") != "full":
+        tool_ref = tool_selector.compact_reference(tool_ref)
 
     persona_parts = []
     if soul_path.exists():
@@ -191,6 +324,62 @@ def _load_system_prompt(memory_context: str) -> str:
     return prompt
 
 
+# Assembled system prompt shared by every session initialized while its inputs are
+# unchanged, so prompt prefixes are byte-identical (provider-side prompt caching) and
+# session init skips the memory_read subprocess. Keyed by the mtimes of the prompt and
+# memory files, tool_runner.memory_version() (bumped by the bot's own memory writes) and
+# a memory.db watermark that also catches writes from cron jobs and CLI imports.
+_prompt_cache: dict = {"key": None, "prompt": None}
+
+
+def _memory_db_watermark() -> tuple | None:
+    """(MAX(updated_at), COUNT(*)) of memory_entries: changes on any add, update or delete."""
+    try:
+        conn = sqlite3.connect(f"file:{_MEMORY_DB_PATH}?mode=ro", uri=True)
+        try:
+            return tuple(conn.execute("SELECT MAX(updated_at), COUNT(*) FROM memory_entries").fetchone())
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+
+
+def _prompt_cache_key(config: dict) -> tuple:
+    mem_cfg = config.get("memory", {})
+    log_days = mem_cfg.get("log_days", 2)
+    today = datetime.now().date()
+    paths = [_PROMPT_TEMPLATE_PATH, _TOOL_REF_PATH, _SOUL_PATH, _USER_PATH, _MEMORY_FILE_PATH] + [
+        _MEMORY_LOGS_DIR / f"{(today - timedelta(days=i)).isoformat()}.md" for i in range(log_days)
+    ]
+    files = []
+    for path in paths:
+        try:
+            st = path.stat()
+            files.append((path.name, st.st_mtime_ns, st.st_size))
+        except OSError:
+            files.append((path.name, None, None))
+    load_db = mem_cfg.get("load_db_entries", True)
+    return (
+        tool_runner.memory_version(),
+        (config.get("tools") or {}).get("reference", "compact"),
+        load_db,
+        _memory_db_watermark() if load_db else None,
+        tuple(files),
+    )
+
+
+async def _get_system_prompt() -> str:
+    """Return the current system prompt, rebuilding it only when a file or memory changed."""
+    key = _prompt_cache_key(load_config())
+    if _prompt_cache["key"] == key:
+        return _prompt_cache["prompt"]
+    prompt = _load_system_prompt(await _load_memory())
+    _prompt_cache["key"] = key
+    _prompt_cache["prompt"] = prompt
+    logger.info("System prompt rebuilt (~%d tokens)", context_window.estimate_tokens(prompt))
+    return prompt
+
+
 async def _load_memory() -> str:
     """Run memory_read and return a formatted string for the system prompt."""
     config = load_config()
@@ -226,13 +415,6 @@ async def _load_memory() -> str:
         return result  # fallback: return raw output
 
 
-def _trim_history(messages: list) -> list:
-    """Drop oldest messages if history exceeds MAX_HISTORY."""
-    if len(messages) <= MAX_HISTORY:
-        return messages
-    return messages[-MAX_HISTORY:]
-
-
 # Phrases that clearly mean "search the web" / "browse the internet"
 _WEB_SEARCH_TRIGGERS = (
     "browse the internet",
@@ -298,6 +480,26 @@ _BAMBU_TRIGGERS = (
     "3d print",
 )
 
+# Prefetch bundles per intent: (label, tool, input). Tools in a group run concurrently and
+# the group waits at most its deadline (prefetch.<group> in telegram.yaml, seconds);
+# anything still running then is left out of the context instead of delaying the reply.
+_PREFETCH_GROUPS = {
+    "priorities": [
+        ("kanban", "kanban_read", {}),
+        ("journal", "journal_read_recent", {"days": 7}),
+        ("reminders", "reminders_read", {}),
+    ],
+    "today": [("reminders", "reminders_read", {})],
+    "remind_me": [("reminders", "reminders_read", {})],
+    "bambu": [
+        ("status", "bambu", {"action": "status"}),
+        ("ams", "bambu", {"action": "ams"}),
+    ],
+}
+_PREFETCH_DEADLINES = {"priorities": 8.0, "today": 5.0, "remind_me": 5.0, "bambu": 15.0}
+_PREFETCH_MISSING = "(not available — timed out)"
+
+
 # Deflection phrases — local 7B model sometimes refuses or asks for clarification instead of acting
 _DEFLECTION_PHRASES = (
     "i'm not able to",
@@ -327,6 +529,59 @@ _DEFLECTION_PHRASES = (
 )
 
 
+async def _prefetch(group: str, extra: dict | None = None) -> dict:
+    """
+    Run a prefetch group concurrently and return {label: result} for whatever finished in time.
+
+    extra: additional {label: coroutine} to run alongside the group's tools.
+    """
+    deadline = float((load_config().get("prefetch") or {}).get(group, _PREFETCH_DEADLINES[group]))
+    tasks = {
+        label: asyncio.create_task(tool_runner.execute(tool_name, dict(tool_input)))
+        for label, tool_name, tool_input in _PREFETCH_GROUPS[group]
+    }
+    for label, coro in (extra or {}).items():
+        tasks[label] = asyncio.create_task(coro)
+
+    done, pending = await asyncio.wait(tasks.values(), timeout=deadline)
+    for task in pending:
+        task.cancel()
+
+    results = {}
+    for label, task in tasks.items():
+        if task in done and task.exception() is None:
+            results[label] = task.result()
+        elif task in done:
+            logger.warning("Prefetch %s/%s failed: %s", group, label, task.exception())
+    missing = [label for label in tasks if label not in results]
+    if missing:
+        logger.warning("Prefetch %s: %s not ready within %.1fs", group, ", ".join(missing), deadline)
+    return results
+
+
+def _clip(text: str, limit: int) -> str:
+    return text[:limit] + "…" if len(text) > limit else text
+
+
+def _fetch_slice_info(last_completed_name: str):
+    """Download + parse slice_info for the file the watcher logged as last completed (blocking FTP)."""
+    # Do NOT fall back to newest file — phone prints may not match.
+    try:
+        from tools.bambu.bambu_watcher import ftp_list_gcode_3mf, ftp_download, parse_slice_info_from_3mf
+        import tempfile
+        entries = ftp_list_gcode_3mf()
+        match = next((e for e in entries if e["name"] == last_completed_name), None)
+        if match:
+            tmp_3mf = Path(tempfile.gettempdir()) / "last_print.gcode.3mf"
+            if ftp_download(match["name"], tmp_3mf):
+                slice_info = parse_slice_info_from_3mf(tmp_3mf)
+                tmp_3mf.unlink(missing_ok=True)
+                return slice_info
+    except Exception as e:
+        logger.warning("slice_info fetch failed: %s", e)
+    return None
+
+
 def _is_remind_me_intent(text: str) -> bool:
     """True if the user is asking to set a reminder."""
     lower = (text or "").strip().lower()
@@ -398,49 +653,17 @@ def _is_rate_limit_error(error: Exception) -> bool:
 
 
 def _get_provider_client(provider_cfg: dict):
-    """Build OpenAI-compatible client for a provider config. Returns (client, model_name, provider_name) or (None, None, None)."""
-    provider = provider_cfg.get("provider", "")
-
-    if provider == "minimax":
-        api_key_env = provider_cfg.get("api_key_env", "MINIMIAX_CODING")
-        key = os.environ.get(api_key_env, "").strip()
-        if not key:
-            logger.warning(f"{api_key_env} not found — MiniMax unavailable")
-            return None, None, None
-        client = openai.OpenAI(
-            base_url=provider_cfg.get("base_url", "https://api.minimax.io/v1"),
-            api_key=key,
-            timeout=provider_cfg.get("timeout", 60.0)
-        )
-        return client, provider_cfg.get("model", "MiniMax-M2.5"), "minimax"
-
-    elif provider == "openrouter":
-        key = _get_openrouter_key()
-        if not key:
-            logger.warning("OPENROUTER_API_KEY not found — OpenRouter unavailable")
-            return None, None, None
-        client = openai.OpenAI(
-            base_url=provider_cfg.get("base_url", "https://openrouter.ai/api/v1"),
-            api_key=key,
-            timeout=provider_cfg.get("timeout", 60.0)
-        )
-        return client, provider_cfg.get("model", "openrouter/free"), "openrouter"
-
-    elif provider == "ollama":
-        client = openai.OpenAI(
-            base_url=provider_cfg.get("base_url", "http://localhost:11434/v1"),
-            api_key="ollama",
-            timeout=provider_cfg.get("timeout", 120.0)
-        )
-        return client, provider_cfg.get("model", "qwen2.5:14b"), "ollama"
-
-    return None, None, None
+    """Shared async provider for a config block. Returns (provider, model_name, provider_name) or (None, None, None)."""
+    provider = llm.get_provider(provider_cfg, openrouter_key=_get_openrouter_key)
+    if provider is None:
+        return None, None, None
+    return provider, provider.model, provider.name
 
 
 def _get_client_and_model(user_id: int):
     """Return (client, model_name, provider_id) for the session's selected model. Ensures session exists."""
     config = load_config()
-    if user_id not in _sessions:
+    if _get_session(user_id) is None:
         _sessions[user_id] = {
             "messages": [],
             "system_prompt": "",
@@ -483,12 +706,12 @@ def _get_client_and_model(user_id: int):
 
     # Final fallback - Ollama (should always work if running)
     logger.warning("Using final fallback: Ollama")
-    client = openai.OpenAI(
-        base_url="http://localhost:11434/v1",
-        api_key="ollama",
-        timeout=120.0,
+    ollama_cfg = next(
+        (fb for fb in config.get("fallbacks", []) if fb.get("provider") == "ollama"),
+        {"provider": "ollama"},
     )
-    return client, "qwen2.5:14b", "ollama"
+    client, model_name, _ = _get_provider_client(ollama_cfg)
+    return client, model_name, "ollama"
 
 
 def get_available_models() -> list[dict]:
@@ -533,7 +756,7 @@ def handle_models_command(user_id: int, text: str) -> str:
     ids = [m["id"] for m in available]
 
     if not arg:
-        current = _sessions.get(user_id, {}).get("model_id", "openrouter")
+        current = (_get_session(user_id) or {}).get("model_id", "openrouter")
         lines = [f"Session model: {current}", ""]
         for m in available:
             mark = " ✓" if m["id"] == current else ""
@@ -546,7 +769,7 @@ def handle_models_command(user_id: int, text: str) -> str:
     if choice not in ids:
         return f"Unknown model: {choice}. Use: " + ", ".join(ids)
 
-    if user_id not in _sessions:
+    if _get_session(user_id) is None:
         _sessions[user_id] = {
             "messages": [],
             "system_prompt": "",
@@ -602,22 +825,244 @@ def _derive_search_query(text: str) -> str:
     return query or "search"
 
 
+def _system_content(session: dict) -> str:
+    """System prompt plus the session's rolling summary (appended so the prompt prefix stays stable)."""
+    summary = session.get("summary")
+    if not summary:
+        return session["system_prompt"]
+    return session["system_prompt"] + "\n\n## Earlier in this conversation (summary)\n" + summary
+
+
+# Rolling summary: once history passes context.summarize_above tokens, the oldest turns are
+# folded into session["summary"] by a background task after the reply has been sent
+DEFAULT_SUMMARIZE_ABOVE = 12000
+DEFAULT_SUMMARY_KEEP_TOKENS = 4000
+DEFAULT_SUMMARY_MAX_TOKENS = 600
+
+_SUMMARY_PROMPT = (
+    "You maintain a running summary of a chat between Tony and his assistant.\n"
+    "Merge the existing summary with the new transcript excerpt into one updated summary.\n"
+    "Keep facts, decisions, commitments, names, dates, numbers and open questions; drop small talk\n"
+    "and raw tool output. Write terse bullet points, at most {max_words} words. Output only the summary.\n\n"
+    "[Existing summary]\n{summary}\n\n[New transcript]\n{transcript}"
+)
+
+# Strong references to fire-and-forget tasks so they aren't garbage-collected mid-run
+_background_tasks: set = set()
+_summarizing: set = set()
+
+
+def _schedule_summary(user_id: int) -> None:
+    """Start a background summarization if the session's history is over the threshold."""
+    session = _sessions.get(user_id)
+    if not session or user_id in _summarizing:
+        return
+    ctx_cfg = load_config().get("context") or {}
+    if context_window.messages_tokens(session["messages"]) <= int(ctx_cfg.get("summarize_above", DEFAULT_SUMMARIZE_ABOVE)):
+        return
+    _summarizing.add(user_id)
+    task = asyncio.create_task(_summarize_session(user_id, session, ctx_cfg))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def _summarize_session(user_id: int, session: dict, ctx_cfg: dict) -> None:
+    """Fold the oldest turns into the running summary and persist it."""
+    try:
+        keep_tokens = int(ctx_cfg.get("summary_keep_tokens", DEFAULT_SUMMARY_KEEP_TOKENS))
+        max_tokens = int(ctx_cfg.get("summary_max_tokens", DEFAULT_SUMMARY_MAX_TOKENS))
+        folded, _ = context_window.split_for_summary(session["messages"], keep_tokens)
+        if not folded:
+            return
+
+        client, model_name, _ = _get_client_and_model(user_id)
+        prompt = _SUMMARY_PROMPT.format(
+            max_words=max_tokens * 3 // 4,
+            summary=session.get("summary") or "(none yet)",
+            transcript=context_window.format_transcript(folded),
+        )
+        response = await client.complete(
+            model=model_name,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.2,
+            max_tokens=max_tokens,
+        )
+        summary = _strip_think((response.choices[0].message.content or "") if response.choices else "")
+        if not summary:
+            return
+
+        # Apply only if the folded turns are still the head of this session's history
+        # (a reset, a trim or another turn's rewrite in the meantime makes the summary stale)
+        messages = session["messages"]
+        if _sessions.get(user_id) is not session or len(messages) < len(folded) or any(
+            a is not b for a, b in zip(messages, folded)
+        ):
+            logger.info("Session %d changed during summarization — discarding summary", user_id)
+            return
+        session["summary"] = summary
+        session["messages"] = messages[len(folded):]
+        _drop_oldest(session, len(folded))
+        _save_session(user_id)
+        logger.info(
+            "Summarized %d messages for user %d (summary ~%d tokens)",
+            len(folded), user_id, context_window.estimate_tokens(summary),
+        )
+    except Exception as e:
+        logger.warning("Summarization failed for user %d: %s", user_id, e)
+    finally:
+        _summarizing.discard(user_id)
+
+
+def _log_request_tokens(provider: str, messages: list, tools: list) -> None:
+    """Log the estimated prompt size of a completion request."""
+    message_tokens = context_window.messages_tokens(messages)
+    tool_tokens = context_window.tools_tokens(tools)
+    logger.info(
+        "Request to %s: ~%d prompt tokens (%d messages: %d, tools: %d)",
+        provider, message_tokens + tool_tokens, len(messages), message_tokens, tool_tokens,
+    )
+
+
+def _visible_text(content: str) -> str:
+    """Streaming-safe _strip_think(): also hides a <think> block that hasn't been closed yet."""
+    text = _THINK_TAG.sub('', content)
+    start = text.find('<think>')
+    if start != -1:
+        text = text[:start]
+    return text.strip()
+
+
+class _StreamedMessage:
+    """Assistant message rebuilt from streamed chunks; same attributes the loop reads from a normal one."""
+
+    def __init__(self, content: str, tool_calls: list[dict]):
+        self.content = content or None
+        self.tool_calls = [
+            SimpleNamespace(id=tc["id"], type="function",
+                            function=SimpleNamespace(name=tc["name"], arguments=tc["arguments"]))
+            for tc in tool_calls
+        ] or None
+
+    def model_dump(self) -> dict:
+        return {
+            "role": "assistant",
+            "content": self.content,
+            "tool_calls": [
+                {"id": tc.id, "type": "function",
+                 "function": {"name": tc.function.name, "arguments": tc.function.arguments}}
+                for tc in self.tool_calls or []
+            ] or None,
+        }
+
+
+async def _completion_events(provider, stream: bool, **kwargs):
+    """
+    Run one completion. Yields ("partial", visible_text) while a streamed reply grows,
+    then ("message", message, finish_reason); message is None for an empty response.
+    """
+    if not stream:
+        response = await provider.complete(**kwargs)
+        if not response or not response.choices:
+            yield ("message", None, None)
+            return
+        yield ("message", response.choices[0].message, response.choices[0].finish_reason)
+        return
+
+    content = ""
+    shown = ""
+    calls: dict[int, dict] = {}
+    finish_reason = None
+    async for chunk in provider.stream(**kwargs):
+        if not chunk.choices:
+            continue
+        choice = chunk.choices[0]
+        finish_reason = choice.finish_reason or finish_reason
+        delta = choice.delta
+        if delta is None:
+            continue
+        for tc in delta.tool_calls or []:
+            # Arguments arrive in fragments keyed by index (some servers omit it: one call per chunk)
+            index = tc.index if tc.index is not None else len(calls)
+            entry = calls.setdefault(index, {"id": None, "name": "", "arguments": ""})
+            if tc.id:
+                entry["id"] = tc.id
+            if tc.function is not None:
+                entry["name"] += tc.function.name or ""
+                entry["arguments"] += tc.function.arguments or ""
+        if delta.content:
+            content += delta.content
+            visible = _visible_text(content)
+            # Once the model starts calling tools, the text is a preamble, not the reply
+            if visible != shown and not calls:
+                shown = visible
+                yield ("partial", visible)
+
+    if not content and not calls:
+        yield ("message", None, finish_reason)
+        return
+    yield ("message", _StreamedMessage(content, [calls[i] for i in sorted(calls)]), finish_reason)
+
+
 async def handle_message(text: str, user_id: int) -> str:
     """
-    Handle an incoming message from a Telegram user.
+    Handle an incoming message from a Telegram user and return the final reply text.
+
+    Non-streaming wrapper around stream_message() for callers that only need the answer.
+    """
+    reply = ""
+    async for event in stream_message(text, user_id, stream=False):
+        if event["type"] == "reply":
+            reply = event["text"]
+    return reply
+
+
+async def stream_message(text: str, user_id: int, stream: bool = True):
+    """
+    Handle an incoming message from a Telegram user, yielding progress events.
 
     Maintains per-user conversation state. On first message, loads memory
     and builds the system prompt. Runs the OpenAI-compatible tool-use loop
     against the session's selected model (Ollama or Minimax) until the model
     returns a text-only response.
+
+    Yields dicts with a "type" and "text":
+      - "partial": the reply so far while the model streams (full text, not a delta)
+      - "status": a short line when a tool round starts (e.g. "Using kanban_read…")
+      - "reply": the final reply; always the last event
+    With stream=False completions are requested in one piece (no "partial" events).
+    Turns for the same user run one at a time (see _session_lock).
     """
+    async with _session_lock(user_id):
+        async for event in _run_turn(text, user_id, stream):
+            yield event
+
+
+# One lock per user so concurrent turns never interleave appends to the same session
+# (reset when the event loop changes; asyncio locks belong to one loop)
+_session_locks: dict = {}
+_session_locks_loop = None
+
+
+def _session_lock(user_id: int) -> asyncio.Lock:
+    global _session_locks, _session_locks_loop
+    loop = asyncio.get_running_loop()
+    if loop is not _session_locks_loop:
+        _session_locks = {}
+        _session_locks_loop = loop
+    lock = _session_locks.get(user_id)
+    if lock is None:
+        lock = _session_locks[user_id] = asyncio.Lock()
+    return lock
+
+
+async def _run_turn(text: str, user_id: int, stream: bool):
+    """One conversation turn; the body of stream_message(), called with the user's lock held."""
     config = load_config()
     client, model_name, provider_id = _get_client_and_model(user_id)
 
     # --- Session init (or re-init after restart with persisted messages) ---
-    if user_id not in _sessions or not _sessions[user_id].get("memory_loaded"):
-        memory_text = await _load_memory()
-        system_prompt = _load_system_prompt(memory_text)
+    if _get_session(user_id) is None or not _sessions[user_id].get("memory_loaded"):
+        system_prompt = await _get_system_prompt()
         if user_id in _sessions:
             # Restored from disk — keep messages, attach fresh prompt
             _sessions[user_id]["system_prompt"] = system_prompt
@@ -632,9 +1077,7 @@ async def handle_message(text: str, user_id: int) -> str:
 
     session = _sessions[user_id]
 
-    # Append user message
     session["messages"].append({"role": "user", "content": text})
-    session["messages"] = _trim_history(session["messages"])
 
     # NOTE: incoming message already written in bot.py for Bambu group only
     # (removed duplicate write here to prevent overwriting Bambu replies)
@@ -650,74 +1093,73 @@ async def handle_message(text: str, user_id: int) -> str:
     # Run tools and inject results as a user context message. Avoids fake assistant+tool_calls
     # which break APIs (OpenRouter/MiniMax) that validate tool_call_id against the last assistant.
     if _is_priorities_intent(text):
-        kanban = await tool_runner.execute("kanban_read", {})
-        journal = await tool_runner.execute("journal_read_recent", {"days": 7})
-        reminders = await tool_runner.execute("reminders_read", {})
+        fetched = await _prefetch("priorities")
         ctx = (
             "[Context already fetched — use this to answer; call other tools only if needed.]\n\n"
-            "**Tasks (Tony Tasks.md):**\n" + (kanban[:4000] + "…" if len(kanban) > 4000 else kanban) + "\n\n"
-            "**Journal (last 7 days):**\n" + (journal[:4000] + "…" if len(journal) > 4000 else journal) + "\n\n"
-            "**Reminders:**\n" + (reminders[:2000] + "…" if len(reminders) > 2000 else reminders)
+            "**Tasks (Tony Tasks.md):**\n" + _clip(fetched.get("kanban", _PREFETCH_MISSING), 4000) + "\n\n"
+            "**Journal (last 7 days):**\n" + _clip(fetched.get("journal", _PREFETCH_MISSING), 4000) + "\n\n"
+            "**Reminders:**\n" + _clip(fetched.get("reminders", _PREFETCH_MISSING), 2000)
         )
         session["messages"].append({"role": "user", "content": ctx})
 
     # --- Prefetch for "what's today" / "what do I have today" ---
     # Skip if we already prefetched (e.g. "what are my priorities today" matched priorities).
     elif _is_whats_today_intent(text):
-        reminders = await tool_runner.execute("reminders_read", {})
+        fetched = await _prefetch("today")
         ctx = (
             "[Reminders already fetched — use this; call calendar/daily_brief if needed.]\n\n"
-            "**Reminders:**\n" + (reminders[:3000] + "…" if len(reminders) > 3000 else reminders)
+            "**Reminders:**\n" + _clip(fetched.get("reminders", _PREFETCH_MISSING), 3000)
         )
         session["messages"].append({"role": "user", "content": ctx})
 
     # --- Prefetch for "remind me to ..." ---
     elif _is_remind_me_intent(text):
-        reminders = await tool_runner.execute("reminders_read", {})
-        ctx = "[Current reminders — use when adding the new one.]\n\n" + (reminders[:3000] + "…" if len(reminders) > 3000 else reminders)
+        fetched = await _prefetch("remind_me")
+        ctx = "[Current reminders — use when adding the new one.]\n\n" + _clip(fetched.get("reminders", _PREFETCH_MISSING), 3000)
         session["messages"].append({"role": "user", "content": ctx})
 
+    # Fit history (plus system prompt) into the provider's token budget. Runs after the
+    # prefetch so its injected context (part of the newest turn) is counted too.
+    session["messages"], fit_stats = context_window.fit_history(
+        session["messages"],
+        context_window.budget_for(provider_id, config),
+        reserved=context_window.estimate_tokens(session["system_prompt"] + session.get("summary", "")),
+        stale_chars=(config.get("context") or {}).get("stale_tool_result_chars", context_window.DEFAULT_STALE_TOOL_RESULT_CHARS),
+    )
+    _drop_oldest(session, fit_stats["dropped_messages"])
+
     # --- Bambu/printer questions → deterministic handler ---
     # The local 7B model loops infinitely on the bambu tool. Answer directly from data.
     # Try MiniMax first for natural phrasing; fall back to deterministic formatter.
     if _is_bambu_intent(text):
-        status_result = await tool_runner.execute("bambu", {"action": "status"})
-        ams_result = await tool_runner.execute("bambu", {"action": "ams"})
+        # Watcher state is a local file; read it first so the slice_info download for the
+        # last completed print can run alongside the status and AMS queries.
         state_path = REPO_ROOT / "data" / "bambu_last_state.json"
-        try:
-            live = json.loads(status_result)
-        except (json.JSONDecodeError, TypeError):
-            live = {"raw": status_result}
+        watcher_state = None
         if state_path.exists():
             try:
                 watcher_state = json.loads(state_path.read_text(encoding="utf-8"))
-                live["last_completed_print"] = watcher_state.get("last_completed_print", "unknown")
-                live["last_completed_at"] = watcher_state.get("last_completed_at", "unknown")
             except (json.JSONDecodeError, OSError):
                 pass
+        last_completed_name = (watcher_state or {}).get("last_completed_print", "")
+        extra = {}
+        if last_completed_name:
+            extra["slice_info"] = asyncio.to_thread(_fetch_slice_info, last_completed_name)
+        fetched = await _prefetch("bambu", extra)
+
+        status_result = fetched.get("status")
         try:
-            ams_data = json.loads(ams_result)
+            live = json.loads(status_result)
+        except (json.JSONDecodeError, TypeError):
+            live = {"raw": status_result or _PREFETCH_MISSING}
+        if watcher_state is not None:
+            live["last_completed_print"] = watcher_state.get("last_completed_print", "unknown")
+            live["last_completed_at"] = watcher_state.get("last_completed_at", "unknown")
+        try:
+            ams_data = json.loads(fetched.get("ams"))
         except (json.JSONDecodeError, TypeError):
             ams_data = {}
-
-        # Download + parse slice_info, but only for the file the watcher logged as last completed.
-        # Do NOT fall back to newest file — phone prints may not match.
-        slice_info = None
-        last_completed_name = live.get("last_completed_print", "")
-        if last_completed_name:
-            try:
-                from tools.bambu.bambu_watcher import ftp_list_gcode_3mf, ftp_download, parse_slice_info_from_3mf
-                import tempfile
-                entries = ftp_list_gcode_3mf()
-                match = next((e for e in entries if e["name"] == last_completed_name), None)
-                if match:
-                    tmp_3mf = Path(tempfile.gettempdir()) / "last_print.gcode.3mf"
-                    if ftp_download(match["name"], tmp_3mf):
-                        slice_info = parse_slice_info_from_3mf(tmp_3mf)
-                        tmp_3mf.unlink(missing_ok=True)
-            except Exception as e:
-                logger.warning("slice_info fetch failed: %s", e)
-        live["slice_info"] = slice_info
+        live["slice_info"] = fetched.get("slice_info")
 
         # Try primary model for a natural-language answer
         reply = None
@@ -733,7 +1175,7 @@ async def handle_message(text: str, user_id: int) -> str:
                 f"User question: {text}"
             )
             try:
-                fb_resp = bambu_client.chat.completions.create(
+                fb_resp = await bambu_client.complete(
                     model=bambu_model,
                     messages=[{"role": "user", "content": bambu_prompt}],
                     temperature=0.3,
@@ -800,14 +1242,29 @@ async def handle_message(text: str, user_id: int) -> str:
 
         session["messages"].append({"role": "assistant", "content": reply})
         _save_session(user_id)
-        return reply
+        yield {"type": "reply", "text": reply}
+        return
 
     # --- Tool-use loop with hardened safeguards ---
 
+    # Send only the tools relevant to this message (request_all_tools expands mid-turn)
+    intents = [
+        name for name, detect in (
+            ("priorities", _is_priorities_intent),
+            ("today", _is_whats_today_intent),
+            ("remind_me", _is_remind_me_intent),
+            ("bambu", _is_bambu_intent),
+            ("web_search", _is_web_search_intent),
+        ) if detect(text)
+    ]
+    tools, tool_info = tool_selector.select_tools(
+        text, intents, tool_selector.recent_tool_names(session["messages"]), config,
+    )
+
     # Use the actual provider we're calling to decide message role compatibility.
     # MiniMax rejects "system" role (API 2013); others accept it.
     system_role = "system" if provider_id != "minimax" else "user"
-    api_messages = [{"role": system_role, "content": session["system_prompt"]}] + session["messages"]
+    api_messages = [{"role": system_role, "content": _system_content(session)}] + session["messages"]
 
     def _messages_for_provider(provider: str, messages: list) -> list:
         """Return messages with first message role compatible with provider (MiniMax needs 'user' not 'system')."""
@@ -833,22 +1290,32 @@ async def handle_message(text: str, user_id: int) -> str:
             })
             rounds_since_text = 0  # Reset counter
 
-        # Try API call with automatic fallback on rate limits
-        response = None
+        # Try API call with automatic fallback on rate limits. Streamed text is passed
+        # on as "partial" events; fallbacks are only tried before any text was shown.
+        message = None
+        finish_reason = None
         used_provider = provider_id
+        partial_sent = False
         try:
             request_messages = _messages_for_provider(provider_id, api_messages)
-            response = client.chat.completions.create(
+            _log_request_tokens(provider_id, request_messages, tools)
+            async for event in _completion_events(
+                client, stream,
                 model=model_name,
                 messages=request_messages,
-                tools=TOOL_DEFINITIONS,
+                tools=tools,
                 temperature=config.get("primary", {}).get("temperature", 0.7),
                 max_tokens=config.get("primary", {}).get("max_tokens", 4096),
-            )
+            ):
+                if event[0] == "partial":
+                    partial_sent = True
+                    yield {"type": "partial", "text": event[1]}
+                else:
+                    _, message, finish_reason = event
         except Exception as e:
-            # Check if this is a rate limit error
-            if _is_rate_limit_error(e):
-                logger.warning(f"Rate limit hit on {provider_id}: {e}")
+            # Rate limits and timeouts fall through to the next model
+            if not partial_sent and (_is_rate_limit_error(e) or isinstance(e, llm.ProviderTimeout)):
+                logger.warning(f"Rate limit or timeout on {provider_id}: {e}")
                 logger.info("Attempting fallback models...")
 
                 # Try each fallback in order
@@ -864,13 +1331,19 @@ async def handle_message(text: str, user_id: int) -> str:
                     try:
                         logger.info(f"Trying fallback: {fb_provider}")
                         fb_messages = _messages_for_provider(fb_provider, api_messages)
-                        response = fb_client.chat.completions.create(
+                        _log_request_tokens(fb_provider, fb_messages, tools)
+                        async for event in _completion_events(
+                            fb_client, stream,
                             model=fb_model,
                             messages=fb_messages,
-                            tools=TOOL_DEFINITIONS,
+                            tools=tools,
                             temperature=fb_cfg.get("temperature", 0.7),
                             max_tokens=fb_cfg.get("max_tokens", 4096),
-                        )
+                        ):
+                            if event[0] == "partial":
+                                yield {"type": "partial", "text": event[1]}
+                            else:
+                                _, message, finish_reason = event
                         used_provider = fb_provider
                         logger.info(f"Fallback succeeded: {fb_provider}")
                         break
@@ -878,25 +1351,24 @@ async def handle_message(text: str, user_id: int) -> str:
                         logger.warning(f"Fallback {fb_provider} failed: {fb_e}")
                         continue
 
-                if not response:
+                if not message:
                     logger.error("All fallbacks exhausted")
-                    return f"All models unavailable. Primary error: {e}"
+                    yield {"type": "reply", "text": f"All models unavailable. Primary error: {e}"}
+                    return
             else:
                 logger.exception(f"API call failed: {e}")
-                return f"API error: {e}"
-
-        if not response:
-            return "API error: No response from any model"
+                yield {"type": "reply", "text": f"API error: {e}"}
+                return
 
-        if not response or not response.choices:
-            logger.error(f"Empty response from API: {response}")
-            return "Got empty response from API"
+        if not message:
+            logger.error("Empty response from API")
+            yield {"type": "reply", "text": "Got empty response from API"}
+            return
 
-        message = response.choices[0].message
         tool_calls = message.tool_calls
 
         # Debug logging
-        logger.info(f"OpenRouter response - content: {repr(message.content)}, tool_calls: {bool(tool_calls)}, finish_reason: {response.choices[0].finish_reason}")
+        logger.info(f"OpenRouter response - content: {repr(message.content)}, tool_calls: {bool(tool_calls)}, finish_reason: {finish_reason}")
 
         content = message.content or ""
 
@@ -930,7 +1402,9 @@ async def handle_message(text: str, user_id: int) -> str:
                 reply = _strip_think(reply)
 
             _save_session(user_id)
-            return reply
+            _schedule_summary(user_id)
+            yield {"type": "reply", "text": reply}
+            return
 
         # Safeguard: Check for tool loops before executing
         loop_detected = False
@@ -947,26 +1421,41 @@ async def handle_message(text: str, user_id: int) -> str:
         if loop_detected:
             _save_sessions()
             tools_str = ", ".join(looping_tools) if looping_tools else "the same tool"
-            return (
+            yield {"type": "reply", "text": (
                 f"I hit a safety limit: {tools_str} was called too many times in a row, so I stopped to avoid an infinite loop.\n\n"
                 "**What you can do:**\n"
                 "• Ask me to do the same thing in smaller steps (e.g. \"create the script only\" then \"schedule it at 8pm\").\n"
                 "• Run the steps yourself from the repo (see `tools/system/launchd_manager.py` and the script we were building).\n"
                 "• Try again in a new message — sometimes a fresh turn helps."
-            )
+            )}
+            return
 
-        # Execute each tool call and feed results back individually
-        # (OpenAI requires one tool_result message per tool_call_id)
+        # Execute the tool calls and feed results back individually
+        # (OpenAI requires one tool_result message per tool_call_id). Read-only tools run
+        # concurrently; results are appended in the original tool_calls order.
         # Use the same id as in the assistant message (no str()) so type matches — MiniMax 2013 validates this.
+        calls = []
         for tc in tool_calls:
             try:
                 args = json.loads(tc.function.arguments)
             except (json.JSONDecodeError, TypeError) as e:
                 logger.error(f"Failed to parse tool arguments: {e}. Raw: {tc.function.arguments[:200]}")
                 args = {}
-
             logger.info("Tool call round %d: %s(%s)", _round, tc.function.name, tc.function.arguments[:120])
-            result_str = await tool_runner.execute(tc.function.name, args)
+            calls.append((tc.function.name, args))
+
+        # request_all_tools isn't a real tool: switch this turn to the full list and acknowledge it
+        if any(name == tool_selector.EXPAND_TOOL for name, _ in calls):
+            reason = next((a.get("reason", "") for name, a in calls if name == tool_selector.EXPAND_TOOL), "")
+            tools = tool_selector.expand(tool_info, reason)
+        runnable = [(i, call) for i, call in enumerate(calls) if call[0] != tool_selector.EXPAND_TOOL]
+        results = [tool_selector.EXPANDED_RESULT] * len(calls)
+        if runnable:
+            yield {"type": "status", "text": "Using " + ", ".join(dict.fromkeys(name for _, (name, _) in runnable)) + "…"}
+            for (i, _), result in zip(runnable, await tool_runner.execute_calls([call for _, call in runnable])):
+                results[i] = result
+
+        for tc, result_str in zip(tool_calls, results):
             # APIs (e.g. MiniMax) require tool result content to be a string
             result_content = "" if result_str is None else str(result_str)
 
@@ -987,12 +1476,13 @@ async def handle_message(text: str, user_id: int) -> str:
     logger.warning("Tool-use loop hit %d rounds without text reply — returning last content", MAX_TOOL_ROUNDS)
     _save_session(user_id)
     if message.content and message.content.strip():
-        return message.content
-    return (
+        yield {"type": "reply", "text": message.content}
+        return
+    yield {"type": "reply", "text": (
         "I used the maximum number of tool steps without finishing a reply, so I’m stopping here.\n\n"
         "**What you can do:** Try again with a shorter or more specific request, or ask me to do one step at a time "
         "(e.g. first create the script, then in a follow-up ask to schedule it)."
-    )
+    )}
 
 
 def reset_session(user_id: int) -> None:
@@ -0,0 +1,170 @@
+"""
+Async LLM provider layer.
+
+Wraps the OpenAI-compatible providers from args/telegram.yaml (MiniMax, OpenRouter,
+Ollama) in AsyncOpenAI clients so a completion never blocks the bot's event loop.
+Each provider has its own concurrency limit (`concurrency` in its config block) and
+a hard per-request timeout (`timeout`, which also covers waiting for a free slot),
+so one slow model or a burst of chats can't starve the others. Provider.stream()
+yields completion chunks as they arrive for progressive replies.
+"""
+
+import asyncio
+import logging
+import os
+from dataclasses import dataclass, field
+
+import openai
+
+logger = logging.getLogger(__name__)
+
+# Used when a provider block doesn't set `concurrency` (Ollama runs one model on local hardware)
+DEFAULT_CONCURRENCY = {"minimax": 4, "openrouter": 4, "ollama": 1}
+DEFAULT_TIMEOUT = {"minimax": 60.0, "openrouter": 60.0, "ollama": 120.0}
+DEFAULT_BASE_URL = {
+    "minimax": "https://api.minimax.io/v1",
+    "openrouter": "https://openrouter.ai/api/v1",
+    "ollama": "http://localhost:11434/v1",
+}
+DEFAULT_MODEL = {"minimax": "MiniMax-M2.5", "openrouter": "openrouter/free", "ollama": "qwen2.5:14b"}
+
+
+class ProviderTimeout(Exception):
+    """A completion (including the wait for a concurrency slot) exceeded the provider timeout."""
+
+
+@dataclass
+class Provider:
+    """One configured model endpoint: async client plus its concurrency limit and timeout."""
+    name: str
+    model: str
+    client: openai.AsyncOpenAI
+    timeout: float
+    concurrency: int
+    semaphore: asyncio.Semaphore
+    _active: int = field(default=0, init=False, repr=False)
+
+    async def complete(self, **kwargs):
+        """chat.completions.create() under this provider's semaphore and timeout."""
+        kwargs.setdefault("model", self.model)
+        try:
+            return await asyncio.wait_for(self._create(kwargs), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            raise ProviderTimeout(f"{self.name} did not respond within {self.timeout:g}s") from None
+
+    async def _create(self, kwargs: dict):
+        async with self.semaphore:
+            self._active += 1
+            try:
+                return await self.client.chat.completions.create(**kwargs)
+            finally:
+                self._active -= 1
+
+    async def stream(self, **kwargs):
+        """
+        Streaming chat.completions.create(): yields chunks while holding a slot.
+
+        The timeout covers the wait for a slot and each gap between chunks (not the
+        whole generation), so long replies aren't cut off while they keep flowing.
+        """
+        kwargs.setdefault("model", self.model)
+        kwargs["stream"] = True
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            raise ProviderTimeout(f"{self.name} had no free slot within {self.timeout:g}s") from None
+
+        self._active += 1
+        response = None
+        try:
+            response = await asyncio.wait_for(self.client.chat.completions.create(**kwargs), timeout=self.timeout)
+            chunks = response.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=self.timeout)
+                except StopAsyncIteration:
+                    break
+                yield chunk
+        except asyncio.TimeoutError:
+            raise ProviderTimeout(f"{self.name} stalled for {self.timeout:g}s while streaming") from None
+        finally:
+            self._active -= 1
+            self.semaphore.release()
+            if response is not None:
+                try:
+                    await response.close()
+                except Exception:
+                    pass
+
+    def in_flight(self) -> int:
+        """Requests currently holding a slot."""
+        return self._active
+
+
+# Providers are shared across users so limits are global; reset when the event loop changes
+# (AsyncOpenAI's connection pool and the semaphores belong to one loop)
+_providers: dict = {}
+_providers_loop = None
+
+
+def _api_key(provider: str, provider_cfg: dict, openrouter_key=None) -> str | None:
+    if provider == "minimax":
+        return os.environ.get(provider_cfg.get("api_key_env", "MINIMIAX_CODING"), "").strip() or None
+    if provider == "openrouter":
+        return openrouter_key() if openrouter_key else os.environ.get("OPENROUTER_API_KEY", "").strip() or None
+    if provider == "ollama":
+        return "ollama"
+    return None
+
+
+def get_provider(provider_cfg: dict, openrouter_key=None) -> Provider | None:
+    """
+    Return the shared Provider for a config block, or None if it's unknown or has no API key.
+
+    openrouter_key: optional callable that resolves the OpenRouter key (env, .env, legacy profiles).
+    """
+    global _providers, _providers_loop
+    provider = provider_cfg.get("provider", "")
+    if provider not in DEFAULT_MODEL:
+        return None
+
+    key = _api_key(provider, provider_cfg, openrouter_key)
+    if not key:
+        env_name = provider_cfg.get("api_key_env", "OPENROUTER_API_KEY" if provider == "openrouter" else "")
+        logger.warning(f"{env_name} not found — {provider} unavailable")
+        return None
+
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    if loop is not None and loop is not _providers_loop:
+        _providers = {}
+        _providers_loop = loop
+
+    base_url = provider_cfg.get("base_url", DEFAULT_BASE_URL[provider])
+    model = provider_cfg.get("model", DEFAULT_MODEL[provider])
+    cache_key = (provider, base_url, model, key)
+    cached = _providers.get(cache_key)
+    if cached is not None:
+        return cached
+
+    timeout = float(provider_cfg.get("timeout", DEFAULT_TIMEOUT[provider]))
+    concurrency = max(1, int(provider_cfg.get("concurrency", DEFAULT_CONCURRENCY[provider])))
+    result = Provider(
+        name=provider,
+        model=model,
+        client=openai.AsyncOpenAI(base_url=base_url, api_key=key, timeout=timeout),
+        timeout=timeout,
+        concurrency=concurrency,
+        semaphore=asyncio.Semaphore(concurrency),
+    )
+    # Only reuse clients created inside the loop; availability checks outside it get a throwaway
+    if loop is not None:
+        _providers[cache_key] = result
+    return result
+
+
+def provider_stats() -> dict:
+    """In-flight requests per provider, for logs and health checks."""
+    return {f"{p.name}:{p.model}": {"in_flight": p.in_flight(), "limit": p.concurrency} for p in _providers.values()}
@@ -113,8 +113,8 @@ TOOL_DEFINITIONS = [
                     },
                     "keyword_only": {
                         "type": "boolean",
-                        "description": "Use keyword-only search (no API cost). Set to false for semantic search if OPENAI_API_KEY is available.",
-                        "default": True
+                        "description": "Use keyword-only search. Omit to use the configured default (hybrid keyword + semantic, offline).",
+                        "default": False
                     },
                     "type": {
                         "type": "string",
@@ -1,24 +1,41 @@
 """
 Tool runner.
 
-Translates Claude's tool_use requests into subprocess calls against the existing
-memory scripts and goal files. Parses their stdout back into strings for Claude.
+Translates Claude's tool_use requests into calls against the existing memory
+scripts, goal files and tool modules. Parses their output back into strings for Claude.
+
+Tools are registered in TOOL_REGISTRY (bottom of this file) with metadata: read-only
+or mutating, timeout, cacheability, and whether they run in-process. Most call the
+target module's functions directly; tools that need isolation (arbitrary scripts,
+long-running pipelines, their own event loop, external CLIs) still run as subprocesses;
+the ones listed in tools.worker_pool run on warm pre-started workers (worker_pool.py).
+Cacheable read-only tools go through a result cache keyed by input and source-file
+mtime/size, with per-tool TTLs; writing tools invalidate what they touch.
+Per-tool latency histograms are available from tool_stats(), cache counters from cache_stats().
 
 All subprocess calls use arg lists (never shell=True) to prevent injection.
 Tool failures return a generic user-facing message; real errors are logged.
 """
 
 import asyncio
-import csv
+import atexit
+import bisect
+import importlib
 import json
 import logging
 import os
+import sqlite3
 import subprocess
 import sys
+import threading
+import time
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from pathlib import Path
+from typing import Callable
 
 from config import get_repo_root, load_config
+import worker_pool
 
 REPO_ROOT = get_repo_root()
 
@@ -62,8 +79,60 @@ USER_FACING_ERROR = "Operation failed. Please try again."
 TOOL_CALL_RECORD: list[tuple[str, dict]] = []
 
 
-def _run(args: list, cwd: Path = REPO_ROOT, timeout: int = 60) -> subprocess.CompletedProcess:
-    """Run a subprocess with the given args. Returns the CompletedProcess."""
+# Default budget for one tool subprocess (_run)
+DEFAULT_RUN_TIMEOUT = 60
+
+# Scripts run on warm pool workers instead of a fresh interpreter (tools.worker_pool in telegram.yaml).
+# reminder_add.py isn't listed: reminders run in-process and only shell out if its import fails.
+DEFAULT_POOLED_SCRIPTS = (
+    "tools/zapier/zapier_runner.py",
+    "tools/system/system_config.py",
+    "tools/system/launchd_manager.py",
+)
+DEFAULT_POOL_PRELOAD = ("dotenv", "yaml", "httpx", "mcp")
+
+_worker_pool = None
+_pooled_scripts = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker_pool() -> None:
+    global _worker_pool, _pooled_scripts
+    pool_cfg = (load_config().get("tools") or {}).get("worker_pool") or {}
+    if not pool_cfg.get("enabled", True):
+        _pooled_scripts = frozenset()
+        return
+    _pooled_scripts = frozenset(
+        str((REPO_ROOT / s).resolve()) for s in pool_cfg.get("scripts", DEFAULT_POOLED_SCRIPTS)
+    )
+    _worker_pool = worker_pool.WorkerPool(
+        size=int(pool_cfg.get("size", worker_pool.DEFAULT_POOL_SIZE)),
+        max_requests=int(pool_cfg.get("max_requests", worker_pool.DEFAULT_MAX_REQUESTS)),
+        preload=pool_cfg.get("preload", DEFAULT_POOL_PRELOAD),
+    )
+    atexit.register(_worker_pool.close)
+
+
+def _pool_for(args: list):
+    """The worker pool if args is `python <pooled script> ...` and the pool is enabled, else None."""
+    with _pool_lock:
+        if _pooled_scripts is None:
+            _init_worker_pool()
+    if len(args) < 2 or args[0] != sys.executable or str(Path(args[1]).resolve()) not in _pooled_scripts:
+        return None
+    return _worker_pool
+
+
+def worker_pool_stats() -> dict:
+    """Runs, spawns, recycles, crashes and timeouts of the warm worker pool since startup."""
+    return dict(_worker_pool.stats) if _worker_pool else {}
+
+
+def _run(args: list, cwd: Path = REPO_ROOT, timeout: int = DEFAULT_RUN_TIMEOUT) -> subprocess.CompletedProcess:
+    """Run a subprocess with the given args (on a warm pool worker for pooled scripts). Returns the CompletedProcess."""
+    pool = _pool_for(args)
+    if pool is not None:
+        return pool.run(args, cwd=cwd, timeout=timeout)
     return subprocess.run(
         args,
         capture_output=True,
@@ -112,103 +181,294 @@ async def execute(tool_name: str, tool_input: dict) -> str:
 
     Returns a string result to feed back to Claude as a tool_result.
     """
-    return await asyncio.to_thread(_execute_sync, tool_name, tool_input)
+    spec = TOOL_REGISTRY.get(tool_name)
+    timeout = spec.timeout if spec else DEFAULT_TOOL_TIMEOUT
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        call = asyncio.to_thread(_execute_sync, tool_name, tool_input)
+        if spec and spec.read_only:
+            result = await asyncio.wait_for(call, timeout=timeout)
+        else:
+            # Never report a write as failed while it may still complete (the model would retry it);
+            # mutating tools are bounded by their own subprocess timeouts instead
+            result = await call
+        if result == _ERROR_RESULT:
+            outcome = "error"
+    except asyncio.TimeoutError:
+        # The worker thread can't be interrupted; it finishes in the background and is discarded.
+        # Only read-only tools get here, so nothing is left half-written.
+        logger.warning("Tool %s timed out after %gs", tool_name, timeout)
+        outcome = "timeout"
+        result = json.dumps({"success": False, "error": f"{tool_name} timed out after {timeout:g}s."})
+    _record_latency(tool_name, (time.perf_counter() - started) * 1000, outcome)
+    if tool_name == "memory_write" or (tool_name == "memory_db" and tool_input.get("action") == "delete"):
+        _bump_memory_version()
+    return result
+
+
+# Bumped whenever the bot changes memory, so the cached system prompt (built from
+# memory_read output, see conversation._get_system_prompt) is rebuilt for new sessions
+_memory_version = 0
+
+
+def _bump_memory_version() -> None:
+    global _memory_version
+    _memory_version += 1
+
+
+def memory_version() -> int:
+    return _memory_version
+
+
+# ---------------------------------------------------------------------------
+# Registry and latency stats
+# ---------------------------------------------------------------------------
+
+# Outer limit for read-only tools; kept above DEFAULT_RUN_TIMEOUT so a subprocess's own timeout fires first
+DEFAULT_TOOL_TIMEOUT = DEFAULT_RUN_TIMEOUT + 15.0
+
+_ERROR_RESULT = json.dumps({"success": False, "error": USER_FACING_ERROR})
+
+
+@dataclass(frozen=True)
+class ToolSpec:
+    """A registered tool. handler(tool_input) returns the result string."""
+    name: str
+    handler: Callable[[dict], str]
+    read_only: bool = False        # no side effects: may run concurrently with other read-only calls
+    timeout: float = DEFAULT_TOOL_TIMEOUT  # read-only tools only; must exceed the handler's own subprocess timeout
+    cacheable: bool = False        # same input and source files give the same result
+    in_process: bool = True        # False: shells out for isolation
+    cache_ttl: float = 0.0         # cacheable: seconds a result may be reused (tools.cache.ttl overrides)
+    sources: Callable[[dict], list] | None = None  # cacheable: files whose mtime/size key the result
+    invalidates: tuple = ()        # cached tools this one's writes make stale ("*" for all)
+
+
+TOOL_REGISTRY: dict[str, ToolSpec] = {}
+
+
+def register(name: str, handler: Callable[[dict], str], **meta) -> None:
+    TOOL_REGISTRY[name] = ToolSpec(name=name, handler=handler, **meta)
+
+
+# Histogram bucket upper bounds in ms; the last bucket counts everything slower
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+_latency: dict = {}
+
+
+def _record_latency(tool_name: str, elapsed_ms: float, outcome: str) -> None:
+    h = _latency.get(tool_name)
+    if h is None:
+        h = _latency[tool_name] = {
+            "count": 0, "total_ms": 0.0, "max_ms": 0.0, "errors": 0, "timeouts": 0,
+            "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+        }
+    h["count"] += 1
+    h["total_ms"] += elapsed_ms
+    h["max_ms"] = max(h["max_ms"], elapsed_ms)
+    h["buckets"][bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+    if outcome == "error":
+        h["errors"] += 1
+    elif outcome == "timeout":
+        h["timeouts"] += 1
+    logger.debug("Tool %s: %.0f ms (%s)", tool_name, elapsed_ms, outcome)
+
+
+def _bucket_percentile(buckets: list, count: int, q: float):
+    """Upper bound (ms) of the bucket holding the q-th quantile; None if it's the open-ended bucket."""
+    target = q * count
+    seen = 0
+    for i, n in enumerate(buckets):
+        seen += n
+        if seen >= target:
+            return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else None
+    return None
+
+
+def tool_stats() -> dict:
+    """Per-tool call counts, latency histogram and percentile estimates since startup."""
+    labels = [f"<={b}ms" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+    stats = {}
+    for name, h in sorted(_latency.items()):
+        spec = TOOL_REGISTRY.get(name)
+        stats[name] = {
+            "count": h["count"],
+            "mean_ms": round(h["total_ms"] / h["count"], 1),
+            "max_ms": round(h["max_ms"], 1),
+            "p50_ms": _bucket_percentile(h["buckets"], h["count"], 0.5),
+            "p95_ms": _bucket_percentile(h["buckets"], h["count"], 0.95),
+            "errors": h["errors"],
+            "timeouts": h["timeouts"],
+            "in_process": spec.in_process if spec else None,
+            "histogram": {label: n for label, n in zip(labels, h["buckets"]) if n},
+        }
+    return stats
+
+
+# ---------------------------------------------------------------------------
+# Result cache for cacheable read-only tools
+# ---------------------------------------------------------------------------
+# Keyed by tool name + normalized input; an entry is reused while its TTL lasts and the
+# (mtime, size) of every source file is unchanged. Writing tools drop the entries they
+# make stale (ToolSpec.invalidates). Only this process's writes are tracked, so changes
+# from elsewhere (Obsidian sync, other scripts) are seen via the file stamps or the TTL.
+
+MAX_CACHE_ENTRIES = 256
+
+_result_cache: dict = {}  # (tool, input key) -> (source stamp, expires at, result)
+_cache_lock = threading.Lock()
+_cache_generation = 0
+_cache_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+_cache_cfg = None
+
+
+def _cache_settings() -> dict:
+    global _cache_cfg
+    if _cache_cfg is None:
+        _cache_cfg = (load_config().get("tools") or {}).get("cache") or {}
+    return _cache_cfg
+
+
+def _source_stamp(paths) -> tuple:
+    """(path, mtime_ns, size) per source file; a missing file stamps as (path, None, None)."""
+    stamp = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            stamp.append((str(path), st.st_mtime_ns, st.st_size))
+        except OSError:
+            stamp.append((str(path), None, None))
+    return tuple(stamp)
+
+
+def _cached_call(spec: ToolSpec, tool_input: dict) -> str:
+    """Run a cacheable tool through the result cache."""
+    cfg = _cache_settings()
+    ttl = float((cfg.get("ttl") or {}).get(spec.name, spec.cache_ttl))
+    if not cfg.get("enabled", True) or ttl <= 0:
+        return spec.handler(tool_input)
+
+    normalized = {k: v for k, v in tool_input.items() if v is not None}
+    key = (spec.name, json.dumps(normalized, sort_keys=True, default=str))
+    stamp = _source_stamp(spec.sources(tool_input)) if spec.sources else ()
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _result_cache.get(key)
+        if entry and entry[0] == stamp and entry[1] > now:
+            _cache_stats["hits"] += 1
+            return entry[2]
+        _cache_stats["misses"] += 1
+        generation = _cache_generation
+
+    result = spec.handler(tool_input)
+    if result != _ERROR_RESULT:
+        with _cache_lock:
+            # Skip the store if a write invalidated the cache while the handler was reading
+            if generation == _cache_generation:
+                _result_cache.pop(key, None)
+                if len(_result_cache) >= MAX_CACHE_ENTRIES:
+                    _result_cache.pop(next(iter(_result_cache)))
+                _result_cache[key] = (stamp, now + ttl, result)
+    return result
+
+
+def invalidate_cache(tool_names=("*",)) -> None:
+    """Drop cached results for tool_names ("*": every tool)."""
+    global _cache_generation
+    names = set(tool_names)
+    with _cache_lock:
+        _cache_generation += 1
+        stale = [k for k in _result_cache if "*" in names or k[0] in names]
+        for k in stale:
+            del _result_cache[k]
+        _cache_stats["invalidations"] += 1
+    if stale:
+        logger.debug("Invalidated %d cached results (%s)", len(stale), ", ".join(sorted(names)))
+
+
+def cache_stats() -> dict:
+    """Result cache hits, misses, invalidations and current size since startup."""
+    with _cache_lock:
+        lookups = _cache_stats["hits"] + _cache_stats["misses"]
+        return dict(
+            _cache_stats, entries=len(_result_cache),
+            hit_rate=round(_cache_stats["hits"] / lookups, 3) if lookups else 0.0,
+        )
+
+
+def is_read_only(tool_name: str) -> bool:
+    spec = TOOL_REGISTRY.get(tool_name)
+    return bool(spec and spec.read_only)
+
+
+# Modules imported for in-process execution; None when the import failed (caller falls back to a subprocess)
+_tool_modules: dict = {}
+
+
+def _import_tool_module(name: str):
+    """Import a repo module once for in-process calls. Returns None if it can't be imported."""
+    if name not in _tool_modules:
+        try:
+            _tool_modules[name] = importlib.import_module(name)
+        except (ImportError, SystemExit) as e:  # some scripts sys.exit() when a dependency is missing
+            logger.warning("In-process import of %s failed (%s) — using subprocess", name, e)
+            _tool_modules[name] = None
+    return _tool_modules[name]
+
+# Max read-only tools in flight at once for one turn (tools.parallel_limit in telegram.yaml)
+DEFAULT_PARALLEL_LIMIT = 4
+
+
+async def execute_calls(calls: list[tuple[str, dict]]) -> list[str]:
+    """
+    Execute one model turn's tool calls and return their results in the same order.
+
+    Runs of consecutive read-only tools are gathered under a semaphore; a mutating
+    tool acts as a barrier, so writes keep their order relative to every other call.
+    """
+    limit = (load_config().get("tools") or {}).get("parallel_limit", DEFAULT_PARALLEL_LIMIT)
+    semaphore = asyncio.Semaphore(max(1, int(limit)))
+
+    async def _bounded(tool_name: str, tool_input: dict) -> str:
+        async with semaphore:
+            return await execute(tool_name, tool_input)
+
+    results: list[str] = []
+    i = 0
+    while i < len(calls):
+        if not is_read_only(calls[i][0]):
+            results.append(await execute(*calls[i]))
+            i += 1
+            continue
+        j = i
+        while j < len(calls) and is_read_only(calls[j][0]):
+            j += 1
+        results.extend(await asyncio.gather(*(_bounded(name, inp) for name, inp in calls[i:j])))
+        i = j
+    return results
 
 
 def _execute_sync(tool_name: str, tool_input: dict) -> str:
     """
-    Synchronous implementation of tool execution.
+    Synchronous implementation of tool execution: dispatch through TOOL_REGISTRY.
     """
     if os.environ.get("ATLAS_TEST_RECORD_TOOLS"):
         TOOL_CALL_RECORD.append((tool_name, dict(tool_input)))
+    spec = TOOL_REGISTRY.get(tool_name)
+    if spec is None:
+        return _ERROR_RESULT
     try:
-        if tool_name == "memory_read":
-            return _memory_read(tool_input)
-        elif tool_name == "memory_write":
-            return _memory_write(tool_input)
-        elif tool_name == "memory_search":
-            return _memory_search(tool_input)
-        elif tool_name == "memory_db":
-            return _memory_db(tool_input)
-        elif tool_name == "read_goal":
-            return _read_goal(tool_input)
-        elif tool_name == "journal_read_recent":
-            return _journal_read_recent(tool_input)
-        elif tool_name == "reminders_read":
-            return _reminders_read()
-        elif tool_name == "kanban_read":
-            return _kanban_read()
-        elif tool_name == "heartbeat_read":
-            return _heartbeat_read()
-        elif tool_name == "trial_read_guide":
-            return _trial_read_guide()
-        elif tool_name == "trial_list_cases":
-            return _trial_list_cases()
-        elif tool_name == "trial_list_templates":
-            return _trial_list_templates()
-        elif tool_name == "trial_read_template":
-            return _trial_read_template(tool_input)
-        elif tool_name == "trial_save_document":
-            return _trial_save_document(tool_input)
-        elif tool_name == "rotary_read_log":
-            return _rotary_read_log()
-        elif tool_name == "rotary_read_template":
-            return _rotary_read_template()
-        elif tool_name == "rotary_read_agenda":
-            return _rotary_read_agenda(tool_input)
-        elif tool_name == "rotary_save_agenda":
-            return _rotary_save_agenda(tool_input)
-        elif tool_name == "read_file":
-            return _read_file(tool_input)
-        elif tool_name == "list_files":
-            return _list_files(tool_input)
-        elif tool_name == "edit_file":
-            return _edit_file(tool_input)
-        elif tool_name == "reminder_add":
-            return _reminder_add(tool_input)
-        elif tool_name == "reminder_mark_done":
-            return _reminder_mark_done(tool_input)
-        elif tool_name == "bambu":
-            return _bambu(tool_input)
-        elif tool_name == "browser_search":
-            return _browser_search(tool_input)
-        elif tool_name == "run_tool":
-            return _run_tool(tool_input)
-        elif tool_name == "browser":
-            return _browser(tool_input)
-        elif tool_name == "web_search":
-            return _web_search(tool_input)
-        elif tool_name == "system_config":
-            return _system_config(tool_input)
-        elif tool_name == "telegram_groups":
-            return _telegram_groups(tool_input)
-        elif tool_name == "conversation_context":
-            return _conversation_context(tool_input)
-        elif tool_name == "legalkanban_search_cases":
-            return _legalkanban_search_cases(tool_input)
-        elif tool_name == "legalkanban_create_task":
-            return _legalkanban_create_task(tool_input)
-        elif tool_name == "podcast_create_episode":
-            return _podcast_create_episode(tool_input)
-        elif tool_name == "podcast_approve_script":
-            return _podcast_approve_script(tool_input)
-        elif tool_name == "schedule_read":
-            return _schedule_read(tool_input)
-        elif tool_name == "schedule_preview":
-            return _schedule_preview(tool_input)
-        elif tool_name == "schedule_add":
-            return _schedule_add(tool_input)
-        elif tool_name == "script_writer":
-            return _script_writer(tool_input)
-        elif tool_name == "launchd_manager":
-            return _launchd_manager(tool_input)
-        elif tool_name in _ZAPIER_TOOLS:
-            return _zapier(tool_name, tool_input)
-        else:
-            return json.dumps({"success": False, "error": USER_FACING_ERROR})
+        if spec.cacheable:
+            return _cached_call(spec, tool_input)
+        return spec.handler(tool_input)
     except Exception as e:
         logger.exception("Tool runner exception")
-        return json.dumps({"success": False, "error": USER_FACING_ERROR})
+        return _ERROR_RESULT
+    finally:
+        if spec.invalidates:
+            invalidate_cache(spec.invalidates)
 
 
 # ---------------------------------------------------------------------------
@@ -305,14 +565,39 @@ def _memory_write(inp: dict) -> str:
 
 
 def _memory_search(inp: dict) -> str:
+    """hybrid_search.hybrid_search() in-process (warm BM25/ANN caches); subprocess if it can't be imported."""
+    method = (load_config().get("search") or {}).get("default_method", "hybrid")
+    keyword_only = bool(inp.get("keyword_only", method == "keyword_only"))
+    semantic_only = not keyword_only and method == "semantic"
+
+    # memory/ is on sys.path (memory_read/memory_write put it there), so this shares their memory_db module
+    search = _import_tool_module("hybrid_search")
+    if search is None:
+        return _memory_search_subprocess(inp, keyword_only, semantic_only)
+    result = search.hybrid_search(
+        query=inp["query"],
+        entry_type=inp.get("type"),
+        limit=int(inp.get("limit", 10)),
+        keyword_only=keyword_only,
+        semantic_only=semantic_only,
+    )
+    if not result.get("success"):
+        logger.warning("memory_search failed: %s", result.get("error"))
+        return _ERROR_RESULT
+    return json.dumps(result, indent=2, default=str)
+
+
+def _memory_search_subprocess(inp: dict, keyword_only: bool, semantic_only: bool) -> str:
     args = [sys.executable, "memory/hybrid_search.py"]
 
     args.extend(["--query", inp["query"]])
 
     if "limit" in inp:
         args.extend(["--limit", str(inp["limit"])])
-    if inp.get("keyword_only", True):
+    if keyword_only:
         args.append("--keyword-only")
+    elif semantic_only:
+        args.append("--semantic-only")
     if "type" in inp:
         args.extend(["--type", inp["type"]])
 
@@ -324,6 +609,33 @@ def _memory_search(inp: dict) -> str:
 
 
 def _memory_db(inp: dict) -> str:
+    """memory_db actions in-process, with the same defaults as its CLI; subprocess if it can't be imported."""
+    db = _import_tool_module("memory_db")
+    if db is None:
+        return _memory_db_subprocess(inp)
+    action = inp["action"]
+    limit = int(inp.get("limit", 100))
+    if action == "get":
+        result = db.get_entry(int(inp["id"]))
+    elif action == "list":
+        result = db.list_entries(entry_type=inp.get("type"), source="session", limit=limit)
+    elif action == "search":
+        result = db.search_entries(inp["query"], entry_type=inp.get("type"), limit=limit)
+    elif action == "delete":
+        result = db.delete_entry(int(inp["id"]))
+    elif action == "recent":
+        result = db.get_recent(hours=int(inp.get("hours", 24)), entry_type=inp.get("type"))
+    elif action == "stats":
+        result = db.get_stats()
+    else:
+        return _ERROR_RESULT
+    if not result.get("success"):
+        logger.warning("memory_db %s failed: %s", action, result.get("error"))
+        return _ERROR_RESULT
+    return json.dumps(result, indent=2, default=str)
+
+
+def _memory_db_subprocess(inp: dict) -> str:
     args = [sys.executable, "memory/memory_db.py"]
 
     args.extend(["--action", inp["action"]])
@@ -374,27 +686,22 @@ def _journal_read_recent(inp: dict) -> str:
         return json.dumps({"success": False, "error": "Journal export not found.", "entries": []})
 
     days = max(1, min(31, int(inp.get("days", 7))))
+    journal_store = _import_tool_module("tools.briefings.journal_store")
+    if journal_store is None:
+        return json.dumps({"success": False, "error": USER_FACING_ERROR, "entries": []})
 
+    # Most recent first, then by time; only the window's rows are read
+    cutoff = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
     try:
-        with path.open(newline="", encoding="utf-8") as f:
-            rows = list(csv.DictReader(f))
-    except (OSError, csv.Error) as e:
+        rows = journal_store.read_range(path, cutoff, "9999-12-31", newest_first=True)
+    except (OSError, sqlite3.Error) as e:
         logger.warning("journal_read_recent failed: %s", e)
         return json.dumps({"success": False, "error": USER_FACING_ERROR, "entries": []})
 
-    # Sort by date descending (most recent first), then by time
-    def row_key(r):
-        return (r.get("Date") or "", r.get("Time") or "")
-
-    rows_sorted = sorted(rows, key=row_key, reverse=True)
-
-    cutoff = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
     entries = []
     seen_dates = set()
-    for r in rows_sorted:
+    for r in rows:
         d = (r.get("Date") or "").strip()
-        if d < cutoff:
-            break
         if d in seen_dates:
             continue
         seen_dates.add(d)
@@ -1010,11 +1317,15 @@ def _edit_file(inp: dict) -> str:
 
 
 def _reminder_add(inp: dict) -> str:
-    """Add a reminder by calling reminder_add.py as a subprocess."""
+    """Add a reminder via reminder_add.add_reminder() (subprocess if the module can't be imported)."""
     task = (inp.get("task") or "").strip()
     if not task:
         return json.dumps({"success": False, "error": "task is required."})
     schedule = (inp.get("schedule") or "").strip()
+    reminders = _import_tool_module("tools.briefings.reminder_add")
+    if reminders is not None:
+        msg = reminders.add_reminder(task, schedule).strip()
+        return json.dumps({"success": True, "message": msg or "Reminder added."})
     script = REPO_ROOT / "tools" / "briefings" / "reminder_add.py"
     if not script.exists():
         logger.warning("reminder_add.py not found at %s", script)
@@ -1040,6 +1351,12 @@ def _reminder_mark_done(inp: dict) -> str:
     items = [s.strip() for s in items if isinstance(s, str) and s.strip()]
     if not items:
         return json.dumps({"success": False, "error": "items (list of reminder text to mark done) is required.", "marked_count": 0})
+    reminders = _import_tool_module("tools.briefings.reminder_add")
+    if reminders is not None:
+        data = reminders.mark_reminders_done(items)
+        if not data.get("success"):
+            return json.dumps({"success": False, "error": data.get("message", USER_FACING_ERROR), "marked_count": data.get("marked_count", 0)})
+        return json.dumps({"success": True, "marked_count": data.get("marked_count", 0), "message": data.get("message", "")})
     script = REPO_ROOT / "tools" / "briefings" / "reminder_add.py"
     if not script.exists():
         logger.warning("reminder_add.py not found at %s", script)
@@ -1061,6 +1378,12 @@ def _legalkanban_search_cases(inp: dict) -> str:
     query = (inp.get("query") or "").strip()
     if not query:
         return json.dumps({"success": False, "error": "query is required.", "cases": []})
+    case_search = _import_tool_module("tools.legalkanban.case_search")
+    if case_search is not None:
+        data = case_search.search_cases(query)
+        if not data.get("success"):
+            return json.dumps({"success": False, "error": data.get("error", USER_FACING_ERROR), "cases": data.get("cases", [])})
+        return json.dumps({"success": True, "cases": data.get("cases", [])}, indent=2)
     script = REPO_ROOT / "tools" / "legalkanban" / "case_search.py"
     if not script.exists():
         logger.warning("case_search.py not found at %s", script)
@@ -1083,6 +1406,19 @@ def _legalkanban_create_task(inp: dict) -> str:
     title = (inp.get("title") or "").strip()
     if not title:
         return json.dumps({"success": False, "error": "title is required."})
+    task_create = _import_tool_module("tools.legalkanban.task_create")
+    if task_create is not None:
+        priority = (inp.get("priority") or "").strip().lower()
+        data = task_create.create_legalkanban_task(
+            title=title,
+            case_id=int(inp["case_id"]) if inp.get("case_id") is not None else None,
+            priority=priority if priority in ("high", "medium", "low") else "medium",
+            due_date=(inp.get("due_date") or "").strip() or None,
+            description=(inp.get("description") or "").strip(),
+        )
+        if not data.get("success"):
+            return json.dumps({"success": False, "error": data.get("error", USER_FACING_ERROR)})
+        return json.dumps(data, indent=2)
     script = REPO_ROOT / "tools" / "legalkanban" / "task_create.py"
     if not script.exists():
         logger.warning("task_create.py not found at %s", script)
@@ -2097,3 +2433,93 @@ def _zapier(tool_name: str, inp: dict) -> str:
         logger.warning("zapier %s failed (exit %s): %s", tool_name, result.returncode, err)
         return json.dumps({"success": False, "error": USER_FACING_ERROR})
     return out or "(no output)"
+
+
+# ---------------------------------------------------------------------------
+# Registry
+# ---------------------------------------------------------------------------
+# read_only: no side effects, so it may run alongside other read-only calls in a turn.
+# cacheable: repeated calls with the same input may reuse the result for cache_ttl seconds,
+#   or until a source file's mtime/size changes or a tool that invalidates it runs.
+# in_process=False: the handler shells out, for isolation (arbitrary or long-running
+# scripts, tools with their own event loop or credentials wrapper, external CLIs).
+
+def _memory_sources(inp: dict) -> list:
+    days = int(inp.get("days", 2))
+    today = datetime.now().date()
+    logs = [memory.memory_read.LOGS_DIR / f"{(today - timedelta(days=i)).isoformat()}.md" for i in range(days)]
+    db = REPO_ROOT / "data" / "memory.db"
+    return [memory.memory_read.MEMORY_FILE, db, db.with_name("memory.db-wal")] + logs
+
+
+def _trial_year_dirs(inp: dict) -> list:
+    """TRIALS_ROOT and its year folders: adding a case changes the year folder's mtime."""
+    try:
+        return [TRIALS_ROOT] + sorted(p for p in TRIALS_ROOT.iterdir() if p.name.isdigit())
+    except OSError:
+        return [TRIALS_ROOT]
+
+
+register("memory_read", _memory_read, read_only=True, cacheable=True, cache_ttl=30, sources=_memory_sources)
+register("memory_write", _memory_write, invalidates=("memory_read",))
+register("memory_search", _memory_search, read_only=True)
+register("memory_db", _memory_db, invalidates=("memory_read",))
+register("read_goal", _read_goal, read_only=True, cacheable=True, cache_ttl=300,
+         sources=lambda inp: [REPO_ROOT / "goals" / inp.get("filename", "")])
+register("journal_read_recent", _journal_read_recent, read_only=True, cacheable=True, cache_ttl=300,
+         sources=lambda inp: [_resolve_path("journal_csv", _DEFAULT_JOURNAL_CSV_PATH)])
+register("reminders_read", lambda inp: _reminders_read(), read_only=True, cacheable=True, cache_ttl=300,
+         sources=lambda inp: [_resolve_path("reminders", _DEFAULT_REMINDERS_PATH)])
+register("kanban_read", lambda inp: _kanban_read(), read_only=True, cacheable=True, cache_ttl=300,
+         sources=lambda inp: [_resolve_path("kanban", _DEFAULT_KANBAN_PATH)])
+register("heartbeat_read", lambda inp: _heartbeat_read(), read_only=True, cacheable=True, cache_ttl=60,
+         sources=lambda inp: [HEARTBEAT_MD, HEARTBEAT_STATE])
+register("trial_read_guide", lambda inp: _trial_read_guide(), read_only=True, cacheable=True, cache_ttl=600,
+         sources=lambda inp: [TRIALS_ROOT / "Case Prep Guide.md"])
+register("trial_list_cases", lambda inp: _trial_list_cases(), read_only=True, cacheable=True, cache_ttl=600,
+         sources=_trial_year_dirs)
+register("trial_list_templates", lambda inp: _trial_list_templates(), read_only=True, cacheable=True, cache_ttl=600,
+         sources=lambda inp: [TRIALS_ROOT / "Templates"])
+register("trial_read_template", _trial_read_template, read_only=True, cacheable=True, cache_ttl=600,
+         sources=lambda inp: [TRIALS_ROOT / "Templates" / (inp.get("template_name") or "").strip()])
+register("trial_save_document", _trial_save_document,
+         invalidates=("trial_list_cases", "trial_list_templates", "trial_read_template", "trial_read_guide"))
+register("rotary_read_log", lambda inp: _rotary_read_log(), read_only=True, cacheable=True, cache_ttl=300,
+         sources=lambda inp: [ROTARY_LOG])
+register("rotary_read_template", lambda inp: _rotary_read_template(), read_only=True, cacheable=True, cache_ttl=600,
+         sources=lambda inp: [ROTARY_TEMPLATE])
+register("rotary_read_agenda", _rotary_read_agenda, read_only=True, cacheable=True, cache_ttl=300,
+         sources=lambda inp: [ROTARY_MEETINGS / f"{(inp.get('meeting_date') or '').strip()} Agenda.md"])
+register("rotary_save_agenda", _rotary_save_agenda, invalidates=("rotary_read_agenda", "rotary_read_log"))
+register("read_file", _read_file, read_only=True, cacheable=True, cache_ttl=60,
+         sources=lambda inp: [REPO_ROOT / (inp.get("path") or "").strip()])
+register("list_files", _list_files, read_only=True, cacheable=True, cache_ttl=60,
+         sources=lambda inp: [REPO_ROOT / (inp.get("path") or "").strip()])
+register("edit_file", _edit_file, invalidates=("*",))
+register("reminder_add", _reminder_add, invalidates=("reminders_read",))
+register("reminder_mark_done", _reminder_mark_done, invalidates=("reminders_read",))
+register("browser_search", _browser_search, read_only=True)
+register("web_search", _web_search, read_only=True, in_process=False)
+register("browser", _browser, in_process=False)
+register("bambu", _bambu, in_process=False)
+register("run_tool", _run_tool, in_process=False, invalidates=("*",))
+register("system_config", _system_config, in_process=False)
+register("telegram_groups", _telegram_groups)
+register("conversation_context", _conversation_context, read_only=True)
+register("legalkanban_search_cases", _legalkanban_search_cases, read_only=True)
+register("legalkanban_create_task", _legalkanban_create_task)
+register("podcast_create_episode", _podcast_create_episode, in_process=False, invalidates=("*",))
+register("podcast_approve_script", _podcast_approve_script, in_process=False, invalidates=("*",))
+register("podcast_regenerate_voice", _podcast_regenerate_voice, in_process=False, invalidates=("*",))
+register("podcast_regenerate_paragraph", _podcast_regenerate_paragraph, in_process=False, invalidates=("*",))
+register("schedule_read", _schedule_read, read_only=True, cacheable=True, cache_ttl=60)
+register("schedule_preview", _schedule_preview)
+register("schedule_add", _schedule_add, invalidates=("schedule_read",))
+register("script_writer", _script_writer, in_process=False, invalidates=("*",))
+register("launchd_manager", _launchd_manager, in_process=False)
+for _name in _ZAPIER_TOOLS:
+    register(_name, lambda inp, _name=_name: _zapier(_name, inp), in_process=False)
+
+# Tools with no side effects. Within one model turn, consecutive read-only calls run
+# concurrently; any other tool runs alone, after every call before it has finished.
+READ_ONLY_TOOLS = frozenset(name for name, spec in TOOL_REGISTRY.items() if spec.read_only)
@@ -0,0 +1,278 @@
+"""
+Per-message tool subset selection.
+
+Sending every schema in TOOL_DEFINITIONS with each completion costs thousands of
+prompt tokens, most of them for tools irrelevant to the message. select_tools()
+picks the domains a message touches and sends only their tools:
+  - intents already detected by conversation.py (_is_priorities_intent, …)
+  - router.AGENTS keywords, mapped through each agent's tool directories
+  - extra keyword rules for bot domains router.py doesn't cover (rotary, calendar, files…)
+  - tools called in the last couple of turns, so follow-ups keep working
+A small core set is always included, plus request_all_tools: when the model calls
+it, the rest of the turn runs with the full tool list (conversation.py handles it).
+
+Set tools.selection.enabled: false in args/telegram.yaml to always send every tool.
+selection_stats() reports cumulative schema-token savings.
+"""
+
+import logging
+import re
+import sys
+
+from config import get_repo_root
+from context_window import is_stale_context, tools_tokens
+from tool_definitions import TOOL_DEFINITIONS
+
+try:
+    if str(get_repo_root()) not in sys.path:
+        sys.path.append(str(get_repo_root()))
+    from router import AGENTS
+except ImportError:
+    AGENTS = {}
+
+logger = logging.getLogger(__name__)
+
+EXPAND_TOOL = "request_all_tools"
+EXPAND_TOOL_DEFINITION = {
+    "type": "function",
+    "function": {
+        "name": EXPAND_TOOL,
+        "description": "Only the tools that looked relevant to this message are loaded. If you need a tool that isn't listed (calendar, email, printer, podcast, rotary, trial, files, scheduling…), call this first; every tool becomes available on your next step.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "reason": {
+                    "type": "string",
+                    "description": "What you are trying to do."
+                }
+            },
+            "required": []
+        }
+    }
+}
+
+# Always sent: cheap, general-purpose tools the model reaches for in any conversation
+CORE_TOOLS = (
+    "memory_read", "memory_write", "memory_search", "web_search", "reminders_read", "conversation_context",
+)
+
+# Tool names per domain. Keys include the tool directories used in router.AGENTS[*]["tools"].
+DOMAIN_TOOLS = {
+    "memory": ("memory_read", "memory_write", "memory_search", "memory_db", "read_goal"),
+    "capture": ("memory_write",),
+    "zapier": (
+        "gmail_create_draft", "google_calendar_find_calendars", "google_calendar_find_events",
+        "google_calendar_create_detailed_event", "google_calendar_retrieve_event_by_id",
+        "google_calendar_move_event_to_another_calendar", "google_calendar_find_busy_periods_in_calendar",
+    ),
+    "research": ("web_search", "browser_search"),
+    "browser": ("browser", "browser_search"),
+    "legalkanban": (
+        "legalkanban_search_cases", "legalkanban_create_task", "trial_read_guide", "trial_list_cases",
+        "trial_list_templates", "trial_read_template", "trial_save_document",
+    ),
+    "bambu": ("bambu",),
+    "briefings": ("run_tool", "reminders_read", "journal_read_recent", "heartbeat_read", "kanban_read"),
+    "system": ("system_config", "launchd_manager", "script_writer", "run_tool"),
+    "heartbeat": ("heartbeat_read",),
+    "podcast": (
+        "podcast_create_episode", "podcast_approve_script", "podcast_regenerate_voice",
+        "podcast_regenerate_paragraph", "schedule_read", "schedule_preview", "schedule_add", "script_writer",
+    ),
+    "telegram": ("telegram_groups", "conversation_context"),
+    # Bot domains without a router agent
+    "reminders": ("reminders_read", "reminder_add", "reminder_mark_done"),
+    "tasks": ("kanban_read", "journal_read_recent", "reminders_read", "read_goal"),
+    "rotary": ("rotary_read_log", "rotary_read_template", "rotary_read_agenda", "rotary_save_agenda"),
+    "files": ("read_file", "list_files", "edit_file"),
+}
+
+# Keyword rules beyond router.AGENTS (matched at word starts, like "priorit" → priorities)
+KEYWORD_DOMAINS = {
+    "zapier": ("calendar", "meeting", "appointment", "event", "email", "e-mail", "gmail", "draft", "busy", "free time"),
+    "reminders": ("remind", "reminder"),
+    "tasks": ("task", "todo", "to-do", "kanban", "priorit", "focus", "plate", "journal", "goal"),
+    "rotary": ("rotary", "agenda", "club"),
+    "legalkanban": ("court", "motion", "hearing", "trial", "case"),
+    "files": ("file", "folder", "directory", "repo", "code", "script", ".py", ".md", ".yaml", ".json"),
+    "system": ("schedule", "cron", "launchd", "every day", "every morning", "automate", "script"),
+    "research": ("search", "look up", "google", "news", "latest", "website", "http"),
+    "browser": ("browse", "website", "http", "url", "page"),
+    "telegram": ("group", "earlier", "we talked", "you said", "last time"),
+    "memory": ("remember", "memory", "forget", "recall"),
+}
+
+# Intent names passed by conversation.py → domains
+INTENT_DOMAINS = {
+    "priorities": ("tasks", "briefings"),
+    "today": ("reminders", "zapier", "briefings"),
+    "remind_me": ("reminders",),
+    "bambu": ("bambu",),
+    "web_search": ("research", "browser"),
+}
+
+# Every message here is a Telegram chat, so the telegram agent's keywords ("message", "chat") carry no signal
+_SKIP_AGENTS = frozenset({"telegram"})
+
+# Tool result for request_all_tools calls
+EXPANDED_RESULT = '{"success": true, "message": "All tools are now available. Call the one you need."}'
+
+_ALL_NAMES = frozenset(t["function"]["name"] for t in TOOL_DEFINITIONS)
+_FULL_SCHEMA_TOKENS = None
+
+_stats = {"requests": 0, "subset_requests": 0, "expanded": 0, "schema_tokens_full": 0, "schema_tokens_sent": 0}
+
+
+def _keyword_hit(lower: str, keyword: str) -> bool:
+    return re.search(r"(?<![a-z0-9])" + re.escape(keyword), lower) is not None
+
+
+def match_domains(text: str, intents=()) -> list[str]:
+    """Domains a message touches: detected intents, router.AGENTS keywords, extra keyword rules."""
+    lower = (text or "").lower()
+    domains: dict = {}
+    for intent in intents:
+        for domain in INTENT_DOMAINS.get(intent, ()):
+            domains[domain] = True
+    for agent_name, agent in AGENTS.items():
+        if agent_name in _SKIP_AGENTS:
+            continue
+        if any(_keyword_hit(lower, kw) for kw in agent.get("keywords", [])):
+            for domain in agent.get("tools", []):
+                domains[domain] = True
+    for domain, keywords in KEYWORD_DOMAINS.items():
+        if any(_keyword_hit(lower, kw) for kw in keywords):
+            domains[domain] = True
+    return list(domains)
+
+
+def recent_tool_names(messages: list, turns: int = 2) -> set:
+    """Tools the assistant called during the last `turns` user turns."""
+    names = set()
+    seen = 0
+    for m in reversed(messages):
+        for tc in m.get("tool_calls") or []:
+            names.add((tc.get("function") or {}).get("name"))
+        if m.get("role") == "user" and not is_stale_context(m):
+            seen += 1
+            if seen > turns:
+                break
+    names.discard(None)
+    return names
+
+
+def _full_schema_tokens() -> int:
+    global _FULL_SCHEMA_TOKENS
+    if _FULL_SCHEMA_TOKENS is None:
+        _FULL_SCHEMA_TOKENS = tools_tokens(TOOL_DEFINITIONS)
+    return _FULL_SCHEMA_TOKENS
+
+
+def select_tools(text: str, intents=(), recent=(), config: dict | None = None):
+    """
+    Return (tools, info) for one user message.
+
+    tools keeps TOOL_DEFINITIONS order (stable request prefix) and ends with the
+    request_all_tools escape hatch unless every tool was selected anyway.
+    info: {"domains", "selected", "total", "schema_tokens", "full_schema_tokens", "expanded"}.
+    """
+    sel_cfg = ((config or {}).get("tools") or {}).get("selection") or {}
+    full_tokens = _full_schema_tokens()
+    _stats["requests"] += 1
+
+    if not sel_cfg.get("enabled", True):
+        _stats["schema_tokens_full"] += full_tokens
+        _stats["schema_tokens_sent"] += full_tokens
+        return TOOL_DEFINITIONS, {
+            "domains": [], "selected": len(_ALL_NAMES), "total": len(_ALL_NAMES),
+            "schema_tokens": full_tokens, "full_schema_tokens": full_tokens, "expanded": True,
+        }
+
+    domains = match_domains(text, intents)
+    names = set(sel_cfg.get("core", CORE_TOOLS))
+    for domain in domains:
+        names.update(DOMAIN_TOOLS.get(domain, ()))
+    names.update(n for n in recent if n in _ALL_NAMES)
+
+    if names >= _ALL_NAMES:
+        tools = TOOL_DEFINITIONS
+    else:
+        tools = [t for t in TOOL_DEFINITIONS if t["function"]["name"] in names] + [EXPAND_TOOL_DEFINITION]
+        _stats["subset_requests"] += 1
+    sent_tokens = tools_tokens(tools)
+    _stats["schema_tokens_full"] += full_tokens
+    _stats["schema_tokens_sent"] += sent_tokens
+
+    info = {
+        "domains": domains,
+        "selected": len(names & _ALL_NAMES),
+        "total": len(_ALL_NAMES),
+        "schema_tokens": sent_tokens,
+        "full_schema_tokens": full_tokens,
+        "expanded": tools is TOOL_DEFINITIONS,
+    }
+    logger.info(
+        "Tool subset: %d/%d tools (domains: %s) — schemas ~%d of ~%d tokens (saved ~%d)",
+        info["selected"], info["total"], ", ".join(domains) or "core only",
+        sent_tokens, full_tokens, full_tokens - sent_tokens,
+    )
+    return tools, info
+
+
+def expand(info: dict, reason: str = "") -> list:
+    """The model asked for every tool: return the full list and count it."""
+    if not info.get("expanded"):
+        _stats["expanded"] += 1
+        info["expanded"] = True
+        logger.info("Expanding to all tools (%s)", reason or "model request")
+    return TOOL_DEFINITIONS
+
+
+def selection_stats() -> dict:
+    """Cumulative selection metrics since startup."""
+    full = _stats["schema_tokens_full"]
+    saved = full - _stats["schema_tokens_sent"]
+    return dict(_stats, schema_tokens_saved=saved, saved_pct=round(100 * saved / full, 1) if full else 0.0)
+
+
+def compact_reference(text: str) -> str:
+    """
+    Shrink gotcha_tools_reference.md for the system prompt.
+
+    The tool schemas already carry parameters, so keep each section's heading, its
+    opening description and any confirm/requires caveats; drop CLI flags, output
+    formats and the parsing table. Deterministic, so the system prompt stays stable.
+    """
+    out = []
+    in_intro = started = False
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("#"):
+            out.append(line)
+            in_intro, started = True, False
+        elif not stripped or stripped == "---":
+            if out and out[-1]:
+                out.append("")
+            if started:
+                in_intro = False
+        elif stripped.startswith(("- ", "|")):
+            in_intro = False
+            if "**Confirm" in stripped or "**Requires" in stripped or "`goals/" in stripped:
+                out.append(line)
+        elif in_intro:
+            out.append(line)
+            started = True
+
+    # Drop headings whose whole section was removed (e.g. the parsing table)
+    def level(line):
+        return len(line) - len(line.lstrip("#"))
+
+    kept = []
+    for i, line in enumerate(out):
+        if line.startswith("#"):
+            nxt = next((later for later in out[i + 1:] if later), None)
+            if nxt is None or (nxt.startswith("#") and level(nxt) <= level(line)):
+                continue
+        if line or (kept and kept[-1]):
+            kept.append(line)
+    return "\n".join(kept).strip() + "\n"
@@ -0,0 +1,136 @@
+"""
+Per-user turn queue for the Telegram bot.
+
+A user's messages are handled one turn at a time, in arrival order, so two messages
+never interleave appends to the same session. Messages sent in quick succession
+(each within bot.coalesce_ms of the previous) in the same chat are merged into one
+turn, and messages that arrive while a turn is running wait and are merged into the
+next. A user may have at most bot.max_pending_per_user messages waiting, and at most
+bot.max_concurrent_turns turns run at once across all users and groups.
+
+The first message for an idle user makes its handler that user's worker: it runs
+batches until the user's queue is empty. Later handlers only enqueue and return, so
+a burst doesn't tie up the bot's update slots.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COALESCE_MS = 600
+DEFAULT_MAX_PENDING_PER_USER = 5
+DEFAULT_MAX_CONCURRENT_TURNS = 4
+
+# A steady stream of messages keeps extending the merge window, but not past this many windows
+MAX_COALESCE_WINDOWS = 4
+
+
+@dataclass
+class QueuedMessage:
+    """One incoming message. Commands and directives set coalesce=False and always run alone."""
+    chat_id: int
+    text: str
+    payload: object = None
+    coalesce: bool = True
+
+
+@dataclass
+class _Lane:
+    pending: list = field(default_factory=list)
+    running: bool = False
+
+
+class TurnQueue:
+    def __init__(
+        self,
+        coalesce_ms: int = DEFAULT_COALESCE_MS,
+        max_pending_per_user: int = DEFAULT_MAX_PENDING_PER_USER,
+        max_concurrent_turns: int = DEFAULT_MAX_CONCURRENT_TURNS,
+    ):
+        self.coalesce_sec = max(0, coalesce_ms) / 1000
+        self.max_pending = max(1, max_pending_per_user)
+        self.max_concurrent = max(1, max_concurrent_turns)
+        self._lanes: dict = {}
+        self._slots = None
+        self._slots_loop = None
+        self.stats = {"turns": 0, "coalesced": 0, "rejected": 0, "waited_for_slot": 0}
+
+    async def submit(self, user_id: int, message: QueuedMessage, run) -> bool:
+        """
+        Queue a message for user_id; run(batch) is awaited with each list of messages to handle.
+
+        Returns False without queueing if the user already has max_pending_per_user waiting.
+        If this call becomes the user's worker it returns once the queue is drained.
+        """
+        lane = self._lanes.setdefault(user_id, _Lane())
+        if len(lane.pending) >= self.max_pending:
+            self.stats["rejected"] += 1
+            logger.warning("User %s has %d messages queued — rejecting", user_id, len(lane.pending))
+            return False
+        lane.pending.append(message)
+        if lane.running:
+            return True
+
+        lane.running = True
+        try:
+            while lane.pending:
+                await self._settle(lane)
+                await self._run(user_id, self._take_batch(lane), run)
+        finally:
+            lane.running = False
+            if not lane.pending:
+                self._lanes.pop(user_id, None)
+        return True
+
+    def pending(self, user_id: int) -> int:
+        lane = self._lanes.get(user_id)
+        return len(lane.pending) if lane else 0
+
+    async def _settle(self, lane: _Lane) -> None:
+        """Wait until no new message has arrived for one coalescing window."""
+        if not self.coalesce_sec or not lane.pending[0].coalesce:
+            return
+        for _ in range(MAX_COALESCE_WINDOWS):
+            seen = len(lane.pending)
+            await asyncio.sleep(self.coalesce_sec)
+            if len(lane.pending) == seen:
+                return
+
+    @staticmethod
+    def _take_batch(lane: _Lane) -> list:
+        """The oldest message, plus following mergeable messages from the same chat."""
+        first = lane.pending.pop(0)
+        batch = [first]
+        if first.coalesce:
+            while lane.pending and lane.pending[0].coalesce and lane.pending[0].chat_id == first.chat_id:
+                batch.append(lane.pending.pop(0))
+        return batch
+
+    def _slots_for_loop(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+            self._slots_loop = loop
+        return self._slots
+
+    async def _run(self, user_id: int, batch: list, run) -> None:
+        slots = self._slots_for_loop()
+        if slots.locked():
+            self.stats["waited_for_slot"] += 1
+            logger.info("All %d turn slots busy — user %s waits", self.max_concurrent, user_id)
+        async with slots:
+            self.stats["turns"] += 1
+            if len(batch) > 1:
+                self.stats["coalesced"] += len(batch) - 1
+                logger.info("Merged %d messages from user %s into one turn", len(batch), user_id)
+            try:
+                await run(batch)
+            except Exception:
+                logger.exception("Turn for user %s failed", user_id)
+
+
+def merge_texts(batch: list) -> str:
+    """Text for one turn built from a batch of messages."""
+    return "\n\n".join(m.text for m in batch)
@@ -0,0 +1,253 @@
+"""
+Warm worker pool for subprocess-backed tools.
+
+Starting a fresh interpreter per tool call means re-importing dotenv, the MCP client
+and friends every time. A pool worker is a long-lived python process that has
+already imported those (tools.worker_pool.preload in args/telegram.yaml) and runs
+tool scripts on request: it gets a JSON-RPC 2.0 "run" request with the script's
+argv and cwd on its stdin, executes the script as __main__ with stdout/stderr
+captured, and answers with {"returncode", "stdout", "stderr"} on its stdout.
+WorkerPool.run() returns that as a subprocess.CompletedProcess, like
+subprocess.run(capture_output=True, text=True), with one difference: only what the
+script writes through sys.stdout/sys.stderr is captured. Output written straight
+to file descriptors 1/2 (C extensions, child processes started without capture)
+goes to the bot's stderr, which workers inherit, as do their own tracebacks.
+
+Each script still runs outside the bot process. A worker is replaced after
+max_requests runs (scripts can leave state behind in sys.modules, logging etc.),
+when it exits or crashes, and when a call times out (it is killed, and
+subprocess.TimeoutExpired is raised as subprocess.run would). A crash mid-call is
+reported as a failed run and never retried, since the script may have had side effects.
+
+Run as a worker: python worker_pool.py [module ...]  (modules to preload)
+"""
+
+import contextlib
+import io
+import json
+import logging
+import os
+import select
+import subprocess
+import sys
+import threading
+import time
+import traceback
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 2
+DEFAULT_MAX_REQUESTS = 50
+
+
+class _Worker:
+    """One worker process and its pipe."""
+
+    def __init__(self, preload: list):
+        self.proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), *preload],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=None,  # inherit: worker crashes and uncaptured output reach the bot log
+            bufsize=0,
+        )
+        self.requests = 0
+        self._buffer = b""
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def call(self, request: dict, timeout: float) -> dict:
+        """Send one request and wait up to timeout seconds for its response."""
+        self.proc.stdin.write((json.dumps(request) + "\n").encode())
+        self.proc.stdin.flush()
+        self.requests += 1
+        deadline = time.monotonic() + timeout
+        fd = self.proc.stdout.fileno()
+        while b"\n" not in self._buffer:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if ready:
+                chunk = os.read(fd, 65536)
+                if not chunk:
+                    raise EOFError("worker exited")
+                self._buffer += chunk
+        line, _, self._buffer = self._buffer.partition(b"\n")
+        return json.loads(line)
+
+    def close(self) -> None:
+        if self.alive():
+            try:
+                self.proc.stdin.close()
+                self.proc.wait(timeout=2)
+            except Exception:
+                self.proc.kill()
+                self.proc.wait()
+
+
+class WorkerPool:
+    """Up to `size` warm workers shared by all threads; callers wait when every worker is busy."""
+
+    def __init__(self, size: int = DEFAULT_POOL_SIZE, max_requests: int = DEFAULT_MAX_REQUESTS, preload=()):
+        self.size = max(1, size)
+        self.max_requests = max(1, max_requests)
+        self.preload = list(preload)
+        self._idle: list = []
+        self._started = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self.stats = {"runs": 0, "spawned": 0, "recycled": 0, "crashed": 0, "timeouts": 0}
+
+    def run(self, args: list, cwd=None, timeout: float = 60) -> subprocess.CompletedProcess:
+        """Run args[1] (a python script) with argv args[1:] on a worker, like subprocess.run."""
+        deadline = time.monotonic() + timeout
+        worker = self._checkout(deadline, args, timeout)
+        request = {
+            "jsonrpc": "2.0",
+            "id": worker.requests + 1,
+            "method": "run",
+            "params": {"argv": [str(a) for a in args[1:]], "cwd": str(cwd) if cwd else None},
+        }
+        keep = False
+        try:
+            response = worker.call(request, max(0.0, deadline - time.monotonic()))
+            result = response.get("result") or {}
+            keep = worker.requests < self.max_requests
+            if not keep:
+                self.stats["recycled"] += 1
+            return subprocess.CompletedProcess(
+                args, result.get("returncode", 1), result.get("stdout", ""),
+                result.get("stderr", "") or (response.get("error") or {}).get("message", ""),
+            )
+        except TimeoutError:
+            self.stats["timeouts"] += 1
+            logger.warning("Pool worker timed out after %ss running %s — killing it", timeout, args[1])
+            worker.proc.kill()
+            raise subprocess.TimeoutExpired(args, timeout)
+        except (EOFError, OSError, ValueError) as e:
+            self.stats["crashed"] += 1
+            logger.warning("Pool worker died running %s (%s)", args[1], e)
+            return subprocess.CompletedProcess(args, -1, "", f"worker process died: {e}")
+        finally:
+            self.stats["runs"] += 1
+            self._checkin(worker, keep)
+
+    def _checkout(self, deadline: float, args: list, timeout: float) -> _Worker:
+        with self._cond:
+            while True:
+                while self._idle:
+                    worker = self._idle.pop()
+                    if worker.alive():
+                        return worker
+                    self._started -= 1
+                    self.stats["crashed"] += 1
+                if self._started < self.size and not self._closed:
+                    self._started += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired(args, timeout)
+                self._cond.wait(remaining)
+        try:
+            worker = _Worker(self.preload)
+        except Exception:
+            with self._cond:
+                self._started -= 1
+                self._cond.notify()
+            raise
+        self.stats["spawned"] += 1
+        return worker
+
+    def _checkin(self, worker: _Worker, keep: bool) -> None:
+        if not (keep and worker.alive()) or self._closed:
+            worker.close()
+            with self._cond:
+                self._started -= 1
+                self._cond.notify()
+            return
+        with self._cond:
+            self._idle.append(worker)
+            self._cond.notify()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._started -= len(idle)
+        for worker in idle:
+            worker.close()
+
+
+# ---------------------------------------------------------------------------
+# Worker process
+# ---------------------------------------------------------------------------
+
+def _run_script(argv: list, cwd) -> dict:
+    """Run argv[0] as __main__ in this process, capturing output and the exit code."""
+    import runpy
+
+    saved_argv, saved_path, saved_env, saved_cwd = sys.argv, list(sys.path), dict(os.environ), os.getcwd()
+    out, err = io.StringIO(), io.StringIO()
+    returncode = 0
+    try:
+        if cwd:
+            os.chdir(cwd)
+        script = os.path.abspath(argv[0])
+        sys.argv = [script, *argv[1:]]
+        sys.path.insert(0, os.path.dirname(script))
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            try:
+                runpy.run_path(script, run_name="__main__")
+            except SystemExit as e:
+                if isinstance(e.code, int):
+                    returncode = e.code
+                elif e.code is not None:
+                    print(e.code, file=sys.stderr)
+                    returncode = 1
+            except BaseException:
+                traceback.print_exc()
+                returncode = 1
+    finally:
+        sys.argv = saved_argv
+        sys.path[:] = saved_path
+        os.environ.clear()
+        os.environ.update(saved_env)
+        os.chdir(saved_cwd)
+    return {"returncode": returncode, "stdout": out.getvalue(), "stderr": err.getvalue()}
+
+
+def _serve(preload: list) -> None:
+    # The pipe is ours: scripts (and anything they spawn) get an empty stdin, and fd 1 goes to
+    # stderr (the bot's, inherited) so stray writes can't corrupt the responses
+    requests = os.fdopen(os.dup(0), "r", encoding="utf-8")
+    responses = os.fdopen(os.dup(1), "w", encoding="utf-8")
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.dup2(2, 1)
+    sys.stdin = io.StringIO("")
+    # Scripts get their own directory first on sys.path, as under a fresh interpreter, not this one's
+    if sys.path and os.path.abspath(sys.path[0]) == os.path.dirname(os.path.abspath(__file__)):
+        sys.path.pop(0)
+
+    for name in preload:
+        try:
+            __import__(name)
+        except Exception as e:
+            print(f"worker_pool: preload of {name} failed: {e}", file=sys.stderr)
+
+    for line in requests:
+        try:
+            request = json.loads(line)
+            params = request.get("params") or {}
+            response = {"jsonrpc": "2.0", "id": request.get("id"),
+                        "result": _run_script(params["argv"], params.get("cwd"))}
+        except Exception as e:
+            response = {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": str(e)}}
+        responses.write(json.dumps(response) + "\n")
+        responses.flush()
+
+
+if __name__ == "__main__":
+    _serve(sys.argv[1:])